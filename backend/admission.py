@@ -0,0 +1,306 @@
+"""
+Admission Control
+=================
+Decides, before a request reaches its handler, whether to serve it now,
+let it wait briefly, or turn it away, so one busy client or a burst of
+uploads cannot push everyone's latency up without bound.
+
+1. Per-client rate: a token bucket per client, keyed by its API key
+   (ADMISSION_API_KEY_HEADER) when the key's SHA-256 hex digest is listed
+   in ADMISSION_API_KEYS, else by its IP address. Unlisted keys share
+   their IP's bucket, so a client cannot mint a fresh budget by sending
+   a new key with every request. Each
+   request takes its class's cost in tokens; the bucket refills at
+   ADMISSION_RATE tokens per second up to ADMISSION_BURST. An empty bucket
+   gets 429 with Retry-After: the seconds until the request would fit.
+   Buckets live in shared_state, so a client gets one budget however many
+   workers its requests land on.
+   Off by default (ADMISSION_RATE=0): the IP is scope["client"], which is
+   the real client only when uvicorn trusts the proxy in front of it
+   (FORWARDED_ALLOW_IPS, see serve.py). Behind an untrusted proxy every
+   user would share the proxy's bucket.
+2. Concurrency per endpoint class, per worker (a worker's CPU and thread
+   pools are what the caps protect):
+   - inference: scan, voice analysis, batch assessment, chat stream
+   - standard: chat, assessment, booking
+   - read: everything else (doctors, admin, history)
+   Up to ADMISSION_<CLASS>_CONCURRENCY requests of a class run at once.
+   Further ones wait in a FIFO queue of at most ADMISSION_<CLASS>_QUEUE,
+   each for at most ADMISSION_<CLASS>_TIMEOUT_MS. A full queue or a
+   missed deadline gets 503 with Retry-After, estimated from the queue
+   length and recent handler times.
+
+The bucket is GCRA (the "theoretical arrival time" form of a token
+bucket): one number per client, updated atomically with
+SharedState.update(). If the state backend fails, requests are admitted
+rather than rejected.
+
+The root health check, /metrics, CORS preflights and websockets are not
+limited. Rate or concurrency 0 turns that limit off. Rejections are
+counted in admission_rejected_total{class,reason}; queue depth and
+running requests are exported per class.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple
+
+from metrics import registry
+from tracing import span
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "0"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "40"))
+ADMISSION_API_KEY_HEADER = os.getenv("ADMISSION_API_KEY_HEADER", "X-API-Key").lower().encode()
+# Comma-separated SHA-256 hex digests of the keys that get their own bucket
+ADMISSION_API_KEYS = frozenset(
+    digest.strip().lower() for digest in os.getenv("ADMISSION_API_KEYS", "").split(",")
+    if digest.strip())
+
+# class: (concurrency, queue, timeout ms, token cost) defaults
+CLASS_DEFAULTS = {
+    "inference": (8, 32, 2000, 4),
+    "standard": (32, 128, 1000, 1),
+    "read": (64, 256, 500, 1),
+}
+CLASS_ROUTES = {
+    ("POST", "/api/scan"): "inference",
+    ("POST", "/api/voice-analysis"): "inference",
+    ("POST", "/api/health-assessment/batch"): "inference",
+    ("POST", "/api/chat/stream"): "inference",
+    ("POST", "/api/chat"): "standard",
+    ("POST", "/api/health-assessment"): "standard",
+    ("POST", "/api/book"): "standard",
+}
+EXEMPT_PATHS = {"/", "/metrics"}
+
+REJECTED = registry.counter(
+    "admission_rejected_total", "Requests turned away by admission control",
+    ("class", "reason"))
+
+
+def _class_setting(name: str, index: int, key: str) -> float:
+    return float(os.getenv(f"ADMISSION_{name.upper()}_{key}", CLASS_DEFAULTS[name][index]))
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ClassLimiter:
+    """At most `limit` holders; a bounded FIFO of waiters with a deadline"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: deque = deque()
+        self._hold_seconds = 0.05   # moving average, for Retry-After
+        self._stats = {"admitted": 0, "queued": 0, "queue_full": 0, "timeout": 0}
+
+    def retry_after(self) -> float:
+        """Seconds until the queue ahead of a new arrival has likely drained"""
+        return (len(self._waiters) + 1) * self._hold_seconds / max(1, self.limit)
+
+    async def acquire(self):
+        """Take a slot, waiting up to timeout; raises Rejected"""
+        if self.limit <= 0:
+            return
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._stats["admitted"] += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._stats["queue_full"] += 1
+            raise Rejected(503, "queue_full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._stats["queued"] += 1
+        try:
+            with span(f"admission.wait.{self.name}"):
+                await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self._stats["timeout"] += 1
+            raise Rejected(503, "timeout", self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0)   # the slot was handed over; pass it on
+            else:
+                self._discard(waiter)
+            raise
+        self._stats["admitted"] += 1
+
+    def _discard(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, held: float):
+        """Give the slot to the next waiter, or free it"""
+        if self.limit <= 0:
+            return
+        if held:
+            self._hold_seconds += 0.1 * (held - self._hold_seconds)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)   # slot changes hands; active unchanged
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict:
+        return {"limit": self.limit, "active": self.active, "queued_now": len(self._waiters),
+                "max_queue": self.max_queue, "timeout_s": self.timeout,
+                "avg_hold_ms": round(self._hold_seconds * 1000, 1), **self._stats}
+
+
+def _gcra(current: Optional[str], now: float, cost: float, interval: float,
+          burst: float) -> str:
+    """
+    New bucket value "tat;retry_after". tat is when the bucket would be
+    full again; a request fits while tat stays within burst of now.
+    retry_after > 0 means rejected (tat unchanged).
+    """
+    tat = max(float(current.split(";", 1)[0]) if current else now, now)
+    new_tat = tat + cost * interval
+    overshoot = new_tat - now - burst * interval
+    if overshoot > 1e-9:   # not float rounding: the last token of a burst fits
+        return f"{tat!r};{overshoot!r}"
+    return f"{new_tat!r};0"
+
+
+class AdmissionController:
+    """Client buckets (in shared state) plus this worker's class limiters"""
+
+    def __init__(self, state, rate: float = ADMISSION_RATE, burst: float = ADMISSION_BURST,
+                 api_keys: Iterable[str] = ADMISSION_API_KEYS):
+        self.state = state
+        self.rate = rate
+        self.api_keys = frozenset(api_keys)
+        self.burst = max(burst, max(d[3] for d in CLASS_DEFAULTS.values()))
+        self.limiters = {
+            name: ClassLimiter(name, int(_class_setting(name, 0, "CONCURRENCY")),
+                               int(_class_setting(name, 1, "QUEUE")),
+                               _class_setting(name, 2, "TIMEOUT_MS") / 1000)
+            for name in CLASS_DEFAULTS
+        }
+        self.costs = {name: _class_setting(name, 3, "COST") for name in CLASS_DEFAULTS}
+        self._state_errors = 0
+
+    @staticmethod
+    def classify(method: str, path: str) -> str:
+        return CLASS_ROUTES.get((method, path), "read")
+
+    def client_key(self, scope) -> str:
+        """Bucket id: the API key if it is a listed one, else the IP"""
+        if self.api_keys:
+            for key, value in scope.get("headers", ()):
+                if key == ADMISSION_API_KEY_HEADER and value:
+                    digest = hashlib.sha256(value).hexdigest()
+                    if digest in self.api_keys:
+                        return "key:" + digest[:16]
+                    break
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def check_rate(self, client: str, klass: str):
+        """Take the class's cost from the client's bucket; raises Rejected"""
+        if self.rate <= 0:
+            return
+        interval = 1 / self.rate
+        cost, burst, now = self.costs[klass], self.burst, time.time()
+        try:
+            with span("admission.rate"):
+                value = await self.state.update(
+                    f"ratelimit:{client}",
+                    lambda current: _gcra(current, now, cost, interval, burst),
+                    ttl=burst * interval + 1)
+        except Exception:
+            self._state_errors += 1   # fail open: the limiter must not take the API down
+            return
+        retry_after = float(value.split(";", 1)[1])
+        if retry_after > 0:
+            raise Rejected(429, "rate_limited", retry_after)
+
+    def metrics(self) -> Iterable[str]:
+        """Collector lines for metrics.registry"""
+        yield "# HELP admission_active Requests running per endpoint class"
+        yield "# TYPE admission_active gauge"
+        for name, limiter in self.limiters.items():
+            yield f'admission_active{{class="{name}"}} {limiter.active}'
+        yield "# HELP admission_queued Requests waiting per endpoint class"
+        yield "# TYPE admission_queued gauge"
+        for name, limiter in self.limiters.items():
+            yield f'admission_queued{{class="{name}"}} {len(limiter._waiters)}'
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "api_keys": len(self.api_keys),
+            "costs": self.costs,
+            "state_errors": self._state_errors,
+            "classes": {name: limiter.stats() for name, limiter in self.limiters.items()},
+        }
+
+
+def _rejection(error: Rejected) -> Tuple[Dict, bytes]:
+    retry_after = str(max(1, math.ceil(error.retry_after)))
+    messages = {
+        "rate_limited": "Too many requests from this client; retry later",
+        "queue_full": "Server busy; retry later",
+        "timeout": "Server busy; request waited too long",
+    }
+    body = json.dumps({"detail": messages[error.reason]}).encode()
+    headers = [(b"content-type", b"application/json"),
+               (b"content-length", str(len(body)).encode()),
+               (b"retry-after", retry_after.encode())]
+    return {"type": "http.response.start", "status": error.status, "headers": headers}, body
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying an AdmissionController"""
+
+    def __init__(self, app, controller: AdmissionController, enabled: bool = ADMISSION_ENABLED):
+        self.app = app
+        self.controller = controller
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if (not self.enabled or scope["type"] != "http" or scope["method"] == "OPTIONS"
+                or scope["path"] in EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        klass = self.controller.classify(scope["method"], scope["path"])
+        limiter = self.controller.limiters[klass]
+        try:
+            await self.controller.check_rate(self.controller.client_key(scope), klass)
+            await limiter.acquire()
+        except Rejected as error:
+            REJECTED.labels(klass, error.reason).inc()
+            start, body = _rejection(error)
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
@@ -0,0 +1,7 @@
+"""
+MediDoctor Benchmarks
+=====================
+Standalone performance scripts. Run from the backend directory, e.g.:
+
+    python -m benchmarks.db_profile_bench
+"""
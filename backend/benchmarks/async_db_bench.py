@@ -0,0 +1,147 @@
+"""
+Sync vs Async Database Access Benchmark
+=======================================
+Drives two otherwise identical endpoints with N concurrent connections:
+
+- /sync:  async handler running the admin-style queries on SessionLocal
+          (blocks the event loop while SQLite works)
+- /async: the same queries on AsyncSession (DB waits yield the loop)
+
+Besides throughput and latency it reports event-loop lag, i.e. how long a
+10 ms ticker was delayed while the requests were in flight.
+
+Usage:
+    python -m benchmarks.async_db_bench --concurrency 500 --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, build_async_engines, build_engines
+from models import ScanResult
+
+
+def build_app(url: str) -> FastAPI:
+    """Benchmark app with a sync-session and an async-session endpoint"""
+    _, read_engine = build_engines(url)
+    _, async_read_engine = build_async_engines(url)
+    ReadSession = sessionmaker(bind=read_engine)
+    AsyncReadSession = async_sessionmaker(async_read_engine, class_=AsyncSession)
+
+    async def get_async_read_db():
+        async with AsyncReadSession() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    async def sync_endpoint():
+        db = ReadSession()
+        try:
+            total = db.scalar(select(func.count(ScanResult.id)))
+            rows = db.execute(
+                select(ScanResult.risk_level, func.count(ScanResult.id))
+                .group_by(ScanResult.risk_level)).all()
+        finally:
+            db.close()
+        return {"total": total, "risk": dict(rows)}
+
+    @app.get("/async")
+    async def async_endpoint(db: AsyncSession = Depends(get_async_read_db)):
+        total = await db.scalar(select(func.count(ScanResult.id)))
+        rows = (await db.execute(
+            select(ScanResult.risk_level, func.count(ScanResult.id))
+            .group_by(ScanResult.risk_level))).all()
+        return {"total": total, "risk": dict(rows)}
+
+    return app
+
+
+async def _ticker(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    """Measure how late the event loop wakes a periodic task"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run_mode(app: FastAPI, path: str, concurrency: int, total: int) -> dict:
+    """Fire `total` requests with at most `concurrency` in flight"""
+    latencies = []
+    lags = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 limits=limits) as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(_ticker(stop, lags))
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await ticker
+
+    latencies.sort()
+    return {
+        "mode": path.strip("/"),
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max_loop_lag_ms": max(lags, default=0.0) * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--seed-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        write_engine, _ = build_engines(url)
+        Base.metadata.create_all(bind=write_engine)
+        Session = sessionmaker(bind=write_engine)
+        db = Session()
+        db.add_all(ScanResult(injury_type="cut", confidence_score=0.8,
+                              risk_level=("LOW", "MEDIUM", "HIGH")[i % 3])
+                   for i in range(args.seed_rows))
+        db.commit()
+        db.close()
+
+        app = build_app(url)
+        print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+              f"{'loop lag ms':>14}{'errors':>8}")
+        for path in ("/sync", "/async"):
+            r = asyncio.run(run_mode(app, path, args.concurrency, args.requests))
+            print(f"{r['mode']:<8}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}"
+                  f"{r['p99_ms']:>10.1f}{r['max_loop_lag_ms']:>14.1f}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
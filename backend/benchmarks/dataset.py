@@ -0,0 +1,355 @@
+"""
+Synthetic Benchmark Dataset
+===========================
+Builds a MediDoctor database at production-like volume, so benchmarks do
+not measure eight mock doctors and an empty scan table.
+
+Profiles:
+- small:  1k doctors,    50k scans,  10k appointments (seconds)
+- medium: 10k doctors,   1M scans,  100k appointments
+- large:  100k doctors, 10M scans,    1M appointments (a few minutes)
+
+The same seed always gives the same rows. What the rows look like:
+- doctors: specialization-driven expertise tags (about 8% also general,
+  urgent or emergency care), 0-8 open slots, log-normal distances,
+  ratings around 4.4
+- scan_results: two years up to END_DATE, growing over time; risk level
+  depends on the injury type (fractures skew HIGH, bruises LOW)
+- appointments: same period; popular doctors get most bookings; tokens
+  are DS<id>, apart from the MD<4 digits> tokens /api/book issues
+
+Loading: the schema comes from the migrations (init_db), then rows go in
+through sqlite3 executemany in batches, with the journal and fsync off
+and the secondary indexes dropped until the end. The file is built
+under a temporary name and only renamed into place once complete, so an
+interrupted run leaves nothing half-loaded. A <db>.json sidecar records
+profile and seed.
+
+ensure_dataset() keeps one file per profile, seed and schema revision in
+BENCH_DATASET_DIR (benchmarks/.datasets by default) and reuses it; the
+load test and the microbenchmarks take --dataset PROFILE. It imports
+database, whose engines bind to DATABASE_URL on import, so a process that
+is about to point DATABASE_URL at the dataset calls
+ensure_dataset_in_subprocess() instead.
+
+Usage:
+    python -m benchmarks.dataset --profile medium --out medium.db
+    python -m benchmarks.dataset --profile large --seed 7 --out large.db
+    python -m benchmarks.dataset --profile small --cached   # prints the path
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from bisect import bisect_right
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_CACHE_DIR = os.getenv("BENCH_DATASET_DIR",
+                              os.path.join(BACKEND_DIR, "benchmarks", ".datasets"))
+
+DEFAULT_SEED = 42
+END_DATE = datetime(2026, 1, 1)
+SPAN = timedelta(days=730)
+START_DATE = END_DATE - SPAN
+SPAN_SECONDS = SPAN.total_seconds()
+BATCH_ROWS = 50_000
+
+# Only during the load: a crash loses the (temporary) file anyway
+LOAD_PRAGMAS = {
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+    "locking_mode": "EXCLUSIVE",
+    "temp_store": "MEMORY",
+    "cache_size": "-262144",   # 256 MB
+}
+
+
+@dataclass(frozen=True)
+class Profile:
+    doctors: int
+    scans: int
+    appointments: int
+
+
+PROFILES = {
+    "small": Profile(doctors=1_000, scans=50_000, appointments=10_000),
+    "medium": Profile(doctors=10_000, scans=1_000_000, appointments=100_000),
+    "large": Profile(doctors=100_000, scans=10_000_000, appointments=1_000_000),
+}
+
+INJURY_WEIGHTS = {"cut": 26, "bruise": 22, "swelling": 18, "burn": 14, "rash": 12, "fracture": 8}
+RISK_WEIGHTS = {   # LOW, MEDIUM, HIGH per injury type
+    "cut": (50, 35, 15), "bruise": (70, 25, 5), "swelling": (45, 40, 15),
+    "burn": (35, 40, 25), "rash": (65, 30, 5), "fracture": (5, 30, 65),
+}
+VISUAL_NOTES = {
+    "cut": ["Linear wound with clean edges", "Deep laceration with bleeding",
+            "Superficial abrasion"],
+    "bruise": ["Purple discoloration, no open wound", "Yellow-green healing bruise"],
+    "swelling": ["Localized swelling around the joint", "Diffuse puffiness with redness"],
+    "burn": ["Red area with blistering", "Superficial redness, skin intact"],
+    "rash": ["Raised red patches", "Scattered small bumps"],
+    "fracture": ["Visible deformity near the joint", "Swelling with suspected bone injury"],
+}
+
+SPECIALIZATIONS = {   # specialization: (weight, expertise tags)
+    "Emergency Medicine": (14, ["trauma", "burns", "fractures", "emergency_care"]),
+    "Orthopedic Surgery": (16, ["fractures", "bone_injuries", "sports_injuries", "sprains"]),
+    "Dermatology": (14, ["rash", "burns", "skin_conditions", "allergies"]),
+    "General Practice": (24, ["cuts", "bruises", "minor_injuries", "swelling"]),
+    "Urgent Care Physician": (10, ["minor_trauma", "burns", "cuts", "bruise"]),
+    "Sports Medicine": (10, ["sports_injuries", "fractures", "swelling", "sprains"]),
+    "Plastic Surgery": (4, ["burns", "skin_reconstruction", "wound_care", "cut"]),
+    "Pediatrics": (8, ["pediatric_care", "children_injuries", "rash", "burns"]),
+}
+BROAD_EXPERTISE = ["general_care", "urgent_care", "emergency_care"]
+FIRST_NAMES = ["Sarah", "Michael", "Priya", "James", "Anita", "David", "Fatima", "Rahul",
+               "Emily", "Arjun", "Maria", "Wei", "Kavya", "Daniel", "Aisha", "Vikram"]
+LAST_NAMES = ["Johnson", "Chen", "Sharma", "Wilson", "Patel", "Kumar", "Garcia", "Singh",
+              "Brown", "Rao", "Nguyen", "Iyer", "Okafor", "Reddy", "Martin", "Das"]
+HOSPITAL_KINDS = ["General Hospital", "Medical Center", "Clinic", "Care Hospital",
+                  "Health Institute", "Community Hospital"]
+SLOT_DAYS = ["Today", "Tomorrow", "Mon", "Tue", "Wed", "Thu", "Fri"]
+SLOT_TIMES = ["9:00 AM", "10:00 AM", "11:00 AM", "2:00 PM", "3:00 PM", "4:00 PM", "5:00 PM"]
+APPOINTMENT_STATUS = {"confirmed": 70, "completed": 22, "cancelled": 8}
+
+
+def _timestamp(fraction: float) -> str:
+    """fraction of the way through SPAN, denser towards END_DATE (growth)"""
+    moment = START_DATE + timedelta(seconds=SPAN_SECONDS * math.sqrt(fraction))
+    return moment.isoformat(" ", "microseconds")
+
+
+def doctor_rows(n: int, seed: int = DEFAULT_SEED) -> Iterator[Tuple]:
+    """(name, specialization, hospital, distance_km, rating, available_slots,
+    expertise, created_at) for n doctors"""
+    rng = random.Random(f"doctors-{seed}")
+    names = list(SPECIALIZATIONS)
+    weights = [SPECIALIZATIONS[s][0] for s in names]
+    hospitals = [f"{rng.choice(LAST_NAMES)} {kind}" for kind in HOSPITAL_KINDS
+                 for _ in range(max(1, n // 300))]
+    for i in range(n):
+        specialization = rng.choices(names, weights)[0]
+        tags = SPECIALIZATIONS[specialization][1]
+        expertise = rng.sample(tags, rng.randint(2, len(tags)))
+        broad = rng.choice(BROAD_EXPERTISE)
+        if rng.random() < 0.08 and broad not in expertise:
+            expertise.append(broad)
+        slot_count = min(8, int(rng.expovariate(1 / 3.5)))
+        slots = sorted(rng.sample(range(len(SLOT_DAYS) * len(SLOT_TIMES)), slot_count))
+        yield (
+            f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+            specialization,
+            rng.choice(hospitals),
+            round(min(80.0, max(0.3, rng.lognormvariate(1.6, 0.8))), 1),
+            round(min(5.0, max(2.5, rng.gauss(4.4, 0.3))), 1),
+            json.dumps([f"{SLOT_DAYS[s // len(SLOT_TIMES)]} {SLOT_TIMES[s % len(SLOT_TIMES)]}"
+                        for s in slots]),
+            ",".join(expertise),
+            _timestamp(i / n),
+        )
+
+
+def scan_rows(n: int, seed: int = DEFAULT_SEED) -> Iterator[Tuple]:
+    """(injury_type, confidence_score, risk_level, image_path, visual_notes,
+    created_at) for n scans, oldest first"""
+    rng = random.Random(f"scans-{seed}")
+    injuries = list(INJURY_WEIGHTS)
+    injury_cum = list(_cumulative(INJURY_WEIGHTS.values()))
+    risks = ("LOW", "MEDIUM", "HIGH")
+    # Per injury: cumulative risk weights scaled to 1, for one bisect per row
+    risk_cum = {injury: [c / sum(w) for c in _cumulative(w)] for injury, w in RISK_WEIGHTS.items()}
+    random_, uniform, choice = rng.random, rng.uniform, rng.choice
+    for start in range(0, n, BATCH_ROWS):
+        count = min(BATCH_ROWS, n - start)
+        batch_injuries = rng.choices(injuries, cum_weights=injury_cum, k=count)
+        for offset, injury in enumerate(batch_injuries):
+            i = start + offset
+            yield (
+                injury,
+                round(uniform(0.6, 0.98), 2),
+                risks[bisect_right(risk_cum[injury], random_())],
+                f"uploads/scan_{i + 1}.jpg" if random_() < 0.3 else None,
+                choice(VISUAL_NOTES[injury]),
+                _timestamp((i + random_()) / n),
+            )
+
+
+def appointment_rows(n: int, doctors: int, seed: int = DEFAULT_SEED) -> Iterator[Tuple]:
+    """(doctor_id, patient_name, patient_phone, appointment_slot, injury_type,
+    token_number, status, created_at) for n appointments, oldest first"""
+    rng = random.Random(f"appointments-{seed}")
+    injuries = list(INJURY_WEIGHTS)
+    statuses = list(APPOINTMENT_STATUS)
+    status_weights = list(APPOINTMENT_STATUS.values())
+    for i in range(n):
+        yield (
+            int(doctors * rng.random() ** 2) + 1,   # skewed to popular doctors
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            f"9{rng.randrange(10**9):09d}",
+            f"{rng.choice(SLOT_DAYS)} {rng.choice(SLOT_TIMES)}",
+            rng.choice(injuries) if rng.random() < 0.9 else None,
+            f"DS{i + 1:08d}",
+            rng.choices(statuses, status_weights)[0],
+            _timestamp((i + rng.random()) / n),
+        )
+
+
+def _cumulative(weights) -> Iterator[float]:
+    total = 0
+    for weight in weights:
+        total += weight
+        yield total
+
+
+def _insert(conn: sqlite3.Connection, table: str, columns: Tuple[str, ...], rows: Iterator[Tuple]):
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+           f"VALUES ({', '.join('?' * len(columns))})")
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            conn.executemany(sql, batch)
+            batch.clear()
+    if batch:
+        conn.executemany(sql, batch)
+
+
+def generate(path: str, profile: Profile, seed: int = DEFAULT_SEED) -> Dict:
+    """Build the dataset at path (replacing it); returns row counts and timings"""
+    from database import get_pragmas, init_db
+
+    tmp_path = f"{path}.building"
+    for stale in (tmp_path, f"{tmp_path}-wal", f"{tmp_path}-shm"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    started = time.perf_counter()
+    init_db(f"sqlite:///{tmp_path}")
+
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    for name, value in LOAD_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        "AND tbl_name IN ('doctors', 'scan_results', 'appointments')").fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+
+    timings = {}
+    tables = (
+        ("doctors", ("name", "specialization", "hospital", "distance_km", "rating",
+                     "available_slots", "expertise", "created_at"),
+         doctor_rows(profile.doctors, seed)),
+        ("scan_results", ("injury_type", "confidence_score", "risk_level", "image_path",
+                          "visual_notes", "created_at"),
+         scan_rows(profile.scans, seed)),
+        ("appointments", ("doctor_id", "patient_name", "patient_phone", "appointment_slot",
+                          "injury_type", "token_number", "status", "created_at"),
+         appointment_rows(profile.appointments, max(1, profile.doctors), seed)),
+    )
+    for table, columns, rows in tables:
+        table_started = time.perf_counter()
+        conn.execute("BEGIN")
+        _insert(conn, table, columns, rows)
+        conn.execute("COMMIT")
+        timings[table] = round(time.perf_counter() - table_started, 2)
+
+    index_started = time.perf_counter()
+    for _, sql in indexes:
+        conn.execute(sql)
+    conn.execute("ANALYZE")
+    timings["indexes"] = round(time.perf_counter() - index_started, 2)
+    conn.execute("PRAGMA locking_mode=NORMAL")
+    conn.execute(f"PRAGMA journal_mode={get_pragmas().get('journal_mode', 'DELETE')}")
+    conn.close()
+
+    for stale in (f"{path}-wal", f"{path}-shm"):   # would be replayed into the new file
+        if os.path.exists(stale):
+            os.remove(stale)
+    os.replace(tmp_path, path)
+    info = {"profile": asdict(profile), "seed": seed,
+            "seconds": round(time.perf_counter() - started, 2), "timings": timings}
+    with open(f"{path}.json", "w") as f:
+        json.dump(info, f, indent=2)
+    return info
+
+
+def resolve_profile(name: str) -> Profile:
+    if name not in PROFILES:
+        raise ValueError(f"Unknown dataset profile '{name}'. Choose from: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def ensure_dataset(profile_name: str, seed: int = DEFAULT_SEED,
+                   cache_dir: str = DATASET_CACHE_DIR) -> str:
+    """Path of the cached dataset for a profile and seed, building it if needed"""
+    from database import head_revision
+
+    profile = resolve_profile(profile_name)
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{profile_name}-{seed}-{head_revision()}.db")
+    try:
+        with open(f"{path}.json") as f:
+            info = json.load(f)
+        if os.path.exists(path) and info["profile"] == asdict(profile) and info["seed"] == seed:
+            return path
+    except (OSError, ValueError, KeyError):
+        pass
+    print(f"🏗️  Building the {profile_name} dataset (seed {seed}) in {path}")
+    generate(path, profile, seed)
+    return path
+
+
+def ensure_dataset_in_subprocess(profile_name: str, seed: int = DEFAULT_SEED) -> str:
+    """ensure_dataset() in a child process, leaving database unimported here"""
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.dataset", "--profile", profile_name,
+         "--seed", str(seed), "--cached"],
+        cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True, check=True)
+    *progress, path = result.stdout.strip().splitlines()
+    for line in progress:
+        print(line)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic MediDoctor database")
+    parser.add_argument("--profile", default="small", choices=list(PROFILES))
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="database file to (re)create")
+    target.add_argument("--cached", action="store_true",
+                        help="reuse or build the BENCH_DATASET_DIR copy and print its path")
+    parser.add_argument("--doctors", type=int, default=None, help="override the profile")
+    parser.add_argument("--scans", type=int, default=None, help="override the profile")
+    parser.add_argument("--appointments", type=int, default=None, help="override the profile")
+    args = parser.parse_args()
+    if args.cached:
+        print(ensure_dataset(args.profile, args.seed))
+        return
+
+    profile = PROFILES[args.profile]
+    profile = Profile(
+        doctors=profile.doctors if args.doctors is None else args.doctors,
+        scans=profile.scans if args.scans is None else args.scans,
+        appointments=profile.appointments if args.appointments is None else args.appointments,
+    )
+    print(f"🏗️  {profile.doctors:,} doctors, {profile.scans:,} scans, "
+          f"{profile.appointments:,} appointments (seed {args.seed}) -> {args.out}")
+    info = generate(args.out, profile, args.seed)
+    for step, seconds in info["timings"].items():
+        print(f"  {step:<14} {seconds:8.2f} s")
+    print(f"✅ Done in {info['seconds']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Mixed Read/Write Database Benchmark
+===================================
+Compares DB_PROFILE settings under the traffic pattern that used to produce
+"database is locked": scan inserts committing while the admin dashboard
+polls aggregates.
+
+Usage:
+    python -m benchmarks.db_profile_bench --seconds 10 --readers 8 --writers 2
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, build_engines
+from models import ScanResult
+
+
+def _writer(Session, stop, counters):
+    while not stop.is_set():
+        db = Session()
+        try:
+            db.add(ScanResult(
+                injury_type=random.choice(["cut", "burn", "bruise"]),
+                confidence_score=0.8,
+                risk_level=random.choice(["LOW", "MEDIUM", "HIGH"]),
+                visual_notes="benchmark"
+            ))
+            db.commit()
+            counters["writes"] += 1
+        except OperationalError:
+            db.rollback()
+            counters["errors"] += 1
+        finally:
+            db.close()
+
+
+def _reader(Session, stop, counters):
+    while not stop.is_set():
+        db = Session()
+        try:
+            db.query(func.count(ScanResult.id)).scalar()
+            db.query(ScanResult.risk_level, func.count(ScanResult.id)).group_by(
+                ScanResult.risk_level).all()
+            db.query(ScanResult).order_by(
+                ScanResult.created_at.desc()).limit(10).all()
+            counters["reads"] += 1
+        except OperationalError:
+            counters["errors"] += 1
+        finally:
+            db.close()
+
+
+def run_profile(profile: str, seconds: float, readers: int, writers: int, seed_rows: int) -> dict:
+    """Run the mixed workload against a fresh database file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        write_engine, read_engine = build_engines(url, profile)
+        Base.metadata.create_all(bind=write_engine)
+
+        WriteSession = sessionmaker(bind=write_engine)
+        ReadSession = sessionmaker(bind=read_engine)
+
+        db = WriteSession()
+        db.add_all(ScanResult(injury_type="cut", confidence_score=0.8,
+                              risk_level="LOW") for _ in range(seed_rows))
+        db.commit()
+        db.close()
+
+        counters = {"reads": 0, "writes": 0, "errors": 0}
+        stop = threading.Event()
+        threads = (
+            [threading.Thread(target=_writer, args=(WriteSession, stop, counters))
+             for _ in range(writers)] +
+            [threading.Thread(target=_reader, args=(ReadSession, stop, counters))
+             for _ in range(readers)]
+        )
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        write_engine.dispose()
+        read_engine.dispose()
+
+    return {
+        "profile": profile,
+        "reads_per_sec": counters["reads"] / seconds,
+        "writes_per_sec": counters["writes"] / seconds,
+        "errors": counters["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seed-rows", type=int, default=5000)
+    parser.add_argument("--profiles", default="legacy,performance")
+    args = parser.parse_args()
+
+    print(f"{'profile':<14}{'reads/s':>12}{'writes/s':>12}{'errors':>10}")
+    for profile in args.profiles.split(","):
+        result = run_profile(profile, args.seconds, args.readers,
+                             args.writers, args.seed_rows)
+        print(f"{result['profile']:<14}{result['reads_per_sec']:>12.1f}"
+              f"{result['writes_per_sec']:>12.1f}{result['errors']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Intent Model Latency / Accuracy Benchmark
+=========================================
+Compares the keyword rules with the trained hashed n-gram intent model on
+the trainer's holdout (the same group split and seed, so every message
+comes from a template the model never saw):
+
+- accuracy, macro F1 and expected calibration error (ECE)
+- single-message latency (p50/p99) through classify()
+- batch throughput through classify_batch() at several batch sizes
+
+Usage:
+    python -m scripts.train_intent_model          # once, writes the artifact
+    python -m benchmarks.intent_model_bench --batch-sizes 1,32,1024
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from scripts.train_intent_model import BUNDLED_DATA, RULES, evaluate, load_examples, split_by_group
+from services.intent_model import INTENT_MODEL_PATH, load_intent_model
+
+
+def latency(model, texts):
+    times = []
+    for text in texts:
+        started = time.perf_counter()
+        model.classify(text)
+        times.append((time.perf_counter() - started) * 1e6)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99)]
+
+
+def throughput(model, texts, batch_size: int):
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        model.classify_batch(texts[start:start + batch_size])
+    return len(texts) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--model", default=INTENT_MODEL_PATH,
+                        help="artifact prefix to benchmark")
+    parser.add_argument("--data", action="append", default=None,
+                        help=f"labelled JSONL, repeatable (default: {BUNDLED_DATA})")
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0, help="must match the training seed")
+    parser.add_argument("--batch-sizes", default="1,32,1024")
+    parser.add_argument("--repeat", type=int, default=10,
+                        help="passes over the holdout for the throughput runs")
+    args = parser.parse_args()
+
+    model = load_intent_model(args.model)
+    if model is None:
+        raise SystemExit(f"No intent model at {args.model} - run "
+                         "python -m scripts.train_intent_model first")
+
+    _, holdout = split_by_group(load_examples(args.data or [BUNDLED_DATA]),
+                                args.holdout, random.Random(args.seed))
+    texts = [text for text, *_ in holdout]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+
+    print(f"{len(holdout)} held-out messages")
+    print(f"{'model':16s} {'acc':>6s} {'F1':>6s} {'ECE':>6s} {'p50/p99 us':>16s} "
+          + " ".join(f"{f'batch {b} msg/s':>15s}" for b in batch_sizes))
+    for name, candidate in (("rules", RULES), (model.name, model)):
+        metrics = evaluate(candidate.classify_batch(texts), holdout)
+        p50, p99 = latency(candidate, texts)
+        rates = [throughput(candidate, texts * args.repeat, b) for b in batch_sizes]
+        print(f"{name:16s} {metrics['accuracy']:6.3f} {metrics['macro_f1']:6.3f} "
+              f"{metrics['ece']:6.3f} {p50:7.1f} / {p99:6.1f} "
+              + " ".join(f"{rate:15.0f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Load Testing
+============
+Capacity check for a release: drives the API with a weighted mix of
+realistic requests arriving at a fixed rate (open loop), and reports
+throughput, p50/p95/p99 latency and error rates per endpoint.
+
+- scenarios.py: the request mix (scan, assessment, voice, chat, doctors,
+  booking, admin polling) and their payloads
+- runner.py: Poisson arrivals, in-process ASGI or real HTTP targets
+- report.py: per-endpoint statistics, JSON results, baseline comparison
+
+Usage:
+    python -m benchmarks.loadtest run --rate 50 --duration 30 --out results.json
+    python -m benchmarks.loadtest run --url http://localhost:8000 --rate 200
+    python -m benchmarks.loadtest compare baseline.json results.json
+"""
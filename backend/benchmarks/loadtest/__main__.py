@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import sys
+
+from benchmarks.dataset import PROFILES
+from benchmarks.loadtest import report
+from benchmarks.loadtest.runner import open_client, run_load
+from benchmarks.loadtest.scenarios import parse_mix
+
+
+async def run(args) -> dict:
+    mix = parse_mix(args.mix)
+    async with open_client(args.url, args.timeout, args.dataset) as client:
+        result = await run_load(client, mix, args.rate, args.duration, warmup=args.warmup,
+                                seed=args.seed, max_in_flight=args.max_in_flight)
+    config = {
+        "target": args.url or "in-process",
+        "rate": args.rate,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        "max_in_flight": args.max_in_flight,
+        "mix": mix,
+        "dataset": args.dataset,
+    }
+    return report.build_results(result, config)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest",
+                                     description="MediDoctor load test")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="send load and report")
+    run_parser.add_argument("--url", default=None,
+                            help="server to test (default: the app in this process)")
+    run_parser.add_argument("--rate", type=float, default=50, help="arrivals per second")
+    run_parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5,
+                            help="seconds of load before measuring")
+    run_parser.add_argument("--dataset", default=None, choices=list(PROFILES),
+                            help="in-process only: start from this benchmarks.dataset profile")
+    run_parser.add_argument("--mix", default=None,
+                            help="scenario weights, e.g. scan=2,chat=5,admin=0")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--max-in-flight", type=int, default=1000)
+    run_parser.add_argument("--timeout", type=float, default=30)
+    run_parser.add_argument("--out", default=None, help="write JSON results here")
+
+    compare_parser = commands.add_parser("compare", help="diff results against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.2,
+                                help="allowed relative growth of p95/p99 (0.2 = 20%%)")
+    compare_parser.add_argument("--min-ms", type=float, default=5.0,
+                                help="ignore latency growth below this many ms")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        if args.dataset and args.url:
+            parser.error("--dataset applies to the in-process target; point the "
+                         "server's DATABASE_URL at a generated dataset instead")
+        try:
+            results = asyncio.run(run(args))
+        except ValueError as e:
+            sys.exit(f"❌ {e}")
+        report.print_table(results)
+        if args.out:
+            report.save_results(results, args.out)
+            print(f"\n💾 Results saved to {args.out}")
+        return
+
+    baseline = report.load_results(args.baseline)
+    current = report.load_results(args.current)
+    report.print_table(baseline)
+    report.print_table(current)
+    regressions = report.compare(baseline, current, args.tolerance, args.min_ms)
+    if regressions:
+        print("\n❌ Regressions against the baseline:")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print("\n✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Load Test Report
+================
+Per-endpoint statistics of a run, its JSON results file, and the
+comparison of two results files.
+
+Per endpoint:
+- requests, achieved rps
+- p50 / p95 / p99 / max latency (ms, nearest rank)
+- error_rate: responses >= 400 (other than 429/503) and transport errors
+- rejected_rate: 429 and 503, the server shedding load on purpose
+- dropped: arrivals the runner skipped at --max-in-flight
+
+A comparison flags an endpoint when, against the baseline:
+- p95 or p99 grew by more than the tolerance and by more than --min-ms
+  (a floor so 2 ms -> 3 ms on a fast endpoint is not a regression)
+- error_rate or rejected_rate grew by more than one percentage point
+- achieved rps fell by more than the tolerance (the target kept up
+  before and does not now)
+"""
+
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from typing import Dict, List
+
+from benchmarks.loadtest.runner import BACKEND_DIR, RunResult
+
+RESULTS_VERSION = 1
+REJECTED_STATUSES = (429, 503)
+# Absolute growth in error_rate / rejected_rate that counts as a regression
+RATE_TOLERANCE = 0.01
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _endpoint_stats(latencies: List[float], statuses: List[int], dropped: int,
+                    duration: float) -> Dict:
+    latencies = sorted(latencies)
+    count = len(statuses)
+    rejected = sum(1 for s in statuses if s in REJECTED_STATUSES)
+    errors = sum(1 for s in statuses if (s == 0 or s >= 400) and s not in REJECTED_STATUSES)
+    return {
+        "requests": count,
+        "rps": round(count / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "rejected_rate": round(rejected / count, 4) if count else 0.0,
+        "dropped": dropped,
+    }
+
+
+def summarize(result: RunResult) -> Dict[str, Dict]:
+    """Endpoint -> stats, plus an "ALL" row"""
+    by_endpoint: Dict[str, List] = {}
+    for sample in result.samples:
+        by_endpoint.setdefault(sample.endpoint, []).append(sample)
+    for endpoint in result.dropped:
+        by_endpoint.setdefault(endpoint, [])
+
+    endpoints = {}
+    for endpoint, samples in sorted(by_endpoint.items()):
+        endpoints[endpoint] = _endpoint_stats(
+            [s.latency for s in samples], [s.status for s in samples],
+            result.dropped.get(endpoint, 0), result.duration)
+    endpoints["ALL"] = _endpoint_stats(
+        [s.latency for s in result.samples], [s.status for s in result.samples],
+        sum(result.dropped.values()), result.duration)
+    return endpoints
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def build_results(result: RunResult, config: Dict) -> Dict:
+    return {
+        "version": RESULTS_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": os.getenv("GIT_COMMIT") or _git_commit(),
+        "python": platform.python_version(),
+        "config": config,
+        "endpoints": summarize(result),
+    }
+
+
+def save_results(results: Dict, path: str):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_results(path: str) -> Dict:
+    with open(path) as f:
+        results = json.load(f)
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path}: results version {results.get('version')}, "
+                         f"expected {RESULTS_VERSION}")
+    return results
+
+
+def print_table(results: Dict):
+    config = results["config"]
+    print(f"\n📊 {config['target']} at {config['rate']} req/s for {config['duration']}s "
+          f"(commit {results['commit'] or '?'})")
+    print(f"  {'endpoint':<30} {'req':>6} {'rps':>7} {'p50':>8} {'p95':>8} "
+          f"{'p99':>8} {'max':>8} {'err%':>6} {'rej%':>6} {'drop':>5}")
+    for endpoint, s in results["endpoints"].items():
+        print(f"  {endpoint:<30} {s['requests']:>6} {s['rps']:>7.1f} {s['p50_ms']:>8.1f} "
+              f"{s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['max_ms']:>8.1f} "
+              f"{s['error_rate'] * 100:>6.2f} {s['rejected_rate'] * 100:>6.2f} {s['dropped']:>5}")
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float = 0.2,
+            min_ms: float = 5.0) -> List[str]:
+    """Regressions of current against baseline, one line each"""
+    regressions = []
+    for key in ("rate", "dataset"):
+        if baseline["config"].get(key) != current["config"].get(key):
+            regressions.append(f"config: {key} {baseline['config'].get(key)} -> "
+                               f"{current['config'].get(key)}; runs are not comparable")
+    if regressions:
+        return regressions
+
+    for endpoint, before in baseline["endpoints"].items():
+        after = current["endpoints"].get(endpoint)
+        if after is None:
+            regressions.append(f"{endpoint}: missing from current run")
+            continue
+        if not before["requests"]:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if (after[key] > before[key] * (1 + tolerance)
+                    and after[key] - before[key] > min_ms):
+                regressions.append(f"{endpoint}: {key} {before[key]:.1f} -> {after[key]:.1f}")
+        for key in ("error_rate", "rejected_rate"):
+            if after[key] - before[key] > RATE_TOLERANCE:
+                regressions.append(f"{endpoint}: {key} {before[key]:.2%} -> {after[key]:.2%}")
+        if after["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: rps {before['rps']:.1f} -> {after['rps']:.1f}")
+    return regressions
@@ -0,0 +1,168 @@
+"""
+Load Test Runner
+================
+Open-loop arrivals: requests start on a Poisson schedule at --rate per
+second whether or not earlier ones have finished, the way real users
+arrive. A closed loop (N clients each waiting for its last reply) slows
+down with the server and hides queueing; here queueing shows up as
+latency, which is measured from each request's scheduled start.
+
+When --max-in-flight requests are outstanding, new arrivals are dropped
+and counted rather than queued in the client, so an overloaded server
+cannot turn the run into an unbounded backlog.
+
+Targets:
+- in-process (default): the ASGI app through httpx.ASGITransport, with a
+  fresh temporary database, state and caches. Measures the app without
+  a network or server in the way. --dataset PROFILE starts it on a copy
+  of that benchmarks/dataset.py profile instead of an empty database
+- --url: a running server over real HTTP (python serve.py)
+"""
+
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from benchmarks.loadtest.scenarios import SCENARIOS, ScenarioContext
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    scheduled: float   # seconds since the run started
+    latency: float     # seconds from scheduled start to full response
+    status: int        # 0: transport error or timeout
+
+
+@dataclass
+class RunResult:
+    samples: List[Sample]
+    dropped: Dict[str, int]
+    duration: float    # measured seconds (after warm-up)
+    warmup: float
+
+
+def _isolated_env(tmp: str):
+    """Point the in-process app at throwaway storage, unless set already"""
+    defaults = {
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'medidoctor.db')}",
+        "CHAT_SPILL_PATH": os.path.join(tmp, "chat_sessions.db"),
+        "STATE_SQLITE_PATH": os.path.join(tmp, "state.db"),
+        "TRANSCRIPT_CACHE_DIR": os.path.join(tmp, "transcripts"),
+        "INIT_LOCK_PATH": os.path.join(tmp, "init.lock"),
+        "STT_WORKERS": "0",
+        "AUDIO_DECODE_WORKERS": "0",
+        "TRACE_SAMPLE_RATE": "0",
+        "ADMISSION_RATE": "0",   # every arrival comes from one client
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+
+@asynccontextmanager
+async def open_client(url: Optional[str], timeout: float,
+                      dataset: Optional[str] = None) -> AsyncIterator[httpx.AsyncClient]:
+    """A client for --url, or for the app in this process (on a copy of a
+    benchmarks.dataset profile when given)"""
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+            yield client
+        return
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as tmp:
+        _isolated_env(tmp)
+        if BACKEND_DIR not in sys.path:
+            sys.path.insert(0, BACKEND_DIR)
+        if dataset:
+            from benchmarks.dataset import ensure_dataset_in_subprocess
+
+            # Before anything imports database: its engines take DATABASE_URL
+            # on import, so an earlier import would serve the empty database
+            copy = os.path.join(tmp, "dataset.db")
+            shutil.copyfile(ensure_dataset_in_subprocess(dataset), copy)
+            os.environ["DATABASE_URL"] = f"sqlite:///{copy}"
+        import main
+        import database
+
+        if dataset and os.path.abspath(database.engine.url.database or "") != copy:
+            raise RuntimeError(f"The app is serving {database.engine.url.database}, not the "
+                               f"{dataset} dataset: database was imported before "
+                               "DATABASE_URL was set")
+
+        await main.app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest",
+                                         timeout=timeout) as client:
+                yield client
+        finally:
+            await main.app.router.shutdown()
+
+
+async def prepare(client: httpx.AsyncClient, ctx: ScenarioContext):
+    """Fetch what scenarios need from the target (doctors to book)"""
+    response = await client.get("/api/doctors", params={"limit": 50})
+    response.raise_for_status()
+    ctx.doctors = response.json()
+    if not ctx.doctors:
+        raise RuntimeError("Target has no doctors to book")
+
+
+async def run_load(client: httpx.AsyncClient, mix: Dict[str, float], rate: float,
+                   duration: float, warmup: float = 5.0, seed: int = 42,
+                   max_in_flight: int = 1000) -> RunResult:
+    """Send an open-loop mix for warmup + duration seconds"""
+    ctx = ScenarioContext(seed)
+    await prepare(client, ctx)
+    arrivals = random.Random(seed + 1)
+    names, weights = list(mix), list(mix.values())
+
+    samples: List[Sample] = []
+    dropped = {SCENARIOS[name].endpoint: 0 for name in names}
+    in_flight = set()
+
+    async def fire(scenario, scheduled: float, started_at: float):
+        status = 0
+        try:
+            response = await scenario.send(client, ctx)
+            status = response.status_code
+        except (httpx.HTTPError, OSError):
+            pass
+        elapsed = time.perf_counter() - started_at - scheduled
+        if scheduled >= warmup:
+            samples.append(Sample(scenario.endpoint, scheduled - warmup, elapsed, status))
+
+    started_at = time.perf_counter()
+    scheduled = 0.0
+    end = warmup + duration
+    while True:
+        scheduled += arrivals.expovariate(rate)
+        if scheduled >= end:
+            break
+        delay = started_at + scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        scenario = SCENARIOS[arrivals.choices(names, weights)[0]]
+        if len(in_flight) >= max_in_flight:
+            if scheduled >= warmup:
+                dropped[scenario.endpoint] += 1
+            continue
+        task = asyncio.create_task(fire(scenario, scheduled, started_at))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        await asyncio.wait(in_flight)
+    return RunResult(samples, dropped, duration, warmup)
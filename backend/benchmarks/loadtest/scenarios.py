@@ -0,0 +1,198 @@
+"""
+Load Test Scenarios
+===================
+One Scenario per kind of traffic. Each builds its request from a shared,
+seeded ScenarioContext, so two runs with the same seed send the same
+requests in the same order.
+
+Scan images come from the repository's test_images folder when it holds
+any, else from synthetic JPEG-sized payloads named after the injury types.
+Voice notes are synthetic 16 kHz WAV tones with a few bytes changed per
+request, so each upload is new audio (no transcript cache hits).
+"""
+
+import glob
+import io
+import math
+import os
+import random
+import struct
+import wave
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+TEST_IMAGES_DIR = os.path.join(REPO_DIR, "test_images")
+
+INJURY_TYPES = ["cut", "burn", "swelling", "bruise", "fracture", "rash"]
+RISK_LEVELS = ["LOW", "MEDIUM", "HIGH"]
+# Synthetic scan image sizes in bytes (phone photos after client resize)
+IMAGE_SIZES = [60_000, 250_000, 1_000_000]
+
+CHAT_MESSAGES = [
+    "hello", "my knee hurts a lot since yesterday", "is this swelling serious",
+    "what medicine can I take for the pain", "how do I treat a burn at home",
+    "I twisted my ankle playing football and now it is swollen and bruised, "
+    "it hurts when I walk and I am worried it might be broken",
+]
+
+QUESTIONNAIRE_CHOICES = {
+    "pain_level": ["mild", "moderate", "severe"],
+    "swelling": ["none", "mild", "moderate", "severe"],
+    "duration": ["less than 24 hours", "1-2 days", "3-7 days", "1 week+", "2 weeks+"],
+    "affected_area": ["knee", "ankle", "wrist", "back", "shoulder", "hand"],
+    "movement_difficulty": ["none", "mild", "moderate", "severe", "unable"],
+    "redness": ["yes", "no"],
+    "warmth": ["yes", "no"],
+}
+
+DEFAULT_MIX = {
+    "scan": 2, "assessment": 3, "voice": 1, "chat": 4,
+    "doctors": 4, "booking": 1, "admin": 1,
+}
+
+
+def load_images(rng: random.Random) -> List[Tuple[str, bytes]]:
+    """(filename, bytes) scan uploads"""
+    paths = sorted(p for ext in ("jpg", "jpeg", "png")
+                   for p in glob.glob(os.path.join(TEST_IMAGES_DIR, f"*.{ext}")))
+    if paths:
+        images = []
+        for path in paths:
+            with open(path, "rb") as f:
+                images.append((os.path.basename(path), f.read()))
+        return images
+    return [(f"{injury}.jpg", b"\xff\xd8\xff\xe0" + rng.randbytes(size - 6) + b"\xff\xd9")
+            for injury in INJURY_TYPES for size in IMAGE_SIZES]
+
+
+def synth_wav(seconds: float = 3.0, rate: int = 16000) -> bytes:
+    """A 16-bit mono WAV: a wavering tone, loud enough to pass the VAD"""
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        t = i / rate
+        sample = 0.4 * math.sin(2 * math.pi * (180 + 40 * math.sin(3 * t)) * t)
+        frames += struct.pack("<h", int(sample * 32767))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+class ScenarioContext:
+    """Payloads and state shared by all scenarios of one run"""
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.images = load_images(self.rng)
+        self.wav = synth_wav()
+        self.doctors: List[Dict] = []
+        self.chat_sessions: List[Optional[str]] = [None] * 50
+
+    def unique_wav(self) -> bytes:
+        """The base recording with 64 samples of noise at a random offset"""
+        data = bytearray(self.wav)
+        offset = 44 + 2 * self.rng.randrange(0, (len(data) - 44) // 2 - 64)
+        data[offset:offset + 128] = self.rng.randbytes(128)
+        return bytes(data)
+
+
+class Scenario:
+    """One kind of request; endpoint is its report label"""
+
+    name = "base"
+    endpoint = ""
+
+    async def send(self, client: httpx.AsyncClient, ctx: ScenarioContext) -> httpx.Response:
+        raise NotImplementedError
+
+
+class Scan(Scenario):
+    name, endpoint = "scan", "POST /api/scan"
+
+    async def send(self, client, ctx):
+        filename, content = ctx.rng.choice(ctx.images)
+        return await client.post("/api/scan", files={"image": (filename, content, "image/jpeg")})
+
+
+class Assessment(Scenario):
+    name, endpoint = "assessment", "POST /api/health-assessment"
+
+    async def send(self, client, ctx):
+        body = {field: ctx.rng.choice(choices) for field, choices in QUESTIONNAIRE_CHOICES.items()}
+        body["additional_notes"] = ctx.rng.choice(["", "fell while running", "throbbing at night"])
+        return await client.post("/api/health-assessment", json=body)
+
+
+class Voice(Scenario):
+    name, endpoint = "voice", "POST /api/voice-analysis"
+
+    async def send(self, client, ctx):
+        return await client.post("/api/voice-analysis",
+                                 files={"audio": ("note.wav", ctx.unique_wav(), "audio/wav")})
+
+
+class Chat(Scenario):
+    """Conversations over a pool of sessions, so histories grow"""
+
+    name, endpoint = "chat", "POST /api/chat"
+
+    async def send(self, client, ctx):
+        slot = ctx.rng.randrange(len(ctx.chat_sessions))
+        response = await client.post("/api/chat", json={
+            "message": ctx.rng.choice(CHAT_MESSAGES),
+            "session_id": ctx.chat_sessions[slot],
+        })
+        if response.status_code == 200:
+            ctx.chat_sessions[slot] = response.json().get("session_id")
+        return response
+
+
+class Doctors(Scenario):
+    name, endpoint = "doctors", "GET /api/doctors"
+
+    async def send(self, client, ctx):
+        return await client.get("/api/doctors", params={
+            "injury_type": ctx.rng.choice(INJURY_TYPES),
+            "risk_level": ctx.rng.choice(RISK_LEVELS),
+        })
+
+
+class Booking(Scenario):
+    name, endpoint = "booking", "POST /api/book"
+
+    async def send(self, client, ctx):
+        doctor = ctx.rng.choice(ctx.doctors)
+        return await client.post("/api/book", json={
+            "doctor_id": doctor["id"],
+            "patient_name": "Load Test",
+            "patient_phone": f"98{ctx.rng.randrange(10**8):08d}",
+            "appointment_slot": ctx.rng.choice(doctor["available_slots"] or ["Today 2:00 PM"]),
+            "injury_type": ctx.rng.choice(INJURY_TYPES),
+        })
+
+
+class AdminPolling(Scenario):
+    name, endpoint = "admin", "GET /api/admin/stats"
+
+    async def send(self, client, ctx):
+        return await client.get("/api/admin/stats")
+
+
+SCENARIOS = {s.name: s for s in (Scan(), Assessment(), Voice(), Chat(),
+                                  Doctors(), Booking(), AdminPolling())}
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, float]:
+    """'scan=2,chat=5' -> weights; unnamed scenarios keep DEFAULT_MIX weights"""
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (text or "").split(",")):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r} ({', '.join(SCENARIOS)})")
+        mix[name.strip()] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
@@ -0,0 +1,117 @@
+"""
+Metrics Recording Overhead Benchmark
+====================================
+Shows that metrics.py is cheap enough to leave on in production:
+
+- observe: one histogram observation on a labelled child
+- stage: one `with stage(pipeline, name)` block (label lookup + timer)
+- middleware: MetricsMiddleware around a do-nothing ASGI app, minus the
+  same app called directly - the per-request cost of the http_* metrics
+- span (off): tracing.span() outside a traced request, the cost every
+  span pays when tracing is off
+
+A /api/scan request records one request and six stages, so its total
+cost is reported as well. The run fails (exit code 1) when that exceeds
+--max-request-us.
+
+Usage:
+    python -m benchmarks.metrics_overhead_bench --iterations 200000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from metrics import STAGE_SECONDS, MetricsMiddleware, stage
+from tracing import span
+
+SCAN_STAGES = 6
+
+
+def per_call_ns(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    fn(iterations)
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def observe_loop(iterations: int):
+    child = STAGE_SECONDS.labels("bench", "observe")
+    for i in range(iterations):
+        child.observe(0.003)
+
+
+def stage_loop(iterations: int):
+    for _ in range(iterations):
+        with stage("bench", "stage"):
+            pass
+
+
+def span_loop(iterations: int):
+    for _ in range(iterations):
+        with span("bench"):
+            pass
+
+
+def empty_loop(iterations: int):
+    for _ in range(iterations):
+        pass
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+class BenchRoute:
+    path = "/api/scan"
+
+
+def asgi_loop(app):
+    scope = {"type": "http", "method": "POST", "path": "/api/scan"}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    def run(iterations: int):
+        async def requests():
+            for _ in range(iterations):
+                await app(dict(scope), receive, send)
+        asyncio.run(requests())
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--max-request-us", type=float, default=50.0,
+                        help="fail above this metrics cost per scan request")
+    args = parser.parse_args()
+    n = args.iterations
+
+    loop_ns = per_call_ns(empty_loop, n)
+    observe_ns = per_call_ns(observe_loop, n) - loop_ns
+    stage_ns = per_call_ns(stage_loop, n) - loop_ns
+    span_ns = per_call_ns(span_loop, n) - loop_ns
+    middleware = MetricsMiddleware(bare_app, routes=lambda: [BenchRoute()])
+    middleware_ns = per_call_ns(asgi_loop(middleware), n) - per_call_ns(asgi_loop(bare_app), n)
+    scan_us = (middleware_ns + SCAN_STAGES * stage_ns) / 1000
+
+    print(f"{n} iterations")
+    print(f"  histogram observe      {observe_ns:8.0f} ns")
+    print(f"  stage() block          {stage_ns:8.0f} ns")
+    print(f"  span (off)             {span_ns:8.0f} ns")
+    print(f"  middleware per request {middleware_ns:8.0f} ns")
+    print(f"  /api/scan total        {scan_us:8.2f} µs "
+          f"(request + {SCAN_STAGES} stages; limit {args.max_request_us:.0f} µs)")
+    if scan_us > args.max_request_us:
+        print("❌ Metrics overhead above the limit")
+        sys.exit(1)
+    print("✅ Within limit")
+
+
+if __name__ == "__main__":
+    main()
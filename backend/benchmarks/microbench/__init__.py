@@ -0,0 +1,22 @@
+"""
+Service Microbenchmarks
+=======================
+Function-level timings of the service hot paths, so a slowdown is caught
+in the function that caused it rather than as a vague end-to-end drift
+(see benchmarks/loadtest for that).
+
+- cases.py: what is measured - AIService.analyze_injury (image sizes),
+  RiskClassifier.classify_risk, GuidanceEngine.generate_guidance,
+  DoctorService.get_recommended_doctors (10 to 100k doctors),
+  HealthAssessmentService.analyze_questionnaire (cached and uncached),
+  VoiceService.extract_health_info_from_text and
+  ChatService.process_message (short and long messages)
+- harness.py: timing rounds and allocations per call (tracemalloc)
+- compare.py: Mann-Whitney U test between two results files
+
+Usage:
+    python -m benchmarks.microbench run --out bench.json
+    python -m benchmarks.microbench run --filter doctors --max-seconds 5
+    python -m benchmarks.microbench compare base.json bench.json
+    python -m benchmarks.microbench commits main HEAD
+"""
@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.dataset import DATASET_CACHE_DIR, PROFILES
+from benchmarks.microbench import compare as comparison
+from benchmarks.microbench.harness import Settings, measure
+
+RESULTS_VERSION = 1
+MICROBENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(os.path.dirname(MICROBENCH_DIR))
+
+
+def git(*args: str, cwd: str = BACKEND_DIR) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True,
+                          check=True).stdout.strip()
+
+
+def run(args) -> dict:
+    # Services that touch storage at import get throwaway paths
+    tmp = tempfile.mkdtemp(prefix="microbench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmp, 'medidoctor.db')}")
+    os.environ.setdefault("CHAT_SPILL_PATH", os.path.join(tmp, "chat_sessions.db"))
+    os.environ.setdefault("TRANSCRIPT_CACHE_DIR", os.path.join(tmp, "transcripts"))
+    from benchmarks.microbench.cases import all_cases
+
+    settings = Settings(round_seconds=args.round_ms / 1000, max_seconds=args.max_seconds,
+                        min_rounds=args.min_rounds, max_rounds=args.max_rounds)
+    cases = [c for c in all_cases(args.dataset) if not args.filter or args.filter in c.name]
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for case in cases:
+            try:
+                result = measure(case, loop, settings)
+            except Exception as e:   # e.g. a service API that differs at an older commit
+                results[case.name] = {"error": f"{type(e).__name__}: {e}"}
+                print(f"  {case.name:<48} ⚠️  {results[case.name]['error']}")
+                continue
+            results[case.name] = result
+            print(f"  {case.name:<48} {comparison.fmt_ns(result['median_ns']):>10} "
+                  f"±{comparison.fmt_ns(result['iqr_ns']):>9}  "
+                  f"peak {result['peak_bytes'] / 1024:8.1f} KiB  "
+                  f"retained {result['retained_bytes']:>7} B")
+    finally:
+        loop.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    try:
+        commit = os.getenv("GIT_COMMIT") or git("rev-parse", "--short", "HEAD")
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {
+        "version": RESULTS_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "settings": vars(settings),
+        "cases": results,
+    }
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        results = json.load(f)
+    if results.get("version") != RESULTS_VERSION:
+        sys.exit(f"❌ {path}: results version {results.get('version')}, "
+                 f"expected {RESULTS_VERSION}")
+    return results
+
+
+def run_at_commit(ref: str, out: str, run_args: list) -> dict:
+    """Check ref out in a temporary worktree and run this suite against it"""
+    root = git("rev-parse", "--show-toplevel")
+    backend_rel = os.path.relpath(BACKEND_DIR, root)
+    with tempfile.TemporaryDirectory(prefix="microbench-wt-") as tmp:
+        worktree = os.path.join(tmp, "tree")
+        git("worktree", "add", "--detach", worktree, ref, cwd=root)
+        try:
+            backend = os.path.join(worktree, backend_rel)
+            # The suite itself comes from this checkout, so both commits run the same cases
+            target = os.path.join(backend, "benchmarks", "microbench")
+            shutil.copytree(MICROBENCH_DIR, target, dirs_exist_ok=True,
+                            ignore=shutil.ignore_patterns("__pycache__"))
+            shutil.copy(os.path.join(BACKEND_DIR, "benchmarks", "dataset.py"),
+                        os.path.join(backend, "benchmarks", "dataset.py"))
+            package_init = os.path.join(backend, "benchmarks", "__init__.py")
+            if not os.path.exists(package_init):
+                open(package_init, "w").close()
+            env = {**os.environ, "GIT_COMMIT": git("rev-parse", "--short", ref),
+                   "BENCH_DATASET_DIR": DATASET_CACHE_DIR}
+            print(f"\n⏱️  {ref} ({env['GIT_COMMIT']})")
+            subprocess.run([sys.executable, "-m", "benchmarks.microbench", "run",
+                            "--out", out, *run_args], cwd=backend, env=env, check=True)
+        finally:
+            git("worktree", "remove", "--force", worktree, cwd=root)
+    return load(out)
+
+
+def report(baseline: dict, current: dict, args) -> int:
+    rows = comparison.compare(baseline, current, args.alpha, args.threshold, args.mem_threshold)
+    comparison.print_comparison(rows, baseline, current)
+    flagged = [name for name, verdict, _ in rows if verdict in ("slower", "more-memory")]
+    if flagged:
+        print(f"\n❌ {len(flagged)} case(s) regressed: {', '.join(flagged)}")
+        return 1
+    print("\n✅ No significant slowdowns")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.microbench",
+                                     description="MediDoctor service microbenchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_options = argparse.ArgumentParser(add_help=False)
+    run_options.add_argument("--filter", default="", help="only cases whose name contains this")
+    run_options.add_argument("--round-ms", type=float, default=50)
+    run_options.add_argument("--max-seconds", type=float, default=2.0,
+                             help="timing budget per case")
+    run_options.add_argument("--min-rounds", type=int, default=5)
+    run_options.add_argument("--max-rounds", type=int, default=30)
+    run_options.add_argument("--dataset", default=None, choices=list(PROFILES),
+                             help="also query this benchmarks.dataset profile")
+
+    compare_options = argparse.ArgumentParser(add_help=False)
+    compare_options.add_argument("--alpha", type=float, default=0.01,
+                                 help="significance level of the U test")
+    compare_options.add_argument("--threshold", type=float, default=0.05,
+                                 help="ignore median changes smaller than this fraction")
+    compare_options.add_argument("--mem-threshold", type=float, default=0.2,
+                                 help="flag peak allocation growth above this fraction")
+
+    run_parser = commands.add_parser("run", parents=[run_options], help="run the suite")
+    run_parser.add_argument("--out", default=None, help="write JSON results here")
+
+    compare_parser = commands.add_parser("compare", parents=[compare_options],
+                                         help="compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+
+    commits_parser = commands.add_parser("commits", parents=[run_options, compare_options],
+                                         help="run the suite at two commits and compare")
+    commits_parser.add_argument("base")
+    commits_parser.add_argument("head")
+    commits_parser.add_argument("--keep", default=None,
+                                help="directory to keep both results files in")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(args)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+            print(f"\n💾 Results saved to {args.out}")
+        return
+
+    if args.command == "compare":
+        sys.exit(report(load(args.baseline), load(args.current), args))
+
+    run_args = ["--round-ms", str(args.round_ms), "--max-seconds", str(args.max_seconds),
+                "--min-rounds", str(args.min_rounds), "--max-rounds", str(args.max_rounds)]
+    if args.filter:
+        run_args += ["--filter", args.filter]
+    if args.dataset:
+        run_args += ["--dataset", args.dataset]
+    out_dir = args.keep or tempfile.mkdtemp(prefix="microbench-")
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        baseline = run_at_commit(args.base, os.path.join(out_dir, "base.json"), run_args)
+        current = run_at_commit(args.head, os.path.join(out_dir, "head.json"), run_args)
+    finally:
+        if not args.keep:
+            shutil.rmtree(out_dir, ignore_errors=True)
+    sys.exit(report(baseline, current, args))
+
+
+if __name__ == "__main__":
+    main()
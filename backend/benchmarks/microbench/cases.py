@@ -0,0 +1,208 @@
+"""
+Microbenchmark Cases
+====================
+Each case imports its service inside setup, so `--filter` can run a
+subset without loading the rest (and their dependencies). Arguments are
+prepared up front and cycled, so a call is the service call plus one
+next() on an iterator.
+
+The doctor cases build a temporary database of N doctors with
+benchmarks/dataset.py and query it through an async read session with
+the app's engine settings (DB_PROFILE), as GET /api/doctors does. With
+--dataset PROFILE, the doctor and admin dashboard queries also run
+against that dataset profile.
+"""
+
+import inspect
+import itertools
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+from typing import List, Optional
+
+from benchmarks.microbench.harness import Case
+
+SEED = 1234
+INJURY_TYPES = ["cut", "burn", "swelling", "bruise", "fracture", "rash"]
+RISK_LEVELS = ["LOW", "MEDIUM", "HIGH"]
+IMAGE_SIZES = {"50KB": 50_000, "250KB": 250_000, "1MB": 1_000_000, "5MB": 5_000_000}
+DOCTOR_COUNTS = [10, 1_000, 10_000, 100_000]
+
+SHORT_TEXT = "my knee hurts"
+LONG_TEXT = (
+    "I fell off my bike yesterday evening and landed on my left knee and wrist. "
+    "The knee is swollen and feels warm, there is a sharp throbbing pain when I "
+    "bend it, and the wrist has a dull ache with some bruising. I took a pill "
+    "for the pain last night but it is still severe this morning and I am "
+    "worried it might be serious because I can barely walk. "
+) * 4
+
+QUESTIONNAIRE = {
+    "pain_level": "moderate", "swelling": "mild", "duration": "1-2 days",
+    "affected_area": "knee", "movement_difficulty": "mild",
+    "redness": "no", "warmth": "yes", "additional_notes": "fell while running",
+}
+
+
+def _cycle(items):
+    return itertools.cycle(items).__next__
+
+
+@contextmanager
+def analyze_injury(loop, size: int):
+    from services.ai_service import AIService
+
+    service = AIService()
+    rng = random.Random(SEED)
+    images = [rng.randbytes(size) for _ in range(4)]
+    next_image = _cycle(images)
+    yield lambda: service.analyze_injury(next_image(), "injury.jpg")
+
+
+@contextmanager
+def classify_risk(loop):
+    from services.risk_service import RiskClassifier
+
+    classifier = RiskClassifier()
+    rng = random.Random(SEED)
+    args = [(rng.choice(INJURY_TYPES), rng.uniform(0.5, 0.99),
+             rng.choice(["Deep laceration with bleeding", "Mild redness", "Swollen area"]))
+            for _ in range(64)]
+    next_args = _cycle(args)
+    yield lambda: classifier.classify_risk(*next_args())
+
+
+@contextmanager
+def generate_guidance(loop):
+    from services.guidance_service import GuidanceEngine
+
+    engine = GuidanceEngine()
+    next_args = _cycle(list(itertools.product(INJURY_TYPES, RISK_LEVELS)))
+    yield lambda: engine.generate_guidance(*next_args())
+
+
+@contextmanager
+def _read_session(loop, path: str):
+    """Async read sessions on a database file, with the app's engine settings"""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    from database import build_async_engines
+
+    async_write, async_read = build_async_engines(f"sqlite:///{path}")
+    try:
+        yield async_sessionmaker(async_read, class_=AsyncSession, autoflush=False,
+                                 expire_on_commit=False)
+    finally:
+        loop.run_until_complete(async_read.dispose())
+        loop.run_until_complete(async_write.dispose())
+
+
+def _doctor_queries(Session):
+    from services.doctor_service import DoctorService
+
+    service = DoctorService()
+    next_args = _cycle(list(itertools.product(INJURY_TYPES, RISK_LEVELS)))
+
+    async def call():
+        injury_type, risk_level = next_args()
+        async with Session() as db:
+            return await service.get_recommended_doctors(
+                db, injury_type=injury_type, risk_level=risk_level)
+    return call
+
+
+@contextmanager
+def get_recommended_doctors(loop, n: int):
+    from benchmarks.dataset import Profile, generate
+
+    with tempfile.TemporaryDirectory(prefix="microbench-") as tmp:
+        path = os.path.join(tmp, "doctors.db")
+        generate(path, Profile(doctors=n, scans=0, appointments=0), seed=SEED)
+        with _read_session(loop, path) as Session:
+            yield _doctor_queries(Session)
+
+
+@contextmanager
+def doctors_on_dataset(loop, profile: str):
+    from benchmarks.dataset import ensure_dataset
+
+    with _read_session(loop, ensure_dataset(profile)) as Session:
+        yield _doctor_queries(Session)
+
+
+@contextmanager
+def admin_stats(loop, profile: str):
+    from benchmarks.dataset import ensure_dataset
+    from services.admin_stats_service import AdminStatsService
+
+    service = AdminStatsService()
+    with _read_session(loop, ensure_dataset(profile)) as Session:
+        async def call():
+            async with Session() as db:
+                return await service.get_stats(db)
+        yield call
+
+
+@contextmanager
+def analyze_questionnaire(loop, cached: bool):
+    from services.health_assessment_service import HealthAssessmentService
+
+    # cache_size=0 builds every result from the rules
+    service = HealthAssessmentService() if cached else HealthAssessmentService(cache_size=0)
+    yield lambda: service.analyze_questionnaire(QUESTIONNAIRE)
+
+
+@contextmanager
+def extract_health_info(loop, text: str):
+    from services.voice_service import VoiceService
+
+    service = VoiceService()
+    yield lambda: service.extract_health_info_from_text(text)
+
+
+@contextmanager
+def process_message(loop, text: str):
+    from services.chat_service import ChatService
+
+    service = ChatService()
+    if not inspect.iscoroutinefunction(service.process_message):   # before sessions went async
+        yield lambda: service.process_message(text)
+        return
+    session_id = loop.run_until_complete(service.process_message(text))["session_id"]
+
+    async def call():
+        return await service.process_message(text, session_id=session_id)
+    yield call
+
+
+def _bind(setup, **params):
+    return lambda loop: setup(loop, **params)
+
+
+def all_cases(dataset: Optional[str] = None) -> List[Case]:
+    """Every case; with a dataset profile, also the queries over that dataset"""
+    cases = [Case(f"ai.analyze_injury[{label}]", _bind(analyze_injury, size=size))
+             for label, size in IMAGE_SIZES.items()]
+    cases += [
+        Case("risk.classify_risk", classify_risk),
+        Case("guidance.generate_guidance", generate_guidance),
+    ]
+    cases += [Case(f"doctors.get_recommended_doctors[n={n}]", _bind(get_recommended_doctors, n=n))
+              for n in DOCTOR_COUNTS]
+    cases += [
+        Case("assessment.analyze_questionnaire[cached]", _bind(analyze_questionnaire, cached=True)),
+        Case("assessment.analyze_questionnaire[uncached]",
+             _bind(analyze_questionnaire, cached=False)),
+        Case("voice.extract_health_info_from_text[short]", _bind(extract_health_info, text=SHORT_TEXT)),
+        Case("voice.extract_health_info_from_text[long]", _bind(extract_health_info, text=LONG_TEXT)),
+        Case("chat.process_message[short]", _bind(process_message, text=SHORT_TEXT)),
+        Case("chat.process_message[long]", _bind(process_message, text=LONG_TEXT)),
+    ]
+    if dataset:
+        cases += [
+            Case(f"doctors.get_recommended_doctors[{dataset}]",
+                 _bind(doctors_on_dataset, profile=dataset)),
+            Case(f"admin.get_stats[{dataset}]", _bind(admin_stats, profile=dataset)),
+        ]
+    return cases
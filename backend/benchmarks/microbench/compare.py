@@ -0,0 +1,104 @@
+"""
+Microbenchmark Comparison
+=========================
+Decides, per case, whether the current results are slower than the
+baseline. A case is flagged slower only when both hold:
+
+- the rounds differ significantly: two-sided Mann-Whitney U test (normal
+  approximation with tie correction), p below --alpha. It makes no
+  normality assumption, which timing samples rarely meet
+- the median grew by more than --threshold (a significant 1% is not worth
+  failing a build over)
+
+Memory is flagged when peak_bytes per call grew by more than
+--mem-threshold and by more than MEM_FLOOR_BYTES.
+"""
+
+import math
+from typing import Dict, List, Sequence, Tuple
+
+MEM_FLOOR_BYTES = 1024
+
+
+def mann_whitney_p(a: Sequence[float], b: Sequence[float]) -> float:
+    """Two-sided p-value that a and b come from the same distribution"""
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 1.0
+    ranked = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+
+    rank_sum_a = sum(r for r, (_, group) in zip(ranks, ranked) if group == 0)
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)   # continuity correction
+    return min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+def compare_case(before: Dict, after: Dict, alpha: float, threshold: float,
+                 mem_threshold: float) -> Tuple[str, Dict]:
+    """(verdict, details); verdict is slower, faster, same or more-memory"""
+    change = after["median_ns"] / before["median_ns"] - 1 if before["median_ns"] else 0.0
+    p = mann_whitney_p(before["rounds_ns"], after["rounds_ns"])
+    details = {"change": change, "p": p,
+               "before_ns": before["median_ns"], "after_ns": after["median_ns"],
+               "before_peak": before["peak_bytes"], "after_peak": after["peak_bytes"]}
+
+    verdict = "same"
+    if p < alpha and abs(change) > threshold:
+        verdict = "slower" if change > 0 else "faster"
+    grown = after["peak_bytes"] - before["peak_bytes"]
+    if (verdict != "slower" and grown > MEM_FLOOR_BYTES
+            and grown > before["peak_bytes"] * mem_threshold):
+        verdict = "more-memory"
+    return verdict, details
+
+
+def compare(baseline: Dict, current: Dict, alpha: float = 0.01, threshold: float = 0.05,
+            mem_threshold: float = 0.2) -> List[Tuple[str, str, Dict]]:
+    """(case, verdict, details) for every case in either file"""
+    rows = []
+    for name in sorted(set(baseline["cases"]) | set(current["cases"])):
+        before, after = baseline["cases"].get(name), current["cases"].get(name)
+        if before is None or after is None:
+            rows.append((name, "missing", {}))
+        elif "error" in before or "error" in after:
+            rows.append((name, "error", {"error": before.get("error") or after.get("error")}))
+        else:
+            rows.append((name, *compare_case(before, after, alpha, threshold, mem_threshold)))
+    return rows
+
+
+def print_comparison(rows: List[Tuple[str, str, Dict]], baseline: Dict, current: Dict):
+    marks = {"slower": "❌", "more-memory": "⚠️ ", "faster": "🚀", "same": "  ",
+             "missing": "? ", "error": "? "}
+    print(f"\n{baseline['commit'] or 'baseline'} -> {current['commit'] or 'current'}")
+    print(f"   {'case':<48} {'before':>10} {'after':>10} {'change':>8} {'p':>8} {'peak KiB':>17}")
+    for name, verdict, d in rows:
+        if verdict in ("missing", "error"):
+            print(f"{marks[verdict]} {name:<48} {verdict} {d.get('error', '')}")
+            continue
+        peak = f"{d['before_peak'] / 1024:.1f}->{d['after_peak'] / 1024:.1f}"
+        print(f"{marks[verdict]} {name:<48} {fmt_ns(d['before_ns']):>10} "
+              f"{fmt_ns(d['after_ns']):>10} {d['change']:>+8.1%} {d['p']:>8.4f} {peak:>17}")
+
+
+def fmt_ns(ns: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("µs", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
@@ -0,0 +1,121 @@
+"""
+Microbenchmark Harness
+======================
+Times one Case in rounds: a round calls the function enough times to take
+about --round-ms, and its mean per-call time is one sample. The rounds,
+not a single total, go into the results, so compare.py can tell noise
+from a real change.
+
+The number of calls per round is calibrated first (which also warms
+caches and lazy imports); the number of rounds then fits --max-seconds,
+within --min-rounds / --max-rounds. The garbage collector runs as usual:
+collections caused by a function's garbage are part of its cost.
+
+Allocations are measured after the timing, in a separate pass under
+tracemalloc (which slows every allocation down):
+- peak_bytes: the most memory one call had allocated at once (median)
+- retained_bytes: memory still held after a call, averaged over the
+  calls - caches filling up, or a leak
+"""
+
+import asyncio
+import gc
+import inspect
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, ContextManager, Dict, List
+
+
+@dataclass
+class Case:
+    """name: "group.function[params]"; setup(loop) yields the callable"""
+
+    name: str
+    setup: Callable[[asyncio.AbstractEventLoop], ContextManager[Callable]]
+
+
+@dataclass
+class Settings:
+    round_seconds: float = 0.05
+    max_seconds: float = 2.0
+    min_rounds: int = 5
+    max_rounds: int = 30
+    alloc_calls: int = 20
+
+
+def _timer(fn: Callable, loop: asyncio.AbstractEventLoop) -> Callable[[int], float]:
+    """n -> seconds for n calls of fn (awaited in loop if it is async)"""
+    if inspect.iscoroutinefunction(fn):
+        async def calls(n: int) -> float:
+            started = time.perf_counter()
+            for _ in range(n):
+                await fn()
+            return time.perf_counter() - started
+        return lambda n: loop.run_until_complete(calls(n))
+
+    def timed(n: int) -> float:
+        started = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return time.perf_counter() - started
+    return timed
+
+
+def _allocations(fn: Callable, loop: asyncio.AbstractEventLoop, calls: int) -> Dict:
+    is_async = inspect.iscoroutinefunction(fn)
+
+    async def run() -> Dict:
+        peaks = []
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            for _ in range(calls):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                if is_async:
+                    await fn()
+                else:
+                    fn()
+                peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            retained = tracemalloc.get_traced_memory()[0] - start
+        finally:
+            tracemalloc.stop()
+        return {"peak_bytes": int(statistics.median(peaks)),
+                "retained_bytes": int(retained / calls)}
+
+    return loop.run_until_complete(run())
+
+
+def measure(case: Case, loop: asyncio.AbstractEventLoop, settings: Settings) -> Dict:
+    """Timing rounds (ns per call) and allocations of one case"""
+    with case.setup(loop) as fn:
+        timed = _timer(fn, loop)
+
+        # Calibrate: double the calls until a batch takes a quarter round
+        n, elapsed = 1, timed(1)
+        while elapsed < settings.round_seconds / 4 and n < 1_000_000:
+            n *= 2
+            elapsed = timed(n)
+        per_call = elapsed / n
+        calls = max(1, round(settings.round_seconds / per_call))
+        rounds = int(settings.max_seconds / (calls * per_call))
+        rounds = max(settings.min_rounds, min(settings.max_rounds, rounds))
+
+        samples: List[float] = []
+        for _ in range(rounds):
+            gc.collect()
+            samples.append(timed(calls) / calls * 1e9)
+
+        memory = _allocations(fn, loop, min(settings.alloc_calls, max(1, calls)))
+
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else samples * 3
+    return {
+        "calls_per_round": calls,
+        "rounds_ns": [round(s, 1) for s in samples],
+        "median_ns": round(statistics.median(samples), 1),
+        "min_ns": round(min(samples), 1),
+        "iqr_ns": round(quartiles[2] - quartiles[0], 1),
+        **memory,
+    }
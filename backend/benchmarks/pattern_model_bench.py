@@ -0,0 +1,82 @@
+"""
+Pattern Model Latency / Accuracy Benchmark
+==========================================
+Compares the keyword rules with the trained hashed-feature model on a
+fresh synthetic corpus (different seed from training):
+
+- accuracy: exact match and macro F1 against the generated labels
+- single-call latency (p50/p99) for short notes and long (~2 KB) notes
+- batch throughput via predict_batch
+
+Usage:
+    python -m scripts.train_pattern_model          # once, writes the artifact
+    python -m benchmarks.pattern_model_bench --rows 5000
+"""
+
+import argparse
+import statistics
+import time
+
+from scripts.train_pattern_model import LABELS, RULES, evaluate, synthetic_examples
+from services.pattern_model import PATTERN_MODEL_PATH, load_pattern_model
+
+FILLER = ("I have been resting it and using ice as suggested, but walking to "
+          "work and climbing the stairs at home still hurts quite a lot. ")
+
+
+def lengthen(examples, target_chars: int = 2000):
+    """Copies of the examples with filler text padding the notes"""
+    long_examples = []
+    for responses, labels in examples:
+        notes = responses.get('additional_notes') or ""
+        padding = FILLER * (target_chars // len(FILLER))
+        long_examples.append(({**responses, 'additional_notes': padding + notes}, labels))
+    return long_examples
+
+
+def latency(model, rows):
+    times = []
+    for row in rows:
+        started = time.perf_counter()
+        model.predict(row)
+        times.append((time.perf_counter() - started) * 1e6)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99)]
+
+
+def throughput(model, rows):
+    started = time.perf_counter()
+    model.predict_batch(rows)
+    return len(rows) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--model", default=PATTERN_MODEL_PATH,
+                        help="artifact prefix to benchmark")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=12345)
+    args = parser.parse_args()
+
+    model = load_pattern_model(args.model)
+    if model is None:
+        raise SystemExit(f"No pattern model at {args.model} - run "
+                         "python -m scripts.train_pattern_model first")
+
+    short = synthetic_examples(args.rows, args.seed)
+    long = lengthen(short)
+
+    print(f"{'model':16s} {'exact':>6s} {'F1':>6s} {'short p50/p99 us':>18s} "
+          f"{'long p50/p99 us':>18s} {'batch rows/s':>13s}")
+    for name, candidate in (("rules", RULES), (model.name, model)):
+        accuracy = evaluate(candidate.predict_batch([r for r, _ in short]), short, LABELS)
+        short_p50, short_p99 = latency(candidate, [r for r, _ in short])
+        long_p50, long_p99 = latency(candidate, [r for r, _ in long])
+        rate = throughput(candidate, [r for r, _ in short])
+        print(f"{name:16s} {accuracy['exact_match']:6.3f} {accuracy['macro_f1']:6.3f} "
+              f"{short_p50:8.1f} / {short_p99:7.1f} {long_p50:8.1f} / {long_p99:7.1f} "
+              f"{rate:13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+In-Process Redis Protocol Stand-In
+==================================
+A tiny server that speaks enough of the Redis protocol (RESP2) for
+services/shared_state.RedisState, so the redis backend can be exercised
+without a Redis install:
+
+    PING AUTH SELECT GET SET [NX] [PX|EX] DEL INCRBY PEXPIRE [NX]
+    WATCH UNWATCH MULTI EXEC DISCARD DBSIZE FLUSHALL
+
+It runs on one asyncio loop, so each command and each MULTI/EXEC block
+is atomic, like Redis. WATCH is tracked with a version counter per key.
+It has no persistence and one database. It is for tests and load tests,
+not production.
+
+Usage:
+    python -m benchmarks.resp_standin --port 6390
+    # in-process (own thread):
+    standin = RespStandin(); port = standin.start_in_thread(); ...; standin.stop()
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class RespStandin:
+    """Single-database, in-memory RESP2 server"""
+
+    def __init__(self):
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}  # key -> (value, expires_at)
+        self.versions: Dict[bytes, int] = {}
+        self.commands = 0
+        self._clients = set()
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -- keyspace ---------------------------------------------------------
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        item = self.data.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.time():
+            self._delete(key)
+            return None
+        return item[0] if item else None
+
+    def _put(self, key: bytes, value: bytes, expires_at: Optional[float]):
+        self.data[key] = (value, expires_at)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _delete(self, key: bytes) -> int:
+        if self.data.pop(key, None) is None:
+            return 0
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return 1
+
+    # -- commands ---------------------------------------------------------
+
+    def execute(self, args: List[bytes]):
+        """Run one command; returns the reply value (Exception = error reply)"""
+        self.commands += 1
+        name, args = args[0].upper(), args[1:]
+        if name == b"PING":
+            return "PONG"
+        if name in (b"AUTH", b"SELECT"):
+            return "OK"
+        if name == b"GET":
+            return self._get(args[0])
+        if name == b"SET":
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            expires_at = None
+            for unit, scale in ((b"PX", 1000.0), (b"EX", 1.0)):
+                if unit in options:
+                    expires_at = time.time() + int(options[options.index(unit) + 1]) / scale
+            if b"NX" in options and self._get(key) is not None:
+                return None
+            self._put(key, value, expires_at)
+            return "OK"
+        if name == b"DEL":
+            return sum(self._delete(key) for key in args)
+        if name == b"INCRBY":
+            current = self._get(args[0])
+            try:
+                value = int(current or 0) + int(args[1])
+            except ValueError:
+                return ValueError("ERR value is not an integer or out of range")
+            expires_at = self.data[args[0]][1] if current is not None else None
+            self._put(args[0], str(value).encode(), expires_at)
+            return value
+        if name == b"PEXPIRE":
+            key = args[0]
+            if self._get(key) is None:
+                return 0
+            value, expires_at = self.data[key]
+            if b"NX" in [a.upper() for a in args[2:]] and expires_at is not None:
+                return 0
+            self._put(key, value, time.time() + int(args[1]) / 1000)
+            return 1
+        if name == b"DBSIZE":
+            return len(self.data)
+        if name == b"FLUSHALL":
+            for key in list(self.data):
+                self._delete(key)
+            return "OK"
+        return ValueError(f"ERR unknown command '{name.decode()}'")
+
+    # -- protocol ---------------------------------------------------------
+
+    @staticmethod
+    def encode(reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, Exception):
+            return b"-%s\r\n" % str(reply).encode()
+        if isinstance(reply, str):
+            return b"+%s\r\n" % reply.encode()
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, bytes):
+            return b"$%d\r\n%s\r\n" % (len(reply), reply)
+        return b"*%d\r\n" % len(reply) + b"".join(RespStandin.encode(r) for r in reply)
+
+    @staticmethod
+    async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):   # inline command (redis-cli, telnet)
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        watched: Dict[bytes, int] = {}
+        queued: Optional[List[List[bytes]]] = None   # inside MULTI
+        self._clients.add(writer)
+        try:
+            while True:
+                args = await self.read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                name = args[0].upper()
+                if name == b"WATCH":
+                    watched.update({k: self.versions.get(k, 0) for k in args[1:]})
+                    reply = "OK"
+                elif name == b"UNWATCH":
+                    watched.clear()
+                    reply = "OK"
+                elif name == b"MULTI":
+                    queued = []
+                    reply = "OK"
+                elif name == b"DISCARD":
+                    queued, reply = None, "OK"
+                    watched.clear()
+                elif name == b"EXEC":
+                    if queued is None:
+                        reply = ValueError("ERR EXEC without MULTI")
+                    else:
+                        # Expired watched keys count as changed, as in Redis
+                        for key in watched:
+                            self._get(key)
+                        changed = any(self.versions.get(k, 0) != v for k, v in watched.items())
+                        reply = None if changed else [self.execute(c) for c in queued]
+                    queued = None
+                    watched.clear()
+                elif queued is not None:
+                    queued.append(args)
+                    reply = "QUEUED"
+                else:
+                    reply = self.execute(args)
+                writer.write(self.encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    # -- lifecycle --------------------------------------------------------
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Start listening on the running loop; returns the bound port"""
+        self._server = await asyncio.start_server(self.handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Serve from a background thread with its own loop; returns the port"""
+        ready = threading.Event()
+        bound = {}
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            bound["port"] = self._loop.run_until_complete(self.serve(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="resp-standin", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return bound["port"]
+
+    async def _shutdown(self):
+        self._server.close()
+        for writer in list(self._clients):
+            writer.close()   # the handler sees EOF and returns
+        await self._server.wait_closed()
+
+    def stop(self):
+        """Stop a server started with start_in_thread"""
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    async def run():
+        standin = RespStandin()
+        port = await standin.serve(args.host, args.port)
+        print(f"✅ RESP stand-in listening on {args.host}:{port}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
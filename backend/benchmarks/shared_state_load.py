@@ -0,0 +1,188 @@
+"""
+Multi-Worker Shared State Load Test
+===================================
+Starts N worker processes of the real app once per STATE_BACKEND and
+checks that the workers agree:
+
+- chat: S sessions send M messages each, concurrently. Consecutive
+  messages of a session go to different workers. Each session's history
+  is then read R times, from a different worker each time. A session is
+  consistent when every read shows all M messages.
+- idempotency: B concurrent /api/book requests with one Idempotency-Key
+  should create exactly one booking; the rest replay it or get 409.
+
+Throughput and p50/p99 latency of the chat requests are reported too.
+Each run uses a fresh temporary database and state. The redis backend
+runs against benchmarks/resp_standin.py in this process.
+
+The workers are N single-worker uvicorn processes on consecutive ports,
+and the client rotates requests between them. This is what uvicorn
+--workers N amounts to for shared state. It does not depend on how the
+kernel spreads accept() calls: on a machine with few cores, one worker
+can take nearly every connection, which hides the problem.
+
+Usage:
+    python -m benchmarks.shared_state_load --workers 4 --sessions 50 --messages 10
+    python -m benchmarks.shared_state_load --backends sqlite,redis
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+from benchmarks.resp_standin import RespStandin
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSAGES = ["hello", "my knee hurts", "it is swollen since yesterday",
+            "can I take ibuprofen", "is this serious", "how do I treat it"]
+
+
+def start_workers(backend: str, workers: int, port: int, tmp: str, redis_url: str):
+    """N single-worker servers on port .. port + N - 1 sharing one state and DB"""
+    env = {
+        **os.environ,
+        "STATE_BACKEND": backend,
+        "STATE_SQLITE_PATH": os.path.join(tmp, "state.db"),
+        "STATE_REDIS_URL": redis_url,
+        "STATE_KEY_PREFIX": f"load-{uuid.uuid4().hex[:8]}:",
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'medidoctor.db')}",
+        "CHAT_SPILL_PATH": os.path.join(tmp, "chat_sessions.db"),
+        "TRANSCRIPT_CACHE_DIR": os.path.join(tmp, "transcripts"),
+        "STT_WORKERS": "0",
+        "AUDIO_DECODE_WORKERS": "0",
+        "ADMISSION_RATE": "0",
+    }
+    return [subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port + i),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+        for i in range(workers)]
+
+
+async def wait_ready(base: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base}/api/doctors")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise SystemExit(f"Server at {base} did not start")
+
+
+async def chat_session(clients, first: int, messages: int, latencies: list) -> str:
+    session_id = uuid.uuid4().hex
+    for i in range(messages):
+        client = clients[(first + i) % len(clients)]
+        started = time.perf_counter()
+        r = await client.post("/api/chat", json={"message": MESSAGES[i % len(MESSAGES)],
+                                                 "session_id": session_id})
+        latencies.append(time.perf_counter() - started)
+        r.raise_for_status()
+    return session_id
+
+
+async def consistent(clients, first: int, session_id: str, messages: int,
+                     reads: int) -> bool:
+    for i in range(reads):
+        r = await clients[(first + i) % len(clients)].get("/api/chat/history", params={"session": session_id})
+        if r.status_code != 200:
+            return False
+        summary = r.json()
+        if (summary["total_messages"] != messages
+                or sum(summary["intent_counts"].values()) != messages):
+            return False
+    return True
+
+
+async def run_load(bases, args) -> dict:
+    clients = [httpx.AsyncClient(base_url=base, timeout=30) for base in bases]
+    try:
+        latencies = []
+        started = time.perf_counter()
+        sessions = await asyncio.gather(*[
+            chat_session(clients, i, args.messages, latencies) for i in range(args.sessions)])
+        elapsed = time.perf_counter() - started
+
+        checks = await asyncio.gather(*[
+            consistent(clients, i + 1, s, args.messages, args.reads)
+            for i, s in enumerate(sessions)])
+
+        doctor_id = (await clients[0].get("/api/doctors")).json()[0]["id"]
+        key = uuid.uuid4().hex
+        booking = {"doctor_id": doctor_id, "patient_name": "Load Test",
+                   "patient_phone": "9876543210", "appointment_slot": "Today 2:00 PM"}
+        responses = await asyncio.gather(*[
+            clients[i % len(clients)].post("/api/book", json=booking,
+                                           headers={"Idempotency-Key": key})
+            for i in range(args.bookings)])
+    finally:
+        for client in clients:
+            await client.aclose()
+
+    latencies.sort()
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "consistent_sessions": sum(checks),
+        "bookings_created": len({r.json()["booking_id"] for r in responses
+                                 if r.status_code == 200}),
+        "booking_statuses": dict(Counter(r.status_code for r in responses)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--backends", default="local,sqlite,redis")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--reads", type=int, default=3, help="history reads per session")
+    parser.add_argument("--bookings", type=int, default=20,
+                        help="concurrent bookings sharing one Idempotency-Key")
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+
+    standin = RespStandin()
+    redis_url = f"redis://127.0.0.1:{standin.start_in_thread()}/0"
+
+    print(f"{args.workers} workers, {args.sessions} sessions x {args.messages} messages, "
+          f"{args.bookings} concurrent bookings with one Idempotency-Key")
+    print(f"{'backend':8s} {'req/s':>7s} {'p50 ms':>7s} {'p99 ms':>7s} "
+          f"{'consistent':>11s} {'bookings':>9s}  statuses")
+    try:
+        for offset, backend in enumerate(args.backends.split(",")):
+            port = args.port + offset * args.workers
+            bases = [f"http://127.0.0.1:{port + i}" for i in range(args.workers)]
+            with tempfile.TemporaryDirectory() as tmp:
+                workers = start_workers(backend, args.workers, port, tmp, redis_url)
+                try:
+                    for base in bases:
+                        asyncio.run(wait_ready(base))
+                    result = asyncio.run(run_load(bases, args))
+                finally:
+                    for worker in workers:
+                        worker.terminate()
+                    for worker in workers:
+                        worker.wait(timeout=30)
+            print(f"{backend:8s} {result['requests_per_second']:7.0f} {result['p50_ms']:7.1f} "
+                  f"{result['p99_ms']:7.1f} {result['consistent_sessions']:5d}/{args.sessions:<5d} "
+                  f"{result['bookings_created']:9d}  {result['booking_statuses']}")
+    finally:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
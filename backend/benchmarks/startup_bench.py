@@ -0,0 +1,188 @@
+"""
+Cold Start Benchmark
+====================
+Measures what an autoscaled or serverless instance pays before it can
+answer:
+
+- import: wall time of `import main` in a fresh interpreter
+- first 200: from launching uvicorn to the first 200 from GET /, on a
+  fresh database (migrations run) and on an existing one (schema probe
+  only)
+- lazy imports: `import main` must not load LAZY_MODULES (NumPy and the
+  optional audio/speech packages); they load on first use
+
+Each figure is the median of --runs fresh processes. The run fails (exit
+code 1) when a median exceeds its limit: --max-import-ms and
+--max-first-200-ms, or --baseline plus --tolerance (fraction over a saved
+baseline; write one with --save-baseline), or when a lazy module is
+imported eagerly.
+
+Usage:
+    python -m benchmarks.startup_bench --runs 5
+    python -m benchmarks.startup_bench --save-baseline startup_baseline.json
+    python -m benchmarks.startup_bench --baseline startup_baseline.json --tolerance 0.2
+    python -m benchmarks.startup_bench --top 15   # slowest imports
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = ("import time; started = time.perf_counter(); import main; "
+                  "print(time.perf_counter() - started)")
+
+# Only needed by model-backed and audio code paths, never by `import main`
+LAZY_MODULES = ("numpy", "soundfile", "vosk", "faster_whisper")
+
+
+def bench_env(tmp: str, warmup: str) -> dict:
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'medidoctor.db')}",
+        "CHAT_SPILL_PATH": os.path.join(tmp, "chat_sessions.db"),
+        "TRANSCRIPT_CACHE_DIR": os.path.join(tmp, "transcripts"),
+        "INIT_LOCK_PATH": os.path.join(tmp, "init.lock"),
+        "WARMUP": warmup,
+        "STT_WORKERS": "0",
+        "AUDIO_DECODE_WORKERS": "0",
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds(env: dict) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR,
+                         env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def eager_imports(env: dict) -> list:
+    """LAZY_MODULES that `import main` loads anyway"""
+    snippet = (f"import sys, main; print(' '.join(m for m in {LAZY_MODULES!r} "
+               "if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", snippet], cwd=BACKEND_DIR,
+                         env=env, capture_output=True, text=True, check=True)
+    lines = out.stdout.splitlines()
+    return lines[-1].split() if lines else []
+
+
+def first_200_seconds(env: dict, timeout: float = 60.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            if server.poll() is not None:
+                raise SystemExit(f"Server exited with code {server.returncode}")
+            time.sleep(0.01)
+        raise SystemExit(f"No 200 within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def slowest_imports(env: dict, top: int):
+    """Top-level packages by cumulative import time (-X importtime), in µs"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                         cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if "." in name or name == "main" or not cumulative_us.strip().isdigit():
+            continue   # submodules, the total, the header
+        cumulative[name] = max(cumulative.get(name, 0), int(cumulative_us))
+    return sorted(cumulative.items(), key=lambda item: -item[1])[:top]
+
+
+def measure(runs: int, warmup: str) -> dict:
+    imports, fresh, existing = [], [], []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = bench_env(tmp, warmup)
+            fresh.append(first_200_seconds(env))
+            existing.append(first_200_seconds(env))
+            imports.append(import_seconds(env))
+    return {
+        "import_ms": statistics.median(imports) * 1000,
+        "first_200_fresh_db_ms": statistics.median(fresh) * 1000,
+        "first_200_ms": statistics.median(existing) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", default="background", choices=["background", "eager", "lazy"],
+                        help="WARMUP mode of the measured server")
+    parser.add_argument("--max-import-ms", type=float,
+                        default=float(os.getenv("STARTUP_MAX_IMPORT_MS", "1500")))
+    parser.add_argument("--max-first-200-ms", type=float,
+                        default=float(os.getenv("STARTUP_MAX_FIRST_200_MS", "3000")))
+    parser.add_argument("--baseline", help="JSON from --save-baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed fraction over the baseline")
+    parser.add_argument("--save-baseline", help="write the medians to this JSON file")
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest imports")
+    args = parser.parse_args()
+
+    result = measure(args.runs, args.warmup)
+    print(f"{args.runs} runs, WARMUP={args.warmup} (medians)")
+    for name, value in result.items():
+        print(f"  {name:24s} {value:8.0f} ms")
+
+    if args.top:
+        with tempfile.TemporaryDirectory() as tmp:
+            print("Slowest imports (cumulative):")
+            for name, micros in slowest_imports(bench_env(tmp, args.warmup), args.top):
+                print(f"  {name:24s} {micros / 1000:8.1f} ms")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    limits = {"import_ms": args.max_import_ms, "first_200_ms": args.max_first_200_ms}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limits = {name: baseline[name] * (1 + args.tolerance) for name in result if name in baseline}
+
+    failures = [f"{name} {result[name]:.0f} ms > {limit:.0f} ms"
+                for name, limit in limits.items() if result[name] > limit]
+    with tempfile.TemporaryDirectory() as tmp:
+        failures += [f"import main loads {name}"
+                     for name in eager_imports(bench_env(tmp, args.warmup))]
+    if failures:
+        print("❌ Startup regression: " + "; ".join(failures))
+        sys.exit(1)
+    print("✅ Within limits")
+
+
+if __name__ == "__main__":
+    main()
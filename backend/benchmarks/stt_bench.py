@@ -0,0 +1,88 @@
+"""
+Speech-to-Text Pool Benchmark
+=============================
+Sends N recordings through a TranscriptionPool with C requests in flight
+and reports the pool metrics: real-time factor (compute seconds per audio
+second), queue wait and wall-clock throughput.
+
+Recordings are WAV files given on the command line (decoded by the audio
+front-end), or synthetic noise bursts when none are given, which only
+make sense for the simulated backend or for timing.
+
+Usage:
+    python -m benchmarks.stt_bench --backend simulated --requests 200 --concurrency 8
+    STT_MODEL_PATH=/models/vosk-small-en python -m benchmarks.stt_bench \
+        --backend vosk --workers 2 notes/*.wav
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from services.audio_frontend import TARGET_SAMPLE_RATE, process_audio_bytes
+from services.speech_to_text import STT_BACKEND, STT_WORKERS, TranscriptionPool
+
+
+def load_recordings(paths, count: int, seconds: float):
+    if paths:
+        recordings = []
+        for path in paths:
+            with open(path, "rb") as f:
+                data = f.read()
+            recordings.append((process_audio_bytes(data)["samples"], len(data)))
+        return recordings
+
+    rng = np.random.default_rng(0)
+    n = int(seconds * TARGET_SAMPLE_RATE)
+    return [((0.1 * rng.standard_normal(n)).astype(np.float32), 2 * n)
+            for _ in range(min(count, 16))]
+
+
+async def run(pool: TranscriptionPool, recordings, requests: int, concurrency: int):
+    await pool.start()
+    in_flight = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with in_flight:
+            samples, size = recordings[i % len(recordings)]
+            return await pool.transcribe(samples, size)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+    pool.stop()
+    return results, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("recordings", nargs="*", help="WAV/FLAC files")
+    parser.add_argument("--backend", default=STT_BACKEND)
+    parser.add_argument("--workers", type=int, default=STT_WORKERS)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=8.0,
+                        help="length of the synthetic recordings")
+    parser.add_argument("--queue-timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.recordings, args.requests, args.seconds)
+    pool = TranscriptionPool(args.backend, args.workers, args.queue_timeout)
+    results, wall = asyncio.run(run(pool, recordings, args.requests, args.concurrency))
+
+    stats = pool.snapshot()
+    waits = sorted(r["queue_wait_seconds"] for r in results)
+    print(f"backend {args.backend}, {args.workers} workers, "
+          f"{args.concurrency} in flight, {args.requests} requests")
+    print(f"  real-time factor   {stats['real_time_factor'] or 0:.4f} "
+          f"(max {stats['max_real_time_factor']:.4f})")
+    print(f"  queue wait p50/max {waits[len(waits) // 2] * 1000:.1f} / "
+          f"{waits[-1] * 1000:.1f} ms")
+    print(f"  throughput         {stats['audio_seconds'] / wall:.1f} audio s / wall s, "
+          f"{args.requests / wall:.1f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+One-Time Initialization
+=======================
+Schema upgrade, doctor seeding and cache warm-up must run once per
+deployment, not once per worker. Several workers starting together would
+otherwise all see an empty doctors table and all seed it.
+
+OneTimeInit runs the init function under an exclusive file lock
+(INIT_LOCK_PATH, next to the database by default). Workers that start
+together queue on the lock. Each one re-checks under the lock, so the
+first does the work and the others find it done. With serve.py the
+launcher runs it once before forking, and the workers inherit the done
+flag and skip it.
+
+Without fcntl (Windows) there is no lock. That is fine for the single
+development process.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+
+from database import BACKEND_DIR
+
+INIT_LOCK_PATH = os.getenv("INIT_LOCK_PATH", os.path.join(BACKEND_DIR, ".medidoctor_init.lock"))
+
+
+@asynccontextmanager
+async def file_lock(path: str):
+    """Exclusive lock on path, held across awaits; waits in a thread"""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+class OneTimeInit:
+    """Runs an async init function at most once per process, under the lock"""
+
+    def __init__(self, fn: Callable[[], Awaitable[None]], lock_path: str = INIT_LOCK_PATH):
+        self.fn = fn
+        self.lock_path = lock_path
+        self.done = False
+        self._stats: Dict = {"pid": None, "lock_wait_seconds": None, "seconds": None}
+
+    async def run(self) -> bool:
+        """Run the init unless this process (or its parent before forking)
+        already did; True if it ran here"""
+        if self.done:
+            return False
+        started = time.perf_counter()
+        async with file_lock(self.lock_path):
+            locked = time.perf_counter()
+            await self.fn()
+        self.done = True
+        self._stats = {
+            "pid": os.getpid(),
+            "lock_wait_seconds": round(locked - started, 3),
+            "seconds": round(time.perf_counter() - locked, 3),
+        }
+        return True
+
+    def stats(self) -> Dict:
+        return {"done": self.done, "lock_path": self.lock_path, **self._stats}
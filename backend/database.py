@@ -1,33 +1,350 @@
 """
 Database Configuration
 SQLite + SQLAlchemy for local storage
+
+Performance profiles
+--------------------
+DB_PROFILE selects how SQLite connections are tuned:
+
+- performance (default): WAL journal plus per-connection pragmas, one
+  writer connection per engine and a pool of read-only connections, so
+  dashboard reads never wait behind /api/scan writes.
+- legacy: the original setup - rollback journal, one shared engine.
+
+Individual pragmas can be overridden with DB_PRAGMA_<NAME>, e.g.
+DB_PRAGMA_SYNCHRONOUS=FULL.
+
+Schema
+------
+The schema is managed by Alembic (migrations/). init_db() upgrades to head
+and adopts databases created before migrations existed. When the database
+is already at head (the usual restart) a single alembic_version query
+settles it, and alembic is never imported.
+
+Sync and async access
+---------------------
+API handlers use the async engines (aiosqlite) through get_async_db /
+get_async_read_db so database waits yield the event loop. The sync
+SessionLocal path stays for CLI jobs and scripts.
+
+Writers
+-------
+The writer pool holds one connection, so writes inside one engine queue
+in the pool rather than on the file lock. That is not a single writer per
+file: the sync and async engines each have one, every serve.py worker has
+its own, and CLI jobs open theirs. Request handlers only write through
+the async engine, so a server process normally has one active writer; the
+rest are serialized by SQLite's lock, which busy_timeout waits on instead
+of failing with "database is locked". Keep busy_timeout set (or raise it)
+when overriding pragmas.
+
+Every session dependency closes its session however the request ends, and
+labels its connection checkouts with the route for pool_monitor. Each SQL
+statement is a span in traced requests (tracing.py).
 """
 
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from pool_monitor import db_endpoint, pool_monitor
+from tracing import instrument_engine
 
 # SQLite database URL
-SQLITE_DATABASE_URL = "sqlite:///./medidoctor.db"
+SQLITE_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./medidoctor.db")
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Revision matching the pre-migration create_all schema
+BASELINE_REVISION = "0001"
+
+# Async drivers for each sync backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+# Connection tuning
+DB_PROFILE = os.getenv("DB_PROFILE", "performance")
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "30"))
+
+DB_PROFILES = {
+    "legacy": {},
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",      # WAL makes NORMAL crash-safe
+        "mmap_size": 268435456,       # 256 MiB
+        "cache_size": -65536,         # 64 MiB (negative = KiB)
+        "busy_timeout": 5000,         # ms
+        "temp_store": "MEMORY",
+    },
+}
+
+# Pragmas that change the database file rather than the connection
+_WRITE_ONLY_PRAGMAS = {"journal_mode"}
+
+
+def get_pragmas(profile: str = DB_PROFILE) -> dict:
+    """Resolve the pragma set for a profile, applying env overrides"""
+    if profile not in DB_PROFILES:
+        raise ValueError(
+            f"Unknown DB_PROFILE '{profile}'. Choose from: {', '.join(DB_PROFILES)}")
+
+    pragmas = dict(DB_PROFILES[profile])
+    for name in ("journal_mode", "synchronous", "mmap_size",
+                 "cache_size", "busy_timeout", "temp_store"):
+        override = os.getenv(f"DB_PRAGMA_{name.upper()}")
+        if override:
+            pragmas[name] = override
+    return pragmas
+
+
+def _install_pragmas(engine, pragmas: dict, read_only: bool = False):
+    """Run the pragma set on every new DBAPI connection of an engine"""
+    if read_only:
+        pragmas = {k: v for k, v in pragmas.items()
+                   if k not in _WRITE_ONLY_PRAGMAS}
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver"""
+    sa_url = make_url(url)
+    backend = sa_url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}'")
+    return sa_url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(
+        hide_password=False)
+
+
+def _engine_pair(url: str, profile: str, asynchronous: bool):
+    """Build (writer, reader) engines with either the sync or async API"""
+    pragmas = get_pragmas(profile)
+    sa_url = make_url(url)
+    is_sqlite = sa_url.get_backend_name() == "sqlite"
+    connect_args = {"check_same_thread": False} if is_sqlite else {}
+
+    if asynchronous:
+        create = create_async_engine
+        pool_args = {"poolclass": AsyncAdaptedQueuePool}
+    else:
+        create = create_engine
+        pool_args = {}
+
+    def pragma_target(e):
+        return e.sync_engine if asynchronous else e
+
+    if not is_sqlite or profile == "legacy" or sa_url.database in (None, "", ":memory:"):
+        engine = create(url, connect_args=connect_args, echo=False)
+        if is_sqlite:
+            _install_pragmas(pragma_target(engine), pragmas)
+        return engine, engine
+
+    # One writer connection per engine: SQLite allows a single writer
+    # anyway, so queue this engine's writers in the pool instead of letting
+    # them collide on the file lock. Writers of other engines and processes
+    # wait on that lock through busy_timeout (see "Writers" above).
+    write_engine = create(
+        url,
+        connect_args=connect_args,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=DB_WRITE_TIMEOUT,
+        echo=False,  # Set to True for SQL query logging
+        **pool_args
+    )
+    _install_pragmas(pragma_target(write_engine), pragmas)
+
+    read_url = sa_url.set(
+        database=f"file:{sa_url.database}",
+        query={**sa_url.query, "mode": "ro", "uri": "true"}
+    )
+    read_engine = create(
+        read_url,
+        connect_args=connect_args,
+        pool_size=DB_READ_POOL_SIZE,
+        max_overflow=DB_READ_POOL_SIZE,
+        echo=False,
+        **pool_args
+    )
+    _install_pragmas(pragma_target(read_engine), pragmas, read_only=True)
+
+    return write_engine, read_engine
+
+
+def build_engines(url: str = SQLITE_DATABASE_URL, profile: str = DB_PROFILE):
+    """
+    Create the (writer, reader) engine pair for a database URL.
+
+    Non-SQLite databases, in-memory SQLite and the legacy profile get a
+    single shared engine for both roles.
+    """
+    return _engine_pair(url, profile, asynchronous=False)
 
-# Create engine
-engine = create_engine(
-    SQLITE_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=False  # Set to True for SQL query logging
-)
 
-# Session factory
+def build_async_engines(url: str = SQLITE_DATABASE_URL, profile: str = DB_PROFILE):
+    """Async counterpart of build_engines, for use inside request handlers"""
+    return _engine_pair(to_async_url(url), profile, asynchronous=True)
+
+
+# Create engines
+engine, read_engine = build_engines()
+async_engine, async_read_engine = build_async_engines()
+
+pool_monitor.attach("writer", engine)
+pool_monitor.attach("reader", read_engine)
+pool_monitor.attach("async_writer", async_engine)
+pool_monitor.attach("async_reader", async_read_engine)
+for _engine in (engine, read_engine, async_engine, async_read_engine):
+    instrument_engine(_engine)
+
+# Session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=read_engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
 
 
-def get_db():
+def head_revision(versions_dir: str = os.path.join(BACKEND_DIR, "migrations", "versions")):
+    """
+    Latest migration id, read from the revision files without importing
+    alembic: the one revision no other file names as its down_revision.
+    None when there is no single head (alembic sorts that out).
+    """
+    revisions, parents = set(), set()
+    for name in os.listdir(versions_dir):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(versions_dir, name), encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                key = key.split(":")[0].strip()   # also `revision: str = ...`
+                if key in ("revision", "down_revision"):
+                    value = value.strip().strip("\"'")
+                    (revisions if key == "revision" else parents).add(value)
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+
+def schema_is_current(url: str = SQLITE_DATABASE_URL) -> bool:
+    """Cheap startup probe: does alembic_version already name the head?"""
+    probe = create_engine(url)
+    try:
+        with probe.connect() as conn:
+            if "alembic_version" not in inspect(conn).get_table_names():
+                return False
+            current = conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalars().all()
+    finally:
+        probe.dispose()
+    return current == [head_revision()]
+
+
+def init_db(url: str = SQLITE_DATABASE_URL):
+    """
+    Upgrade the schema to the latest migration.
+
+    A database already at the head revision returns after one query,
+    without importing alembic. Databases created by the old create_all
+    call (tables present but no alembic_version) are stamped at the
+    baseline revision first, so only the newer migrations run against them.
+    """
+    if schema_is_current(url):
+        return
+
+    from alembic import command
+    from alembic.config import Config
+
+    cfg = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    cfg.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    cfg.attributes["configure_logger"] = False
+
+    probe = create_engine(url)
+    try:
+        tables = set(inspect(probe).get_table_names())
+    finally:
+        probe.dispose()
+
+    if "scan_results" in tables and "alembic_version" not in tables:
+        command.stamp(cfg, BASELINE_REVISION)
+    command.upgrade(cfg, "head")
+
+
+async def dispose_engines():
+    """
+    Close every pooled connection. The launcher calls this after the
+    one-time init and before forking, so no worker inherits a connection
+    (or an aiosqlite thread) it cannot use.
+    """
+    engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+
+def _label_connections(request: Request):
+    """Attribute this request's pool checkouts to its route"""
+    route = request.scope.get("route")
+    path = route.path if route is not None else request.url.path
+    db_endpoint.set(f"{request.method} {path}")
+
+
+def get_db(request: Request):
     """Dependency for database sessions"""
+    _label_connections(request)
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db(request: Request):
+    """Dependency for read-only database sessions"""
+    _label_connections(request)
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db(request: Request):
+    """Dependency for async database sessions"""
+    _label_connections(request)
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db(request: Request):
+    """Dependency for async read-only database sessions"""
+    _label_connections(request)
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -4,15 +4,32 @@ MediDoctor AI Digital Doctor Platform - FastAPI Backend
 This is a PROTOTYPE ONLY - Not for real medical diagnosis
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import (
+    FastAPI, UploadFile, File, HTTPException, Depends, Header, Query, Request,
+    WebSocket, WebSocketDisconnect
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
 import uvicorn
 from datetime import datetime
+import asyncio
+import json
 import os
-
-from database import engine, Base
-from models import Doctor, ScanResult, Appointment
+import random
+import traceback
+from contextlib import aclosing
+from typing import Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import init_db, get_async_db, get_async_read_db, AsyncSessionLocal
+from pool_monitor import pool_monitor, db_endpoint
+from bootstrap import OneTimeInit
+from admission import AdmissionController, AdmissionMiddleware
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, registry, stage
+from tracing import TracingMiddleware, trace_buffer
+from models import Doctor, Appointment
 from schemas import (
     ScanResponse,
     DoctorResponse,
@@ -29,12 +46,44 @@ from services.ai_service import AIService
 from services.risk_service import RiskClassifier
 from services.guidance_service import GuidanceEngine
 from services.doctor_service import DoctorService
-from services.health_assessment_service import HealthAssessmentService
 from services.voice_service import VoiceService
-from services.chat_service import ChatService
+from services.audio_frontend import AudioDecodePool, UnsupportedAudio
+from services.speech_to_text import TranscriptionBusy, TranscriptionPool
+from services.transcript_cache import TranscriptCache
+from services.voice_stream import (
+    PooledStreamingTranscriber,
+    SimulatedStreamingTranscriber,
+    StreamingTranscriber,
+    StreamLimitExceeded,
+    StreamSlots,
+    VoiceStreamSession,
+    CLOSE_INTERNAL_ERROR,
+    CLOSE_TOO_BIG,
+    CLOSE_TRY_AGAIN_LATER,
+    CLOSE_UNSUPPORTED_DATA,
+    VOICE_WS_IDLE_SECONDS,
+    VOICE_WS_MAX_CHUNK_BYTES,
+    VOICE_WS_MAX_SECONDS,
+    VOICE_WS_QUEUE_CHUNKS
+)
+from services.chat_store import CHAT_HISTORY_DEPTH, create_session_store
+from services.shared_state import create_state
+from services.idempotency import IdempotencyConflict, IdempotencyStore
+from services.lazy import LazyService
+from services.admin_stats_service import AdminStatsService
+from services.write_behind import (
+    ScanRecorder,
+    ScanWriteBuffer,
+    WriteBufferFull,
+    WRITE_BEHIND_ENABLED
+)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+BATCH_ASSESSMENT_MAX_ROWS = int(os.getenv("BATCH_ASSESSMENT_MAX_ROWS", "10000"))
+BATCH_ASSESSMENT_MAX_BYTES = int(os.getenv("BATCH_ASSESSMENT_MAX_BYTES", str(16 * 1024 * 1024)))
+# When the lazy services (model-backed, see services/lazy.py) are built:
+# background (after startup, in a thread), eager (before serving) or lazy
+# (on first use)
+WARMUP = os.getenv("WARMUP", "background")
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -45,6 +94,15 @@ app = FastAPI(
     redoc_url="/api/redoc"
 )
 
+# State every worker must agree on (chat sessions, idempotency keys, the
+# transcript cache's second tier, rate-limit buckets) lives in shared_state;
+# see STATE_BACKEND
+shared_state = create_state()
+admission = AdmissionController(shared_state)
+
+# Innermost, so rejections still carry CORS headers and show up in metrics
+# and traces; see admission.py
+app.add_middleware(AdmissionMiddleware, controller=admission)
 # CORS middleware for Next.js frontend
 app.add_middleware(
     CORSMiddleware,
@@ -53,15 +111,75 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware, routes=lambda: app.routes)
+app.add_middleware(TracingMiddleware)
 
 # Initialize services
+idempotency = IdempotencyStore(shared_state)
 ai_service = AIService()
 risk_classifier = RiskClassifier()
 guidance_engine = GuidanceEngine()
 doctor_service = DoctorService()
-health_assessment_service = HealthAssessmentService()
+
+
+def _health_assessment_service():
+    from services.health_assessment_service import HealthAssessmentService
+    return HealthAssessmentService()
+
+
+def _batch_assessment_service():
+    from services.batch_assessment_service import BatchAssessmentService
+    return BatchAssessmentService(health_assessment_service.get())
+
+
+def _chat_service():
+    from services.chat_service import ChatService
+    return ChatService(sessions=create_session_store(shared_state))
+
+
+health_assessment_service = LazyService("health_assessment", _health_assessment_service)
+batch_assessment_service = LazyService("batch_assessment", _batch_assessment_service)
 voice_service = VoiceService()
-chat_service = ChatService()
+audio_decode_pool = AudioDecodePool()
+transcription_pool = TranscriptionPool()
+transcript_cache = TranscriptCache(shared=shared_state if shared_state.shared else None)
+voice_stream_slots = StreamSlots()
+chat_service = LazyService("chat", _chat_service)
+admin_stats_service = AdminStatsService()
+scan_recorder = ScanRecorder(ScanWriteBuffer() if WRITE_BEHIND_ENABLED else None)
+
+
+async def initialize():
+    """Per-deployment setup: schema, mock doctors, cache trimming"""
+    await asyncio.to_thread(init_db)
+    await doctor_service.initialize_mock_doctors()
+    await asyncio.to_thread(transcript_cache.prune)
+
+
+# Runs once across all workers (see bootstrap.py and serve.py)
+one_time_init = OneTimeInit(initialize)
+
+
+def warm_up():
+    """Build the lazy services (loads the pattern and intent models)"""
+    for service in (health_assessment_service, batch_assessment_service, chat_service):
+        service.get()
+
+
+def report_warm_up(future: asyncio.Future):
+    """Log a failed background warm-up now rather than at the first request"""
+    if future.cancelled() or future.exception() is None:
+        return
+    error = future.exception()
+    print(f"❌ Background warm-up failed ({error!r}); "
+          "the service will be built again on first use")
+    traceback.print_exception(error)
+
+
+def write_buffer_full(error: WriteBufferFull) -> HTTPException:
+    """503 telling the client to back off while the write buffer drains"""
+    return HTTPException(status_code=503, detail=str(error),
+                         headers={"Retry-After": "1"})
 
 
 @app.get("/")
@@ -76,7 +194,10 @@ async def root():
 
 
 @app.post("/api/scan", response_model=ScanResponse)
-async def scan_injury(image: UploadFile = File(...)):
+async def scan_injury(
+    image: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     AI Injury Scan Endpoint
     ------------------------
@@ -90,7 +211,8 @@ async def scan_injury(image: UploadFile = File(...)):
     """
     try:
         # Read image content
-        image_content = await image.read()
+        with stage("scan", "read_upload"):
+            image_content = await image.read()
 
         # Save image (optional, for demo purposes)
         upload_dir = "uploads"
@@ -98,40 +220,38 @@ async def scan_injury(image: UploadFile = File(...)):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{upload_dir}/scan_{timestamp}.jpg"
 
-        with open(filename, "wb") as f:
+        with stage("scan", "save_upload"), open(filename, "wb") as f:
             f.write(image_content)
 
         # Mock AI Analysis
-        ai_result = ai_service.analyze_injury(image_content, image.filename)
+        with stage("scan", "analyze_injury"):
+            ai_result = ai_service.analyze_injury(image_content, image.filename)
 
         # Risk Classification
-        risk_data = risk_classifier.classify_risk(
-            ai_result["injury_type"],
-            ai_result["confidence"],
-            ai_result.get("visual_notes", "")
-        )
+        with stage("scan", "classify_risk"):
+            risk_data = risk_classifier.classify_risk(
+                ai_result["injury_type"],
+                ai_result["confidence"],
+                ai_result.get("visual_notes", "")
+            )
 
         # Generate Guidance
-        guidance = guidance_engine.generate_guidance(
-            ai_result["injury_type"],
-            risk_data["risk_level"]
-        )
+        with stage("scan", "generate_guidance"):
+            guidance = guidance_engine.generate_guidance(
+                ai_result["injury_type"],
+                risk_data["risk_level"]
+            )
 
         # Store scan result in database
-        from database import SessionLocal
-        db = SessionLocal()
-
-        scan_record = ScanResult(
-            injury_type=ai_result["injury_type"],
-            confidence_score=ai_result["confidence"],
-            risk_level=risk_data["risk_level"],
-            image_path=filename,
-            visual_notes=ai_result["visual_notes"]
-        )
-        db.add(scan_record)
-        db.commit()
-        db.refresh(scan_record)
-        db.close()
+        with stage("scan", "db_record"):
+            scan_record = await scan_recorder.record(
+                db,
+                injury_type=ai_result["injury_type"],
+                confidence_score=ai_result["confidence"],
+                risk_level=risk_data["risk_level"],
+                image_path=filename,
+                visual_notes=ai_result["visual_notes"]
+            )
 
         # Construct response
         response = {
@@ -151,6 +271,8 @@ async def scan_injury(image: UploadFile = File(...)):
 
         return response
 
+    except WriteBufferFull as e:
+        raise write_buffer_full(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Scan failed: {str(e)}")
 
@@ -159,7 +281,8 @@ async def scan_injury(image: UploadFile = File(...)):
 async def get_doctors(
     injury_type: str = None,
     risk_level: str = None,
-    limit: int = 10
+    limit: int = 10,
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get Doctor Recommendations
@@ -168,29 +291,57 @@ async def get_doctors(
     Uses mock data for demonstration.
     """
     try:
-        doctors = doctor_service.get_recommended_doctors(
-            injury_type=injury_type,
-            risk_level=risk_level,
-            limit=limit
-        )
+        with stage("doctors", "get_recommended_doctors"):
+            doctors = await doctor_service.get_recommended_doctors(
+                db,
+                injury_type=injury_type,
+                risk_level=risk_level,
+                limit=limit
+            )
         return doctors
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/book", response_model=BookingResponse)
-async def book_appointment(booking: BookingRequest):
+async def book_appointment(
+    booking: BookingRequest,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None, max_length=128)
+):
     """
     Book Appointment
     ----------------
     Creates a demo appointment booking and returns confirmation.
+    With an Idempotency-Key header, retries of the same booking return the
+    first confirmation (header Idempotent-Replayed: true) instead of
+    booking twice.
     """
+    payload = booking.dict()
+    if idempotency_key:
+        try:
+            with stage("booking", "idempotency_begin"):
+                replay = await idempotency.begin("book", idempotency_key, payload)
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        if replay is not None:
+            return JSONResponse(replay, headers={"Idempotent-Replayed": "true"})
+
     try:
-        from database import SessionLocal
-        import random
+        with stage("booking", "create_booking"):
+            response = await create_booking(booking, db)
+    except BaseException:
+        if idempotency_key:
+            await idempotency.abandon("book", idempotency_key)
+        raise
+    if idempotency_key:
+        await idempotency.complete("book", idempotency_key, payload, response)
+    return response
 
-        db = SessionLocal()
 
+async def create_booking(booking: BookingRequest, db: AsyncSession) -> Dict:
+    """Store the appointment and build the confirmation"""
+    try:
         # Generate token number
         token_number = f"MD{random.randint(1000, 9999)}"
 
@@ -206,15 +357,15 @@ async def book_appointment(booking: BookingRequest):
         )
 
         db.add(appointment)
-        db.commit()
-        db.refresh(appointment)
+        with stage("booking", "db_commit"):
+            await db.commit()
+            await db.refresh(appointment)
 
         # Get doctor details
-        doctor = db.query(Doctor).filter(
-            Doctor.id == booking.doctor_id).first()
+        with stage("booking", "db_get_doctor"):
+            doctor = await db.get(Doctor, booking.doctor_id)
 
         if not doctor:
-            db.close()
             raise HTTPException(
                 status_code=404,
                 detail=f"Doctor with ID {booking.doctor_id} not found. Please refresh and try again."
@@ -223,8 +374,6 @@ async def book_appointment(booking: BookingRequest):
         doctor_name = doctor.name
         doctor_specialization = doctor.specialization
 
-        db.close()
-
         response = {
             "booking_id": appointment.id,
             "token_number": token_number,
@@ -246,97 +395,130 @@ async def book_appointment(booking: BookingRequest):
 
 
 @app.get("/api/admin/stats", response_model=AdminStatsResponse)
-async def get_admin_stats():
+async def get_admin_stats(db: AsyncSession = Depends(get_async_read_db)):
     """
     Admin Dashboard Statistics
     ---------------------------
     Returns analytics data for admin view.
     """
     try:
-        from database import SessionLocal
-        from sqlalchemy import func
-
-        db = SessionLocal()
-
-        # Total scans
-        total_scans = db.query(func.count(ScanResult.id)).scalar()
-
-        # Risk distribution
-        risk_counts = db.query(
-            ScanResult.risk_level,
-            func.count(ScanResult.id)
-        ).group_by(ScanResult.risk_level).all()
-
-        risk_distribution = {level: count for level, count in risk_counts}
-
-        # Total appointments
-        total_appointments = db.query(func.count(Appointment.id)).scalar()
-
-        # Recent scans
-        recent_scans = db.query(ScanResult).order_by(
-            ScanResult.created_at.desc()
-        ).limit(10).all()
-
-        recent_scans_data = [
-            {
-                "id": scan.id,
-                "injury_type": scan.injury_type,
-                "risk_level": scan.risk_level,
-                "confidence": scan.confidence_score,
-                "timestamp": scan.created_at.isoformat()
-            }
-            for scan in recent_scans
-        ]
-
-        # Recent appointments
-        recent_appointments = db.query(Appointment).order_by(
-            Appointment.created_at.desc()
-        ).limit(10).all()
-
-        recent_appointments_data = []
-        for apt in recent_appointments:
-            # Get doctor details
-            doctor = db.query(Doctor).filter(
-                Doctor.id == apt.doctor_id).first()
-            apt_data = {
-                "id": apt.id,
-                "patient_name": apt.patient_name,
-                "patient_phone": apt.patient_phone,
-                "appointment_slot": apt.appointment_slot,
-                "injury_type": apt.injury_type,
-                "token_number": apt.token_number,
-                "status": apt.status,
-                "created_at": apt.created_at.isoformat(),
-                "doctor_name": doctor.name if doctor else "Not Available",
-                "hospital": doctor.hospital if doctor else "Not Available"
-            }
-            recent_appointments_data.append(apt_data)
-
-        # Injury type distribution
-        injury_counts = db.query(
-            ScanResult.injury_type,
-            func.count(ScanResult.id)
-        ).group_by(ScanResult.injury_type).all()
-
-        injury_distribution = {itype: count for itype, count in injury_counts}
-
-        db.close()
-
-        return {
-            "total_scans": total_scans or 0,
-            "total_appointments": total_appointments or 0,
-            "risk_distribution": risk_distribution,
-            "injury_distribution": injury_distribution,
-            "recent_scans": recent_scans_data,
-            "recent_appointments": recent_appointments_data
-        }
+        return await admin_stats_service.get_stats(db)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/admin/db-pool")
+async def get_db_pool_stats():
+    """
+    Database Pool Health
+    --------------------
+    Pool gauges per engine, per-endpoint connection hold times and any
+    connections held longer than DB_SESSION_WARN_SECONDS.
+    """
+    return pool_monitor.snapshot()
+
+
+@app.get("/api/admin/stt")
+async def get_stt_stats():
+    """
+    Speech-to-Text Pool
+    -------------------
+    Real-time factor (compute seconds per audio second), queue wait,
+    timeouts and failures per transcription backend.
+    """
+    return {transcription_pool.backend: transcription_pool.snapshot()}
+
+
+def db_pool_metrics():
+    """Pool gauges from pool_monitor, read at scrape time"""
+    gauges = pool_monitor.gauges()
+    for key, help in (("checked_out", "Connections checked out"),
+                      ("size", "Pool size"), ("overflow", "Connections above the pool size")):
+        yield f"# HELP db_pool_{key} {help}"
+        yield f"# TYPE db_pool_{key} gauge"
+        for engine, gauge in gauges.items():
+            if gauge[key] is not None:
+                yield f'db_pool_{key}{{engine="{engine}"}} {gauge[key]}'
+
+
+registry.add_collector(db_pool_metrics)
+registry.add_collector(admission.metrics)
+
+
+@app.get("/api/admin/admission")
+async def get_admission_stats():
+    """
+    Admission Control
+    -----------------
+    Per-client rate settings and, per endpoint class, this worker's
+    running and queued requests and how many were admitted, queued, or
+    turned away (queue full or deadline missed).
+    """
+    return admission.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text exposition of this worker's metrics (see metrics.py)"""
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/api/admin/traces")
+async def get_traces(
+    min_ms: float = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Recent Traces
+    -------------
+    Kept traces of this worker, newest first: slow sampled requests and
+    requests sent with X-Debug-Trace (see tracing.py).
+    """
+    return {"stats": trace_buffer.stats(), "traces": trace_buffer.list(min_ms, limit)}
+
+
+@app.get("/api/admin/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """One trace with its span tree"""
+    trace = trace_buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (evicted or on another worker)")
+    return trace.to_dict()
+
+
+@app.get("/api/admin/traces/{trace_id}/profile")
+async def get_trace_profile(trace_id: str):
+    """The request's sampled stacks in folded format, for flamegraph tools"""
+    trace = trace_buffer.get(trace_id)
+    if trace is None or trace.profile is None:
+        raise HTTPException(status_code=404, detail="No profile for this trace")
+    return PlainTextResponse(trace.profile, headers={
+        "Content-Disposition": f'attachment; filename="trace-{trace_id}.folded"'})
+
+
+@app.get("/api/admin/caches")
+async def get_cache_stats():
+    """Hit/miss statistics for the result caches and shared state, and the
+    write-behind queue (per worker)"""
+    return {
+        "worker_pid": os.getpid(),
+        "services": {s.name: s.build_info() for s in (
+            health_assessment_service, batch_assessment_service, chat_service)},
+        "assessment": health_assessment_service.cache_info(),
+        "transcripts": transcript_cache.cache_info(),
+        "chat_sessions": chat_service.sessions.stats(),
+        "idempotency": idempotency.stats(),
+        "shared_state": shared_state.stats(),
+        "scan_writes": scan_recorder.stats()
+    }
+
+
 @app.post("/api/health-assessment", response_model=HealthAssessmentResponse)
-async def analyze_health_assessment(assessment: HealthAssessmentRequest):
+async def analyze_health_assessment(
+    assessment: HealthAssessmentRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Health Assessment Analysis
     ---------------------------
@@ -348,38 +530,177 @@ async def analyze_health_assessment(assessment: HealthAssessmentRequest):
         assessment_data = assessment.dict()
 
         # Analyze using AI/ML and rule-based system
-        analysis = health_assessment_service.analyze_questionnaire(
-            assessment_data)
+        with stage("assessment", "analyze_questionnaire"):
+            analysis = health_assessment_service.analyze_questionnaire(
+                assessment_data)
 
         # Store assessment in database
-        from database import SessionLocal
-        db = SessionLocal()
-
-        scan_record = ScanResult(
-            injury_type=analysis['affected_area'],
-            confidence_score=analysis['confidence_score'],
-            risk_level=analysis['risk_level'],
-            image_path=None,
-            visual_notes=f"Health Assessment - {assessment_data.get('additional_notes', '')}"
-        )
-        db.add(scan_record)
-        db.commit()
-        db.refresh(scan_record)
+        with stage("assessment", "db_record"):
+            scan_record = await scan_recorder.record(
+                db,
+                injury_type=analysis['affected_area'],
+                confidence_score=analysis['confidence_score'],
+                risk_level=analysis['risk_level'],
+                image_path=None,
+                visual_notes=f"Health Assessment - {assessment_data.get('additional_notes', '')}"
+            )
 
         # Update analysis with database ID
         analysis['analysis_id'] = scan_record.id
 
-        db.close()
-
         return analysis
 
+    except WriteBufferFull as e:
+        raise write_buffer_full(e)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Assessment failed: {str(e)}")
 
 
+async def read_body_capped(request: Request, max_bytes: int) -> bytes:
+    """
+    The request body, or 413 as soon as it is known to exceed max_bytes:
+    up front from Content-Length, else while streaming, so an oversized
+    upload is never held in memory whole.
+    """
+    too_large = HTTPException(
+        status_code=413, detail=f"Body too large (max {max_bytes} bytes)")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        raise too_large
+
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def parse_batch_body(body: bytes, content_type: str):
+    """
+    Split a batch request into (index, questionnaire dict) pairs and
+    (index, error) pairs. Accepts a JSON array or NDJSON (one object per line).
+    """
+    if "ndjson" in content_type:
+        try:
+            text = body.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Body is not UTF-8: {e}")
+        lines = [line for line in text.splitlines() if line.strip()]
+        items = []
+        for line in lines:
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                items.append(e)
+    else:
+        try:
+            items = json.loads(body or b"[]")
+        except UnicodeDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Body is not UTF-8: {e}")
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(
+                status_code=400,
+                detail="Expected a JSON array or application/x-ndjson body")
+
+    if len(items) > BATCH_ASSESSMENT_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(items)} rows (max {BATCH_ASSESSMENT_MAX_ROWS})")
+
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        if isinstance(item, Exception):
+            errors.append((index, f"Invalid JSON: {item}"))
+            continue
+        if not isinstance(item, dict):
+            errors.append((index, "Expected a questionnaire object"))
+            continue
+        try:
+            valid.append((index, HealthAssessmentRequest(**item).dict()))
+        except ValidationError as e:
+            errors.append((index, e.errors(include_url=False)))
+    return valid, errors
+
+
+@app.post("/api/health-assessment/batch")
+async def analyze_health_assessment_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Batch Health Assessment
+    -----------------------
+    Scores many questionnaires at once (screening campaigns).
+    Body: JSON array of HealthAssessmentRequest objects, or NDJSON with
+    Content-Type: application/x-ndjson.
+    Response: NDJSON, one line per input row in input order - either
+    {"index": i, "result": {...}} or {"index": i, "error": ...}.
+    All valid rows are stored with a single bulk insert.
+    """
+    with stage("assessment_batch", "parse_body"):
+        body = await read_body_capped(request, BATCH_ASSESSMENT_MAX_BYTES)
+        valid, errors = parse_batch_body(body, request.headers.get("content-type", ""))
+
+    try:
+        with stage("assessment_batch", "analyze_batch"):
+            analyses = batch_assessment_service.analyze_batch([row for _, row in valid])
+
+        with stage("assessment_batch", "db_record_many"):
+            ids = await scan_recorder.record_many(db, [
+                {
+                    "injury_type": analysis['affected_area'],
+                    "confidence_score": analysis['confidence_score'],
+                    "risk_level": analysis['risk_level'],
+                    "image_path": None,
+                    "visual_notes": f"Health Assessment - {row.get('additional_notes', '')}"
+                }
+                for (_, row), analysis in zip(valid, analyses)
+            ])
+        for analysis, scan_id in zip(analyses, ids):
+            analysis['analysis_id'] = scan_id
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Batch assessment failed: {str(e)}")
+
+    lines = sorted(
+        [(index, {"index": index, "result": analysis})
+         for (index, _), analysis in zip(valid, analyses)] +
+        [(index, {"index": index, "error": error}) for index, error in errors],
+        key=lambda item: item[0])
+
+    def stream(chunk: int = 500):
+        for start in range(0, len(lines), chunk):
+            yield "".join(json.dumps(line) + "\n"
+                          for _, line in lines[start:start + chunk])
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def save_voice_recording(audio_content: bytes, extension: str) -> str:
+    """Store a voice recording under uploads/voice and return its path"""
+    upload_dir = "uploads/voice"
+    os.makedirs(upload_dir, exist_ok=True)
+    # Microseconds: cached transcripts point at these files, so two
+    # recordings saved in the same second must not share a name
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    audio_filename = f"{upload_dir}/voice_{timestamp}.{extension}"
+
+    with open(audio_filename, "wb") as f:
+        f.write(audio_content)
+    return audio_filename
+
+
 @app.post("/api/voice-analysis", response_model=VoiceAnalysisResponse)
-async def analyze_voice(audio: UploadFile = File(...)):
+async def analyze_voice(
+    audio: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Voice-to-Text Analysis
     -----------------------
@@ -397,59 +718,76 @@ async def analyze_voice(audio: UploadFile = File(...)):
             )
 
         # Read audio content
-        audio_content = await audio.read()
-
-        # Save audio file (optional, for demo)
-        upload_dir = "uploads/voice"
-        os.makedirs(upload_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        audio_filename = f"{upload_dir}/voice_{timestamp}.{audio.filename.split('.')[-1]}"
-
-        with open(audio_filename, "wb") as f:
-            f.write(audio_content)
-
-        # Process voice to text
-        voice_result = voice_service.process_audio(
-            audio_content, audio.filename)
+        with stage("voice", "read_upload"):
+            audio_content = await audio.read()
+
+        # Decode / resample / trim in the worker pool
+        with stage("voice", "decode_audio"):
+            decoded_audio = await audio_decode_pool.process(audio_content)
+
+        # Re-submitted recordings reuse the stored file, transcript and
+        # extracted info; only new audio is saved and transcribed
+        cache_key = TranscriptCache.key(
+            transcription_pool.backend, decoded_audio["fingerprint"])
+        with stage("voice", "transcript_cache_get"):
+            cached = await transcript_cache.get(cache_key)
+        if cached is not None and os.path.exists(cached["audio_path"]):
+            audio_filename = cached["audio_path"]
+        else:
+            with stage("voice", "save_upload"):
+                audio_filename = save_voice_recording(
+                    audio_content, audio.filename.split('.')[-1])
+
+        if cached is not None:
+            transcription = cached["transcription"]
+        else:
+            with stage("voice", "transcribe"):
+                transcription = await transcription_pool.transcribe(
+                    decoded_audio["samples"], len(audio_content))
+        with stage("voice", "process_audio"):
+            voice_result = voice_service.process_audio(
+                audio_content, audio.filename, decoded_audio, transcription)
 
         # Extract health information from transcribed text
-        extracted_info = voice_service.extract_health_info_from_text(
-            voice_result["transcribed_text"]
-        )
+        if cached is not None:
+            extracted_info = cached["extracted_info"]
+        else:
+            with stage("voice", "extract_health_info"):
+                extracted_info = voice_service.extract_health_info_from_text(
+                    voice_result["transcribed_text"]
+                )
+            with stage("voice", "transcript_cache_put"):
+                await transcript_cache.put(cache_key, {
+                    "transcription": {k: transcription[k]
+                                      for k in ("text", "confidence", "language")},
+                    "extracted_info": extracted_info,
+                    "audio_path": audio_filename,
+                })
 
         # Analyze extracted information using health assessment service
-        assessment_data = {
-            "pain_level": extracted_info["pain_level"],
-            "swelling": extracted_info["swelling_severity"],
-            "duration": extracted_info["duration"],
-            "affected_area": extracted_info["affected_area"],
-            "movement_difficulty": "moderate" if "limited_mobility" in extracted_info["additional_symptoms"] else "mild",
-            "redness": "yes" if "redness" in extracted_info["additional_symptoms"] else "no",
-            "warmth": "yes" if "warmth" in extracted_info["additional_symptoms"] else "no"
-        }
+        assessment_data = voice_service.build_assessment_data(extracted_info)
 
-        analysis = health_assessment_service.analyze_questionnaire(
-            assessment_data)
+        with stage("voice", "analyze_questionnaire"):
+            analysis = health_assessment_service.analyze_questionnaire(
+                assessment_data)
 
         # Store in database
-        from database import SessionLocal
-        db = SessionLocal()
-
-        scan_record = ScanResult(
-            injury_type=analysis['affected_area'],
-            confidence_score=voice_result["confidence"],
-            risk_level=analysis['risk_level'],
-            image_path=audio_filename,
-            visual_notes=f"Voice Analysis: {voice_result['transcribed_text']}"
-        )
-        db.add(scan_record)
-        db.commit()
-        db.close()
+        with stage("voice", "db_record"):
+            await scan_recorder.record(
+                db,
+                injury_type=analysis['affected_area'],
+                confidence_score=voice_result["confidence"],
+                risk_level=analysis['risk_level'],
+                image_path=audio_filename,
+                visual_notes=f"Voice Analysis: {voice_result['transcribed_text']}"
+            )
 
         return {
             "transcribed_text": voice_result["transcribed_text"],
             "confidence": voice_result["confidence"],
             "detected_language": voice_result["detected_language"],
+            "duration_seconds": voice_result["duration_seconds"],
+            "speech_seconds": voice_result["speech_seconds"],
             "extracted_info": extracted_info,
             "analysis": analysis,
             "timestamp": datetime.now().isoformat()
@@ -457,11 +795,177 @@ async def analyze_voice(audio: UploadFile = File(...)):
 
     except HTTPException:
         raise
+    except WriteBufferFull as e:
+        raise write_buffer_full(e)
+    except TranscriptionBusy as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": "5"})
+    except UnsupportedAudio as e:
+        raise HTTPException(status_code=415, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Voice analysis failed: {str(e)}")
 
 
+async def close_with_error(websocket: WebSocket, detail: str, code: int):
+    """Tell the client why, then close (the client may already be gone)"""
+    try:
+        await websocket.send_json({"type": "error", "detail": detail})
+        await websocket.close(code=code)
+    except (RuntimeError, WebSocketDisconnect):
+        pass
+
+
+async def receive_voice_chunks(websocket: WebSocket, queue: asyncio.Queue):
+    """
+    Read audio frames into the session queue until the client sends
+    {"type": "end"}. queue.put blocks while processing is behind, which
+    stops reads from the socket and pushes back on the client.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + VOICE_WS_MAX_SECONDS
+    while True:
+        timeout = min(VOICE_WS_IDLE_SECONDS, deadline - loop.time())
+        if timeout <= 0:
+            raise StreamLimitExceeded(
+                f"Stream longer than {VOICE_WS_MAX_SECONDS:.0f}s")
+        try:
+            message = await asyncio.wait_for(websocket.receive(), timeout)
+        except asyncio.TimeoutError:
+            raise StreamLimitExceeded(
+                f"No audio for {VOICE_WS_IDLE_SECONDS:.0f}s")
+
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            if len(message["bytes"]) > VOICE_WS_MAX_CHUNK_BYTES:
+                raise StreamLimitExceeded(
+                    f"Chunk larger than {VOICE_WS_MAX_CHUNK_BYTES} bytes", CLOSE_TOO_BIG)
+            await queue.put(message["bytes"])
+        elif message.get("text") is not None:
+            try:
+                control = json.loads(message["text"])
+            except json.JSONDecodeError:
+                control = None
+            if not isinstance(control, dict) or control.get("type") != "end":
+                raise StreamLimitExceeded('Expected audio frames or {"type": "end"}')
+            await queue.put(None)
+            return
+
+
+async def process_voice_chunks(websocket: WebSocket, queue: asyncio.Queue,
+                               session: VoiceStreamSession):
+    """Feed queued chunks to the session and push its messages to the client"""
+    while True:
+        chunk = await queue.get()
+        if chunk is None:
+            return
+        with stage("voice_stream", "feed_chunk"):
+            messages = await session.feed(chunk)
+        for message in messages:
+            await websocket.send_json(message)
+        await websocket.send_json({"type": "ack", "bytes": session.received})
+
+
+def streaming_transcriber() -> StreamingTranscriber:
+    """The configured STT backend, through the shared decode and
+    transcription pools; the word-by-word stub for the simulated backend"""
+    if transcription_pool.backend == "simulated":
+        return SimulatedStreamingTranscriber()
+    return PooledStreamingTranscriber(voice_service, audio_decode_pool, transcription_pool)
+
+
+@app.websocket("/ws/voice")
+async def voice_stream(websocket: WebSocket):
+    """
+    Streaming Voice Analysis
+    ------------------------
+    Connect to /ws/voice?format=wav (default webm).
+    Client: binary frames of audio, then the text frame {"type": "end"}.
+    Server:
+    - {"type": "ack", "bytes": n} after each processed chunk
+    - {"type": "transcript", "text": ...} when the partial transcript grows
+    - {"type": "partial", "extracted_info": {...}} once extracted info is stable
+    - {"type": "final", ...} with the /api/voice-analysis response fields
+    - {"type": "error", "detail": ...} before closing on a limit or failure
+    """
+    await websocket.accept()
+    audio_format = websocket.query_params.get("format", "webm").lower()
+    if not voice_service.validate_audio_format(f"stream.{audio_format}"):
+        await close_with_error(
+            websocket, "Unsupported audio format. Please use WAV, MP3, M4A, OGG, WEBM, or FLAC",
+            CLOSE_UNSUPPORTED_DATA)
+        return
+    if transcription_pool.backend != "simulated" and audio_format not in ("wav", "flac"):
+        await close_with_error(
+            websocket, f"The {transcription_pool.backend} transcriber needs WAV or FLAC audio",
+            CLOSE_UNSUPPORTED_DATA)
+        return
+    if not voice_stream_slots.acquire():
+        await close_with_error(
+            websocket, "Too many voice streams, please retry shortly", CLOSE_TRY_AGAIN_LATER)
+        return
+
+    session = VoiceStreamSession(voice_service, streaming_transcriber())
+    queue = asyncio.Queue(maxsize=VOICE_WS_QUEUE_CHUNKS)
+    tasks = [
+        asyncio.create_task(receive_voice_chunks(websocket, queue)),
+        asyncio.create_task(process_voice_chunks(websocket, queue, session)),
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+        await asyncio.gather(*tasks)
+
+        with stage("voice_stream", "finish"):
+            voice_result, extracted_info = await session.finish()
+        with stage("voice_stream", "analyze_questionnaire"):
+            analysis = health_assessment_service.analyze_questionnaire(
+                voice_service.build_assessment_data(extracted_info))
+
+        with stage("voice_stream", "save_upload"):
+            audio_filename = save_voice_recording(bytes(session.audio), audio_format)
+        db_endpoint.set("WS /ws/voice")
+        with stage("voice_stream", "db_record"):
+            async with AsyncSessionLocal() as db:
+                await scan_recorder.record(
+                    db,
+                    injury_type=analysis['affected_area'],
+                    confidence_score=voice_result["confidence"],
+                    risk_level=analysis['risk_level'],
+                    image_path=audio_filename,
+                    visual_notes=f"Voice Analysis: {voice_result['transcribed_text']}"
+                )
+
+        await websocket.send_json({
+            "type": "final",
+            "transcribed_text": voice_result["transcribed_text"],
+            "confidence": voice_result["confidence"],
+            "detected_language": voice_result["detected_language"],
+            "extracted_info": extracted_info,
+            "analysis": analysis,
+            "timestamp": datetime.now().isoformat()
+        })
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        pass
+    except StreamLimitExceeded as e:
+        await close_with_error(websocket, str(e), e.close_code)
+    except (WriteBufferFull, TranscriptionBusy) as e:
+        await close_with_error(websocket, str(e), CLOSE_TRY_AGAIN_LATER)
+    except UnsupportedAudio as e:
+        await close_with_error(websocket, str(e), CLOSE_UNSUPPORTED_DATA)
+    except Exception as e:
+        await close_with_error(
+            websocket, f"Voice analysis failed: {str(e)}", CLOSE_INTERNAL_ERROR)
+    finally:
+        for task in tasks:
+            task.cancel()
+        voice_stream_slots.release()
+
+
 @app.post("/api/chat", response_model=ChatMessageResponse)
 async def chat_message(chat_request: ChatMessageRequest):
     """
@@ -471,10 +975,12 @@ async def chat_message(chat_request: ChatMessageRequest):
     Provides conversational health guidance and answers questions.
     """
     try:
-        response = chat_service.process_message(
-            chat_request.message,
-            chat_request.context
-        )
+        with stage("chat", "process_message"):
+            response = await chat_service.process_message(
+                chat_request.message,
+                chat_request.context,
+                chat_request.session_id
+            )
 
         return response
 
@@ -482,24 +988,88 @@ async def chat_message(chat_request: ChatMessageRequest):
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
 
+def sse_event(event: str, data: Dict) -> str:
+    """One Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def chat_message_stream(chat_request: ChatMessageRequest):
+    """
+    Streaming AI Chat
+    -----------------
+    Same as /api/chat, as Server-Sent Events: `meta` (session, intent and
+    entities) first, then a `token` event per reply chunk as it is
+    produced, then `done` (follow-up questions, confidence,
+    conversation_id). Disconnecting stops reply generation.
+    """
+    async def events():
+        async with aclosing(chat_service.stream_message(
+                chat_request.message,
+                chat_request.context,
+                chat_request.session_id)) as stream:
+            try:
+                with stage("chat_stream", "stream_message"):
+                    async for event, data in stream:
+                        yield sse_event(event, data)
+            except Exception as e:
+                yield sse_event("error", {"detail": f"Chat failed: {str(e)}"})
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.get("/api/chat/history")
-async def get_chat_history():
-    """Get conversation history summary"""
+async def get_chat_history(
+    session: str = Query(..., max_length=64),
+    limit: int = Query(20, ge=1, le=CHAT_HISTORY_DEPTH),
+    before: Optional[int] = Query(None, ge=1)
+):
+    """
+    Conversation summary for one chat session plus one page of its history:
+    the newest `limit` messages, or those before sequence number `before`
+    (pass previous_page_before from the last response to page back)
+    """
     try:
-        summary = chat_service.get_conversation_summary()
-        return summary
+        with stage("chat", "conversation_summary"):
+            summary = await chat_service.get_conversation_summary(session, limit, before)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return summary
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database with mock data"""
-    doctor_service.initialize_mock_doctors()
+    """Initialize database with mock data, then start this worker's pools"""
+    await one_time_init.run()
+    if WARMUP == "eager":
+        await asyncio.to_thread(warm_up)
+    elif WARMUP == "background":
+        app.state.warm_up = asyncio.get_running_loop().run_in_executor(None, warm_up)
+        app.state.warm_up.add_done_callback(report_warm_up)
+    await scan_recorder.start()
+    pool_monitor.start_watchdog()
+    audio_decode_pool.start()
+    await transcription_pool.start()
     print("✅ MediDoctor API Started")
     print("📚 API Docs: http://localhost:8000/api/docs")
     print("⚠️  PROTOTYPE ONLY - Not for medical use")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered writes before the process exits"""
+    await scan_recorder.stop()
+    await pool_monitor.stop_watchdog()
+    audio_decode_pool.stop()
+    transcription_pool.stop()
+    if chat_service.loaded:
+        chat_service.sessions.close()
+    await shared_state.close()
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
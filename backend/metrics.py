@@ -0,0 +1,509 @@
+"""
+Metrics
+=======
+Request and pipeline-stage metrics, exposed at /metrics in the Prometheus
+text exposition format (version 0.0.4).
+
+- http_requests_total{method,route,status}: responses by status
+- http_request_duration_seconds{method,route}: latency histogram; for
+  streamed responses, until the last byte
+- http_requests_in_flight{method,route}: requests being handled now
+- pipeline_stage_duration_seconds{pipeline,stage}: one histogram per
+  service call in the scan, assessment, voice, chat and booking pipelines
+- pipeline_stage_errors_total{pipeline,stage}: stages that raised
+- db_pool_checked_out / db_pool_size / db_pool_overflow{engine}: read from
+  pool_monitor at scrape time
+
+Recording is cheap enough to leave on: a labelled child is looked up once
+per call in a dict, and an observation is a bisect plus three additions
+under an uncontended lock. benchmarks/metrics_overhead_bench.py measures
+it.
+
+Several workers (serve.py): every worker writes a snapshot of its metrics
+to <METRICS_DIR>/<pid>.json every METRICS_SNAPSHOT_SECONDS and when it
+exits, and a scrape, whichever worker answers it, merges the snapshots:
+counters and histograms are summed over every worker that ever ran, gauges
+(including the collector lines) over the live ones. When a worker exits,
+serve.py folds its counters and histograms into retired.json, so totals
+never go backwards. A worker that crashes loses at most its last
+METRICS_SNAPSHOT_SECONDS of counts. Without fcntl (Windows) snapshots are
+not locked; serve.py does not run several workers there.
+
+Usage:
+    with stage("scan", "analyze_injury"):
+        result = ai_service.analyze_injury(...)
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+
+from starlette.routing import Match
+
+from tracing import span
+
+# Seconds; fine at the low end, where most stages are
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS_SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "1"))
+RETIRED_SNAPSHOT = "retired.json"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _Timer:
+    """
+    Context manager observing its wall time into a histogram child; with a
+    name it is also a tracing span (a no-op unless the request is traced)
+    """
+
+    __slots__ = ("child", "errors", "name", "span", "started")
+
+    def __init__(self, child: "_HistogramChild", errors: Optional[_CounterChild],
+                 name: Optional[str] = None):
+        self.child = child
+        self.errors = errors
+        self.name = name
+
+    def __enter__(self):
+        if self.name is not None:
+            self.span = span(self.name)
+            self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.child.observe(time.perf_counter() - self.started)
+        if self.name is not None:
+            self.span.__exit__(exc_type, exc, tb)
+        # Cancellation and generator close are not failures
+        if exc_type is not None and issubclass(exc_type, Exception) and self.errors is not None:
+            self.errors.inc()
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last: above every bound
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self, errors: Optional[_CounterChild] = None) -> _Timer:
+        return _Timer(self, errors)
+
+
+class _Family:
+    """A metric name with labels; children are created on first use"""
+
+    kind = "untyped"
+    child_class = _CounterChild
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def state(self) -> List[Tuple[Tuple[str, ...], object]]:
+        """(label values, value) per child; what a snapshot stores"""
+        return [(values, child.value) for values, child in list(self._children.items())]
+
+    def samples(self, state: Optional[Iterable] = None) -> Iterable[str]:
+        for values, value in self.state() if state is None else state:
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+    def render(self, state: Optional[Iterable] = None) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}",
+                *self.samples(state)]
+
+
+class Counter(_Family):
+    kind = "counter"
+
+
+class Gauge(_Family):
+    kind = "gauge"
+    child_class = _GaugeChild
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def state(self) -> List[Tuple[Tuple[str, ...], object]]:
+        state = []
+        for values, child in list(self._children.items()):
+            with child._lock:
+                state.append((values, [list(child.counts), child.sum, child.count]))
+        return state
+
+    def samples(self, state: Optional[Iterable] = None) -> Iterable[str]:
+        for values, (counts, total, count) in self.state() if state is None else state:
+            cumulative = 0
+            for bound, n in zip(self.bounds + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+def _combine(kind: str, a, b):
+    """Sum of two values of one child, across workers"""
+    if a is None:
+        return b
+    if kind == "histogram":
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+    return a + b
+
+
+def _load(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _dump(path: str, data: Dict):
+    """Write path atomically, so a reader sees the old file or the new one"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+class _DirLock:
+    """
+    flock on <directory>/.lock: shared to read the snapshots, exclusive to
+    fold one. A no-op without fcntl.
+    """
+
+    def __init__(self, directory: str, exclusive: bool = False):
+        self.path = os.path.join(directory, ".lock")
+        self.exclusive = exclusive
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            os.close(self.fd)   # releases the lock
+            self.fd = None
+
+
+def retire_worker(directory: str, pid: int):
+    """
+    Fold an exited worker's counters and histograms into retired.json and
+    drop its snapshot (serve.py, when it reaps the worker)
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    with _DirLock(directory, exclusive=True):
+        snapshot = _load(path)
+        if snapshot is not None:
+            retired_path = os.path.join(directory, RETIRED_SNAPSHOT)
+            retired = _load(retired_path) or {"families": {}}
+            for name, family in snapshot["families"].items():
+                if family["kind"] == "gauge":
+                    continue
+                merged = {tuple(values): value for values, value in
+                          retired["families"].get(name, {}).get("state", [])}
+                for values, value in family["state"]:
+                    merged[tuple(values)] = _combine(family["kind"], merged.get(tuple(values)), value)
+                retired["families"][name] = {"kind": family["kind"],
+                                             "state": list(merged.items())}
+            _dump(retired_path, retired)
+        for leftover in (path, f"{path}.{pid}.tmp"):
+            try:
+                os.remove(leftover)
+            except FileNotFoundError:
+                pass
+
+
+class MetricsRegistry:
+    """Metric families plus collectors that report gauges at scrape time"""
+
+    def __init__(self):
+        self._families: List[_Family] = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+        self.directory: Optional[str] = None
+
+    def register(self, family: _Family) -> _Family:
+        self._families.append(family)
+        return family
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]):
+        """collector() returns exposition lines (with HELP/TYPE) per scrape"""
+        self._collectors.append(collector)
+
+    def _collected(self) -> List[str]:
+        lines = []
+        for collector in self._collectors:
+            lines.extend(collector())
+        return lines
+
+    def render(self) -> str:
+        if self.directory is not None:
+            return self._render_merged()
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        lines.extend(self._collected())
+        return "\n".join(lines) + "\n"
+
+    def enable_multiprocess(self, directory: str,
+                            interval: float = METRICS_SNAPSHOT_SECONDS):
+        """
+        Snapshot this worker's metrics into directory every interval seconds
+        and merge every worker's snapshot on render() (serve.py, after fork)
+        """
+        self.directory = directory
+        self.write_snapshot()
+
+        def snapshot_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_snapshot()
+                except Exception as e:
+                    print(f"⚠️  Metrics snapshot failed: {e}")
+
+        threading.Thread(target=snapshot_loop, name="metrics-snapshot", daemon=True).start()
+
+    def write_snapshot(self):
+        """This worker's metrics to <directory>/<pid>.json"""
+        if self.directory is None:
+            return
+        _dump(os.path.join(self.directory, f"{os.getpid()}.json"), {
+            "families": {family.name: {"kind": family.kind, "state": family.state()}
+                         for family in self._families},
+            "collected": self._collected(),
+        })
+
+    def _render_merged(self) -> str:
+        self.write_snapshot()   # this worker's part is never stale
+        with _DirLock(self.directory):
+            retired = _load(os.path.join(self.directory, RETIRED_SNAPSHOT))
+            live = [_load(os.path.join(self.directory, name))
+                    for name in sorted(os.listdir(self.directory))
+                    if name.endswith(".json") and name != RETIRED_SNAPSHOT]
+        live = [snapshot for snapshot in live if snapshot is not None]
+
+        lines = []
+        for family in self._families:
+            merged: Dict[Tuple[str, ...], object] = {}
+            sources = live if family.kind == "gauge" else live + [retired or {"families": {}}]
+            for snapshot in sources:
+                for values, value in snapshot["families"].get(family.name, {}).get("state", []):
+                    merged[tuple(values)] = _combine(family.kind, merged.get(tuple(values)), value)
+            lines.extend(family.render(merged.items()))
+
+        # Collector lines are gauges: summed per sample, grouped per metric
+        groups: Dict[str, Tuple[List[str], Dict[str, float]]] = {}
+        for snapshot in live:
+            name = None
+            for line in snapshot["collected"]:
+                if line.startswith("#"):
+                    name = line.split()[2]
+                    header, _ = groups.setdefault(name, ([], {}))
+                    if line not in header:
+                        header.append(line)
+                    continue
+                sample, value = line.rsplit(" ", 1)
+                group = groups.setdefault(name or sample, ([], {}))[1]
+                value = float(value)
+                group[sample] = group.get(sample, 0) + (int(value) if value.is_integer() else value)
+        for header, samples in groups.values():
+            lines.extend(header)
+            lines.extend(f"{sample} {_format_value(value)}" for sample, value in samples.items())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter(
+    "http_requests_total", "HTTP responses by route and status", ("method", "route", "status"))
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests being handled", ("method", "route"))
+STAGE_SECONDS = registry.histogram(
+    "pipeline_stage_duration_seconds", "Time per service call in a request pipeline",
+    ("pipeline", "stage"))
+STAGE_ERRORS = registry.counter(
+    "pipeline_stage_errors_total", "Pipeline stages that raised", ("pipeline", "stage"))
+PROCESS_START = registry.gauge(
+    "process_start_time_seconds", "Start time of this worker (unix seconds)", ("pid",))
+PROCESS_START.labels(str(os.getpid())).set(time.time())
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# (pipeline, stage) -> (histogram child, error counter child, span name)
+_stages: Dict[Tuple[str, str], Tuple[_HistogramChild, _CounterChild, str]] = {}
+
+
+def stage(pipeline: str, name: str) -> _Timer:
+    """
+    Time one service call: `with stage("scan", "classify_risk"): ...`.
+    Also a tracing span named pipeline.stage.
+    """
+    children = _stages.get((pipeline, name))
+    if children is None:
+        children = _stages.setdefault((pipeline, name), (
+            STAGE_SECONDS.labels(pipeline, name), STAGE_ERRORS.labels(pipeline, name),
+            f"{pipeline}.{name}"))
+    return _Timer(*children)
+
+
+def reset_after_fork():
+    """Fresh start-time sample for a forked worker (serve.py)"""
+    PROCESS_START._children.clear()
+    PROCESS_START.labels(str(os.getpid())).set(time.time())
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording the http_* metrics. The route label is
+    the matched route's path template, resolved before the request runs so
+    the in-flight gauge gets it too; paths that match no route share the
+    label "unmatched", so scanners cannot blow up the label set.
+    """
+
+    def __init__(self, app, routes: Optional[Callable[[], Iterable]] = None):
+        self.app = app
+        self._routes = routes
+        self._static_paths = None
+        self._templated = None
+
+    def _route_label(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        if self._static_paths is None:
+            routes = [r for r in (self._routes() if self._routes else ()) if hasattr(r, "path")]
+            self._static_paths = {r.path for r in routes if "{" not in r.path}
+            self._templated = [r for r in routes if "{" in r.path]
+        path = scope["path"]
+        if path in self._static_paths:
+            return path
+        for route in self._templated:
+            if route.matches(scope)[0] != Match.NONE:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_label(scope)
+        in_flight = IN_FLIGHT.labels(method, route)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, str(status)).inc()
@@ -0,0 +1,69 @@
+"""initial schema
+
+Tables as originally created by Base.metadata.create_all.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "scan_results",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("injury_type", sa.String(length=50), nullable=False),
+        sa.Column("confidence_score", sa.Float(), nullable=False),
+        sa.Column("risk_level", sa.String(length=20), nullable=False),
+        sa.Column("image_path", sa.String(length=255), nullable=True),
+        sa.Column("visual_notes", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_scan_results_id", "scan_results", ["id"])
+
+    op.create_table(
+        "doctors",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("specialization", sa.String(length=100), nullable=False),
+        sa.Column("hospital", sa.String(length=200), nullable=False),
+        sa.Column("distance_km", sa.Float(), nullable=False),
+        sa.Column("rating", sa.Float(), nullable=False),
+        sa.Column("available_slots", sa.Text(), nullable=True),
+        sa.Column("expertise", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_doctors_id", "doctors", ["id"])
+
+    op.create_table(
+        "appointments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("doctor_id", sa.Integer(), nullable=False),
+        sa.Column("patient_name", sa.String(length=100), nullable=False),
+        sa.Column("patient_phone", sa.String(length=20), nullable=False),
+        sa.Column("appointment_slot", sa.String(length=50), nullable=False),
+        sa.Column("injury_type", sa.String(length=50), nullable=True),
+        sa.Column("token_number", sa.String(length=20), nullable=False, unique=True),
+        sa.Column("status", sa.String(length=20), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_appointments_id", "appointments", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_appointments_id", table_name="appointments")
+    op.drop_table("appointments")
+    op.drop_index("ix_doctors_id", table_name="doctors")
+    op.drop_table("doctors")
+    op.drop_index("ix_scan_results_id", table_name="scan_results")
+    op.drop_table("scan_results")
@@ -0,0 +1,42 @@
+"""indexes for admin dashboard queries
+
+- ix_scan_results_recent: covers ORDER BY created_at DESC LIMIT 10 and every
+  column the recent-scans list reads
+- ix_scan_results_risk_level / ix_scan_results_injury_type: GROUP BY counts
+  answered from the index alone
+- ix_appointments_created_at: recent appointments, joined to doctors by
+  primary key
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_scan_results_recent", "scan_results",
+        ["created_at", "injury_type", "risk_level", "confidence_score"])
+    op.create_index(
+        "ix_scan_results_risk_level", "scan_results", ["risk_level"])
+    op.create_index(
+        "ix_scan_results_injury_type", "scan_results", ["injury_type"])
+    op.create_index(
+        "ix_appointments_created_at", "appointments", ["created_at"])
+    op.execute("ANALYZE")
+
+
+def downgrade():
+    op.drop_index("ix_appointments_created_at", table_name="appointments")
+    op.drop_index("ix_scan_results_injury_type", table_name="scan_results")
+    op.drop_index("ix_scan_results_risk_level", table_name="scan_results")
+    op.drop_index("ix_scan_results_recent", table_name="scan_results")
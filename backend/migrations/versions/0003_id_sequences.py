@@ -0,0 +1,31 @@
+"""id sequences for write-behind inserts
+
+Lets the write-behind buffer hand out scan_results ids before the rows are
+flushed, so responses can return scan_id immediately.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "id_sequences",
+        sa.Column("name", sa.String(length=50), primary_key=True),
+        sa.Column("next_id", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("id_sequences")
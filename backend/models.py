@@ -3,7 +3,7 @@ Database Models
 SQLAlchemy ORM models for MediDoctor platform
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Index
 from datetime import datetime
 from database import Base
 
@@ -20,6 +20,16 @@ class ScanResult(Base):
     visual_notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Admin "recent scans": ORDER BY created_at DESC LIMIT 10, covering
+        # every column the dashboard reads so no table lookups are needed
+        Index("ix_scan_results_recent", "created_at",
+              "injury_type", "risk_level", "confidence_score"),
+        # Admin distributions: GROUP BY risk_level / injury_type
+        Index("ix_scan_results_risk_level", "risk_level"),
+        Index("ix_scan_results_injury_type", "injury_type"),
+    )
+
     def __repr__(self):
         return f"<ScanResult {self.id}: {self.injury_type} ({self.risk_level})>"
 
@@ -56,5 +66,21 @@ class Appointment(Base):
     status = Column(String(20), default="confirmed")
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Admin "recent appointments": ORDER BY created_at DESC LIMIT 10
+        Index("ix_appointments_created_at", "created_at"),
+    )
+
     def __repr__(self):
         return f"<Appointment {self.token_number}: {self.patient_name}>"
+
+
+class IdSequence(Base):
+    """Pre-allocated id blocks for rows written by the write-behind buffer"""
+    __tablename__ = "id_sequences"
+
+    name = Column(String(50), primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<IdSequence {self.name}: {self.next_id}>"
@@ -0,0 +1,162 @@
+"""
+Connection Pool Monitoring
+==========================
+Tracks how long each endpoint holds a pooled database connection and
+reports pool gauges, so exhaustion shows up before it becomes an outage.
+
+- Per-endpoint checkout stats: count, total/max hold time, slow checkouts
+- Gauges per engine: pool size, checked out, overflow
+- Leak detection: connections held longer than DB_SESSION_WARN_SECONDS are
+  logged when returned, and a watchdog logs ones that are still out
+
+The endpoint label comes from the db_endpoint context variable, which the
+session dependencies in database.py set from the matched route.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+DB_SESSION_WARN_SECONDS = float(os.getenv("DB_SESSION_WARN_SECONDS", "2.0"))
+DB_LEAK_CHECK_INTERVAL = float(os.getenv("DB_LEAK_CHECK_INTERVAL", "5.0"))
+
+# Route template of the request currently using the database
+db_endpoint = contextvars.ContextVar("db_endpoint", default="background")
+
+
+class PoolMonitor:
+    """
+    Listens to pool checkout/checkin events on registered engines.
+    """
+
+    def __init__(self, warn_after: float = DB_SESSION_WARN_SECONDS):
+        self.warn_after = warn_after
+        self._engines = {}
+        self._active: Dict[int, Dict] = {}
+        self._endpoints: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._watchdog = None
+
+    def attach(self, name: str, engine):
+        """Start tracking an engine (sync Engine or AsyncEngine)"""
+        sync_engine = getattr(engine, "sync_engine", engine)
+        if any(e is sync_engine for e in self._engines.values()):
+            return  # shared writer/reader engine, already tracked
+        self._engines[name] = sync_engine
+
+        from sqlalchemy import event
+
+        @event.listens_for(sync_engine, "checkout")
+        def _on_checkout(dbapi_connection, record, proxy):
+            self._checkout(name, record)
+
+        @event.listens_for(sync_engine, "checkin")
+        def _on_checkin(dbapi_connection, record):
+            self._checkin(record)
+
+    def _checkout(self, engine_name: str, record):
+        with self._lock:
+            self._active[id(record)] = {
+                "engine": engine_name,
+                "endpoint": db_endpoint.get(),
+                "started": time.monotonic(),
+                "warned": False,
+            }
+
+    def _checkin(self, record):
+        with self._lock:
+            checkout = self._active.pop(id(record), None)
+            if checkout is None:
+                return
+            held = time.monotonic() - checkout["started"]
+            stats = self._endpoints.setdefault(checkout["endpoint"], {
+                "checkouts": 0, "total_seconds": 0.0,
+                "max_seconds": 0.0, "slow_checkouts": 0
+            })
+            stats["checkouts"] += 1
+            stats["total_seconds"] += held
+            stats["max_seconds"] = max(stats["max_seconds"], held)
+            if held > self.warn_after:
+                stats["slow_checkouts"] += 1
+
+        if held > self.warn_after:
+            logger.warning("DB connection (%s) held %.2fs by %s",
+                           checkout["engine"], held, checkout["endpoint"])
+
+    def check_leaks(self) -> list:
+        """Log and return connections checked out longer than the threshold"""
+        now = time.monotonic()
+        suspects = []
+        with self._lock:
+            for checkout in self._active.values():
+                held = now - checkout["started"]
+                if held > self.warn_after:
+                    suspects.append({**checkout, "held_seconds": round(held, 3)})
+                    if not checkout["warned"]:
+                        checkout["warned"] = True
+                        logger.warning(
+                            "Possible DB connection leak: %s has held a %s "
+                            "connection for %.1fs", checkout["endpoint"],
+                            checkout["engine"], held)
+        return [{k: v for k, v in s.items() if k not in ("started", "warned")}
+                for s in suspects]
+
+    def gauges(self) -> Dict[str, Dict]:
+        """Current size / checked-out / overflow per engine"""
+        result = {}
+        for name, engine in self._engines.items():
+            pool = engine.pool
+            result[name] = {
+                "pool": type(pool).__name__,
+                "size": pool.size() if hasattr(pool, "size") else None,
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                # QueuePool.overflow() counts down from -pool_size while the
+                # pool is not full; report only connections above the size
+                "overflow": max(0, pool.overflow()) if hasattr(pool, "overflow") else None,
+            }
+        return result
+
+    def snapshot(self) -> Dict:
+        """Everything the admin endpoint reports"""
+        with self._lock:
+            endpoints = {
+                name: {
+                    **stats,
+                    "avg_seconds": stats["total_seconds"] / stats["checkouts"]
+                }
+                for name, stats in self._endpoints.items()
+            }
+        return {
+            "warn_after_seconds": self.warn_after,
+            "engines": self.gauges(),
+            "endpoints": endpoints,
+            "long_held": self.check_leaks(),
+        }
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.check_leaks()
+
+    def start_watchdog(self, interval: float = DB_LEAK_CHECK_INTERVAL):
+        """Periodically scan for long-held connections (needs a running loop)"""
+        if self._watchdog is None:
+            self._watchdog = asyncio.create_task(self._watch(interval))
+
+    async def stop_watchdog(self):
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            try:
+                await self._watchdog
+            except asyncio.CancelledError:
+                pass
+            self._watchdog = None
+
+
+pool_monitor = PoolMonitor()
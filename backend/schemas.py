@@ -110,6 +110,8 @@ class VoiceAnalysisResponse(BaseModel):
     transcribed_text: str
     confidence: float
     detected_language: str
+    duration_seconds: Optional[float] = None
+    speech_seconds: Optional[float] = None
     extracted_info: Dict
     analysis: Dict
     timestamp: str
@@ -119,6 +121,7 @@ class ChatMessageRequest(BaseModel):
     """Chat message request"""
     message: str = Field(..., min_length=1, max_length=1000)
     context: Optional[Dict] = None
+    session_id: Optional[str] = Field(None, max_length=64, pattern=r"^[A-Za-z0-9_-]+$")
 
 
 class ChatMessageResponse(BaseModel):
@@ -129,4 +132,5 @@ class ChatMessageResponse(BaseModel):
     follow_up_questions: List[str]
     entities_detected: Dict
     timestamp: str
+    session_id: str
     conversation_id: int
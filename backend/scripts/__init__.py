@@ -0,0 +1,7 @@
+"""
+MediDoctor Maintenance Scripts
+==============================
+Run from the backend directory, e.g.:
+
+    python -m scripts.check_query_plans
+"""
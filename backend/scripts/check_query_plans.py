@@ -0,0 +1,93 @@
+"""
+Query Plan Check
+================
+Runs EXPLAIN QUERY PLAN for every hot endpoint query against a database
+migrated to head and fails if any of them falls back to a table scan or
+a temporary sort.
+
+Usage:
+    python -m scripts.check_query_plans                 # fresh temp database
+    python -m scripts.check_query_plans --database-url sqlite:///./medidoctor.db
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+from sqlalchemy import create_engine, select, text
+
+from database import init_db
+from models import Doctor
+from services.admin_stats_service import AdminStatsService
+
+# "SCAN scan_results" with no index is a full table scan; a temp b-tree means
+# the ORDER BY / GROUP BY could not use an index either.
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+
+# /api/doctors filters on the comma-separated expertise column in Python,
+# so reading the (small) doctor catalogue in full is expected.
+ALLOWED_SCANS = {"doctors.catalogue"}
+
+
+def endpoint_queries() -> dict:
+    """Every query issued by the DB-backed endpoints, by name"""
+    queries = AdminStatsService().endpoint_queries()
+    queries["book.doctor_lookup"] = select(Doctor).where(Doctor.id == 1)
+    queries["doctors.catalogue"] = select(Doctor)
+    return queries
+
+
+def explain(connection, statement) -> list:
+    sql = str(statement.compile(
+        dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return [row[-1] for row in rows]
+
+
+def check(url: str) -> bool:
+    engine = create_engine(url)
+    ok = True
+    with engine.connect() as connection:
+        for name, statement in endpoint_queries().items():
+            plan = explain(connection, statement)
+            problems = [
+                step for step in plan
+                if FULL_SCAN.match(step) or TEMP_SORT.search(step)
+            ]
+            if problems and name not in ALLOWED_SCANS:
+                ok = False
+                status = "FAIL"
+            else:
+                status = "ok" if not problems else "allowed"
+            print(f"[{status:>7}] {name}")
+            for step in plan:
+                print(f"           {step}")
+    engine.dispose()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--database-url", default=None,
+                        help="Check an existing database instead of a fresh one")
+    args = parser.parse_args()
+
+    if args.database_url:
+        ok = check(args.database_url)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'plans.db')}"
+            init_db(url)
+            ok = check(url)
+
+    if not ok:
+        print("Query plan check failed: add or adjust an index (see models.py)")
+        sys.exit(1)
+    print("All endpoint queries use indexes")
+
+
+if __name__ == "__main__":
+    main()
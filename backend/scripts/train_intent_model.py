@@ -0,0 +1,220 @@
+"""
+Train the Chat Intent Model
+===========================
+Fits the hashed character + word n-gram softmax model used by
+ChatService._classify and writes a versioned artifact
+(<output>.npy weights + <output>.json metadata).
+
+Training data is JSONL, one labelled message per line:
+    {"text": "can I take ibuprofen for my knee", "intent": "medication_query",
+     "group": "medication_query/0"}
+
+"group" is optional. Rows that share it (paraphrases of one template, or
+messages from one conversation) always land on the same side of the
+holdout and validation splits. Without that, the holdout would measure
+template recall and not generalization.
+
+The bundled set (ml_models/chat_intents.jsonl) covers every ChatService
+intent plus general_query. A message that states a symptom and asks
+something ("my knee hurts, what should I do") is labelled with the ask.
+It also includes confusers for the old substring rules ("this chip",
+"thanks, this is helpful"). It is templated bootstrap data. Held-out
+templates keep the scores honest, but they are still no substitute for
+real, de-identified chat logs (add them with --data).
+
+The softmax temperature is fitted on a validation slice of the training
+data, so the reported confidences are calibrated (see ECE in the output).
+
+Usage:
+    python -m scripts.train_intent_model
+    python -m scripts.train_intent_model --data more.jsonl --output ml_models/intent_model_v2
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from services.chat_service import ChatService
+from services.intent_model import (
+    DEFAULT_INTENT,
+    INTENT_MODEL_PATH,
+    HashedIntentModel,
+    RuleIntentModel,
+    feature_indices,
+)
+from services.pattern_model import resolve_model_path
+
+BUNDLED_DATA = "ml_models/chat_intents.jsonl"
+
+RULES = RuleIntentModel(ChatService(intent_model_path=None).intents)
+INTENTS = list(RULES.intents) + [DEFAULT_INTENT]
+
+
+def load_examples(paths: List[str]) -> List[Tuple[str, str, str]]:
+    """(text, intent, group) rows; a row without a group is its own group"""
+    examples = []
+    for path in paths:
+        with open(resolve_model_path(path)) as f:
+            examples.extend((row["text"], row["intent"], f"{path}:{row.get('group') or row['text']}")
+                            for row in map(json.loads, f) if row)
+    unknown = {intent for _, intent, _ in examples} - set(INTENTS)
+    if unknown:
+        raise SystemExit(f"Unknown intents in training data: {sorted(unknown)}")
+    return examples
+
+
+def split_by_group(examples, fraction: float, rng: random.Random):
+    """(rest, split-off) with about fraction of the examples split off, whole groups only"""
+    groups = sorted({group for *_, group in examples})
+    rng.shuffle(groups)
+    sizes = Counter(group for *_, group in examples)
+    taken, target = set(), fraction * len(examples)
+    for group in groups:
+        if sum(sizes[g] for g in taken) >= target:
+            break
+        taken.add(group)
+    return ([e for e in examples if e[2] not in taken],
+            [e for e in examples if e[2] in taken])
+
+
+def encode(examples, hash_bits: int):
+    """Feature index lists and integer labels"""
+    features = [feature_indices(text, hash_bits) for text, *_ in examples]
+    y = np.array([INTENTS.index(intent) for _, intent, _ in examples])
+    return features, y
+
+
+def train(features, y, hash_bits: int, epochs: int, lr: float, l2: float,
+          batch_size: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mini-batch SGD on the softmax cross-entropy with sparse updates"""
+    n, n_intents = len(y), len(INTENTS)
+    weights = np.zeros((1 << hash_bits, n_intents), dtype=np.float32)
+    bias = np.zeros(n_intents, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+
+    for _ in range(epochs):
+        order = rng.permutation(n)
+        for start in range(0, n, batch_size):
+            batch = order[start:start + batch_size]
+            idx = [features[i] for i in batch]
+            counts = np.array([len(i) for i in idx])
+            flat = np.concatenate(idx)
+            rows = np.repeat(np.arange(len(batch)), counts)
+
+            logits = np.tile(bias, (len(batch), 1))
+            np.add.at(logits, rows, weights[flat])
+            logits -= logits.max(axis=1, keepdims=True)
+            grad = np.exp(logits)
+            grad /= grad.sum(axis=1, keepdims=True)
+            grad[np.arange(len(batch)), y[batch]] -= 1
+
+            touched = np.unique(flat)
+            weights[touched] *= (1 - lr * l2)
+            np.add.at(weights, flat, (-lr / len(batch)) * grad[rows])
+            bias -= lr * grad.mean(axis=0)
+
+    return weights, bias
+
+
+def fit_temperature(model: HashedIntentModel, examples) -> float:
+    """Temperature minimizing the validation negative log-likelihood"""
+    logits = model.decision_batch([text for text, *_ in examples]).astype(np.float64)
+    y = np.array([INTENTS.index(intent) for _, intent, _ in examples])
+    best, best_nll = 1.0, np.inf
+    for t in np.exp(np.linspace(np.log(0.01), np.log(100), 400)):
+        scaled = logits / t
+        scaled -= scaled.max(axis=1, keepdims=True)
+        log_probs = scaled - np.log(np.exp(scaled).sum(axis=1, keepdims=True))
+        nll = -log_probs[np.arange(len(y)), y].mean()
+        if nll < best_nll:
+            best, best_nll = float(t), nll
+    return best
+
+
+def evaluate(predicted: List[Tuple[str, float]], examples, bins: int = 10) -> Dict:
+    """Accuracy, macro F1 and expected calibration error"""
+    truth = [intent for _, intent, _ in examples]
+    labels = [p for p, _ in predicted]
+    accuracy = sum(p == t for p, t in zip(labels, truth)) / len(truth)
+
+    f1s = []
+    for intent in INTENTS:
+        tp = sum(p == intent and t == intent for p, t in zip(labels, truth))
+        fp = sum(p == intent and t != intent for p, t in zip(labels, truth))
+        fn = sum(p != intent and t == intent for p, t in zip(labels, truth))
+        f1s.append(2 * tp / (2 * tp + fp + fn) if tp + fp + fn else 0.0)
+
+    confidence = np.array([c for _, c in predicted])
+    correct = np.array([p == t for p, t in zip(labels, truth)], dtype=float)
+    which = np.minimum((confidence * bins).astype(int), bins - 1)
+    ece = sum(abs(correct[which == b].mean() - confidence[which == b].mean())
+              * np.mean(which == b) for b in range(bins) if np.any(which == b))
+
+    return {"accuracy": round(accuracy, 4), "macro_f1": round(sum(f1s) / len(f1s), 4),
+            "ece": round(float(ece), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", action="append", default=None,
+                        help=f"labelled JSONL, repeatable (default: {BUNDLED_DATA})")
+    parser.add_argument("--output", default=INTENT_MODEL_PATH,
+                        help="artifact prefix (writes .npy and .json)")
+    parser.add_argument("--hash-bits", type=int, default=15)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--lr", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sources = args.data or [BUNDLED_DATA]
+    examples = load_examples(sources)
+    rng = random.Random(args.seed)
+    train_set, holdout = split_by_group(examples, args.holdout, rng)
+    # The temperature is fitted on held-out groups of the training data, never the holdout
+    train_set, validation = split_by_group(train_set, 0.15, rng)
+
+    started = time.perf_counter()
+    features, y = encode(train_set, args.hash_bits)
+    weights, bias = train(features, y, args.hash_bits, args.epochs, args.lr,
+                          args.l2, args.batch_size, args.seed)
+    model = HashedIntentModel(weights, bias, INTENTS, args.hash_bits)
+    texts = [text for text, *_ in holdout]
+    uncalibrated = evaluate(model.classify_batch(texts), holdout)
+    model.temperature = fit_temperature(model, validation)
+    elapsed = time.perf_counter() - started
+
+    metrics = {
+        "model": evaluate(model.classify_batch(texts), holdout),
+        "model_uncalibrated": uncalibrated,
+        "rules": evaluate(RULES.classify_batch(texts), holdout),
+    }
+
+    prefix = resolve_model_path(args.output)
+    model.save(prefix, extra={
+        "version": prefix.rsplit("/", 1)[-1],
+        "trained_at": datetime.utcnow().isoformat(),
+        "training": {"source": sources, "examples": len(train_set),
+                     "validation": len(validation), "holdout": len(holdout),
+                     "hash_bits": args.hash_bits, "epochs": args.epochs,
+                     "lr": args.lr, "l2": args.l2},
+        "metrics": metrics,
+    })
+
+    print(f"Trained on {len(train_set)} examples in {elapsed:.1f}s -> {prefix}.npy/.json "
+          f"(temperature {model.temperature:.2f})")
+    for name, m in metrics.items():
+        print(f"  {name:18s} accuracy {m['accuracy']:.3f}  macro F1 {m['macro_f1']:.3f}  "
+              f"ECE {m['ece']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Train the Injury Pattern Model
+==============================
+Fits the hashed-feature logistic model used by
+HealthAssessmentService._ml_pattern_detection and writes a versioned
+artifact (<output>.npy weights + <output>.json metadata).
+
+Training data is JSONL, one labelled questionnaire per line:
+    {"responses": {...questionnaire fields...}, "patterns": ["infection"]}
+
+Without --data a seeded synthetic corpus is generated: label sets are drawn
+first, then answers and free-text notes are written from per-pattern
+phrase lists with distractors ("no fever", "bored", "hotel") mixed in.
+It is a bootstrap for development, not clinical data.
+
+Usage:
+    python -m scripts.train_pattern_model
+    python -m scripts.train_pattern_model --data labelled.jsonl --output ml_models/pattern_model_v2
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from services.pattern_model import (
+    PATTERN_MODEL_PATH,
+    HashedPatternModel,
+    RulePatternModel,
+    feature_indices,
+    resolve_model_path,
+)
+from services.health_assessment_service import HealthAssessmentService
+
+RULES = RulePatternModel(HealthAssessmentService(model_path=None).injury_patterns)
+LABELS = list(RULES.patterns)
+
+PHRASES = {
+    'acute_trauma': [
+        "sharp pain", "sudden pain", "after a fall", "accident at work",
+        "twisted it suddenly", "hit by a ball", "heard a pop", "collided with a player",
+        "tripped on the stairs", "injured during football", "fell off my bike",
+    ],
+    'inflammation': [
+        "swollen", "puffy", "throbbing", "inflamed", "feels warm", "tight skin",
+        "redness around the joint", "swelling keeps increasing", "warmth over the knee",
+    ],
+    'chronic_condition': [
+        "persistent ache", "recurring pain", "for weeks", "for months",
+        "keeps coming back", "on and off since last year", "old injury flares up",
+        "stiff every morning", "never fully healed",
+    ],
+    'infection': [
+        "fever", "pus", "spreading redness", "hot to touch", "red streaks",
+        "oozing", "chills at night", "wound looks infected", "yellow discharge",
+    ],
+}
+
+DISTRACTORS = [
+    "bored at home", "stayed in a hotel", "shredded paper at work", "no fever",
+    "not sudden", "went to the gym", "took paracetamol", "slept badly",
+    "over the weekend", "the doctor said rest", "prepared dinner", "credit card bill",
+    "photos attached", "no pus", "tired", "watching tv", "hot weather lately",
+    "wearing red shoes", "recently moved house", "several weeks of exams",
+]
+
+AREAS = ["knee", "ankle", "wrist", "elbow", "shoulder", "back", "hand", "foot", "hip", "neck"]
+
+
+def synthetic_example(rng: random.Random) -> Tuple[Dict, List[str]]:
+    """One questionnaire and its true pattern labels"""
+    labels = [label for label in LABELS if rng.random() < 0.22]
+
+    def pick(default: List[str], boosted: List[str], *triggers) -> str:
+        if any(t in labels for t in triggers) and rng.random() < 0.7:
+            return rng.choice(boosted)
+        return rng.choice(default)
+
+    responses = {
+        'pain_level': pick(['mild', 'moderate', 'severe'], ['severe'], 'acute_trauma'),
+        'swelling': pick(['none', 'mild', 'moderate'], ['moderate', 'severe'],
+                         'inflammation', 'infection'),
+        'duration': pick(['less than 24 hours', '1-2 days', '3-7 days'],
+                         ['1 week+', '2 weeks+'], 'chronic_condition'),
+        'affected_area': rng.choice(AREAS),
+        'movement_difficulty': pick(['none', 'mild', 'moderate'], ['severe', 'unable'],
+                                    'acute_trauma'),
+        'redness': pick(['no', 'no', 'yes'], ['yes'], 'inflammation', 'infection'),
+        'warmth': pick(['no', 'no', 'yes'], ['yes'], 'inflammation', 'infection'),
+    }
+
+    parts = []
+    for label in labels:
+        parts.extend(rng.sample(PHRASES[label], rng.randint(1, 3)))
+    parts.extend(rng.sample(DISTRACTORS, rng.randint(0, 4)))
+    rng.shuffle(parts)
+    responses['additional_notes'] = ". ".join(parts) if parts else None
+
+    return responses, labels
+
+
+def synthetic_examples(n: int, seed: int = 0) -> List[Tuple[Dict, List[str]]]:
+    rng = random.Random(seed)
+    return [synthetic_example(rng) for _ in range(n)]
+
+
+def load_examples(path: str) -> List[Tuple[Dict, List[str]]]:
+    with open(path) as f:
+        return [(row["responses"], row["patterns"])
+                for row in map(json.loads, f) if row]
+
+
+def encode(examples, hash_bits: int, labels: List[str]):
+    """Feature index lists and a 0/1 label matrix"""
+    features = [feature_indices(r, hash_bits) for r, _ in examples]
+    y = np.zeros((len(examples), len(labels)), dtype=np.float32)
+    for i, (_, patterns) in enumerate(examples):
+        for p in patterns:
+            if p in labels:
+                y[i, labels.index(p)] = 1
+    return features, y
+
+
+def train(features, y, hash_bits: int, epochs: int, lr: float, l2: float,
+          batch_size: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mini-batch SGD on the logistic loss with sparse gradient updates"""
+    n, n_labels = y.shape
+    weights = np.zeros((1 << hash_bits, n_labels), dtype=np.float32)
+    bias = np.zeros(n_labels, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+
+    for _ in range(epochs):
+        order = rng.permutation(n)
+        for start in range(0, n, batch_size):
+            batch = order[start:start + batch_size]
+            idx = [features[i] for i in batch]
+            counts = np.array([len(i) for i in idx])
+            flat = np.concatenate(idx)
+            rows = np.repeat(np.arange(len(batch)), counts)
+
+            logits = np.tile(bias, (len(batch), 1))
+            np.add.at(logits, rows, weights[flat])
+            grad = 1.0 / (1.0 + np.exp(-logits)) - y[batch]
+
+            touched = np.unique(flat)
+            weights[touched] *= (1 - lr * l2)
+            np.add.at(weights, flat, (-lr / len(batch)) * grad[rows])
+            bias -= lr * grad.mean(axis=0)
+
+    return weights, bias
+
+
+def evaluate(predicted: List[List[str]], examples, labels: List[str]) -> Dict:
+    """Exact-match accuracy and per-label precision/recall/F1"""
+    exact = sum(set(p) - {'general_injury'} == set(truth)
+                for p, (_, truth) in zip(predicted, examples)) / len(examples)
+    per_label = {}
+    for label in labels:
+        tp = sum(label in p and label in t for p, (_, t) in zip(predicted, examples))
+        fp = sum(label in p and label not in t for p, (_, t) in zip(predicted, examples))
+        fn = sum(label not in p and label in t for p, (_, t) in zip(predicted, examples))
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_label[label] = {"precision": round(precision, 3), "recall": round(recall, 3),
+                            "f1": round(f1, 3)}
+    macro_f1 = sum(v["f1"] for v in per_label.values()) / len(labels)
+    return {"exact_match": round(exact, 4), "macro_f1": round(macro_f1, 4),
+            "per_label": per_label}
+
+
+def tune_thresholds(model: HashedPatternModel, examples, y: np.ndarray) -> np.ndarray:
+    """Per-label probability threshold that maximizes F1 on held-out data"""
+    probs = model.predict_proba_batch([r for r, _ in examples])
+    grid = np.arange(0.2, 0.81, 0.05)
+    thresholds = []
+    for j in range(y.shape[1]):
+        best, best_f1 = 0.5, -1.0
+        for t in grid:
+            pred = probs[:, j] >= t
+            tp = np.sum(pred & (y[:, j] == 1))
+            f1 = 2 * tp / (pred.sum() + y[:, j].sum()) if pred.sum() + y[:, j].sum() else 0
+            if f1 > best_f1:
+                best, best_f1 = float(t), f1
+        thresholds.append(best)
+    return np.array(thresholds, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default=None,
+                        help="labelled JSONL (default: synthetic corpus)")
+    parser.add_argument("--synthetic", type=int, default=20000,
+                        help="synthetic examples to generate without --data")
+    parser.add_argument("--output", default=PATTERN_MODEL_PATH,
+                        help="artifact prefix (writes .npy and .json)")
+    parser.add_argument("--hash-bits", type=int, default=14)
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--lr", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    examples = (load_examples(args.data) if args.data
+                else synthetic_examples(args.synthetic, args.seed))
+    random.Random(args.seed).shuffle(examples)
+    split = int(len(examples) * (1 - args.holdout))
+    train_set, holdout = examples[:split], examples[split:]
+    # Thresholds are tuned on a slice of the training data, never the holdout
+    tune_split = int(len(train_set) * 0.9)
+    train_set, validation = train_set[:tune_split], train_set[tune_split:]
+
+    started = time.perf_counter()
+    features, y = encode(train_set, args.hash_bits, LABELS)
+    weights, bias = train(features, y, args.hash_bits, args.epochs, args.lr,
+                          args.l2, args.batch_size, args.seed)
+    model = HashedPatternModel(weights, bias, LABELS, args.hash_bits)
+
+    _, y_validation = encode(validation, args.hash_bits, LABELS)
+    model.thresholds = tune_thresholds(model, validation, y_validation)
+    elapsed = time.perf_counter() - started
+
+    rows = [r for r, _ in holdout]
+    metrics = {
+        "model": evaluate(model.predict_batch(rows), holdout, LABELS),
+        "rules": evaluate(RULES.predict_batch(rows), holdout, LABELS),
+    }
+
+    prefix = resolve_model_path(args.output)
+    model.save(prefix, extra={
+        "version": prefix.rsplit("/", 1)[-1],
+        "trained_at": datetime.utcnow().isoformat(),
+        "training": {"source": args.data or f"synthetic:{args.synthetic}:seed={args.seed}",
+                     "examples": len(train_set), "validation": len(validation),
+                     "holdout": len(holdout), "hash_bits": args.hash_bits,
+                     "epochs": args.epochs, "lr": args.lr, "l2": args.l2},
+        "metrics": metrics,
+    })
+
+    print(f"Trained on {len(train_set)} examples in {elapsed:.1f}s -> {prefix}.npy/.json")
+    for name, m in metrics.items():
+        print(f"  {name:6s} exact match {m['exact_match']:.3f}  macro F1 {m['macro_f1']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
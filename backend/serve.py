@@ -0,0 +1,223 @@
+"""
+Production Launcher
+===================
+Runs the API with several worker processes:
+
+1. Imports main (the app, services and models) once, in this process
+2. Runs the one-time init (schema, mock doctors, cache trimming) here,
+   under the init lock, builds the lazy services (main.warm_up), then
+   closes the pooled DB connections
+3. Binds the listening socket and forks the workers. They inherit the
+   loaded app, so read-only data (model weights, templates) is shared
+   copy-on-write instead of loaded N times. The init is already marked
+   done in every worker.
+4. On SIGTERM or SIGINT, forwards SIGTERM to the workers. Each one stops
+   accepting connections and lets in-flight requests finish, for up to
+   SERVE_GRACEFUL_SECONDS. Workers still running after that are killed.
+
+A worker that dies unexpectedly is replaced. Replacements are rate-limited
+so a worker that crashes on startup does not spin.
+
+/metrics covers all the workers, whichever one answers: they snapshot their
+metrics into METRICS_DIR (default: a temporary directory removed on exit)
+and the launcher folds the counters of exited workers into it (see
+metrics.py).
+
+Workers: --workers, else WEB_CONCURRENCY, else one per CPU core this
+process may run on (cgroup affinity), capped at SERVE_MAX_WORKERS. With more
+than one worker, STATE_BACKEND defaults to sqlite so chat sessions and
+idempotency keys are shared (see services/shared_state.py).
+
+Usage:
+    python serve.py --port $PORT
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+Needs fork (Linux, macOS). For development use `python main.py`.
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import metrics
+
+SERVE_MAX_WORKERS = int(os.getenv("SERVE_MAX_WORKERS", "16"))
+SERVE_GRACEFUL_SECONDS = float(os.getenv("SERVE_GRACEFUL_SECONDS", "30"))
+# At most this many replacements per worker slot per minute
+SERVE_RESTARTS_PER_MINUTE = 5
+
+
+def default_workers() -> int:
+    """WEB_CONCURRENCY, else the usable CPU cores (capped)"""
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:   # macOS
+        cores = os.cpu_count() or 1
+    return max(1, min(cores, SERVE_MAX_WORKERS))
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def metrics_dir() -> str:
+    """METRICS_DIR emptied of a previous run's snapshots, else a new temporary directory"""
+    directory = os.getenv("METRICS_DIR")
+    if not directory:
+        return tempfile.mkdtemp(prefix="medidoctor-metrics-")
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith((".json", ".tmp")):
+            os.remove(os.path.join(directory, name))
+    return directory
+
+
+def preload():
+    """Import the app and run the one-time init in this (parent) process"""
+    import main
+    from database import dispose_engines
+
+    async def init():
+        await main.one_time_init.run()
+        await dispose_engines()
+
+    asyncio.run(init())
+    main.warm_up()
+    return main.app
+
+
+def run_worker(app, sock: socket.socket, args):
+    """Worker body (in the forked child); never returns"""
+    import uvicorn
+
+    # Own process group: a terminal Ctrl+C reaches only the launcher, which
+    # then stops the workers once, gracefully
+    os.setpgrp()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    metrics.reset_after_fork()
+    metrics.registry.enable_multiprocess(args.metrics_dir)
+    config = uvicorn.Config(
+        app, log_level=args.log_level, proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        timeout_graceful_shutdown=SERVE_GRACEFUL_SECONDS)
+    server = uvicorn.Server(config)
+    code = 0
+    try:
+        server.run(sockets=[sock])
+    except BaseException:
+        code = 1
+    finally:
+        try:
+            metrics.registry.write_snapshot()
+        except Exception as e:
+            print(f"⚠️  Final metrics snapshot failed: {e}")
+        os._exit(code if server.started else 3)
+
+
+class Supervisor:
+    """Forks the workers, replaces dead ones and stops them on a signal"""
+
+    def __init__(self, app, sock: socket.socket, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, int] = {}   # pid -> slot
+        self.restarts: Dict[int, list] = {}   # slot -> recent restart times
+        self.stopping_since = None
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.app, self.sock, self.args)
+        self.workers[pid] = slot
+
+    def stop(self, signum, frame):
+        if self.stopping_since is None:
+            self.stopping_since = time.monotonic()
+            print(f"⏹️  {signal.Signals(signum).name}: draining {len(self.workers)} workers")
+            for pid in self.workers:
+                os.kill(pid, signal.SIGTERM)
+
+    def reap(self):
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            slot = self.workers.pop(pid, None)
+            if slot is not None:
+                metrics.retire_worker(self.args.metrics_dir, pid)
+            if slot is None or self.stopping_since is not None:
+                continue
+            print(f"⚠️  Worker {pid} exited ({os.waitstatus_to_exitcode(status)}); replacing")
+            now = time.monotonic()
+            recent = [t for t in self.restarts.get(slot, []) if now - t < 60]
+            if len(recent) >= SERVE_RESTARTS_PER_MINUTE:
+                print(f"❌ Worker slot {slot} keeps crashing; shutting down")
+                self.stop(signal.SIGTERM, None)
+                continue
+            self.restarts[slot] = recent + [now]
+            self.spawn(slot)
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for slot in range(self.args.workers):
+            self.spawn(slot)
+        print(f"✅ MediDoctor API serving on {self.args.host}:{self.args.port} "
+              f"with {self.args.workers} workers")
+
+        while self.workers:
+            self.reap()
+            if (self.stopping_since is not None
+                    and time.monotonic() - self.stopping_since > SERVE_GRACEFUL_SECONDS + 5):
+                for pid in self.workers:
+                    os.kill(pid, signal.SIGKILL)
+            time.sleep(0.1)
+        self.sock.close()
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MediDoctor production launcher")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None,
+                        help="default: WEB_CONCURRENCY or one per CPU core")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    args.workers = args.workers or default_workers()
+
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs fork(); use `python main.py` on this platform")
+    if args.workers > 1:
+        os.environ.setdefault("STATE_BACKEND", "sqlite")
+
+    app = preload()
+    sock = bind_socket(args.host, args.port)
+    args.metrics_dir = metrics_dir()
+    try:
+        code = Supervisor(app, sock, args).run()
+    finally:
+        if not os.getenv("METRICS_DIR"):
+            shutil.rmtree(args.metrics_dir, ignore_errors=True)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
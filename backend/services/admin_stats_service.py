@@ -0,0 +1,131 @@
+"""
+Admin Statistics Service
+========================
+Dashboard aggregates for the admin view.
+
+Every query the dashboard runs is built here, so the endpoint and the
+query-plan check (scripts/check_query_plans.py) exercise the same SQL.
+"""
+
+from typing import Dict
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Appointment, Doctor, ScanResult
+
+
+class AdminStatsService:
+    """
+    Builds and runs the admin dashboard queries.
+    Each query is shaped to be answered from an index (see models.py).
+    """
+
+    recent_limit = 10
+
+    def total_scans_query(self):
+        return select(func.count(ScanResult.id))
+
+    def total_appointments_query(self):
+        return select(func.count(Appointment.id))
+
+    def risk_distribution_query(self):
+        return (
+            select(ScanResult.risk_level, func.count(ScanResult.id))
+            .group_by(ScanResult.risk_level)
+        )
+
+    def injury_distribution_query(self):
+        return (
+            select(ScanResult.injury_type, func.count(ScanResult.id))
+            .group_by(ScanResult.injury_type)
+        )
+
+    def recent_scans_query(self):
+        # Only the columns the dashboard shows, all held by ix_scan_results_recent
+        return (
+            select(
+                ScanResult.id,
+                ScanResult.injury_type,
+                ScanResult.risk_level,
+                ScanResult.confidence_score,
+                ScanResult.created_at
+            )
+            .order_by(ScanResult.created_at.desc())
+            .limit(self.recent_limit)
+        )
+
+    def recent_appointments_query(self):
+        # Single join instead of one doctor lookup per appointment
+        return (
+            select(Appointment, Doctor.name, Doctor.hospital)
+            .outerjoin(Doctor, Doctor.id == Appointment.doctor_id)
+            .order_by(Appointment.created_at.desc())
+            .limit(self.recent_limit)
+        )
+
+    def endpoint_queries(self) -> Dict[str, object]:
+        """All dashboard queries by name, for plan inspection"""
+        return {
+            "admin.total_scans": self.total_scans_query(),
+            "admin.total_appointments": self.total_appointments_query(),
+            "admin.risk_distribution": self.risk_distribution_query(),
+            "admin.injury_distribution": self.injury_distribution_query(),
+            "admin.recent_scans": self.recent_scans_query(),
+            "admin.recent_appointments": self.recent_appointments_query(),
+        }
+
+    async def get_stats(self, db: AsyncSession) -> Dict:
+        """
+        Collect dashboard statistics.
+
+        Returns:
+            dict matching AdminStatsResponse
+        """
+        total_scans = await db.scalar(self.total_scans_query())
+        total_appointments = await db.scalar(self.total_appointments_query())
+
+        risk_counts = (await db.execute(self.risk_distribution_query())).all()
+        risk_distribution = {level: count for level, count in risk_counts}
+
+        injury_counts = (await db.execute(self.injury_distribution_query())).all()
+        injury_distribution = {itype: count for itype, count in injury_counts}
+
+        recent_scans = (await db.execute(self.recent_scans_query())).all()
+        recent_scans_data = [
+            {
+                "id": scan.id,
+                "injury_type": scan.injury_type,
+                "risk_level": scan.risk_level,
+                "confidence": scan.confidence_score,
+                "timestamp": scan.created_at.isoformat()
+            }
+            for scan in recent_scans
+        ]
+
+        recent_appointments = (
+            await db.execute(self.recent_appointments_query())).all()
+        recent_appointments_data = [
+            {
+                "id": apt.id,
+                "patient_name": apt.patient_name,
+                "patient_phone": apt.patient_phone,
+                "appointment_slot": apt.appointment_slot,
+                "injury_type": apt.injury_type,
+                "token_number": apt.token_number,
+                "status": apt.status,
+                "created_at": apt.created_at.isoformat(),
+                "doctor_name": doctor_name or "Not Available",
+                "hospital": hospital or "Not Available"
+            }
+            for apt, doctor_name, hospital in recent_appointments
+        ]
+
+        return {
+            "total_scans": total_scans or 0,
+            "total_appointments": total_appointments or 0,
+            "risk_distribution": risk_distribution,
+            "injury_distribution": injury_distribution,
+            "recent_scans": recent_scans_data,
+            "recent_appointments": recent_appointments_data
+        }
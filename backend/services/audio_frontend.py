@@ -0,0 +1,357 @@
+"""
+Audio Decoding Front-End
+========================
+Turns uploaded voice notes into what a speech recognizer wants:
+mono 16 kHz float32 samples with leading/trailing silence removed.
+
+- probe(): true duration, sample rate, channels and bit depth from the WAV
+  (RIFF fmt/data chunks) or FLAC (STREAMINFO) header
+- decode_pcm(): WAV decoded natively with NumPy (8/16/24/32-bit PCM,
+  float32/64, WAVE_FORMAT_EXTENSIBLE); FLAC through the optional soundfile
+  package. Other containers (MP3, WebM, ...) are not decoded.
+- resample(): windowed-sinc anti-alias filter + linear interpolation,
+  vectorized over the whole signal
+- trim_silence(): energy VAD over 20 ms frames, threshold relative to the
+  loudest frame (AUDIO_VAD_THRESHOLD_DB)
+- audio_fingerprint(): content digest of the trimmed 16 kHz PCM, so the
+  same recording re-encoded losslessly (WAV vs FLAC, stereo copy of mono)
+  gets the same key; raw bytes are hashed when the format is not decoded
+
+AudioDecodePool runs process_audio_bytes in a pool of AUDIO_DECODE_WORKERS
+processes so decoding never blocks the event loop (0 = decode inline),
+and replaces the pool when a worker dies.
+"""
+
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np   # imported where used, so `import main` skips it
+
+TARGET_SAMPLE_RATE = 16000
+
+AUDIO_DECODE_WORKERS = int(os.getenv(
+    "AUDIO_DECODE_WORKERS", str(min(2, os.cpu_count() or 1))))
+AUDIO_VAD_THRESHOLD_DB = float(os.getenv("AUDIO_VAD_THRESHOLD_DB", "-35"))
+
+VAD_FRAME_MS = 20
+VAD_PADDING_MS = 100
+VAD_ENERGY_FLOOR = 1e-4   # RMS below this is silence whatever the peak
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+_soundfile = None
+
+
+def _load_soundfile():
+    """soundfile (cffi + libsndfile), imported on the first FLAC upload;
+    None when it is not installed"""
+    global _soundfile
+    if _soundfile is None:
+        try:
+            import soundfile
+        except ImportError:  # FLAC samples need libsndfile; headers are parsed without it
+            soundfile = False
+        _soundfile = soundfile
+    return _soundfile or None
+
+
+class UnsupportedAudio(ValueError):
+    """Audio that cannot be parsed or decoded"""
+
+
+def wav_layout(data: bytes) -> Dict:
+    """
+    fmt fields plus the byte range of the data chunk. Also works on the
+    start of a WAV still being streamed, once the data chunk header is in.
+    """
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise UnsupportedAudio("Not a RIFF/WAVE file")
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, offset)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            if size < 16 or len(data) < body + 16:
+                raise UnsupportedAudio("WAV fmt chunk is truncated")
+            audio_format, channels, sample_rate, _, block_align, bits = \
+                struct.unpack_from("<HHIIHH", data, body)
+            if not (channels and sample_rate and block_align and bits):
+                raise UnsupportedAudio(
+                    "WAV fmt chunk has a zero channel count, sample rate, "
+                    "block size or bit depth")
+            if audio_format == WAVE_FORMAT_EXTENSIBLE and size >= 26 and len(data) >= body + 26:
+                audio_format = struct.unpack_from("<H", data, body + 24)[0]
+            fmt = {"audio_format": audio_format, "channels": channels,
+                   "sample_rate": sample_rate, "block_align": block_align,
+                   "bits_per_sample": bits}
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise UnsupportedAudio("WAV data chunk before fmt chunk")
+            # Streaming writers leave the size as 0 or 0xFFFFFFFF
+            end = len(data) if size in (0, 0xFFFFFFFF) else min(len(data), body + size)
+            return {**fmt, "data_start": body, "data_end": end}
+        offset = body + size + (size & 1)
+
+    raise UnsupportedAudio("WAV file has no fmt/data chunk")
+
+
+def _flac_streaminfo(data: bytes) -> Dict:
+    if len(data) < 42 or data[:4] != b"fLaC" or data[4] & 0x7F != 0:
+        raise UnsupportedAudio("Not a FLAC file with STREAMINFO")
+    # 18 bytes in: 20 bits rate | 3 bits channels-1 | 5 bits bps-1 | 36 bits frames
+    packed = int.from_bytes(data[18:26], "big")
+    if packed >> 44 == 0:
+        raise UnsupportedAudio("FLAC STREAMINFO has a zero sample rate")
+    return {
+        "sample_rate": packed >> 44,
+        "channels": ((packed >> 41) & 0x7) + 1,
+        "bits_per_sample": ((packed >> 36) & 0x1F) + 1,
+        "frames": packed & 0xFFFFFFFFF,
+    }
+
+
+def probe(data: bytes) -> Dict:
+    """
+    Container metadata from the header.
+
+    Returns:
+        dict with format, sample_rate, channels, bits_per_sample, frames and
+        duration_seconds (None for formats that are not parsed)
+    """
+    if data[:4] == b"RIFF":
+        layout = wav_layout(data)
+        frames = (layout["data_end"] - layout["data_start"]) // layout["block_align"]
+        info = {"format": "wav", "sample_rate": layout["sample_rate"],
+                "channels": layout["channels"],
+                "bits_per_sample": layout["bits_per_sample"], "frames": frames}
+    elif data[:4] == b"fLaC":
+        info = {"format": "flac", **_flac_streaminfo(data)}
+    else:
+        return {"format": None, "sample_rate": None, "channels": None,
+                "bits_per_sample": None, "frames": None, "duration_seconds": None}
+
+    info["duration_seconds"] = (info["frames"] / info["sample_rate"]
+                                if info["sample_rate"] and info["frames"] else None)
+    return info
+
+
+def _decode_wav(data: bytes) -> Tuple["np.ndarray", int]:
+    import numpy as np
+
+    layout = wav_layout(data)
+    channels = layout["channels"]
+    bits = layout["bits_per_sample"]
+    width = bits // 8
+    if width == 0:
+        raise UnsupportedAudio(f"Unsupported WAV bit depth ({bits} bit)")
+    raw = data[layout["data_start"]:layout["data_end"]]
+    raw = raw[:len(raw) - len(raw) % (width * channels)]
+
+    if layout["audio_format"] == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(raw, dtype="<f4" if bits == 32 else "<f8").astype(np.float32)
+    elif layout["audio_format"] == WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif layout["audio_format"] == WAVE_FORMAT_PCM and bits == 16:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif layout["audio_format"] == WAVE_FORMAT_PCM and bits == 24:
+        triplets = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = triplets[:, 0] | (triplets[:, 1] << 8) | (triplets[:, 2] << 16)
+        values = np.where(values & 0x800000, values - (1 << 24), values)
+        samples = values.astype(np.float32) / (1 << 23)
+    elif layout["audio_format"] == WAVE_FORMAT_PCM and bits == 32:
+        samples = (np.frombuffer(raw, dtype="<i4") / float(1 << 31)).astype(np.float32)
+    else:
+        raise UnsupportedAudio(
+            f"Unsupported WAV encoding (format {layout['audio_format']}, {bits} bit)")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return samples, layout["sample_rate"]
+
+
+def decode_pcm(data: bytes) -> Tuple["np.ndarray", int]:
+    """Mono float32 samples in [-1, 1] and their sample rate"""
+    import numpy as np
+
+    if data[:4] == b"RIFF":
+        return _decode_wav(data)
+    if data[:4] == b"fLaC":
+        soundfile = _load_soundfile()
+        if soundfile is None:
+            raise UnsupportedAudio("FLAC decoding needs the soundfile package")
+        samples, rate = soundfile.read(io.BytesIO(data), dtype="float32", always_2d=True)
+        return samples.mean(axis=1, dtype=np.float32), rate
+    raise UnsupportedAudio("Only WAV and FLAC audio can be decoded")
+
+
+def _lowpass_kernel(cutoff: float, half_width: int) -> "np.ndarray":
+    """Hann-windowed sinc; cutoff in cycles per sample (< 0.5)"""
+    import numpy as np
+
+    n = np.arange(-half_width, half_width + 1)
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hanning(2 * half_width + 1)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(samples: "np.ndarray", sample_rate: int,
+             target_rate: int = TARGET_SAMPLE_RATE) -> "np.ndarray":
+    """Resample a mono signal; low-pass first when downsampling"""
+    import numpy as np
+
+    if sample_rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+
+    if sample_rate > target_rate:
+        ratio = target_rate / sample_rate
+        half_width = int(np.ceil(8 / ratio))
+        samples = np.convolve(samples, _lowpass_kernel(0.5 * ratio * 0.95, half_width),
+                              mode="same")
+
+    n_out = int(round(len(samples) * target_rate / sample_rate))
+    positions = np.arange(n_out) * (sample_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def trim_silence(samples: "np.ndarray", sample_rate: int,
+                 threshold_db: float = AUDIO_VAD_THRESHOLD_DB) -> Tuple[int, int]:
+    """
+    Energy VAD: [start, end) sample range from the first to the last voiced
+    frame, padded by VAD_PADDING_MS. (0, 0) when nothing is voiced.
+    """
+    import numpy as np
+
+    frame =max(1, sample_rate * VAD_FRAME_MS // 1000)
+    n_frames = -(-len(samples) // frame)
+    if n_frames == 0:
+        return 0, 0
+
+    padded = np.zeros(n_frames * frame, dtype=np.float32)
+    padded[:len(samples)] = samples
+    energy = np.sqrt(np.mean(padded.reshape(n_frames, frame) ** 2, axis=1))
+    threshold = max(VAD_ENERGY_FLOOR, float(energy.max()) * 10 ** (threshold_db / 20))
+    voiced = np.flatnonzero(energy > threshold)
+    if len(voiced) == 0:
+        return 0, 0
+
+    pad = VAD_PADDING_MS // VAD_FRAME_MS
+    start = max(0, voiced[0] - pad) * frame
+    end = min(len(samples), (voiced[-1] + 1 + pad) * frame)
+    return int(start), int(end)
+
+
+def audio_fingerprint(data: bytes, samples: Optional["np.ndarray"]) -> str:
+    """
+    "pcm:<digest>" of the samples quantized to 16 bits (absorbs float
+    rounding between decoders), or "raw:<digest>" of the file bytes
+    """
+    if samples is None:
+        return "raw:" + hashlib.blake2b(data, digest_size=16).hexdigest()
+    import numpy as np
+
+    pcm = np.round(np.clip(samples, -1, 1) * 32767).astype("<i2")
+    return "pcm:" + hashlib.blake2b(pcm.tobytes(), digest_size=16).hexdigest()
+
+
+def process_audio_bytes(data: bytes) -> Dict:
+    """
+    Full front-end for one recording (runs in the decode pool).
+
+    Returns:
+        probe() fields plus decoded (bool), error, samples (16 kHz mono
+        float32 speech span or None), speech_seconds, leading_silence,
+        trailing_silence, fingerprint and cpu_seconds
+
+    Raises:
+        UnsupportedAudio: a WAV or FLAC header that cannot be parsed. Other
+        containers, and encodings the decoder does not handle, come back
+        undecoded with error set so the transcriber can decide.
+    """
+    started = time.process_time()
+    info = probe(data)
+
+    result = {**info, "decoded": False, "samples": None, "speech_seconds": None,
+              "leading_silence": None, "trailing_silence": None, "error": None}
+    if info["format"] is not None:
+        try:
+            samples, rate = decode_pcm(data)
+            samples = resample(samples, rate)
+            start, end = trim_silence(samples, TARGET_SAMPLE_RATE)
+            total = len(samples) / TARGET_SAMPLE_RATE
+            result.update({
+                "decoded": True,
+                "samples": samples[start:end],
+                "speech_seconds": (end - start) / TARGET_SAMPLE_RATE,
+                "leading_silence": start / TARGET_SAMPLE_RATE,
+                "trailing_silence": total - end / TARGET_SAMPLE_RATE,
+            })
+            if result["duration_seconds"] is None:
+                result["duration_seconds"] = len(samples) / TARGET_SAMPLE_RATE
+        except UnsupportedAudio as e:
+            result["error"] = str(e)
+
+    result["fingerprint"] = audio_fingerprint(data, result["samples"])
+    result["cpu_seconds"] = time.process_time() - started
+    return result
+
+
+class AudioDecodePool:
+    """
+    Process pool for the audio front-end. Uses the spawn start method so
+    workers never inherit the server's event loop or database connections.
+    A worker that dies breaks the whole pool; the pool is rebuilt and the
+    recording decoded once more, and if that fails too the request fails.
+    """
+
+    def __init__(self, workers: int = AUDIO_DECODE_WORKERS):
+        self.workers = workers
+        self.restarts = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _spawn(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"))
+
+    def start(self):
+        if self.workers > 0 and self._executor is None:
+            self._executor = self._spawn()
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace a broken executor (once, however many requests saw it break)"""
+        if self._executor is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._spawn()
+        self.restarts += 1
+        print("⚠️  Audio decode worker died - pool restarted")
+
+    async def process(self, data: bytes) -> Dict:
+        """process_audio_bytes in a worker (inline if the pool is not running)"""
+        if self._executor is None:
+            return process_audio_bytes(data)
+        loop = asyncio.get_running_loop()
+        for _ in range(2):
+            executor = self._executor
+            try:
+                return await loop.run_in_executor(executor, process_audio_bytes, data)
+            except BrokenProcessPool:
+                self._restart(executor)
+        raise UnsupportedAudio("The audio decode worker crashed twice on this recording")
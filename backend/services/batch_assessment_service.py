@@ -0,0 +1,52 @@
+"""
+Batch Health Assessment Service
+===============================
+Scores thousands of questionnaires at once for screening campaigns.
+
+Pattern detection runs once over the whole batch through the pattern
+model's predict_batch (NumPy, see services/pattern_model.py). Each row's
+canonical key then selects an analysis template from
+HealthAssessmentService's memoized templates, which already hold the
+rule-based risk score, level, urgency and confidence, so rows sharing a
+key (most of a screening batch) are scored once and a batch produces
+exactly the same analyses as the single-questionnaire endpoint.
+"""
+
+import random
+from datetime import datetime
+from typing import Dict, List
+
+from services.health_assessment_service import HealthAssessmentService
+
+
+class BatchAssessmentService:
+    """
+    Batch front-end to HealthAssessmentService.
+    """
+
+    def __init__(self, assessment_service: HealthAssessmentService):
+        self.assessment_service = assessment_service
+
+    def analyze_batch(self, rows: List[Dict]) -> List[Dict]:
+        """
+        Analyze many questionnaires.
+
+        Args:
+            rows: questionnaire dicts (same shape as HealthAssessmentRequest)
+
+        Returns:
+            one analysis per row, in order, shaped like analyze_questionnaire
+        """
+        if not rows:
+            return []
+
+        service = self.assessment_service
+        patterns = service.detect_patterns_batch(rows)
+        timestamp = datetime.now().isoformat()
+        results = []
+        for row, row_patterns in zip(rows, patterns):
+            result = service.result_for_key(service.canonical_key(row, row_patterns))
+            result["analysis_id"] = random.randint(10000, 99999)
+            result["timestamp"] = timestamp
+            results.append(result)
+        return results
@@ -0,0 +1,72 @@
+"""
+Chat Responders
+===============
+Produce the assistant's reply for a detected intent, as a stream of text
+chunks, so /api/chat/stream can forward each chunk as soon as it exists.
+
+- ChatResponder: the interface. stream() is an async generator; the
+  consumer closes it (aclose) when the client goes away, so a generative
+  backend can stop decoding in its finally block. respond() is the whole
+  reply for the non-streaming /api/chat; by default it joins stream(), so
+  both endpoints answer from the same responder.
+- TemplateResponder: the current rule-based templates, streamed word by
+  word; respond() skips the chunking.
+"""
+
+import asyncio
+import random
+import re
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional
+
+FALLBACK_RESPONSE = "I understand your concern. Could you provide more details about your symptoms so I can assist you better?"
+
+
+class ChatResponder:
+    """Generates the reply text for one user message"""
+
+    def stream(self, intent: str, message: str,
+               context: Optional[Dict]) -> AsyncIterator[str]:
+        """Async generator yielding the reply in chunks as they are produced"""
+        raise NotImplementedError
+
+    async def respond(self, intent: str, message: str, context: Optional[Dict]) -> str:
+        """The whole reply"""
+        chunks = []
+        async with aclosing(self.stream(intent, message, context)) as reply:
+            async for chunk in reply:
+                chunks.append(chunk)
+        return "".join(chunks)
+
+
+class TemplateResponder(ChatResponder):
+    """Random template per intent, plus a risk note from the context"""
+
+    def __init__(self, responses: Dict[str, List[str]]):
+        self.responses = responses
+
+    def compose(self, intent: str, message: str, context: Optional[Dict]) -> str:
+        """Generate contextual AI response"""
+
+        if intent in self.responses:
+            base_response = random.choice(self.responses[intent])
+        else:
+            base_response = FALLBACK_RESPONSE
+
+        # Enhance response with context if available
+        if context and 'risk_level' in context:
+            risk_addendum = f"\n\nBased on your previous assessment, your risk level was {context['risk_level']}. "
+            if context['risk_level'] == 'HIGH':
+                risk_addendum += "I strongly recommend seeking immediate medical attention."
+            base_response += risk_addendum
+
+        return base_response
+
+    async def respond(self, intent: str, message: str, context: Optional[Dict]) -> str:
+        return self.compose(intent, message, context)
+
+    async def stream(self, intent: str, message: str,
+                     context: Optional[Dict]) -> AsyncIterator[str]:
+        for chunk in re.findall(r"\S+\s*|\s+", self.compose(intent, message, context)):
+            yield chunk
+            await asyncio.sleep(0)  # let other requests (and cancellation) in
@@ -2,11 +2,28 @@
 AI Chat Service for Health Conversations
 =========================================
 Rule-based and AI-powered chat for health queries
+
+Conversations are kept per session (services/chat_store.py): a bounded
+window of recent messages per session id with idle expiry, either in this
+process or in the shared state every worker sees.
+
+Intents come from the hashed n-gram model in services/intent_model.py
+(INTENT_MODEL_PATH) with calibrated confidences, or from the keyword
+lists below when no model artifact is available.
+
+Replies come from a ChatResponder (services/chat_responder.py).
+stream_message() forwards the reply chunk by chunk for /api/chat/stream;
+process_message() answers /api/chat in one piece from the same responder.
 """
 
-from typing import List, Dict, Optional
-import random
+from contextlib import aclosing
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Union
 from datetime import datetime
+import uuid
+
+from services.chat_responder import ChatResponder, TemplateResponder
+from services.chat_store import ChatSessionStore, SharedChatSessionStore
+from services.intent_model import INTENT_MODEL_PATH, RuleIntentModel, load_intent_model
 
 
 class ChatService:
@@ -15,7 +32,9 @@ class ChatService:
     Combines rule-based responses with AI-generated advice.
     """
 
-    def __init__(self):
+    def __init__(self, sessions: Optional[Union[ChatSessionStore, SharedChatSessionStore]] = None,
+                 responder: Optional[ChatResponder] = None,
+                 intent_model_path: Optional[str] = INTENT_MODEL_PATH):
         # Intent classification patterns
         self.intents = {
             'pain_query': ['pain', 'hurt', 'ache', 'sore', 'painful'],
@@ -27,6 +46,10 @@ class ChatService:
             'greeting': ['hello', 'hi', 'hey', 'greetings', 'good morning', 'good afternoon']
         }
 
+        # Trained intent classifier, keyword lists as the fallback
+        self.rule_intents = RuleIntentModel(self.intents)
+        self.intent_model = load_intent_model(intent_model_path) or self.rule_intents
+
         # Response templates for different intents
         self.responses = {
             'greeting': [
@@ -56,26 +79,33 @@ class ChatService:
             ]
         }
 
-        # Conversation history
-        self.conversation_history: List[Dict] = []
+        # Conversation history per session
+        self.sessions = sessions if sessions is not None else ChatSessionStore()
 
-    def process_message(self, user_message: str, context: Optional[Dict] = None) -> Dict:
+        # Reply generation for both endpoints: templates, unless a
+        # (generative) responder is plugged in
+        self.responder = responder if responder is not None else TemplateResponder(self.responses)
+
+    async def process_message(self, user_message: str, context: Optional[Dict] = None,
+                              session_id: Optional[str] = None) -> Dict:
         """
         Process user message and generate AI response.
 
         Args:
             user_message: User's input message
             context: Optional context (previous assessment data, etc.)
+            session_id: Conversation to continue; a new session is started
+                        when None or unknown/expired
 
         Returns:
             Dict with AI response, intent, confidence, and suggestions
         """
 
-        # Detect intent using pattern matching
-        detected_intent = self._detect_intent(user_message)
+        # Detect intent with the intent classifier
+        detected_intent, confidence = self._classify(user_message)
 
         # Generate response based on intent
-        response_text = self._generate_response(
+        response_text = await self.responder.respond(
             detected_intent, user_message, context)
 
         # Extract any health-related entities
@@ -85,57 +115,85 @@ class ChatService:
         follow_up_questions = self._generate_follow_up(
             detected_intent, entities)
 
-        # Store in conversation history
-        conversation_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "user_message": user_message,
-            "detected_intent": detected_intent,
-            "ai_response": response_text,
-            "entities": entities
-        }
-        self.conversation_history.append(conversation_entry)
+        # Store in the session's conversation history
+        session_id, sequence = await self._record(
+            session_id, user_message, detected_intent, response_text, entities)
 
         return {
             "response": response_text,
             "intent": detected_intent,
-            "confidence": round(random.uniform(0.85, 0.95), 2),
+            "confidence": round(confidence, 2),
             "follow_up_questions": follow_up_questions,
             "entities_detected": entities,
             "timestamp": datetime.now().isoformat(),
-            "conversation_id": len(self.conversation_history)
+            "session_id": session_id,
+            "conversation_id": sequence
         }
 
-    def _detect_intent(self, message: str) -> str:
-        """Detect user intent from message using rule-based NLP"""
-        message_lower = message.lower()
+    async def stream_message(self, user_message: str, context: Optional[Dict] = None,
+                             session_id: Optional[str] = None
+                             ) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Streaming version of process_message, yielding (event, data):
 
-        intent_scores = {}
-        for intent, keywords in self.intents.items():
-            score = sum(1 for keyword in keywords if keyword in message_lower)
-            if score > 0:
-                intent_scores[intent] = score
+        - ("meta", {session_id, intent, entities_detected}) before any text
+        - ("token", {text}) for each chunk the responder produces
+        - ("done", {follow_up_questions, confidence, timestamp, conversation_id})
 
-        if intent_scores:
-            return max(intent_scores, key=intent_scores.get)
+        The exchange is stored once the reply is complete. If the consumer
+        closes the stream early (client disconnected), the responder is
+        closed too and nothing is stored.
+        """
+        detected_intent, confidence = self._classify(user_message)
+        entities = self._extract_entities(user_message)
+        # The session itself is created (or renewed) when the exchange is stored
+        session_id = session_id or uuid.uuid4().hex
 
-        return 'general_query'
+        yield "meta", {
+            "session_id": session_id,
+            "intent": detected_intent,
+            "entities_detected": entities
+        }
 
-    def _generate_response(self, intent: str, message: str, context: Optional[Dict]) -> str:
-        """Generate contextual AI response"""
+        chunks = []
+        async with aclosing(self.responder.stream(
+                detected_intent, user_message, context)) as reply:
+            async for chunk in reply:
+                chunks.append(chunk)
+                yield "token", {"text": chunk}
 
-        if intent in self.responses:
-            base_response = random.choice(self.responses[intent])
-        else:
-            base_response = "I understand your concern. Could you provide more details about your symptoms so I can assist you better?"
+        _, sequence = await self._record(
+            session_id, user_message, detected_intent, "".join(chunks), entities)
 
-        # Enhance response with context if available
-        if context and 'risk_level' in context:
-            risk_addendum = f"\n\nBased on your previous assessment, your risk level was {context['risk_level']}. "
-            if context['risk_level'] == 'HIGH':
-                risk_addendum += "I strongly recommend seeking immediate medical attention."
-            base_response += risk_addendum
+        yield "done", {
+            "follow_up_questions": self._generate_follow_up(detected_intent, entities),
+            "confidence": round(confidence, 2),
+            "timestamp": datetime.now().isoformat(),
+            "conversation_id": sequence
+        }
+
+    async def _record(self, session_id: Optional[str], user_message: str, intent: str,
+                      response_text: str, entities: Dict) -> Tuple[str, int]:
+        """Append one exchange to the session; returns (session id, sequence number)"""
+        return await self.sessions.record(session_id, {
+            "timestamp": datetime.now().isoformat(),
+            "user_message": user_message,
+            "detected_intent": intent,
+            "ai_response": response_text,
+            "entities": entities
+        })
 
-        return base_response
+    def _classify(self, message: str) -> Tuple[str, float]:
+        """(intent, confidence); confidence is calibrated for the trained model"""
+        return self.intent_model.classify(message)
+
+    def classify_batch(self, messages: List[str]) -> List[Dict]:
+        """
+        Intents for many messages at once (offline log analysis); the
+        trained model scores the whole batch in one pass.
+        """
+        return [{"intent": intent, "confidence": confidence}
+                for intent, confidence in self.intent_model.classify_batch(messages)]
 
     def _extract_entities(self, message: str) -> Dict:
         """Extract health-related entities from message"""
@@ -197,25 +255,30 @@ class ChatService:
 
         return questions[:2]  # Return max 2 follow-up questions
 
-    def get_conversation_summary(self) -> Dict:
-        """Get summary of conversation for analysis"""
-        return {
-            "total_messages": len(self.conversation_history),
-            "intents_discussed": list(set(entry["detected_intent"] for entry in self.conversation_history)),
-            "entities_mentioned": self._aggregate_entities(),
-            "conversation_history": self.conversation_history
-        }
-
-    def _aggregate_entities(self) -> Dict:
-        """Aggregate all entities mentioned in conversation"""
-        all_entities = {"body_parts": set(), "symptoms": set()}
-
-        for entry in self.conversation_history:
-            entities = entry.get("entities", {})
-            all_entities["body_parts"].update(entities.get("body_parts", []))
-            all_entities["symptoms"].update(entities.get("symptoms", []))
-
+    async def get_conversation_summary(self, session_id: str, limit: int = 20,
+                                       before: Optional[int] = None) -> Optional[Dict]:
+        """
+        Get summary of one session's conversation for analysis (None if the
+        session is unknown or expired). The summary fields are running
+        aggregates over every message; conversation_history is one page of
+        the retained window (see ChatSession.page).
+        """
+        session = await self.sessions.load(session_id)
+        if session is None:
+            return None
+        history, previous = session.page(limit, before)
         return {
-            "body_parts": list(all_entities["body_parts"]),
-            "symptoms": list(all_entities["symptoms"])
+            "session_id": session.session_id,
+            "total_messages": session.total_messages,
+            "history_depth": self.sessions.depth,
+            "intents_discussed": list(session.intent_counts),
+            "intent_counts": session.intent_counts,
+            "entities_mentioned": {
+                "body_parts": list(session.body_parts),
+                "symptoms": list(session.symptoms)
+            },
+            "first_message_at": session.first_timestamp,
+            "last_message_at": session.last_timestamp,
+            "conversation_history": history,
+            "previous_page_before": previous
         }
@@ -0,0 +1,333 @@
+"""
+Chat Session Store
+==================
+Per-session conversation state for ChatService, with bounded memory.
+
+- Each session keeps a ring buffer of its last CHAT_HISTORY_DEPTH messages,
+  plus running aggregates over all of its messages (count, intent counts,
+  body parts / symptoms mentioned, first and last timestamps) updated on
+  every append, so summaries never rescan the history
+- Sessions idle for CHAT_SESSION_IDLE_SECONDS are dropped
+- At most CHAT_MEMORY_MAX_MESSAGES messages are held in memory across all
+  sessions; past that the least recently used sessions spill to a SQLite
+  file (CHAT_SPILL_PATH) and are loaded back when the session returns
+
+Sessions are kept in an OrderedDict in last-active order, so idle eviction
+and LRU spill both pop from the front. Used from the event loop only.
+
+ChatSessionStore lives in one process. With several workers
+(STATE_BACKEND=sqlite or redis) SharedChatSessionStore keeps each session
+as one JSON value in services/shared_state.py instead. Every worker sees
+every message, and concurrent appends to one session never lose a message.
+Both stores offer the async record() / load() used by ChatService.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.shared_state import SharedState
+
+CHAT_HISTORY_DEPTH = int(os.getenv("CHAT_HISTORY_DEPTH", "50"))
+CHAT_SESSION_IDLE_SECONDS = float(os.getenv("CHAT_SESSION_IDLE_SECONDS", "1800"))
+CHAT_MEMORY_MAX_MESSAGES = int(os.getenv("CHAT_MEMORY_MAX_MESSAGES", "100000"))
+CHAT_SPILL_PATH = os.getenv("CHAT_SPILL_PATH", "chat_sessions.db")
+CHAT_SPILL_SWEEP_SECONDS = 60.0
+
+
+class ChatSession:
+    """One conversation: bounded message window plus running aggregates"""
+
+    __slots__ = ("session_id", "messages", "total_messages", "last_active",
+                 "intent_counts", "body_parts", "symptoms",
+                 "first_timestamp", "last_timestamp")
+
+    def __init__(self, session_id: str, depth: int, messages: Iterable[Dict] = (),
+                 total_messages: int = 0, last_active: Optional[float] = None):
+        self.session_id = session_id
+        self.messages = deque(messages, maxlen=depth)
+        self.total_messages = total_messages
+        self.last_active = last_active if last_active is not None else time.time()
+        self.intent_counts: Dict[str, int] = {}
+        # dicts as insertion-ordered sets: first mention first
+        self.body_parts: Dict[str, None] = {}
+        self.symptoms: Dict[str, None] = {}
+        self.first_timestamp: Optional[str] = None
+        self.last_timestamp: Optional[str] = None
+
+    def append(self, entry: Dict) -> int:
+        """Add a message and fold it into the aggregates; returns its
+        1-based sequence number in the session"""
+        self.messages.append(entry)
+        self.total_messages += 1
+
+        intent = entry["detected_intent"]
+        self.intent_counts[intent] = self.intent_counts.get(intent, 0) + 1
+        entities = entry.get("entities", {})
+        self.body_parts.update(dict.fromkeys(entities.get("body_parts", ())))
+        self.symptoms.update(dict.fromkeys(entities.get("symptoms", ())))
+        if self.first_timestamp is None:
+            self.first_timestamp = entry["timestamp"]
+        self.last_timestamp = entry["timestamp"]
+        return self.total_messages
+
+    def page(self, limit: int, before: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Up to limit messages (oldest first) with sequence numbers below
+        before (default: the newest), from the retained window.
+
+        Returns:
+            (messages with a "sequence" field, before-cursor for the
+            previous page or None when the window has no older messages)
+        """
+        first = self.total_messages - len(self.messages) + 1  # oldest retained
+        end = self.total_messages + 1
+        if before is not None:
+            end = max(first, min(before, end))
+        start = max(first, end - limit)
+        window = islice(self.messages, start - first, end - first)
+        page = [{"sequence": start + i, **entry} for i, entry in enumerate(window)]
+        return page, (start if start > first else None)
+
+    def to_dict(self) -> Dict:
+        return {
+            "messages": list(self.messages),
+            "total_messages": self.total_messages,
+            "intent_counts": self.intent_counts,
+            "body_parts": list(self.body_parts),
+            "symptoms": list(self.symptoms),
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+        }
+
+    @classmethod
+    def from_dict(cls, session_id: str, data: Dict, depth: int,
+                  last_active: float) -> "ChatSession":
+        session = cls(session_id, depth, data["messages"], data["total_messages"], last_active)
+        session.intent_counts = data["intent_counts"]
+        session.body_parts = dict.fromkeys(data["body_parts"])
+        session.symptoms = dict.fromkeys(data["symptoms"])
+        session.first_timestamp = data["first_timestamp"]
+        session.last_timestamp = data["last_timestamp"]
+        return session
+
+
+class ChatSessionStore:
+    """
+    Sessions by id. spill_path=None disables spilling: LRU sessions over
+    the memory cap are then dropped.
+    """
+
+    def __init__(self, depth: int = CHAT_HISTORY_DEPTH,
+                 idle_seconds: float = CHAT_SESSION_IDLE_SECONDS,
+                 max_messages: int = CHAT_MEMORY_MAX_MESSAGES,
+                 spill_path: Optional[str] = CHAT_SPILL_PATH):
+        self.depth = depth
+        self.idle_seconds = idle_seconds
+        self.max_messages = max_messages
+        self.spill_path = spill_path or None
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._messages_in_memory = 0
+        self._spill: Optional[sqlite3.Connection] = None
+        self._last_sweep = time.monotonic()
+        self._stats = {"created": 0, "expired": 0, "spilled": 0, "restored": 0, "dropped": 0}
+
+    # -- spill file -------------------------------------------------------
+
+    def _spill_db(self) -> sqlite3.Connection:
+        if self._spill is None:
+            self._spill = sqlite3.connect(self.spill_path, isolation_level=None)
+            # Overflow cache: losing it in a crash only loses old sessions
+            self._spill.execute("PRAGMA journal_mode=WAL")
+            self._spill.execute("PRAGMA synchronous=OFF")
+            self._spill.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "session_id TEXT PRIMARY KEY, last_active REAL NOT NULL, data TEXT NOT NULL)")
+            self._spill.execute(
+                "CREATE INDEX IF NOT EXISTS ix_chat_sessions_last_active "
+                "ON chat_sessions (last_active)")
+        return self._spill
+
+    def _spill_session(self, session: ChatSession):
+        if self.spill_path is None:
+            self._stats["dropped"] += 1
+            return
+        self._spill_db().execute(
+            "INSERT OR REPLACE INTO chat_sessions VALUES (?, ?, ?)",
+            (session.session_id, session.last_active, json.dumps(session.to_dict())))
+        self._stats["spilled"] += 1
+
+    def _restore(self, session_id: str) -> Optional[ChatSession]:
+        if self.spill_path is None:
+            return None
+        db = self._spill_db()
+        row = db.execute("SELECT last_active, data FROM chat_sessions WHERE session_id = ?",
+                         (session_id,)).fetchone()
+        if row is None:
+            return None
+        db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+        if row[0] < time.time() - self.idle_seconds:
+            self._stats["expired"] += 1
+            return None
+        self._stats["restored"] += 1
+        return ChatSession.from_dict(session_id, json.loads(row[1]), self.depth, row[0])
+
+    # -- eviction ---------------------------------------------------------
+
+    def _evict(self, keep: Optional[str] = None):
+        """Expire idle sessions, then spill LRU sessions over the memory cap"""
+        cutoff = time.time() - self.idle_seconds
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_active >= cutoff:
+                break
+            self._forget(session)
+            self._stats["expired"] += 1
+
+        while self._messages_in_memory > self.max_messages and len(self._sessions) > 1:
+            session = next(iter(self._sessions.values()))
+            if session.session_id == keep:
+                break
+            self._forget(session)
+            self._spill_session(session)
+
+        if (self._spill is not None
+                and time.monotonic() - self._last_sweep > CHAT_SPILL_SWEEP_SECONDS):
+            self._last_sweep = time.monotonic()
+            self._spill.execute("DELETE FROM chat_sessions WHERE last_active < ?", (cutoff,))
+
+    def _forget(self, session: ChatSession):
+        del self._sessions[session.session_id]
+        self._messages_in_memory -= len(session.messages)
+
+    # -- public -----------------------------------------------------------
+
+    def get(self, session_id: Optional[str], create: bool = True) -> Optional[ChatSession]:
+        """
+        The session with this id, marked active. Unknown or expired ids get
+        a fresh session (a new id when session_id is None), or None when
+        create is False.
+        """
+        session = self._sessions.get(session_id) if session_id else None
+        if session is not None and session.last_active < time.time() - self.idle_seconds:
+            self._forget(session)
+            self._stats["expired"] += 1
+            session = None
+        elif session is None and session_id:
+            session = self._restore(session_id)
+            if session is not None:
+                self._sessions[session_id] = session
+                self._messages_in_memory += len(session.messages)
+        if session is None:
+            if not create:
+                return None
+            session = ChatSession(session_id or uuid.uuid4().hex, self.depth)
+            self._sessions[session.session_id] = session
+            self._stats["created"] += 1
+
+        session.last_active = time.time()
+        self._sessions.move_to_end(session.session_id)
+        self._evict(keep=session.session_id)
+        return session
+
+    def append(self, session: ChatSession, entry: Dict) -> int:
+        """Add a message to a session from get(); returns its sequence number"""
+        before = len(session.messages)
+        sequence = session.append(entry)
+        self._messages_in_memory += len(session.messages) - before
+        self._evict(keep=session.session_id)
+        return sequence
+
+    async def record(self, session_id: Optional[str], entry: Dict) -> Tuple[str, int]:
+        """Append to the session (created when unknown or expired);
+        returns (session id, sequence number)"""
+        session = self.get(session_id)
+        return session.session_id, self.append(session, entry)
+
+    async def load(self, session_id: str) -> Optional[ChatSession]:
+        """The session, or None when unknown or expired"""
+        return self.get(session_id, create=False)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "local",
+            **self._stats,
+            "sessions_in_memory": len(self._sessions),
+            "messages_in_memory": self._messages_in_memory,
+            "max_messages": self.max_messages,
+            "history_depth": self.depth,
+        }
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+class SharedChatSessionStore:
+    """
+    Sessions as JSON values in a SharedState, one key per session. The TTL
+    is the idle timeout and every new message renews it. Appends go through
+    SharedState.update, so two workers appending to one session both land.
+    """
+
+    def __init__(self, state: SharedState, depth: int = CHAT_HISTORY_DEPTH,
+                 idle_seconds: float = CHAT_SESSION_IDLE_SECONDS):
+        self.state = state
+        self.depth = depth
+        self.idle_seconds = idle_seconds
+        self._stats = {"created": 0, "appended": 0}
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"chat:{session_id}"
+
+    async def record(self, session_id: Optional[str], entry: Dict) -> Tuple[str, int]:
+        session_id = session_id or uuid.uuid4().hex
+        result = {}
+
+        def append(current: Optional[str]) -> str:
+            # May run more than once (optimistic retry): no side effects
+            # outside result
+            if current is None:
+                session = ChatSession(session_id, self.depth)
+            else:
+                session = ChatSession.from_dict(session_id, json.loads(current),
+                                                self.depth, time.time())
+            result["sequence"] = session.append(entry)
+            result["created"] = current is None
+            return json.dumps(session.to_dict())
+
+        await self.state.update(self._key(session_id), append, ttl=self.idle_seconds)
+        self._stats["appended"] += 1
+        self._stats["created"] += result["created"]
+        return session_id, result["sequence"]
+
+    async def load(self, session_id: str) -> Optional[ChatSession]:
+        value = await self.state.get(self._key(session_id))
+        if value is None:
+            return None
+        return ChatSession.from_dict(session_id, json.loads(value), self.depth, time.time())
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.state.name,
+            **self._stats,
+            "history_depth": self.depth,
+            "idle_seconds": self.idle_seconds,
+        }
+
+    def close(self):
+        pass   # the SharedState is closed by its owner
+
+
+def create_session_store(state: Optional[SharedState] = None):
+    """SharedChatSessionStore on a shared backend, else the in-process store"""
+    if state is not None and state.shared:
+        return SharedChatSessionStore(state)
+    return ChatSessionStore()
@@ -5,8 +5,10 @@ Manages mock doctor data and recommendations.
 """
 
 import json
-from database import SessionLocal, engine
-from models import Doctor, Base
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import Doctor
 
 
 class DoctorService:
@@ -15,19 +17,21 @@ class DoctorService:
     Uses mock data for demonstration.
     """
 
-    def initialize_mock_doctors(self):
+    async def initialize_mock_doctors(self):
         """
         Initialize database with mock doctor data.
         Only runs if database is empty.
         """
-        db = SessionLocal()
+        async with AsyncSessionLocal() as db:
+            # Check if doctors already exist
+            existing = await db.scalar(select(Doctor.id).limit(1))
+            if existing:
+                return
 
-        # Check if doctors already exist
-        existing = db.query(Doctor).first()
-        if existing:
-            db.close()
-            return
+            await self._insert_mock_doctors(db)
 
+    async def _insert_mock_doctors(self, db: AsyncSession):
+        """Insert the mock doctor catalogue"""
         # Create mock doctors
         mock_doctors = [
             {
@@ -133,12 +137,12 @@ class DoctorService:
             doctor = Doctor(**doc_data)
             db.add(doctor)
 
-        db.commit()
-        db.close()
+        await db.commit()
         print(f"✅ Initialized {len(mock_doctors)} mock doctors")
 
-    def get_recommended_doctors(
+    async def get_recommended_doctors(
         self,
+        db: AsyncSession,
         injury_type: str = None,
         risk_level: str = None,
         limit: int = 10
@@ -147,15 +151,12 @@ class DoctorService:
         Get recommended doctors based on injury and risk.
         Returns filtered and sorted list.
         """
-        db = SessionLocal()
-
         # Query all doctors
-        query = db.query(Doctor)
+        doctors = (await db.scalars(select(Doctor))).all()
 
         # Filter by expertise if injury type provided
         if injury_type:
             # Match expertise keywords
-            doctors = query.all()
             filtered = []
 
             for doctor in doctors:
@@ -169,8 +170,6 @@ class DoctorService:
                     filtered.append(doctor)
 
             doctors = filtered
-        else:
-            doctors = query.all()
 
         # Sort by priority
         if risk_level == "HIGH":
@@ -207,5 +206,4 @@ class DoctorService:
                 "expertise": doctor.expertise.split(',')
             })
 
-        db.close()
         return result
@@ -3,12 +3,86 @@ Health Assessment Service with AI/ML and Rule-Based Analysis
 =============================================================
 Analyzes health questionnaire responses and voice inputs
 using AI, ML algorithms, and medical rule-based systems.
+
+Results are memoized: everything except analysis_id and timestamp is a
+pure function of the questionnaire fields and the detected patterns, so
+each distinct combination is computed once and kept in a bounded LRU
+(ASSESSMENT_CACHE_SIZE). Replacing medical_rules clears the cache.
+
+Pattern detection is delegated to a pattern model (services/pattern_model.py):
+the trained hashed-feature model when PATTERN_MODEL_PATH points at an
+artifact, the keyword rules otherwise or if the model fails.
 """
 
+import os
 import random
-from typing import Dict, List, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
+from services.pattern_model import (
+    PATTERN_MODEL_PATH,
+    RulePatternModel,
+    load_pattern_model,
+)
+
+ASSESSMENT_CACHE_SIZE = int(os.getenv("ASSESSMENT_CACHE_SIZE", "4096"))
+
+# Questionnaire fields the result depends on, with their defaults
+QUESTIONNAIRE_FIELDS = (
+    ('pain_level', 'moderate'),
+    ('swelling', 'moderate'),
+    ('duration', '1-2 days'),
+    ('affected_area', 'unknown'),
+    ('movement_difficulty', 'moderate'),
+    ('redness', 'no'),
+    ('warmth', 'no'),
+)
+
+
+def _freeze(value):
+    """Deep-copy a JSON-like value into immutable containers"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _make_template(analysis: Dict) -> Dict:
+    """
+    Cacheable form of an analysis: lists become tuples. The template itself
+    is never handed out; _instantiate copies it for each request.
+    """
+    template = {k: tuple(v) if isinstance(v, list) else v
+                for k, v in analysis.items()}
+    template["treatment_guidance"] = {
+        k: tuple(v) for k, v in analysis["treatment_guidance"].items()}
+    return template
+
+
+def _instantiate(template: Dict) -> Dict:
+    """
+    Fresh mutable result from a template.
+    Copies only the known nested containers - a generic deep copy would
+    cost more than recomputing the analysis.
+    """
+    guidance = template["treatment_guidance"]
+    return {
+        **template,
+        "risk_factors": list(template["risk_factors"]),
+        "detected_patterns": list(template["detected_patterns"]),
+        "recommendations": list(template["recommendations"]),
+        "possible_conditions": [c.copy() for c in template["possible_conditions"]],
+        "treatment_guidance": {
+            "immediate_care": list(guidance["immediate_care"]),
+            "medications": list(guidance["medications"]),
+            "activities": list(guidance["activities"]),
+            "warning_signs": list(guidance["warning_signs"]),
+        },
+    }
+
 
 class HealthAssessmentService:
     """
@@ -19,7 +93,12 @@ class HealthAssessmentService:
     - Risk stratification
     """
 
-    def __init__(self):
+    def __init__(self, cache_size: int = ASSESSMENT_CACHE_SIZE,
+                 model_path: Optional[str] = PATTERN_MODEL_PATH):
+        # Memoized result templates keyed by canonical inputs
+        self.get_template = lru_cache(maxsize=cache_size)(self._template_for)
+        self._invalidations = 0
+
         # Medical knowledge base for rule-based analysis
         self.medical_rules = {
             'pain_severity_rules': {
@@ -50,6 +129,43 @@ class HealthAssessmentService:
             'infection': ['fever', 'pus', 'hot', 'red', 'spreading']
         }
 
+        # Trained pattern model if an artifact is configured, else the rules
+        self.rule_model = RulePatternModel(self.injury_patterns)
+        self.pattern_model = load_pattern_model(model_path) or self.rule_model
+
+    @property
+    def medical_rules(self) -> MappingProxyType:
+        """Rule tables (read-only; assign a new dict to change them)"""
+        return self._medical_rules
+
+    @medical_rules.setter
+    def medical_rules(self, rules: Dict):
+        self._medical_rules = _freeze(rules)
+        self.clear_cache()
+
+    def clear_cache(self):
+        """Drop all memoized results"""
+        if self.get_template.cache_info().currsize:
+            self._invalidations += 1
+        self.get_template.cache_clear()
+
+    def cache_info(self) -> Dict:
+        """Hit/miss counters and current size of the result cache"""
+        info = self.get_template.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+            "invalidations": self._invalidations,
+        }
+
+    def canonical_key(self, responses: Dict, patterns: List[str]) -> Tuple:
+        """Cache key: QUESTIONNAIRE_FIELDS (defaults applied) + patterns"""
+        get = responses.get
+        return (*(get(field, default) for field, default in QUESTIONNAIRE_FIELDS),
+                tuple(patterns))
+
     def analyze_questionnaire(self, responses: Dict) -> Dict:
         """
         Analyze health questionnaire responses using AI/ML and rules.
@@ -61,14 +177,31 @@ class HealthAssessmentService:
             Comprehensive analysis with diagnosis, risk level, and recommendations
         """
 
-        # Extract key metrics
-        pain_level = responses.get('pain_level', 'moderate')
-        swelling = responses.get('swelling', 'moderate')
-        duration = responses.get('duration', '1-2 days')
-        affected_area = responses.get('affected_area', 'unknown')
-        movement_difficulty = responses.get('movement_difficulty', 'moderate')
-        redness = responses.get('redness', 'no')
-        warmth = responses.get('warmth', 'no')
+        # ML-based pattern recognition (simulated neural network)
+        detected_patterns = self._ml_pattern_detection(responses)
+
+        result = self.result_for_key(
+            self.canonical_key(responses, detected_patterns))
+        result["analysis_id"] = random.randint(10000, 99999)
+        result["timestamp"] = datetime.now().isoformat()
+        return result
+
+    def result_for_key(self, key: Tuple) -> Dict:
+        """Fresh analysis for a canonical key, without analysis_id/timestamp"""
+        return _instantiate(self.get_template(key))
+
+    def _template_for(self, key: Tuple) -> Dict:
+        """
+        Analysis template for a canonical key. Called through the
+        memoized self.get_template; the result must not be mutated.
+        """
+        return _make_template(self._build_template(key))
+
+    def _build_template(self, key: Tuple) -> Dict:
+        """Full analysis for one input combination, minus per-request fields"""
+        (pain_level, swelling, duration, affected_area,
+         movement_difficulty, redness, warmth, detected_patterns) = key
+        detected_patterns = list(detected_patterns)
 
         # Rule-based risk scoring
         risk_score = 0
@@ -112,9 +245,6 @@ class HealthAssessmentService:
             risk_factors.append("Warmth detected - active inflammation")
         risk_score += inflammation_markers
 
-        # ML-based pattern recognition (simulated neural network)
-        detected_patterns = self._ml_pattern_detection(responses)
-
         # Determine risk level using hybrid AI approach
         if risk_score >= 8:
             risk_level = "HIGH"
@@ -131,7 +261,7 @@ class HealthAssessmentService:
 
         # Generate AI-powered diagnosis suggestions
         possible_conditions = self._generate_conditions(
-            responses, detected_patterns)
+            {'pain_level': pain_level, 'swelling': swelling}, detected_patterns)
 
         # Generate personalized recommendations
         recommendations = self._generate_recommendations(
@@ -144,7 +274,6 @@ class HealthAssessmentService:
         )
 
         return {
-            "analysis_id": random.randint(10000, 99999),
             "risk_level": risk_level,
             "risk_color": risk_color,
             "risk_score": risk_score,
@@ -156,30 +285,33 @@ class HealthAssessmentService:
             "treatment_guidance": treatment_guidance,
             "affected_area": affected_area,
             "confidence_score": round(min(0.95, 0.70 + (risk_score * 0.03)), 2),
-            "timestamp": datetime.now().isoformat(),
             "analysis_method": "Hybrid AI/ML + Rule-Based Medical Expert System",
             "disclaimer": "AI-generated assessment. Not a substitute for professional medical diagnosis."
         }
 
     def _ml_pattern_detection(self, responses: Dict) -> List[str]:
         """
-        Simulate ML-based pattern recognition using neural network approach.
-        In production, this would use actual ML models (scikit-learn, TensorFlow, etc.)
+        ML-based pattern recognition via the configured pattern model,
+        falling back to the keyword rules if the model fails.
         """
-        detected = []
-
-        # Create feature vector from responses
-        response_text = ' '.join(str(v).lower() for v in responses.values())
-
-        # Pattern matching using simulated ML
-        for pattern_name, keywords in self.injury_patterns.items():
-            matches = sum(
-                1 for keyword in keywords if keyword in response_text)
-            # Simulate ML confidence threshold
-            if matches >= 2:
-                detected.append(pattern_name)
-
-        return detected if detected else ['general_injury']
+        try:
+            return self.pattern_model.predict(responses)
+        except Exception as e:
+            self._fall_back_to_rules(e)
+            return self.rule_model.predict(responses)
+
+    def detect_patterns_batch(self, rows: List[Dict]) -> List[List[str]]:
+        """Pattern detection for many questionnaires in one pass"""
+        try:
+            return self.pattern_model.predict_batch(rows)
+        except Exception as e:
+            self._fall_back_to_rules(e)
+            return self.rule_model.predict_batch(rows)
+
+    def _fall_back_to_rules(self, error: Exception):
+        if self.pattern_model is not self.rule_model:
+            print(f"⚠️  Pattern model failed ({error}) - switching to keyword rules")
+            self.pattern_model = self.rule_model
 
     def _generate_conditions(self, responses: Dict, patterns: List[str]) -> List[Dict]:
         """Generate possible medical conditions based on AI analysis"""
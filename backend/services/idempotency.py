@@ -0,0 +1,102 @@
+"""
+Idempotency Keys
+================
+Lets a client retry a POST (flaky mobile network, double tap) without
+doing the work twice: the client sends an Idempotency-Key header and a
+retry with the same key gets the first response back.
+
+Keys live in services/shared_state.py, so a retry that reaches another
+worker still sees them. For each (scope, key) the store holds:
+- pending, from the first request until it finishes. A concurrent retry
+  gets 409. The pending record expires after IDEMPOTENCY_PENDING_SECONDS,
+  so a crashed worker never blocks the key for good.
+- done, with the response, for IDEMPOTENCY_TTL_SECONDS
+
+Reusing a key with a different body is a client bug and gets 422.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+from services.shared_state import SharedState
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_PENDING_SECONDS = float(os.getenv("IDEMPOTENCY_PENDING_SECONDS", "60"))
+
+
+class IdempotencyConflict(Exception):
+    """The key is in use: status_code 409 (still running) or 422 (other payload)"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class IdempotencyStore:
+    """begin() before the work, then complete() or abandon()"""
+
+    def __init__(self, state: SharedState, ttl: float = IDEMPOTENCY_TTL_SECONDS,
+                 pending_ttl: float = IDEMPOTENCY_PENDING_SECONDS):
+        self.state = state
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self._stats = {"claimed": 0, "replayed": 0, "conflicts": 0}
+
+    @staticmethod
+    def _key(scope: str, key: str) -> str:
+        return f"idem:{scope}:{key}"
+
+    @staticmethod
+    def fingerprint(payload: Dict) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    async def begin(self, scope: str, key: str, payload: Dict) -> Optional[Dict]:
+        """
+        Claim the key for this request.
+
+        Returns:
+            None if the caller should do the work, or the stored response
+            of an earlier request with the same key and payload
+
+        Raises:
+            IdempotencyConflict: the earlier request is still running, or
+            the key was used with a different payload
+        """
+        fingerprint = self.fingerprint(payload)
+        pending = json.dumps({"status": "pending", "fingerprint": fingerprint})
+        if await self.state.add(self._key(scope, key), pending, ttl=self.pending_ttl):
+            self._stats["claimed"] += 1
+            return None
+
+        stored = await self.state.get(self._key(scope, key))
+        if stored is None:   # expired in between: claim again
+            return await self.begin(scope, key, payload)
+        record = json.loads(stored)
+        if record["fingerprint"] != fingerprint:
+            self._stats["conflicts"] += 1
+            raise IdempotencyConflict(
+                422, "Idempotency-Key was already used with a different request body")
+        if record["status"] == "pending":
+            self._stats["conflicts"] += 1
+            raise IdempotencyConflict(
+                409, "A request with this Idempotency-Key is still being processed")
+        self._stats["replayed"] += 1
+        return record["response"]
+
+    async def complete(self, scope: str, key: str, payload: Dict, response: Dict):
+        """Store the response for replays"""
+        await self.state.set(self._key(scope, key), json.dumps({
+            "status": "done",
+            "fingerprint": self.fingerprint(payload),
+            "response": response,
+        }, default=str), ttl=self.ttl)
+
+    async def abandon(self, scope: str, key: str):
+        """The work failed: release the key so the client can retry"""
+        await self.state.delete(self._key(scope, key))
+
+    def stats(self) -> Dict:
+        return {**self._stats, "ttl_seconds": self.ttl}
@@ -0,0 +1,324 @@
+"""
+Chat Intent Models
+==================
+Intent classification behind ChatService._classify and classify_batch.
+
+- RuleIntentModel: the original keyword lists (the intent with the most
+  substring hits wins). Kept as the fallback; it has no real confidence.
+- HashedIntentModel: multinomial logistic regression over hashed character
+  3/4/5-grams of the normalized message, padded with spaces so n-grams
+  see word boundaries (" hi " is a different feature from the "hi" in
+  "this"), plus hashed word unigrams and bigrams. All intents are scored
+  with one gather + sum over the weight matrix; probabilities are
+  temperature-scaled softmax, calibrated on held-out data when trained.
+  Trained offline by scripts/train_intent_model.py from
+  ml_models/chat_intents.jsonl.
+
+A message the model cannot read is general_query rather than whatever the
+bias favours (greeting, for the bundled data): one with no features
+(blank), with fewer than INTENT_MIN_KNOWN_FEATURES of its features seen in
+training (emoji, junk like 'a' * 10000; an all-zero weight row was never
+seen), or whose best intent stays below INTENT_MIN_CONFIDENCE. Those get
+RULE_CONFIDENCE, as the keyword rules do.
+
+A single classify() costs tens of microseconds (40-60 us p50 on the
+benchmark holdout, machine dependent), nearly all of it fixed per-call
+NumPy overhead; classify_batch() amortizes that over the batch.
+
+Artifacts follow services/pattern_model.py:
+    <prefix>.npy   float32 weights, shape (2**hash_bits, n_intents)
+    <prefix>.json  intents, bias, temperature, hash_bits, format version
+and the weights are memory-mapped. INTENT_MODEL_PATH selects the prefix;
+if it is missing or invalid the keyword rules are used.
+"""
+
+import json
+import math
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.pattern_model import resolve_model_path
+
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "ml_models/intent_model_v1")
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.35"))
+INTENT_MIN_KNOWN_FEATURES = float(os.getenv("INTENT_MIN_KNOWN_FEATURES", "0.5"))
+
+# Bump when the artifact layout or feature extraction changes
+INTENT_MODEL_FORMAT_VERSION = 1
+
+DEFAULT_INTENT = 'general_query'
+RULE_CONFIDENCE = 0.5     # the keyword rules carry no probability
+
+# Lowercase ASCII letters/digits kept, everything else (ASCII) -> space;
+# non-ASCII bytes are kept as is
+_NORMALIZE = np.array([c if chr(c).isalnum() or c >= 128 else ord(' ') for c in range(256)],
+                      dtype=np.uint8)
+_NORMALIZE[ord('A'):ord('Z') + 1] += 32
+_NORMALIZE_TABLE = _NORMALIZE.tobytes()   # the same map for bytes.translate
+
+# Rolling polynomial hash over bytes; each n-gram order gets its own salt
+_BASE = np.uint64(0x100000001B3)
+_FINALIZE = np.uint64(0x9E3779B97F4A7C15)
+_ORDER_SALT = {n: np.uint64(n * 0xC2B2AE3D27D4EB4F & ((1 << 64) - 1)) for n in (3, 4, 5)}
+_WORD_SALT = 0x5BD1E995   # crc32 seed for word n-grams
+
+
+def _padded_bytes(text: str) -> np.ndarray:
+    """' ' + normalized text + ' ' with runs of spaces collapsed"""
+    data = _NORMALIZE[np.frombuffer(f" {text} ".encode(), dtype=np.uint8)]
+    keep = np.ones(len(data), dtype=bool)
+    keep[1:] = (data[1:] != 32) | (data[:-1] != 32)
+    return data[keep]
+
+
+def _ngram_hashes(data: np.ndarray, hash_bits: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Hashed 3/4/5-gram indices starting at every position of data.
+
+    Returns:
+        (concatenated indices, start positions per order) so callers can
+        drop n-grams that cross a message boundary
+    """
+    d = data.astype(np.uint64)
+    shift = np.uint64(64 - hash_bits)
+    h3 = (d[:-2] * _BASE + d[1:-1]) * _BASE + d[2:]
+    h4 = h3[:-1] * _BASE + d[3:]
+    h5 = h4[:-1] * _BASE + d[4:]
+    hashes = [h3 ^ _ORDER_SALT[3], h4 ^ _ORDER_SALT[4], h5 ^ _ORDER_SALT[5]]
+    indices = np.concatenate(hashes) * _FINALIZE >> shift
+    return indices.astype(np.int64), [np.arange(len(h)) for h in hashes]
+
+
+def _word_hashes(data: np.ndarray, hash_bits: int) -> np.ndarray:
+    """Hashed word unigram and bigram indices of one padded message"""
+    words = data.tobytes().split()
+    grams = words + [a + b" " + b for a, b in zip(words, words[1:])]
+    hashes = np.array([zlib.crc32(g, _WORD_SALT) for g in grams], dtype=np.uint64)
+    return (hashes * _FINALIZE >> np.uint64(64 - hash_bits)).astype(np.int64)
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    """np.unique via sort + adjacent compare (faster than its hash path here)"""
+    values.sort()
+    keep = np.empty(len(values), dtype=bool)
+    keep[:1] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+def feature_indices(text: str, hash_bits: int) -> np.ndarray:
+    """
+    Unique hashed character and word n-gram indices of one message.
+    Same features as batch_feature_indices, with the normalization done
+    by bytes.translate/split and one hashing pass, since per-call NumPy
+    overhead is most of a single message's cost.
+    """
+    words = text.encode().translate(_NORMALIZE_TABLE).split()
+    if not words:
+        return np.empty(0, dtype=np.int64)
+    d = np.frombuffer(b" " + b" ".join(words) + b" ", dtype=np.uint8).astype(np.uint64)
+    h3 = (d[:-2] * _BASE + d[1:-1]) * _BASE + d[2:]
+    h4 = h3[:-1] * _BASE + d[3:]
+    h5 = h4[:-1] * _BASE + d[4:]
+    grams = words + [a + b" " + b for a, b in zip(words, words[1:])]
+    word_hashes = np.fromiter((zlib.crc32(g, _WORD_SALT) for g in grams),
+                              dtype=np.uint64, count=len(grams))
+    hashes = np.concatenate((h3 ^ _ORDER_SALT[3], h4 ^ _ORDER_SALT[4],
+                             h5 ^ _ORDER_SALT[5], word_hashes))
+    return _sorted_unique((hashes * _FINALIZE >> np.uint64(64 - hash_bits)).astype(np.int64))
+
+
+def batch_feature_indices(texts: List[str], hash_bits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Features of many messages in one pass over their concatenation.
+
+    Returns:
+        (row, index) pairs, unique and sorted by row
+    """
+    parts = [_padded_bytes(t) for t in texts]
+    lengths = np.array([len(p) for p in parts])
+    ends = np.cumsum(lengths)
+    if not len(parts) or ends[-1] < 3:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    data = np.concatenate(parts)
+    owner = np.repeat(np.arange(len(parts)), lengths)
+
+    indices, starts = _ngram_hashes(data, hash_bits)
+    rows = np.concatenate([owner[s] for s in starts])
+    valid = np.concatenate([s + n <= ends[owner[s]] for n, s in zip((3, 4, 5), starts)])
+    words = [_word_hashes(p, hash_bits) for p in parts]
+    word_rows = np.repeat(np.arange(len(parts)), [len(w) for w in words])
+    keys = _sorted_unique(np.concatenate((
+        (rows[valid] << hash_bits) | indices[valid],
+        (word_rows << hash_bits) | np.concatenate(words).astype(np.int64))))
+    return keys >> hash_bits, keys & ((1 << hash_bits) - 1)
+
+
+class RuleIntentModel:
+    """Substring keyword counts; most hits wins, ties go to the first intent"""
+
+    name = "rules"
+
+    def __init__(self, intents: Dict[str, List[str]]):
+        self.intents = intents
+
+    def classify(self, message: str) -> Tuple[str, float]:
+        message_lower = message.lower()
+
+        intent_scores = {}
+        for intent, keywords in self.intents.items():
+            score = sum(1 for keyword in keywords if keyword in message_lower)
+            if score > 0:
+                intent_scores[intent] = score
+
+        if intent_scores:
+            return max(intent_scores, key=intent_scores.get), RULE_CONFIDENCE
+
+        return DEFAULT_INTENT, RULE_CONFIDENCE
+
+    def classify_batch(self, messages: List[str]) -> List[Tuple[str, float]]:
+        return [self.classify(m) for m in messages]
+
+    def describe(self) -> Dict:
+        return {"model": self.name, "intents": list(self.intents) + [DEFAULT_INTENT]}
+
+
+class HashedIntentModel:
+    """
+    Softmax regression over hashed character n-grams.
+    """
+
+    name = "hashed-softmax"
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, intents: List[str],
+                 hash_bits: int, temperature: float = 1.0,
+                 metadata: Optional[Dict] = None):
+        if weights.shape != (1 << hash_bits, len(intents)):
+            raise ValueError(
+                f"Weights shape {weights.shape} does not match "
+                f"2**{hash_bits} x {len(intents)} intents")
+        self.weights = weights
+        self._weights = np.asarray(weights)   # see HashedPatternModel
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.intents = list(intents)
+        self.hash_bits = hash_bits
+        self.temperature = float(temperature)
+        self.metadata = metadata or {}
+        self.min_confidence = INTENT_MIN_CONFIDENCE
+        self.min_known = INTENT_MIN_KNOWN_FEATURES
+        # Buckets no training feature hashed into kept their zero weights
+        self._known = np.any(self._weights != 0, axis=1)
+        self._fallback = (DEFAULT_INTENT, RULE_CONFIDENCE)
+
+    @classmethod
+    def load(cls, prefix: str, mmap: bool = True) -> "HashedIntentModel":
+        """Load <prefix>.json + <prefix>.npy (weights memory-mapped)"""
+        with open(prefix + ".json") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != INTENT_MODEL_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported intent model format {meta.get('format_version')} "
+                f"(expected {INTENT_MODEL_FORMAT_VERSION})")
+        weights = np.load(prefix + ".npy", mmap_mode="r" if mmap else None)
+        return cls(weights, meta["bias"], meta["intents"], meta["hash_bits"],
+                   meta.get("temperature", 1.0), meta)
+
+    def save(self, prefix: str, extra: Optional[Dict] = None):
+        """Write <prefix>.npy and <prefix>.json"""
+        os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+        np.save(prefix + ".npy", np.ascontiguousarray(self.weights, dtype=np.float32))
+        meta = {
+            **self.metadata,
+            **(extra or {}),
+            "format_version": INTENT_MODEL_FORMAT_VERSION,
+            "model": self.name,
+            "intents": self.intents,
+            "hash_bits": self.hash_bits,
+            "bias": self.bias.tolist(),
+            "temperature": self.temperature,
+        }
+        with open(prefix + ".json", "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def _decision(self, messages: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(logits, feature rows, feature indices) of a batch"""
+        logits = np.tile(self.bias, (len(messages), 1))
+        rows, indices = batch_feature_indices(messages, self.hash_bits)
+        if len(rows):
+            present, starts = np.unique(rows, return_index=True)
+            logits[present] += np.add.reduceat(self._weights[indices], starts, axis=0)
+        return logits, rows, indices
+
+    def _softmax(self, logits: np.ndarray) -> np.ndarray:
+        scaled = logits / self.temperature
+        scaled -= scaled.max(axis=1, keepdims=True)
+        exp = np.exp(scaled)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def decision_batch(self, messages: List[str]) -> np.ndarray:
+        """Logits, shape (len(messages), n_intents)"""
+        return self._decision(messages)[0]
+
+    def predict_proba_batch(self, messages: List[str]) -> np.ndarray:
+        """Calibrated probabilities, shape (len(messages), n_intents)"""
+        return self._softmax(self.decision_batch(messages))
+
+    def classify(self, message: str) -> Tuple[str, float]:
+        """(intent, calibrated probability of that intent), or the fallback"""
+        features = feature_indices(message, self.hash_bits)
+        if np.count_nonzero(self._known[features]) < max(1, self.min_known * len(features)):
+            return self._fallback
+        logits = (self.bias + self._weights.take(features, axis=0).sum(axis=0)).tolist()
+        top = max(logits)
+        # softmax of the winner: 1 / sum(exp(l_j - l_best)); 8 values are
+        # cheaper in Python than through another round of NumPy calls
+        confidence = 1.0 / sum(math.exp((l - top) / self.temperature) for l in logits)
+        if confidence < self.min_confidence:
+            return self._fallback
+        return self.intents[logits.index(top)], confidence
+
+    def classify_batch(self, messages: List[str]) -> List[Tuple[str, float]]:
+        if not messages:
+            return []
+        logits, rows, indices = self._decision(messages)
+        probs = self._softmax(logits)
+        best = probs.argmax(axis=1)
+        confidence = probs[np.arange(len(best)), best]
+
+        total = np.bincount(rows, minlength=len(messages))
+        known = np.bincount(rows, weights=self._known[indices], minlength=len(messages))
+        readable = (known >= np.maximum(1, self.min_known * total)) & \
+            (confidence >= self.min_confidence)
+        return [(self.intents[j], float(p)) if ok else self._fallback
+                for j, p, ok in zip(best, confidence, readable)]
+
+    def describe(self) -> Dict:
+        return {
+            "model": self.name,
+            "intents": self.intents,
+            "hash_bits": self.hash_bits,
+            "temperature": self.temperature,
+            "version": self.metadata.get("version"),
+            "trained_at": self.metadata.get("trained_at"),
+            "memory_mapped": isinstance(self.weights, np.memmap),
+        }
+
+
+def load_intent_model(path: Optional[str] = INTENT_MODEL_PATH) -> Optional[HashedIntentModel]:
+    """
+    Load the configured intent model, or None (use the keyword rules) when
+    no artifact is configured, found or loadable.
+    """
+    if not path:
+        return None
+    prefix = resolve_model_path(path)
+    if not os.path.exists(prefix + ".json"):
+        return None
+    try:
+        return HashedIntentModel.load(prefix)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️  Intent model {prefix} not loaded ({e}) - using keyword rules")
+        return None
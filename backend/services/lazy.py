@@ -0,0 +1,51 @@
+"""
+Lazy Services
+=============
+Builds a service on first use instead of at import, so importing main
+stays cheap for cold starts. The service's module is imported inside the
+factory too, so its dependencies (numpy, model artifacts) load with it.
+
+LazyService forwards attribute access to the instance, so call sites use
+it like the service itself. Construction happens once, under a lock, so a
+warm-up thread and a request that arrive together build one instance.
+main.warm_up() builds every lazy service ahead of traffic (see WARMUP).
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyService(Generic[T]):
+    """Proxy that calls factory() on first attribute access"""
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        # Set through __dict__ so __getattr__ never sees them missing
+        self.__dict__.update(name=name, _factory=factory, _instance=None,
+                             _lock=threading.Lock(), _seconds=None)
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        """The service, built now if needed"""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    started = time.perf_counter()
+                    instance = self._factory()
+                    self.__dict__["_seconds"] = time.perf_counter() - started
+                    self.__dict__["_instance"] = instance
+        return instance
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+    def build_info(self) -> Dict[str, Optional[float]]:
+        return {"loaded": self.loaded,
+                "build_ms": round(self._seconds * 1000, 1) if self._seconds is not None else None}
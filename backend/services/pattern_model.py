@@ -0,0 +1,328 @@
+"""
+Injury Pattern Models
+=====================
+Pluggable CPU models behind HealthAssessmentService._ml_pattern_detection.
+
+- RulePatternModel: the original keyword rules (a pattern fires when two of
+  its keywords occur anywhere in the answers). Always available; used as
+  the fallback.
+- HashedPatternModel: multi-label logistic regression over hashed features
+  (field=value tokens plus word unigrams/bigrams of the free text, see
+  feature_indices), scored with NumPy. Trained offline by
+  scripts/train_pattern_model.py.
+
+Artifacts are versioned pairs next to each other:
+    <prefix>.npy   float32 weights, shape (2**hash_bits, n_labels)
+    <prefix>.json  labels, bias, thresholds, hash_bits, format version
+
+The weights are opened with np.load(mmap_mode="r"), so every worker
+process maps the same read-only pages instead of holding its own copy.
+PATTERN_MODEL_PATH selects the artifact prefix (relative paths are
+resolved against the backend directory); if it is missing or invalid the
+rules are used.
+"""
+
+import json
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATTERN_MODEL_PATH = os.getenv("PATTERN_MODEL_PATH", "ml_models/pattern_model_v1")
+
+# Bump when the artifact layout or feature extraction changes
+MODEL_FORMAT_VERSION = 1
+
+# Fixed-choice questionnaire answers become one field=value token each;
+# every other value is treated as free text
+CATEGORICAL_FIELDS = (
+    'pain_level', 'swelling', 'duration', 'movement_difficulty',
+    'redness', 'warmth',
+)
+
+# ASCII punctuation/whitespace -> space. Words are the remaining runs, so
+# non-ASCII characters (any UTF-8 byte >= 128) always belong to a word.
+_SEPARATORS = str.maketrans({chr(c): ' ' for c in range(128) if not chr(c).isalnum()})
+_WORD_BYTE = np.array([c >= 128 or chr(c).isalnum() for c in range(256)])
+
+# Token hash: polynomial over the UTF-8 bytes, mod 2**64,
+#     h(word) = sum(byte_k * BASE**k)
+# finalized by multiplicative (Fibonacci) hashing down to hash_bits.
+# Computed per word in Python for short texts and with prefix sums in
+# NumPy for long ones - both give identical indices.
+_M64 = (1 << 64) - 1
+_BASE = 0x100000001B3
+_BASE_INV = pow(_BASE, -1, 1 << 64)
+_FINALIZE = 0x9E3779B97F4A7C15
+_BIGRAM_MIX = 0xC2B2AE3D27D4EB4F
+
+# Texts longer than this (characters) take the vectorized path
+_VECTORIZE_CHARS = 256
+
+DEFAULT_PATTERN = 'general_injury'
+
+_powers = np.ones(1, dtype=np.uint64)
+_inverse_powers = np.ones(1, dtype=np.uint64)
+
+
+@lru_cache(maxsize=1 << 16)
+def _token_hash(token: str) -> int:
+    """64-bit polynomial hash of one token (vocabulary repeats, so memoized)"""
+    h, power = 0, 1
+    for byte in token.encode():
+        h = (h + byte * power) & _M64
+        power = (power * _BASE) & _M64
+    return h
+
+
+@lru_cache(maxsize=1 << 12)
+def _categorical_index(field: str, value: str, hash_bits: int) -> int:
+    return ((_token_hash(f"{field}={value}") * _FINALIZE) & _M64) >> (64 - hash_bits)
+
+
+def _power_tables(n: int):
+    """BASE**k and BASE**-k mod 2**64 for k < n (grown on demand)"""
+    global _powers, _inverse_powers
+    if len(_powers) < n:
+        size = max(n, 2 * len(_powers))
+        powers = np.full(size, _BASE, dtype=np.uint64)
+        inverse = np.full(size, _BASE_INV, dtype=np.uint64)
+        powers[0] = inverse[0] = 1
+        _powers, _inverse_powers = np.cumprod(powers), np.cumprod(inverse)
+    return _powers, _inverse_powers
+
+
+def _text_features_vectorized(text: str, hash_bits: int) -> np.ndarray:
+    """Unigram + bigram hashes of a long text without a per-word Python loop"""
+    data = np.frombuffer(text.encode(), dtype=np.uint8)
+    is_word = _WORD_BYTE[data]
+    edges = np.diff(np.concatenate(([False], is_word, [False])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.uint64)
+
+    powers, inverse_powers = _power_tables(len(data) + 1)
+    prefix = np.zeros(len(data) + 1, dtype=np.uint64)
+    np.cumsum(data.astype(np.uint64) * powers[:len(data)], out=prefix[1:])
+    # Sum over [start, end) shifted back to exponent 0 (uint64 wraps mod 2**64)
+    words = (prefix[ends] - prefix[starts]) * inverse_powers[starts]
+
+    bigrams = (words[:-1] * np.uint64(_BIGRAM_MIX)) ^ (words[1:] + np.uint64(1))
+    hashes = np.concatenate((words, bigrams)) * np.uint64(_FINALIZE)
+    return hashes >> np.uint64(64 - hash_bits)
+
+
+def feature_indices(responses: Dict, hash_bits: int) -> np.ndarray:
+    """
+    Unique hashed feature indices for one questionnaire.
+
+    Categorical answers hash as the token "field=value". Free-text answers
+    contribute word unigrams and adjacent-word bigrams.
+    """
+    shift = 64 - hash_bits
+    features = set()
+    for field, value in responses.items():
+        if value is None:
+            continue
+        text = str(value).lower()
+        if field in CATEGORICAL_FIELDS:
+            features.add(_categorical_index(field, text, hash_bits))
+        elif len(text) > _VECTORIZE_CHARS:
+            features.update(np.unique(_text_features_vectorized(text, hash_bits)).tolist())
+        else:
+            # Same arithmetic as the vectorized path, inlined (hot loop)
+            words = [_token_hash(w) for w in text.translate(_SEPARATORS).split(' ') if w]
+            features.update(((h * _FINALIZE) & _M64) >> shift for h in words)
+            features.update(((((a * _BIGRAM_MIX) ^ (b + 1)) * _FINALIZE) & _M64) >> shift
+                            for a, b in zip(words, words[1:]))
+
+    return np.fromiter(features, dtype=np.int64, count=len(features))
+
+
+class RulePatternModel:
+    """
+    Keyword rules: a pattern is detected when at least two of its keywords
+    appear as substrings of the joined answers.
+    """
+
+    name = "rules"
+
+    def __init__(self, patterns: Dict[str, List[str]]):
+        self.patterns = patterns
+
+    def predict(self, responses: Dict) -> List[str]:
+        response_text = ' '.join(str(v).lower() for v in responses.values())
+
+        detected = []
+        for pattern_name, keywords in self.patterns.items():
+            matches = sum(1 for keyword in keywords if keyword in response_text)
+            if matches >= 2:
+                detected.append(pattern_name)
+
+        return detected if detected else [DEFAULT_PATTERN]
+
+    def predict_batch(self, rows: List[Dict]) -> List[List[str]]:
+        """
+        Same rules for many rows: one rows x keywords hit matrix, reduced
+        to per-pattern hit counts with a single matrix product.
+        """
+        if not rows:
+            return []
+
+        keywords = sorted({kw for kws in self.patterns.values() for kw in kws})
+        names = list(self.patterns)
+        membership = np.zeros((len(keywords), len(names)), dtype=np.int16)
+        for j, name in enumerate(names):
+            for kw in self.patterns[name]:
+                membership[keywords.index(kw), j] = 1
+
+        texts = np.array([' '.join(str(v).lower() for v in r.values()) for r in rows])
+        hits = np.stack([np.char.find(texts, kw) >= 0 for kw in keywords], axis=1)
+        detected = (hits.astype(np.int16) @ membership) >= 2
+
+        return [
+            [names[j] for j in np.flatnonzero(row)] or [DEFAULT_PATTERN]
+            for row in detected
+        ]
+
+    def describe(self) -> Dict:
+        return {"model": self.name, "labels": list(self.patterns)}
+
+
+class HashedPatternModel:
+    """
+    Multi-label logistic regression over hashed binary features.
+    """
+
+    name = "hashed-logistic"
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: List[str],
+                 hash_bits: int, thresholds: Optional[np.ndarray] = None,
+                 metadata: Optional[Dict] = None):
+        if weights.shape != (1 << hash_bits, len(labels)):
+            raise ValueError(
+                f"Weights shape {weights.shape} does not match "
+                f"2**{hash_bits} x {len(labels)} labels")
+        self.weights = weights
+        # Plain ndarray view of the same pages: fancy indexing on the
+        # np.memmap subclass is noticeably slower
+        self._weights = np.asarray(weights)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.labels = list(labels)
+        self.hash_bits = hash_bits
+        self.thresholds = (np.full(len(labels), 0.5) if thresholds is None
+                           else thresholds)
+        self.metadata = metadata or {}
+
+    @property
+    def thresholds(self) -> np.ndarray:
+        return self._thresholds
+
+    @thresholds.setter
+    def thresholds(self, thresholds: np.ndarray):
+        self._thresholds = np.asarray(thresholds, dtype=np.float32)
+        # p >= t  <=>  logit >= log(t / (1 - t)); saves the sigmoid per call
+        self._logit_thresholds = np.log(self._thresholds / (1 - self._thresholds))
+
+    @classmethod
+    def load(cls, prefix: str, mmap: bool = True) -> "HashedPatternModel":
+        """Load <prefix>.json + <prefix>.npy (weights memory-mapped)"""
+        with open(prefix + ".json") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != MODEL_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported pattern model format {meta.get('format_version')} "
+                f"(expected {MODEL_FORMAT_VERSION})")
+        weights = np.load(prefix + ".npy", mmap_mode="r" if mmap else None)
+        return cls(weights, meta["bias"], meta["labels"], meta["hash_bits"],
+                   meta.get("thresholds"), meta)
+
+    def save(self, prefix: str, extra: Optional[Dict] = None):
+        """Write <prefix>.npy and <prefix>.json"""
+        os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+        np.save(prefix + ".npy", np.ascontiguousarray(self.weights, dtype=np.float32))
+        meta = {
+            **self.metadata,
+            **(extra or {}),
+            "format_version": MODEL_FORMAT_VERSION,
+            "model": self.name,
+            "labels": self.labels,
+            "hash_bits": self.hash_bits,
+            "bias": self.bias.tolist(),
+            "thresholds": self.thresholds.tolist(),
+        }
+        with open(prefix + ".json", "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def features(self, responses: Dict) -> np.ndarray:
+        return feature_indices(responses, self.hash_bits)
+
+    def decision_batch(self, rows: List[Dict]) -> np.ndarray:
+        """Logits, shape (len(rows), n_labels)"""
+        indices = [self.features(r) for r in rows]
+        counts = np.array([len(i) for i in indices])
+        logits = np.tile(self.bias, (len(rows), 1))
+        if counts.sum() == 0:
+            return logits
+
+        flat = np.concatenate(indices)
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        nonempty = counts > 0
+        # One gather + segmented sum for the whole batch
+        sums = np.add.reduceat(self._weights[flat], offsets[nonempty], axis=0)
+        logits[nonempty] += sums
+        return logits
+
+    def predict_proba_batch(self, rows: List[Dict]) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-self.decision_batch(rows)))
+
+    def predict(self, responses: Dict) -> List[str]:
+        indices = self.features(responses)
+        logits = self.bias + self._weights[indices].sum(axis=0)
+        detected = [self.labels[j]
+                    for j in np.flatnonzero(logits >= self._logit_thresholds)]
+        return detected if detected else [DEFAULT_PATTERN]
+
+    def predict_batch(self, rows: List[Dict]) -> List[List[str]]:
+        if not rows:
+            return []
+        detected = self.decision_batch(rows) >= self._logit_thresholds
+        return [
+            [self.labels[j] for j in np.flatnonzero(row)] or [DEFAULT_PATTERN]
+            for row in detected
+        ]
+
+    def describe(self) -> Dict:
+        return {
+            "model": self.name,
+            "labels": self.labels,
+            "hash_bits": self.hash_bits,
+            "version": self.metadata.get("version"),
+            "trained_at": self.metadata.get("trained_at"),
+            "memory_mapped": isinstance(self.weights, np.memmap),
+        }
+
+
+def resolve_model_path(path: str) -> str:
+    return path if os.path.isabs(path) else os.path.join(BACKEND_DIR, path)
+
+
+def load_pattern_model(path: Optional[str] = PATTERN_MODEL_PATH) -> Optional[HashedPatternModel]:
+    """
+    Load the configured model artifact, or None (use the rules) when no
+    artifact is configured, found or loadable.
+    """
+    if not path:
+        return None
+    prefix = resolve_model_path(path)
+    if not os.path.exists(prefix + ".json"):
+        return None
+    try:
+        return HashedPatternModel.load(prefix)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️  Pattern model {prefix} not loaded ({e}) - using keyword rules")
+        return None
@@ -0,0 +1,483 @@
+"""
+Shared State
+============
+Key/value state that every worker process sees: chat sessions, idempotency
+keys, rate counters and the transcript cache's second tier.
+STATE_BACKEND picks the backend:
+
+- local (default): a dict in this process. Correct with one worker only;
+  with uvicorn --workers N each worker has its own copy.
+- sqlite: one SQLite file shared by all workers on this host. It defaults
+  to /dev/shm (shared memory), so it never touches the disk, with a name
+  derived from DATABASE_URL, so each deployment gets its own file.
+- redis: any server speaking the Redis protocol (Redis 7+, Valkey, ...),
+  for workers on several hosts. The client is a small RESP implementation
+  on asyncio streams, with no extra dependency. benchmarks/resp_standin.py
+  is an in-process server for tests. Keys carry STATE_KEY_PREFIX; give
+  each deployment that shares a server its own.
+
+Every backend offers the same async operations, each atomic on its own:
+get / set / add (set if absent) / delete / incr (counter with a TTL on
+creation) / update (read-modify-write under a lock or optimistic retry).
+Values are strings (callers store JSON). TTLs are in seconds.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from tracing import run_in_context, span
+
+
+def default_sqlite_path(database_url: str = os.getenv("DATABASE_URL", "sqlite:///./medidoctor.db")) -> str:
+    """
+    State file for a deployment: one per database, so two deployments on
+    a host (or a test run next to a dev server) never share sessions,
+    idempotency keys or rate-limit buckets. Workers of one deployment
+    resolve the same database and so the same file.
+    """
+    if database_url.startswith("sqlite:///"):
+        database = database_url[len("sqlite:///"):].split("?", 1)[0]
+        if database and database != ":memory:":
+            database_url = "sqlite:///" + os.path.abspath(database)
+    digest = hashlib.sha256(database_url.encode()).hexdigest()[:16]
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else "."
+    return os.path.join(directory, f"medidoctor_state_{digest}.db")
+
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "local")
+STATE_SQLITE_PATH = os.getenv("STATE_SQLITE_PATH") or default_sqlite_path()
+STATE_REDIS_URL = os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0")
+STATE_REDIS_POOL_SIZE = int(os.getenv("STATE_REDIS_POOL_SIZE", "8"))
+STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "medidoctor:")
+
+# Optimistic update() retries before giving up (redis backend)
+STATE_UPDATE_RETRIES = 100
+STATE_PURGE_SECONDS = 60.0
+
+
+class StateConflict(RuntimeError):
+    """update() lost the race STATE_UPDATE_RETRIES times in a row"""
+
+
+class SharedState:
+    """Interface shared by the backends"""
+
+    name = "base"
+    shared = True   # visible to other worker processes
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set only if the key is absent (or expired); True if it was set"""
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Add to a counter and return it; ttl applies when the counter is created"""
+        raise NotImplementedError
+
+    async def update(self, key: str, fn: Callable[[Optional[str]], str],
+                     ttl: Optional[float] = None) -> str:
+        """
+        Atomically replace the value with fn(current value or None) and
+        return it. fn may run more than once (redis retries on conflict), so
+        it must be pure.
+        """
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "shared": self.shared}
+
+    async def close(self):
+        pass
+
+
+class LocalState(SharedState):
+    """Process-local dict with lazy expiry; the single-worker default"""
+
+    name = "local"
+    shared = False
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}   # key -> (value, expires_at or None)
+        self._last_purge = time.monotonic()
+
+    def _live(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= time.time():
+            del self._data[key]
+            return None
+        return item[0]
+
+    def _store(self, key: str, value: str, ttl: Optional[float]):
+        self._data[key] = (value, time.time() + ttl if ttl else None)
+        if time.monotonic() - self._last_purge > STATE_PURGE_SECONDS:
+            self._last_purge = time.monotonic()
+            now = time.time()
+            for k in [k for k, (_, exp) in self._data.items() if exp is not None and exp <= now]:
+                del self._data[k]
+
+    async def get(self, key):
+        return self._live(key)
+
+    async def set(self, key, value, ttl=None):
+        self._store(key, value, ttl)
+
+    async def add(self, key, value, ttl=None):
+        if self._live(key) is not None:
+            return False
+        self._store(key, value, ttl)
+        return True
+
+    async def delete(self, key):
+        self._data.pop(key, None)
+
+    async def incr(self, key, amount=1, ttl=None):
+        current = self._live(key)
+        if current is None:
+            self._store(key, str(amount), ttl)
+            return amount
+        value = int(current) + amount
+        self._data[key] = (str(value), self._data[key][1])
+        return value
+
+    async def update(self, key, fn, ttl=None):
+        value = fn(self._live(key))
+        self._store(key, value, ttl)
+        return value
+
+    def stats(self):
+        return {**super().stats(), "keys": len(self._data)}
+
+
+class SQLiteState(SharedState):
+    """
+    Rows in one SQLite file (WAL), shared by the workers on this host.
+    All statements run on one thread per process so the event loop never
+    waits on another process's write lock.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = STATE_SQLITE_PATH):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state")
+        self._db: Optional[sqlite3.Connection] = None
+        self._last_purge = time.monotonic()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, isolation_level=None, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS shared_state ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL) WITHOUT ROWID")
+        return self._db
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, run_in_context(self._traced, fn, *args))
+
+    @staticmethod
+    def _traced(fn, *args):
+        with span(f"state.{fn.__name__.lstrip('_')}"):
+            return fn(*args)
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+
+    def _purge(self, db: sqlite3.Connection):
+        if time.monotonic() - self._last_purge > STATE_PURGE_SECONDS:
+            self._last_purge = time.monotonic()
+            db.execute("DELETE FROM shared_state WHERE expires_at <= ?", (time.time(),))
+
+    def _get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM shared_state WHERE key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, value, ttl):
+        db = self._conn()
+        db.execute("INSERT OR REPLACE INTO shared_state VALUES (?, ?, ?)",
+                   (key, value, self._expiry(ttl)))
+        self._purge(db)
+
+    def _add(self, key, value, ttl):
+        # Inserts, or takes over an expired row; a live row is left alone
+        cursor = self._conn().execute(
+            "INSERT INTO shared_state VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE "
+            "SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE shared_state.expires_at <= ?",
+            (key, value, self._expiry(ttl), time.time()))
+        return cursor.rowcount == 1
+
+    def _delete(self, key):
+        self._conn().execute("DELETE FROM shared_state WHERE key = ?", (key,))
+
+    def _incr(self, key, amount, ttl):
+        # An expired counter restarts at amount with a fresh TTL
+        row = self._conn().execute(
+            "INSERT INTO shared_state VALUES (?1, ?2, ?3) ON CONFLICT (key) DO UPDATE SET "
+            "value = CASE WHEN shared_state.expires_at <= ?4 THEN ?2 "
+            "             ELSE CAST(shared_state.value AS INTEGER) + ?2 END, "
+            "expires_at = CASE WHEN shared_state.expires_at <= ?4 THEN ?3 "
+            "                  ELSE shared_state.expires_at END "
+            "RETURNING value",
+            (key, amount, self._expiry(ttl), time.time())).fetchone()
+        return int(row[0])
+
+    def _update(self, key, fn, ttl):
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")   # takes the write lock before reading
+        try:
+            value = fn(self._get(key))
+            db.execute("INSERT OR REPLACE INTO shared_state VALUES (?, ?, ?)",
+                       (key, value, self._expiry(ttl)))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return value
+
+    async def get(self, key):
+        return await self._run(self._get, key)
+
+    async def set(self, key, value, ttl=None):
+        await self._run(self._set, key, value, ttl)
+
+    async def add(self, key, value, ttl=None):
+        return await self._run(self._add, key, value, ttl)
+
+    async def delete(self, key):
+        await self._run(self._delete, key)
+
+    async def incr(self, key, amount=1, ttl=None):
+        return await self._run(self._incr, key, amount, ttl)
+
+    async def update(self, key, fn, ttl=None):
+        return await self._run(self._update, key, fn, ttl)
+
+    def stats(self):
+        return {**super().stats(), "path": self.path}
+
+    async def close(self):
+        def _close():
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        await self._run(_close)
+        self._executor.shutdown(wait=True)
+
+
+class RedisError(RuntimeError):
+    """Error reply from the server"""
+
+
+class RespConnection:
+    """One connection speaking RESP2 (requests are arrays of bulk strings)"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, url: str) -> "RespConnection":
+        parsed = urlparse(url)
+        reader, writer = await asyncio.open_connection(parsed.hostname or "localhost",
+                                                       parsed.port or 6379)
+        conn = cls(reader, writer)
+        if parsed.password:
+            await conn.call("AUTH", *([parsed.username] if parsed.username else []),
+                            parsed.password)
+        db = (parsed.path or "/").lstrip("/")
+        if db and db != "0":
+            await conn.call("SELECT", db)
+        return conn
+
+    @staticmethod
+    def encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    async def read_reply(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            return RedisError(body.decode())   # returned, so arrays stay in sync
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            if body == b"-1":
+                return None
+            data = await self.reader.readexactly(int(body) + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            if body == b"-1":
+                return None
+            return [await self.read_reply() for _ in range(int(body))]
+        raise ConnectionError(f"Unexpected reply {line!r}")
+
+    async def call(self, *args):
+        """One command; error replies are raised as RedisError"""
+        reply = (await self.pipeline(args))[0]
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    async def pipeline(self, *commands) -> List:
+        """Send several commands in one write, then read every reply
+        (error replies come back as RedisError values)"""
+        self.writer.write(b"".join(self.encode(*c) for c in commands))
+        await self.writer.drain()
+        return [await self.read_reply() for _ in commands]
+
+    def close(self):
+        self.writer.close()
+
+
+class RedisState(SharedState):
+    """
+    Redis-protocol backend with a small connection pool. update() uses
+    WATCH/MULTI/EXEC and retries when another client changed the key.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = STATE_REDIS_URL, pool_size: int = STATE_REDIS_POOL_SIZE,
+                 prefix: str = STATE_KEY_PREFIX):
+        self.url = url
+        parsed = urlparse(url)
+        # For stats: without credentials
+        self.address = f"{parsed.hostname}:{parsed.port or 6379}{parsed.path}"
+        self.prefix = prefix
+        self._idle: List[RespConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+        self._stats = {"connections_opened": 0, "update_retries": 0}
+
+    async def _acquire(self) -> RespConnection:
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop()
+        try:
+            conn = await RespConnection.open(self.url)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._stats["connections_opened"] += 1
+        return conn
+
+    def _release(self, conn: RespConnection, healthy: bool):
+        if healthy:
+            self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    async def _pipeline(self, *commands) -> List:
+        """Run commands on a pooled connection; a connection that failed
+        mid-reply is closed, never reused"""
+        conn = await self._acquire()
+        healthy = False
+        try:
+            replies = await conn.pipeline(*commands)
+            healthy = True
+            return replies
+        finally:
+            self._release(conn, healthy)
+
+    async def _call(self, *args):
+        reply = (await self._pipeline(args))[0]
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> List:
+        return ["PX", max(1, int(ttl * 1000))] if ttl else []
+
+    async def get(self, key):
+        return await self._call("GET", self.prefix + key)
+
+    async def set(self, key, value, ttl=None):
+        await self._call("SET", self.prefix + key, value, *self._px(ttl))
+
+    async def add(self, key, value, ttl=None):
+        return await self._call("SET", self.prefix + key, value, "NX", *self._px(ttl)) == "OK"
+
+    async def delete(self, key):
+        await self._call("DEL", self.prefix + key)
+
+    async def incr(self, key, amount=1, ttl=None):
+        k = self.prefix + key
+        commands = [("MULTI",), ("INCRBY", k, amount)]
+        if ttl:
+            commands.append(("PEXPIRE", k, max(1, int(ttl * 1000)), "NX"))
+        replies = await self._pipeline(*commands, ("EXEC",))
+        for reply in [*replies, *(replies[-1] or ())]:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies[-1][0]
+
+    async def update(self, key, fn, ttl=None):
+        k = self.prefix + key
+        conn = await self._acquire()
+        healthy = False   # fn raising leaves a WATCH behind: drop the connection
+        try:
+            for _ in range(STATE_UPDATE_RETRIES):
+                _, current = await conn.pipeline(("WATCH", k), ("GET", k))
+                value = fn(current)
+                replies = await conn.pipeline(
+                    ("MULTI",), ("SET", k, value, *self._px(ttl)), ("EXEC",))
+                if replies[-1] is not None:   # None: the key changed under WATCH
+                    healthy = True
+                    for reply in [*replies, *replies[-1]]:
+                        if isinstance(reply, RedisError):
+                            raise reply
+                    return value
+                self._stats["update_retries"] += 1
+            healthy = True
+            raise StateConflict(f"update({key!r}) conflicted {STATE_UPDATE_RETRIES} times")
+        finally:
+            self._release(conn, healthy)
+
+    def stats(self):
+        return {**super().stats(), "address": self.address, **self._stats}
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+def create_state(backend: str = STATE_BACKEND) -> SharedState:
+    """Backend by name (STATE_BACKEND)"""
+    if backend == "local":
+        return LocalState()
+    if backend == "sqlite":
+        return SQLiteState()
+    if backend == "redis":
+        return RedisState()
+    raise ValueError(f"Unknown STATE_BACKEND {backend!r} (local, sqlite, redis)")
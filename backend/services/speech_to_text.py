@@ -0,0 +1,358 @@
+"""
+Offline Speech-to-Text
+======================
+Pluggable transcriber backends that run on-prem with no network access,
+behind a warm, bounded process pool.
+
+Backends (STT_BACKEND):
+- simulated  canned transcriptions; the default and the test backend
+- vosk       Kaldi models via the optional vosk package
+             (STT_MODEL_PATH = unpacked model directory)
+- whisper    faster-whisper on CPU with int8 weights
+             (STT_MODEL_PATH = local CTranslate2 model directory)
+
+TranscriptionPool loads the model once per worker process (the pool
+initializer) and warms every worker at startup, so no request pays the
+model load. At most STT_WORKERS transcriptions run at once; further requests
+wait up to STT_QUEUE_TIMEOUT_SECONDS for a worker and then fail with
+TranscriptionBusy. A worker that dies (native crash, OOM kill) breaks the
+whole pool; the pool is rebuilt and the request retried once, and if that
+fails too the request gets TranscriptionBusy. Per-backend metrics:
+real-time factor (compute seconds per audio second), queue wait and
+worker restarts.
+
+Backends receive the audio front-end output: mono 16 kHz float32 samples
+with silence trimmed (services/audio_frontend.py).
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    import numpy as np   # imported where used, so `import main` skips it
+
+from services.audio_frontend import TARGET_SAMPLE_RATE, UnsupportedAudio
+
+STT_BACKEND = os.getenv("STT_BACKEND", "simulated")
+STT_MODEL_PATH = os.getenv("STT_MODEL_PATH", "")
+STT_LANGUAGE = os.getenv("STT_LANGUAGE", "en")
+# 0 runs the backend in a thread; the simulated backend is a string lookup
+# and gains nothing from a process of its own
+STT_WORKERS = int(os.getenv("STT_WORKERS", "0" if STT_BACKEND == "simulated" else "1"))
+STT_CPU_THREADS = int(os.getenv("STT_CPU_THREADS", "1"))   # per worker
+STT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("STT_QUEUE_TIMEOUT_SECONDS", "30"))
+
+# Simulated speech-to-text output (prototype)
+SIMULATED_TRANSCRIPTIONS = [
+    "I have severe pain in my knee with significant swelling. It hurts when I walk and there's moderate redness around the joint area.",
+    "There's a sharp burning sensation on my arm with visible swelling. The pain is intense and it started after I fell yesterday.",
+    "I feel a dull aching pain in my lower back. The swelling is mild but the discomfort is constant throughout the day.",
+    "My ankle has moderate swelling and throbbing pain. I can barely put weight on it and there's some bruising visible.",
+    "There's severe stabbing pain in my wrist with significant inflammation. The area is red and warm to touch.",
+    "I have mild pain in my shoulder with slight swelling. It's a dull ache that gets worse when I move my arm."
+]
+
+
+class TranscriptionBusy(Exception):
+    """No transcription worker became free within the queue timeout, or
+    the workers keep crashing"""
+
+
+class Transcriber:
+    """
+    Speech-to-text backend. load() runs once per worker process;
+    transcribe() runs once per recording.
+    """
+
+    name = "base"
+
+    def load(self):
+        """Load the model (called once in each worker)"""
+
+    def transcribe(self, samples: Optional["np.ndarray"], audio_size: int) -> Dict:
+        """
+        Args:
+            samples: 16 kHz mono float32 speech, or None if the upload
+                     could not be decoded
+            audio_size: size of the uploaded file in bytes
+
+        Returns:
+            dict with text, confidence and language
+        """
+        raise NotImplementedError
+
+    def _require_samples(self, samples: Optional["np.ndarray"]) -> "np.ndarray":
+        if samples is None:
+            raise UnsupportedAudio(
+                f"The {self.name} transcriber needs WAV or FLAC audio")
+        return samples
+
+
+class SimulatedTranscriber(Transcriber):
+    """Canned transcriptions picked by file size (for demo consistency)"""
+
+    name = "simulated"
+
+    def transcribe(self, samples: Optional["np.ndarray"], audio_size: int) -> Dict:
+        return {
+            "text": SIMULATED_TRANSCRIPTIONS[audio_size % len(SIMULATED_TRANSCRIPTIONS)],
+            "confidence": 0.92 if audio_size > 50000 else 0.85,
+            "language": "en-US",
+        }
+
+
+class VoskTranscriber(Transcriber):
+    """Offline Kaldi recognizer (pip install vosk + a downloaded model)"""
+
+    name = "vosk"
+
+    def __init__(self, model_path: str = STT_MODEL_PATH):
+        self.model_path = model_path
+        self.model = None
+
+    def load(self):
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        self.model = Model(self.model_path)
+
+    def transcribe(self, samples: Optional["np.ndarray"], audio_size: int) -> Dict:
+        import numpy as np
+        from vosk import KaldiRecognizer
+
+        samples = self._require_samples(samples)
+        recognizer = KaldiRecognizer(self.model, TARGET_SAMPLE_RATE)
+        recognizer.SetWords(True)
+        pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes()
+        recognizer.AcceptWaveform(pcm)
+        result = json.loads(recognizer.FinalResult())
+
+        words = result.get("result", [])
+        return {
+            "text": result.get("text", ""),
+            "confidence": float(np.mean([w["conf"] for w in words])) if words else 0.0,
+            "language": STT_LANGUAGE,
+        }
+
+
+class WhisperTranscriber(Transcriber):
+    """faster-whisper on CPU, int8 (pip install faster-whisper + a local model)"""
+
+    name = "whisper"
+
+    def __init__(self, model_path: str = STT_MODEL_PATH):
+        self.model_path = model_path
+        self.model = None
+
+    def load(self):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(self.model_path, device="cpu", compute_type="int8",
+                                  cpu_threads=STT_CPU_THREADS, local_files_only=True)
+
+    def transcribe(self, samples: Optional["np.ndarray"], audio_size: int) -> Dict:
+        import numpy as np
+
+        samples = self._require_samples(samples)
+        if len(samples) == 0:
+            return {"text": "", "confidence": 0.0, "language": STT_LANGUAGE}
+
+        segments, info = self.model.transcribe(
+            samples, language=STT_LANGUAGE, beam_size=1, vad_filter=False)
+        segments = list(segments)
+        text = " ".join(s.text.strip() for s in segments)
+        # avg_logprob is per token; exp() of its mean is a usable 0-1 score
+        confidence = (float(np.exp(np.mean([s.avg_logprob for s in segments])))
+                      if segments else 0.0)
+        return {"text": text, "confidence": confidence, "language": info.language}
+
+
+TRANSCRIBERS = {
+    "simulated": SimulatedTranscriber,
+    "vosk": VoskTranscriber,
+    "whisper": WhisperTranscriber,
+}
+
+
+def create_transcriber(backend: str = STT_BACKEND) -> Transcriber:
+    try:
+        return TRANSCRIBERS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown STT_BACKEND {backend!r} "
+                         f"(choose from {', '.join(TRANSCRIBERS)})") from None
+
+
+# Worker-process state: the transcriber loaded by _load_worker
+_worker_transcriber: Optional[Transcriber] = None
+
+
+def _load_worker(backend: str):
+    global _worker_transcriber
+    _worker_transcriber = create_transcriber(backend)
+    _worker_transcriber.load()
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+def _run_transcription(samples: Optional["np.ndarray"], audio_size: int) -> Dict:
+    started = time.perf_counter()
+    result = _worker_transcriber.transcribe(samples, audio_size)
+    result["compute_seconds"] = time.perf_counter() - started
+    return result
+
+
+class TranscriptionPool:
+    """
+    Bounded pool of warm transcriber processes (STT_WORKERS = 0 runs the
+    backend in a thread of the server process instead).
+    """
+
+    def __init__(self, backend: str = STT_BACKEND, workers: int = STT_WORKERS,
+                 queue_timeout: float = STT_QUEUE_TIMEOUT_SECONDS):
+        self.backend = backend
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(max(workers, 1))
+        self._waiting = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "completed": 0, "failed": 0, "timed_out": 0,
+            "audio_seconds": 0.0, "compute_seconds": 0.0, "max_real_time_factor": 0.0,
+            "queue_wait_seconds": 0.0, "max_queue_wait_seconds": 0.0,
+            "worker_restarts": 0,
+        }
+
+    def _spawn(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_load_worker, initargs=(self.backend,))
+
+    async def start(self):
+        """Spawn the workers and wait until each one has loaded the model"""
+        if self.workers <= 0:
+            _load_worker(self.backend)
+            return
+        if self._executor is not None:
+            return
+
+        create_transcriber(self.backend)  # fail fast on a bad STT_BACKEND
+        self._executor = self._spawn()
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(self._executor, _warm_up)
+                                   for _ in range(self.workers)))
+        except BrokenProcessPool:
+            self.stop()
+            raise RuntimeError(f"The {self.backend} STT backend failed to load "
+                               "in a worker (see the worker traceback above)") from None
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace a broken executor (once, however many requests saw it break)"""
+        if self._executor is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._spawn()
+        with self._lock:
+            self._stats["worker_restarts"] += 1
+        print(f"⚠️  {self.backend} transcription worker died - pool restarted")
+
+    async def _run(self, samples: Optional["np.ndarray"], audio_size: int) -> Dict:
+        """One transcription; retried once on a fresh pool if a worker dies"""
+        if self._executor is None:
+            return await asyncio.to_thread(_run_transcription, samples, audio_size)
+        loop = asyncio.get_running_loop()
+        for _ in range(2):
+            executor = self._executor
+            try:
+                return await loop.run_in_executor(
+                    executor, _run_transcription, samples, audio_size)
+            except BrokenProcessPool:
+                self._restart(executor)
+        raise TranscriptionBusy(
+            f"The {self.backend} transcription worker crashed twice on this request")
+
+    def busy(self) -> bool:
+        """True when a transcription submitted now would have to queue"""
+        return self._slots.locked()
+
+    async def transcribe(self, samples: Optional["np.ndarray"], audio_size: int) -> Dict:
+        """
+        Transcribe on a free worker, waiting at most queue_timeout for one.
+
+        Returns:
+            backend result plus compute_seconds and queue_wait_seconds
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+        queued = time.perf_counter()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats["timed_out"] += 1
+            raise TranscriptionBusy(
+                f"All {max(self.workers, 1)} transcription workers busy for "
+                f"{self.queue_timeout:g}s") from None
+        finally:
+            self._waiting -= 1
+        queue_wait = time.perf_counter() - queued
+
+        self._running += 1
+        try:
+            result = await self._run(samples, audio_size)
+        except Exception:
+            with self._lock:
+                self._stats["failed"] += 1
+            raise
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+        result["queue_wait_seconds"] = queue_wait
+        self._record(result, samples, queue_wait)
+        return result
+
+    def _record(self, result: Dict, samples: Optional["np.ndarray"], queue_wait: float):
+        audio_seconds = len(samples) / TARGET_SAMPLE_RATE if samples is not None else 0.0
+        with self._lock:
+            stats = self._stats
+            stats["completed"] += 1
+            stats["queue_wait_seconds"] += queue_wait
+            stats["max_queue_wait_seconds"] = max(stats["max_queue_wait_seconds"], queue_wait)
+            if audio_seconds > 0:
+                stats["audio_seconds"] += audio_seconds
+                stats["compute_seconds"] += result["compute_seconds"]
+                stats["max_real_time_factor"] = max(
+                    stats["max_real_time_factor"], result["compute_seconds"] / audio_seconds)
+
+    def snapshot(self) -> Dict:
+        """Everything the admin endpoint reports"""
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            "workers": self.workers,
+            "queue_timeout_seconds": self.queue_timeout,
+            "running": self._running,
+            "waiting": self._waiting,
+            **stats,
+            "real_time_factor": (stats["compute_seconds"] / stats["audio_seconds"]
+                                 if stats["audio_seconds"] else None),
+            "avg_queue_wait_seconds": (stats["queue_wait_seconds"] / stats["completed"]
+                                       if stats["completed"] else None),
+        }
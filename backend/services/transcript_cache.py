@@ -0,0 +1,159 @@
+"""
+Transcript Cache
+================
+Re-submitted voice notes (app retries, users re-sending) skip
+transcription: the transcript, confidence, language and extracted info are
+cached under the audio fingerprint from services/audio_frontend.py.
+
+Two tiers:
+- memory: LRU of TRANSCRIPT_CACHE_SIZE entries
+- disk: one JSON file per entry under TRANSCRIPT_CACHE_DIR (survives
+  restarts, shared by all workers); trimmed to the newest
+  TRANSCRIPT_CACHE_DISK_ENTRIES files at startup and every
+  TRANSCRIPT_CACHE_PRUNE_EVERY writes
+- or, on a shared STATE_BACKEND, the shared state takes the disk's place
+  (entries expire after TRANSCRIPT_CACHE_TTL_SECONDS), so workers on
+  other hosts see the entries too
+
+Keys include the STT backend, so switching backends never serves another
+backend's transcripts. Disk I/O runs in a thread.
+"""
+
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from services.shared_state import SharedState
+
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "1024"))
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", "cache/transcripts")
+TRANSCRIPT_CACHE_DISK_ENTRIES = int(os.getenv("TRANSCRIPT_CACHE_DISK_ENTRIES", "100000"))
+TRANSCRIPT_CACHE_TTL_SECONDS = float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", "604800"))
+TRANSCRIPT_CACHE_PRUNE_EVERY = 1000
+
+
+class TranscriptCache:
+    """
+    Memory LRU in front of a directory of JSON entries, or of the shared
+    state when one is given. directory=None (and no shared state) keeps
+    the cache in memory only.
+    """
+
+    def __init__(self, max_entries: int = TRANSCRIPT_CACHE_SIZE,
+                 directory: Optional[str] = TRANSCRIPT_CACHE_DIR,
+                 max_disk_entries: int = TRANSCRIPT_CACHE_DISK_ENTRIES,
+                 shared: Optional[SharedState] = None,
+                 shared_ttl: float = TRANSCRIPT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self.directory = directory if shared is None and directory else None
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "shared_hits": 0,
+                       "misses": 0, "disk_errors": 0}
+
+    @staticmethod
+    def key(backend: str, fingerprint: str) -> str:
+        return f"{backend}:{fingerprint}"
+
+    def _path(self, key: str) -> str:
+        digest = key.rsplit(":", 1)[-1]
+        name = key.replace(":", "_")
+        return os.path.join(self.directory, digest[:2], f"{name}.json")
+
+    def _remember(self, key: str, entry: Dict):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return entry
+
+        if self.shared is not None:
+            value = await self.shared.get(f"transcript:{key}")
+            if value is not None:
+                entry = json.loads(value)
+                self._remember(key, entry)
+                self._stats["shared_hits"] += 1
+                return entry
+        elif self.directory is not None:
+            entry = await asyncio.to_thread(self._read, key)
+            if entry is not None:
+                self._remember(key, entry)
+                self._stats["disk_hits"] += 1
+                return entry
+
+        self._stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, entry: Dict):
+        self._remember(key, entry)
+        if self.shared is not None:
+            await self.shared.set(f"transcript:{key}", json.dumps(entry), ttl=self.shared_ttl)
+            return
+        if self.directory is None:
+            return
+        await asyncio.to_thread(self._write, key, entry)
+        self._writes += 1
+        if self._writes % TRANSCRIPT_CACHE_PRUNE_EVERY == 0:
+            await asyncio.to_thread(self.prune)
+
+    def _read(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            self._stats["disk_errors"] += 1
+            return None
+
+    def _write(self, key: str, entry: Dict):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)   # readers never see a partial file
+        except OSError:
+            self._stats["disk_errors"] += 1
+
+    def prune(self) -> int:
+        """Delete the oldest disk entries beyond max_disk_entries"""
+        if self.directory is None or not os.path.isdir(self.directory):
+            return 0
+        files = []
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                files.extend((e.stat().st_mtime, e.path) for e in os.scandir(shard.path)
+                             if e.name.endswith(".json"))
+        excess = len(files) - self.max_disk_entries
+        if excess <= 0:
+            return 0
+        files.sort()
+        for _, path in files[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return excess
+
+    def cache_info(self) -> Dict:
+        """Hit/miss counters per tier and current memory size"""
+        return {
+            **self._stats,
+            "size": len(self._entries),
+            "maxsize": self.max_entries,
+            "directory": self.directory,
+            "shared": self.shared.name if self.shared is not None else None,
+        }
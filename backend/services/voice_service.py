@@ -8,16 +8,16 @@ import io
 import re
 from typing import Dict, Optional
 
+from services.audio_frontend import process_audio_bytes
+from services.speech_to_text import SimulatedTranscriber
+
 
 class VoiceService:
     """
     Handles voice input processing and conversion to text.
-    In production, this would integrate with services like:
-    - Google Cloud Speech-to-Text
-    - Azure Speech Services
-    - OpenAI Whisper API
-
-    For this prototype, we simulate voice-to-text conversion.
+    Transcription comes from an offline backend in services/speech_to_text.py
+    (run by main.py's TranscriptionPool); without one, the simulated
+    transcriber is used.
     """
 
     def __init__(self):
@@ -37,49 +37,43 @@ class VoiceService:
             'head', 'chest', 'abdomen', 'leg', 'arm', 'hand', 'foot', 'finger'
         ]
 
-    def process_audio(self, audio_data: bytes, filename: str) -> Dict:
+    def process_audio(self, audio_data: bytes, filename: str,
+                      audio: Optional[Dict] = None,
+                      transcription: Optional[Dict] = None) -> Dict:
         """
         Process audio file and convert to text.
-        In production, this would use actual speech-to-text API.
 
         Args:
             audio_data: Raw audio bytes (WAV, MP3, etc.)
             filename: Original filename
+            audio: audio front-end output for audio_data, if already decoded
+                   (services/audio_frontend.py); decoded inline otherwise
+            transcription: transcriber output for the audio, if already
+                   transcribed; the simulated transcriber is used otherwise
 
         Returns:
             dict with transcribed_text, confidence, detected_language
         """
-
-        # Simulate voice-to-text conversion based on audio characteristics
-        # In production, this would call actual API like:
-        # - Google Cloud Speech-to-Text
-        # - Whisper API
-        # - Azure Speech
+        if audio is None:
+            audio = process_audio_bytes(audio_data)
 
         audio_size = len(audio_data)
+        if transcription is None:
+            transcription = SimulatedTranscriber().transcribe(audio["samples"], audio_size)
 
-        # Simulate different transcriptions based on audio size
-        simulated_transcriptions = [
-            "I have severe pain in my knee with significant swelling. It hurts when I walk and there's moderate redness around the joint area.",
-            "There's a sharp burning sensation on my arm with visible swelling. The pain is intense and it started after I fell yesterday.",
-            "I feel a dull aching pain in my lower back. The swelling is mild but the discomfort is constant throughout the day.",
-            "My ankle has moderate swelling and throbbing pain. I can barely put weight on it and there's some bruising visible.",
-            "There's severe stabbing pain in my wrist with significant inflammation. The area is red and warm to touch.",
-            "I have mild pain in my shoulder with slight swelling. It's a dull ache that gets worse when I move my arm."
-        ]
-
-        # Select transcription based on audio size (for demo consistency)
-        selected_index = (audio_size % len(simulated_transcriptions))
-        transcribed_text = simulated_transcriptions[selected_index]
-
-        # Simulate confidence score
-        confidence = 0.92 if audio_size > 50000 else 0.85
+        # True duration from the header when the format is parsed,
+        # otherwise the old size-based approximation
+        duration = audio["duration_seconds"]
+        if duration is None:
+            duration = audio_size / 16000
 
         return {
-            "transcribed_text": transcribed_text,
-            "confidence": confidence,
-            "detected_language": "en-US",
-            "duration_seconds": audio_size / 16000,  # Approximate duration
+            "transcribed_text": transcription["text"],
+            "confidence": transcription["confidence"],
+            "detected_language": transcription["language"],
+            "duration_seconds": duration,
+            "speech_seconds": audio["speech_seconds"],
+            "sample_rate": audio["sample_rate"],
             "audio_quality": "good" if audio_size > 50000 else "fair"
         }
 
@@ -152,6 +146,22 @@ class VoiceService:
             "original_text": text
         }
 
+    def build_assessment_data(self, extracted_info: Dict) -> Dict:
+        """
+        Map extracted voice information onto questionnaire answers
+        for HealthAssessmentService.analyze_questionnaire.
+        """
+        symptoms = extracted_info["additional_symptoms"]
+        return {
+            "pain_level": extracted_info["pain_level"],
+            "swelling": extracted_info["swelling_severity"],
+            "duration": extracted_info["duration"],
+            "affected_area": extracted_info["affected_area"],
+            "movement_difficulty": "moderate" if "limited_mobility" in symptoms else "mild",
+            "redness": "yes" if "redness" in symptoms else "no",
+            "warmth": "yes" if "warmth" in symptoms else "no"
+        }
+
     def validate_audio_format(self, filename: str) -> bool:
         """
         Validate if audio file format is supported.
@@ -0,0 +1,276 @@
+"""
+Streaming Voice Analysis
+========================
+Incremental transcription and extraction behind the /ws/voice endpoint.
+
+The client streams audio chunks; a VoiceStreamSession feeds them to a
+streaming transcriber, re-runs VoiceService.extract_health_info_from_text
+whenever the partial transcript changes, and reports extracted_info once it
+has held steady for VOICE_STREAM_STABLE_UPDATES consecutive updates. When
+the stream ends the final transcript is analyzed straight away.
+
+Transcribers:
+- SimulatedStreamingTranscriber: the simulated STT backend, word by word
+- PooledStreamingTranscriber: any other STT_BACKEND, through the same
+  decode pool and TranscriptionPool as /api/voice-analysis. Every
+  VOICE_STREAM_PARTIAL_BYTES (0 = final only) it transcribes the audio
+  since the last commit point for a partial transcript; once that span
+  reaches VOICE_STREAM_WINDOW_BYTES its text joins the stable prefix and
+  the next span starts after it, so each partial costs at most one window
+  however long the stream runs. Spans are cut from the WAV data chunk
+  (a streamed WAV may leave its data size as 0 or 0xFFFFFFFF); FLAC cannot
+  be cut mid-stream and only gets the final transcript. When the stream
+  ends the whole recording is decoded and transcribed once, so the final
+  text has no span boundaries in it.
+
+Limits (per connection unless noted):
+- VOICE_WS_MAX_CONNECTIONS  concurrent streams (per process)
+- VOICE_WS_MAX_BYTES        total audio in one stream
+- VOICE_WS_MAX_CHUNK_BYTES  size of one binary frame
+- VOICE_WS_MAX_SECONDS      wall-clock length of one stream
+- VOICE_WS_IDLE_SECONDS     longest gap between frames
+- VOICE_WS_QUEUE_CHUNKS     chunks received but not yet processed; when the
+                            queue is full the server stops reading, so the
+                            client is pushed back through TCP
+"""
+
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from services.audio_frontend import AudioDecodePool, UnsupportedAudio, wav_layout
+from services.speech_to_text import (
+    SIMULATED_TRANSCRIPTIONS,
+    TranscriptionBusy,
+    TranscriptionPool,
+)
+from services.voice_service import VoiceService
+
+VOICE_WS_MAX_CONNECTIONS = int(os.getenv("VOICE_WS_MAX_CONNECTIONS", "50"))
+VOICE_WS_MAX_BYTES = int(os.getenv("VOICE_WS_MAX_BYTES", str(10 * 1024 * 1024)))
+VOICE_WS_MAX_CHUNK_BYTES = int(os.getenv("VOICE_WS_MAX_CHUNK_BYTES", str(256 * 1024)))
+VOICE_WS_MAX_SECONDS = float(os.getenv("VOICE_WS_MAX_SECONDS", "120"))
+VOICE_WS_IDLE_SECONDS = float(os.getenv("VOICE_WS_IDLE_SECONDS", "10"))
+VOICE_WS_QUEUE_CHUNKS = int(os.getenv("VOICE_WS_QUEUE_CHUNKS", "16"))
+VOICE_STREAM_STABLE_UPDATES = int(os.getenv("VOICE_STREAM_STABLE_UPDATES", "2"))
+# 64000 bytes = 2 s of 16 kHz 16-bit mono
+VOICE_STREAM_PARTIAL_BYTES = int(os.getenv("VOICE_STREAM_PARTIAL_BYTES", "64000"))
+# 320000 bytes = 10 s of 16 kHz 16-bit mono
+VOICE_STREAM_WINDOW_BYTES = int(os.getenv("VOICE_STREAM_WINDOW_BYTES", "320000"))
+
+# Largest WAV header (up to the data chunk) looked for in a stream
+WAV_HEADER_MAX_BYTES = 64 * 1024
+
+# WebSocket close codes
+CLOSE_UNSUPPORTED_DATA = 1003
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_TOO_BIG = 1009
+CLOSE_INTERNAL_ERROR = 1011
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class StreamLimitExceeded(Exception):
+    """A per-connection limit was hit; the stream is closed with close_code"""
+
+    def __init__(self, detail: str, close_code: int = CLOSE_POLICY_VIOLATION):
+        super().__init__(detail)
+        self.close_code = close_code
+
+
+class StreamSlots:
+    """Caps concurrent streams (single event loop, so a plain counter)"""
+
+    def __init__(self, limit: int = VOICE_WS_MAX_CONNECTIONS):
+        self.limit = limit
+        self.active = 0
+
+    def acquire(self) -> bool:
+        if self.active >= self.limit:
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+
+
+class StreamingTranscriber:
+    """
+    Incremental speech-to-text: feed audio as it arrives, read the
+    transcript so far, and get the final result when the stream ends.
+    """
+
+    async def feed(self, chunk: bytes) -> str:
+        """Add audio; returns the (partial) transcript so far"""
+        raise NotImplementedError
+
+    async def finish(self) -> Dict:
+        """Final result, same shape as VoiceService.process_audio"""
+        raise NotImplementedError
+
+
+class SimulatedStreamingTranscriber(StreamingTranscriber):
+    """
+    Local stub for development and tests: reveals one of the simulated
+    transcriptions word by word as audio arrives (one word per
+    bytes_per_word). The text is picked from the first chunk, so the same
+    recording always produces the same transcript.
+    """
+
+    def __init__(self, bytes_per_word: int = 6400):  # 0.2 s of 16 kHz 16-bit mono
+        self.bytes_per_word = bytes_per_word
+        self.received = 0
+        self._words: Optional[List[str]] = None
+
+    async def feed(self, chunk: bytes) -> str:
+        if self._words is None and chunk:
+            text = SIMULATED_TRANSCRIPTIONS[zlib.crc32(chunk) % len(SIMULATED_TRANSCRIPTIONS)]
+            self._words = text.split()
+        self.received += len(chunk)
+        if not self._words:
+            return ""
+        return " ".join(self._words[:self.received // self.bytes_per_word])
+
+    async def finish(self) -> Dict:
+        return {
+            "transcribed_text": " ".join(self._words or []),
+            "confidence": 0.92 if self.received > 50000 else 0.85,
+            "detected_language": "en-US",
+            "duration_seconds": self.received / 16000,
+            "audio_quality": "good" if self.received > 50000 else "fair"
+        }
+
+
+class PooledStreamingTranscriber(StreamingTranscriber):
+    """
+    The configured STT backend over a stream, through the shared pools so
+    partials use the same workers, limits and metrics as /api/voice-analysis.
+    Partials transcribe only the span since the last commit point (see the
+    module docstring); finish() transcribes the whole recording.
+    """
+
+    def __init__(self, voice_service: VoiceService, decode_pool: AudioDecodePool,
+                 transcription_pool: TranscriptionPool,
+                 partial_bytes: int = VOICE_STREAM_PARTIAL_BYTES,
+                 window_bytes: int = VOICE_STREAM_WINDOW_BYTES):
+        self.voice_service = voice_service
+        self.decode_pool = decode_pool
+        self.transcription_pool = transcription_pool
+        self.partial_bytes = partial_bytes
+        self.window_bytes = window_bytes
+        self.audio = bytearray()
+        self.stable = ""     # text of the committed spans
+        self.text = ""
+        self._transcribed_at = 0
+        self._layout: Optional[Dict] = None   # WAV layout once the header is in
+        self._span_start = 0
+
+    def _next_span(self) -> Optional[Tuple[bytes, int]]:
+        """
+        (WAV header + data since the commit point, end offset), or None
+        while the header is incomplete or when the stream is not WAV
+        """
+        if self._layout is None:
+            try:
+                self._layout = wav_layout(bytes(self.audio[:WAV_HEADER_MAX_BYTES]))
+            except UnsupportedAudio:
+                return None
+            self._span_start = self._layout["data_start"]
+        data_start = self._layout["data_start"]
+        end = len(self.audio) - (len(self.audio) - data_start) % self._layout["block_align"]
+        if end <= self._span_start:
+            return None
+        return bytes(self.audio[:data_start] + self.audio[self._span_start:end]), end
+
+    async def feed(self, chunk: bytes) -> str:
+        self.audio.extend(chunk)
+        if not self.partial_bytes or len(self.audio) - self._transcribed_at < self.partial_bytes:
+            return self.text
+        if self.transcription_pool.busy():
+            return self.text   # partials never queue behind whole recordings
+        span = self._next_span()
+        if span is None:
+            return self.text
+        self._transcribed_at = len(self.audio)
+        span_audio, end = span
+        try:
+            audio = await self.decode_pool.process(span_audio)
+            transcription = await self.transcription_pool.transcribe(
+                audio["samples"], len(span_audio))
+        except (UnsupportedAudio, TranscriptionBusy):
+            # An encoding the decoder does not handle, or the workers
+            # filled up meanwhile: keep the last partial, the final
+            # transcription settles it
+            return self.text
+        self.text = " ".join(part for part in (self.stable, transcription["text"]) if part)
+        if end - self._span_start >= self.window_bytes:
+            self.stable, self._span_start = self.text, end
+        return self.text
+
+    async def finish(self) -> Dict:
+        data = bytes(self.audio)
+        audio = await self.decode_pool.process(data)
+        transcription = await self.transcription_pool.transcribe(audio["samples"], len(data))
+        return self.voice_service.process_audio(data, "stream", audio, transcription)
+
+
+class VoiceStreamSession:
+    """
+    State of one streaming voice analysis.
+    feed() returns the messages to push to the client.
+    """
+
+    def __init__(self, voice_service: VoiceService, transcriber: StreamingTranscriber,
+                 max_bytes: int = VOICE_WS_MAX_BYTES,
+                 stable_updates: int = VOICE_STREAM_STABLE_UPDATES):
+        self.voice_service = voice_service
+        self.transcriber = transcriber
+        self.max_bytes = max_bytes
+        self.stable_updates = stable_updates
+
+        self.audio = bytearray()
+        self.transcript = ""
+        self._candidate: Optional[Dict] = None
+        self._candidate_updates = 0
+        self._published: Optional[Dict] = None
+
+    @property
+    def received(self) -> int:
+        return len(self.audio)
+
+    async def feed(self, chunk: bytes) -> List[Dict]:
+        if len(self.audio) + len(chunk) > self.max_bytes:
+            raise StreamLimitExceeded(
+                f"Recording exceeds {self.max_bytes} bytes", CLOSE_TOO_BIG)
+        self.audio.extend(chunk)
+
+        transcript = await self.transcriber.feed(chunk)
+        if transcript == self.transcript:
+            return []
+
+        self.transcript = transcript
+        messages = [{"type": "transcript", "text": transcript}]
+        info = self.voice_service.extract_health_info_from_text(transcript)
+        if self._is_stable(info):
+            messages.append({"type": "partial", "extracted_info": info})
+        return messages
+
+    def _is_stable(self, info: Dict) -> bool:
+        """True when info has just held for stable_updates transcript updates"""
+        fields = {k: v for k, v in info.items() if k != "original_text"}
+        if fields == self._candidate:
+            self._candidate_updates += 1
+        else:
+            self._candidate, self._candidate_updates = fields, 1
+
+        if self._candidate_updates >= self.stable_updates and fields != self._published:
+            self._published = fields
+            return True
+        return False
+
+    async def finish(self) -> Tuple[Dict, Dict]:
+        """Final (voice_result, extracted_info) once the stream has ended"""
+        voice_result = await self.transcriber.finish()
+        extracted_info = self.voice_service.extract_health_info_from_text(
+            voice_result["transcribed_text"])
+        return voice_result, extracted_info
@@ -0,0 +1,308 @@
+"""
+Write-Behind Buffer for Scan Records
+====================================
+Takes ScanResult inserts off the request path.
+
+With WRITE_BEHIND=1, /api/scan, /api/health-assessment and
+/api/voice-analysis put their record on a bounded in-memory queue. A
+background task flushes the queue in batches (WRITE_BEHIND_BATCH_SIZE rows
+or every WRITE_BEHIND_FLUSH_MS, whichever comes first), one transaction and
+one fsync per batch. Ids come from blocks reserved in id_sequences, so
+responses still carry scan_id.
+
+Durability (WRITE_BEHIND_DURABILITY):
+- group (default): the request waits until its batch has committed. Nothing
+  acknowledged is lost, but concurrent requests share one commit.
+- buffered: the request returns as soon as the record is queued. A crash
+  can lose up to WRITE_BEHIND_QUEUE_SIZE acknowledged records.
+
+All workers sharing a database must use the same WRITE_BEHIND setting:
+ids from reserved blocks are not visible to plain autoincrement inserts.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import ScanResult
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+WRITE_BEHIND_DURABILITY = os.getenv("WRITE_BEHIND_DURABILITY", "group")
+WRITE_BEHIND_ENQUEUE_TIMEOUT = float(
+    os.getenv("WRITE_BEHIND_ENQUEUE_TIMEOUT", "0.5"))
+WRITE_BEHIND_ID_BLOCK = int(os.getenv("WRITE_BEHIND_ID_BLOCK", "100"))
+
+FLUSH_RETRIES = 3
+
+
+class WriteBufferFull(Exception):
+    """Raised when the queue stays full past the enqueue timeout"""
+
+
+class IdAllocator:
+    """
+    Hands out ids for a table from blocks reserved in id_sequences.
+    Reservation is a single UPDATE ... RETURNING, so it is safe across
+    workers; the block start never falls below MAX(id) + 1.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, table: str = "scan_results",
+                 block_size: int = WRITE_BEHIND_ID_BLOCK):
+        self.session_factory = session_factory
+        self.table = table
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def allocate(self, count: int = 1) -> List[int]:
+        """Return `count` unused ids"""
+        async with self._lock:
+            ids = []
+            while len(ids) < count:
+                if self._next >= self._end:
+                    size = max(self.block_size, count - len(ids))
+                    self._next = await self._reserve(size)
+                    self._end = self._next + size
+                take = min(count - len(ids), self._end - self._next)
+                ids.extend(range(self._next, self._next + take))
+                self._next += take
+            return ids
+
+    async def _reserve(self, size: int) -> int:
+        floor = f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {self.table})"
+        async with self.session_factory() as db:
+            await db.execute(
+                text(f"INSERT INTO id_sequences (name, next_id) VALUES (:name, {floor}) "
+                     "ON CONFLICT (name) DO NOTHING"),
+                {"name": self.table})
+            end = await db.scalar(
+                text("UPDATE id_sequences SET next_id = "
+                     f"CASE WHEN next_id > {floor} THEN next_id ELSE {floor} END + :size "
+                     "WHERE name = :name RETURNING next_id"),
+                {"name": self.table, "size": size})
+            await db.commit()
+        return end - size
+
+
+class ScanWriteBuffer:
+    """
+    Bounded queue of ScanResult rows with a background group-commit writer.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        max_queue: int = WRITE_BEHIND_QUEUE_SIZE,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_ms: float = WRITE_BEHIND_FLUSH_MS,
+        durability: str = WRITE_BEHIND_DURABILITY,
+        enqueue_timeout: float = WRITE_BEHIND_ENQUEUE_TIMEOUT
+    ):
+        if durability not in ("group", "buffered"):
+            raise ValueError(
+                f"Unknown WRITE_BEHIND_DURABILITY '{durability}' (group or buffered)")
+
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.durability = durability
+        self.enqueue_timeout = enqueue_timeout
+        self.ids = IdAllocator(session_factory)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._max_queue = max_queue
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"queued": 0, "flushed": 0, "batches": 0,
+                       "rejected": 0, "failed": 0}
+
+    async def start(self):
+        """Start the background writer (call from the app's event loop)"""
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self._max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued, then stop the writer"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, row: Dict) -> Dict:
+        """
+        Queue one scan_results row.
+
+        Returns:
+            the row with its pre-allocated id and created_at filled in
+
+        Raises:
+            WriteBufferFull: queue still full after the enqueue timeout
+        """
+        if self._task is None:
+            raise RuntimeError("ScanWriteBuffer.start() has not been called")
+
+        row = dict(row)
+        row["id"] = (await self.ids.allocate(1))[0]
+        row.setdefault("created_at", datetime.utcnow())
+
+        loop = asyncio.get_running_loop()
+        done = loop.create_future() if self.durability == "group" else None
+
+        try:
+            await asyncio.wait_for(self._queue.put((row, done)), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            raise WriteBufferFull(
+                "Write buffer is full - server is overloaded, please retry shortly")
+        self._stats["queued"] += 1
+
+        if done is not None:
+            await done
+        return row
+
+    def stats(self) -> Dict:
+        """Queue depth and flush counters"""
+        depth = self._queue.qsize() if self._queue is not None else 0
+        return {**self._stats, "depth": depth, "capacity": self._max_queue,
+                "durability": self.durability}
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # Drain anything queued behind the stop marker
+        rest = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                rest.append(item)
+        for start in range(0, len(rest), self.batch_size):
+            await self._flush(rest[start:start + self.batch_size])
+
+    async def _flush(self, batch: List):
+        rows = [row for row, _ in batch]
+        error = None
+        for attempt in range(FLUSH_RETRIES):
+            try:
+                async with self.session_factory() as db:
+                    await self._insert(db, rows)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                logger.warning("Write-behind flush of %d rows failed (attempt %d): %s",
+                               len(rows), attempt + 1, e)
+                await asyncio.sleep(0.05 * (attempt + 1))
+
+        if error is None:
+            self._stats["flushed"] += len(rows)
+            self._stats["batches"] += 1
+        else:
+            self._stats["failed"] += len(rows)
+            logger.error("Dropped %d scan records after %d attempts: %s",
+                         len(rows), FLUSH_RETRIES, error)
+
+        for _, done in batch:
+            if done is not None and not done.done():
+                if error is None:
+                    done.set_result(None)
+                else:
+                    done.set_exception(error)
+
+    async def _insert(self, db: AsyncSession, rows: List[Dict]):
+        await db.execute(insert(ScanResult), rows)
+        await db.commit()
+
+
+class ScanRecorder:
+    """
+    Stores ScanResult rows for the API, directly or via the write-behind
+    buffer, and returns a ScanResult carrying id and created_at.
+    """
+
+    def __init__(self, buffer: Optional[ScanWriteBuffer] = None):
+        self.buffer = buffer
+
+    async def start(self):
+        if self.buffer is not None:
+            await self.buffer.start()
+
+    async def stop(self):
+        if self.buffer is not None:
+            await self.buffer.stop()
+
+    async def record(self, db: AsyncSession, **fields) -> ScanResult:
+        if self.buffer is not None:
+            return ScanResult(**await self.buffer.submit(fields))
+
+        scan_record = ScanResult(**fields)
+        db.add(scan_record)
+        await db.commit()
+        await db.refresh(scan_record)
+        return scan_record
+
+    async def record_many(self, db: AsyncSession, rows: List[Dict]) -> List[int]:
+        """
+        Store many scan_results rows with one bulk INSERT and one commit.
+        Bypasses the queue - the batch already is a group commit - but takes
+        ids from the buffer's allocator when write-behind is enabled.
+
+        Returns:
+            the new ids, in the order of `rows`
+        """
+        if not rows:
+            return []
+
+        if self.buffer is not None:
+            ids = await self.buffer.ids.allocate(len(rows))
+            await db.execute(insert(ScanResult),
+                             [{**row, "id": id_} for row, id_ in zip(rows, ids)])
+            await db.commit()
+            return ids
+
+        # SQLite hands out rowids in insertion order and the transaction
+        # holds the write lock, so sorted RETURNING ids follow `rows`.
+        # (sort_by_parameter_order=True gives the same answer ~5x slower.)
+        result = await db.execute(insert(ScanResult).returning(ScanResult.id), rows)
+        ids = sorted(result.scalars())
+        await db.commit()
+        return ids
+
+    def stats(self) -> Dict:
+        if self.buffer is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.buffer.stats()}
@@ -0,0 +1,69 @@
+"""
+Test setup: the backend directory on sys.path, and every file the app
+writes (database, chat spill, shared state, transcript cache) in a
+throwaway directory. The environment is set here, before any test module
+imports the app, because the modules read it at import time.
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+TEST_DIR = tempfile.mkdtemp(prefix="medidoctor-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(TEST_DIR, 'medidoctor.db')}",
+    "CHAT_SPILL_PATH": os.path.join(TEST_DIR, "chat_sessions.db"),
+    "STATE_BACKEND": "local",
+    "STATE_SQLITE_PATH": os.path.join(TEST_DIR, "state.db"),
+    "TRANSCRIPT_CACHE_DIR": os.path.join(TEST_DIR, "transcripts"),
+    "INIT_LOCK_PATH": os.path.join(TEST_DIR, "init.lock"),
+    "STT_BACKEND": "simulated",
+    "STT_WORKERS": "0",
+    "AUDIO_DECODE_WORKERS": "0",
+    "TRACE_SAMPLE_RATE": "0",
+    "ADMISSION_RATE": "0",
+    "WARMUP": "lazy",
+})
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def loop():
+    """One event loop for the app: its async engines and pools live on it"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def client(loop):
+    """httpx client for the app in this process, started once per session"""
+    import httpx
+
+    import main
+
+    loop.run_until_complete(main.app.router.startup())
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app),
+                               base_url="http://test")
+    yield client
+    loop.run_until_complete(client.aclose())
+    loop.run_until_complete(main.app.router.shutdown())
+
+
+@pytest.fixture
+def call(loop, client):
+    """call(method, path, **kwargs): one request against the app"""
+    def call(method, path, **kwargs):
+        return loop.run_until_complete(client.request(method, path, **kwargs))
+    return call
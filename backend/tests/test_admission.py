@@ -0,0 +1,168 @@
+"""Admission control: class limiter queueing, GCRA buckets, client keys"""
+
+import asyncio
+import hashlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+from admission import AdmissionController, AdmissionMiddleware, ClassLimiter, Rejected, _gcra
+from services.shared_state import LocalState
+
+
+def test_limiter_queues_then_times_out():
+    async def scenario():
+        limiter = ClassLimiter("test", limit=1, max_queue=1, timeout=0.05)
+        await limiter.acquire()
+
+        with pytest.raises(Rejected) as timeout:
+            await limiter.acquire()
+        assert (timeout.value.status, timeout.value.reason) == (503, "timeout")
+        assert timeout.value.retry_after > 0
+        assert not limiter._waiters   # the timed-out waiter left the queue
+
+        limiter.release(0.01)
+        assert limiter.active == 0
+        assert limiter.stats()["timeout"] == 1
+    asyncio.run(scenario())
+
+
+def test_limiter_rejects_when_queue_is_full():
+    async def scenario():
+        limiter = ClassLimiter("test", limit=1, max_queue=1, timeout=1)
+        await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(Rejected) as full:
+            await limiter.acquire()
+        assert full.value.reason == "queue_full"
+
+        limiter.release(0.01)   # hands the slot to the waiter
+        await waiting
+        assert limiter.active == 1
+        limiter.release(0.01)
+        assert limiter.active == 0
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_passes_a_handed_over_slot_on():
+    async def scenario():
+        limiter = ClassLimiter("test", limit=1, max_queue=4, timeout=1)
+        await limiter.acquire()
+        second = asyncio.create_task(limiter.acquire())
+        third = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        limiter.release(0.01)   # slot goes to second...
+        second.cancel()         # ...which is cancelled before it runs
+        try:
+            await second
+        except asyncio.CancelledError:
+            pass                # it passed the slot on
+        else:
+            limiter.release(0.01)   # wait_for kept the result (3.11): second holds it
+        await asyncio.wait_for(third, 1)   # either way third gets it next
+
+        assert limiter.active == 1
+        limiter.release(0.01)
+        assert limiter.active == 0
+        assert not limiter._waiters
+    asyncio.run(scenario())
+
+
+def test_cancelled_queued_waiter_leaves_the_queue():
+    async def scenario():
+        limiter = ClassLimiter("test", limit=1, max_queue=4, timeout=1)
+        await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        assert not limiter._waiters
+        limiter.release(0.01)
+        assert limiter.active == 0
+    asyncio.run(scenario())
+
+
+def test_gcra_allows_burst_then_rejects_until_refill():
+    interval, burst, now = 0.1, 3, 1000.0
+    value = None
+    for _ in range(3):
+        value = _gcra(value, now, 1, interval, burst)
+        assert value.endswith(";0")
+    rejected = _gcra(value, now, 1, interval, burst)
+    assert float(rejected.split(";")[1]) == pytest.approx(interval)
+    assert _gcra(value, now + interval, 1, interval, burst).endswith(";0")
+
+
+def test_rate_limit_per_client():
+    async def scenario():
+        controller = AdmissionController(LocalState(), rate=1, burst=4)
+        for _ in range(4):
+            await controller.check_rate("ip:a", "standard")
+        with pytest.raises(Rejected) as limited:
+            await controller.check_rate("ip:a", "standard")
+        assert (limited.value.status, limited.value.reason) == (429, "rate_limited")
+        await controller.check_rate("ip:b", "standard")   # own bucket
+    asyncio.run(scenario())
+
+
+def scope(api_key=None, ip="203.0.113.7"):
+    headers = [(b"x-api-key", api_key)] if api_key is not None else []
+    return {"type": "http", "headers": headers, "client": (ip, 5000)}
+
+
+def test_only_listed_api_keys_get_their_own_bucket():
+    listed = hashlib.sha256(b"partner-key").hexdigest()
+    controller = AdmissionController(LocalState(), api_keys=[listed])
+
+    assert controller.client_key(scope(b"partner-key")) == "key:" + listed[:16]
+    assert controller.client_key(scope(b"made-up-key")) == "ip:203.0.113.7"
+    assert controller.client_key(scope()) == "ip:203.0.113.7"
+    unlisted = AdmissionController(LocalState(), api_keys=())
+    assert unlisted.client_key(scope(b"partner-key")) == "ip:203.0.113.7"
+
+
+def test_per_client_rate_is_off_unless_configured():
+    env = {k: v for k, v in os.environ.items() if k != "ADMISSION_RATE"}
+    out = subprocess.run(
+        [sys.executable, "-c", "import admission; print(admission.ADMISSION_RATE)"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True, check=True)
+    assert float(out.stdout.split()[-1]) == 0
+
+    async def scenario():
+        controller = AdmissionController(LocalState(), rate=0, burst=4)
+        for _ in range(100):   # every user behind one proxy IP
+            await controller.check_rate("ip:10.0.0.1", "inference")
+    asyncio.run(scenario())
+
+
+def test_middleware_answers_429_with_retry_after():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def request(middleware):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+        http = {**scope(), "method": "POST", "path": "/api/chat"}
+        await middleware(http, None, send)
+        return sent[0]
+
+    async def scenario():
+        middleware = AdmissionMiddleware(app, AdmissionController(LocalState(), rate=1, burst=1))
+        return [await request(middleware) for _ in range(5)]
+
+    statuses = asyncio.run(scenario())
+    # the burst is raised to one inference request (4 tokens)
+    assert [s["status"] for s in statuses] == [200] * 4 + [429]
+    headers = dict(statuses[-1]["headers"])
+    assert float(headers[b"retry-after"]) > 0
@@ -0,0 +1,52 @@
+"""API endpoints on the async engines: writes land, reads see them"""
+
+import asyncio
+import os
+
+from sqlalchemy import text
+
+from database import build_async_engines, init_db
+
+
+def test_async_writer_and_reader_round_trip(tmp_path):
+    url = f"sqlite:///{os.path.join(tmp_path, 'test.db')}"
+    init_db(url)
+
+    async def scenario():
+        writer, reader = build_async_engines(url)
+        try:
+            async with writer.begin() as conn:
+                await conn.execute(text("CREATE TABLE notes (body TEXT)"))
+                await conn.execute(text("INSERT INTO notes VALUES ('written')"))
+            async with reader.connect() as conn:
+                return (await conn.execute(text("SELECT body FROM notes"))).scalar()
+        finally:
+            await writer.dispose()
+            await reader.dispose()
+
+    assert asyncio.run(scenario()) == "written"
+
+
+def test_doctors_are_filtered_by_injury(call):
+    everyone = call("GET", "/api/doctors", params={"limit": 50}).json()
+    matched = call("GET", "/api/doctors",
+                   params={"injury_type": "fracture", "limit": 50}).json()
+    assert everyone and matched
+    assert len(matched) <= len(everyone)
+    assert len(call("GET", "/api/doctors", params={"limit": 2}).json()) == 2
+
+
+def test_scan_shows_up_in_admin_stats(call, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # uploads are written to ./uploads
+    before = call("GET", "/api/admin/stats").json()
+
+    scan = call("POST", "/api/scan",
+                files={"image": ("cut.jpg", b"\xff\xd8\xff" + b"\0" * 64, "image/jpeg")})
+    assert scan.status_code == 200
+    scan = scan.json()
+
+    after = call("GET", "/api/admin/stats").json()
+    assert after["total_scans"] == before["total_scans"] + 1
+    assert after["recent_scans"][0]["id"] == scan["scan_id"]
+    assert (after["risk_distribution"].get(scan["risk_level"], 0)
+            == before["risk_distribution"].get(scan["risk_level"], 0) + 1)
@@ -0,0 +1,160 @@
+"""WAV/FLAC parsing and decoding, the decode pool, and how /api/voice-analysis answers bad audio"""
+
+import asyncio
+import io
+import os
+import struct
+
+import numpy as np
+import pytest
+
+from services.audio_frontend import (
+    AudioDecodePool,
+    UnsupportedAudio,
+    decode_pcm,
+    probe,
+    process_audio_bytes,
+)
+
+
+def wav(samples=None, rate=16000, channels=1, bits=16, audio_format=1, fmt_size=16,
+        data=None):
+    """A RIFF/WAVE file; fmt_size below 16 truncates the fmt chunk"""
+    if data is None:
+        if samples is None:
+            samples = 0.5 * np.sin(np.arange(rate) * 2 * np.pi * 440 / rate)
+        if bits == 16:
+            data = (np.asarray(samples) * 32767).astype("<i2").tobytes()
+        elif bits == 8:
+            data = (np.asarray(samples) * 127 + 128).astype(np.uint8).tobytes()
+        else:
+            data = np.asarray(samples, dtype="<f4").tobytes()
+    block_align = channels * bits // 8
+    fmt = struct.pack("<HHIIHH", audio_format, channels, rate, rate * block_align,
+                      block_align, bits)[:fmt_size]
+    body = (b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"data" + struct.pack("<I", len(data)) + data)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def flac_header(rate=44100, channels=2, bits=16, frames=441000):
+    """fLaC marker plus a STREAMINFO block (no audio frames)"""
+    packed = (rate << 44) | ((channels - 1) << 41) | ((bits - 1) << 36) | frames
+    streaminfo = (struct.pack(">HH", 4096, 4096) + b"\0" * 6
+                  + packed.to_bytes(8, "big") + b"\0" * 16)
+    return b"fLaC" + bytes([0x80]) + len(streaminfo).to_bytes(3, "big") + streaminfo
+
+
+def test_probe_wav():
+    info = probe(wav(rate=8000, channels=2, data=b"\0" * 32000))
+    assert info == {"format": "wav", "sample_rate": 8000, "channels": 2,
+                    "bits_per_sample": 16, "frames": 8000, "duration_seconds": 1.0}
+
+
+def test_probe_flac_streaminfo():
+    info = probe(flac_header())
+    assert info["format"] == "flac"
+    assert (info["sample_rate"], info["channels"], info["bits_per_sample"]) == (44100, 2, 16)
+    assert info["duration_seconds"] == pytest.approx(10.0)
+
+
+def test_probe_unknown_container():
+    assert probe(b"ID3\x03 mp3 bytes")["format"] is None
+
+
+@pytest.mark.parametrize("bits, audio_format", [(8, 1), (16, 1), (32, 3)])
+def test_decode_wav_encodings(bits, audio_format):
+    tone = 0.5 * np.sin(np.arange(1600) * 2 * np.pi * 440 / 16000)
+    samples, rate = decode_pcm(wav(tone, bits=bits, audio_format=audio_format))
+    assert rate == 16000
+    assert samples.dtype == np.float32
+    assert np.max(np.abs(samples - tone)) < 0.02
+
+
+def test_decode_stereo_is_averaged():
+    left, right = np.full(100, 0.5), np.full(100, -0.25)
+    interleaved = np.column_stack([left, right]).ravel()
+    samples, _ = decode_pcm(wav(interleaved, channels=2))
+    assert np.allclose(samples, 0.125, atol=1e-3)
+
+
+@pytest.mark.parametrize("data, message", [
+    (wav(fmt_size=8), "truncated"),
+    (wav(rate=0), "WAV"),
+    (wav(channels=0, data=b"\0" * 64), "WAV"),
+    (wav(bits=0, data=b"\0" * 64), "WAV"),
+    (b"RIFF\x04\x00\x00\x00WAVE", "no fmt/data chunk"),
+    (b"RIFF\x00\x00\x00\x00AVI ", "Not a RIFF/WAVE"),
+    (flac_header(rate=0), "zero sample rate"),
+    (b"fLaC\x00", "STREAMINFO"),
+])
+def test_malformed_headers_are_rejected(data, message):
+    with pytest.raises(UnsupportedAudio, match=message):
+        process_audio_bytes(data)
+
+
+def test_unsupported_encoding_comes_back_undecoded():
+    result = process_audio_bytes(wav(audio_format=2, data=b"\0" * 64))   # ADPCM
+    assert result["decoded"] is False
+    assert "Unsupported WAV encoding" in result["error"]
+    assert result["fingerprint"].startswith("raw:")
+
+
+def test_process_trims_silence_and_resamples():
+    rate = 8000
+    tone = 0.5 * np.sin(np.arange(rate) * 2 * np.pi * 300 / rate)
+    silence = np.zeros(rate)
+    result = process_audio_bytes(wav(np.concatenate([silence, tone, silence]), rate=rate))
+    assert result["decoded"] is True
+    assert result["duration_seconds"] == pytest.approx(3.0)
+    assert 1.0 <= result["speech_seconds"] <= 1.3
+    assert result["leading_silence"] == pytest.approx(0.9, abs=0.05)
+    assert len(result["samples"]) == pytest.approx(result["speech_seconds"] * 16000)
+
+
+def test_flac_decodes_like_the_wav_it_came_from():
+    soundfile = pytest.importorskip("soundfile")
+    tone = 0.5 * np.sin(np.arange(16000) * 2 * np.pi * 440 / 16000)
+    buffer = io.BytesIO()
+    soundfile.write(buffer, tone, 16000, format="FLAC", subtype="PCM_16")
+    flac = buffer.getvalue()
+    pcm, _ = soundfile.read(io.BytesIO(flac), dtype="int16")
+
+    assert probe(flac)["frames"] == 16000
+    assert (process_audio_bytes(flac)["fingerprint"]
+            == process_audio_bytes(wav(data=pcm.astype("<i2").tobytes()))["fingerprint"])
+
+
+@pytest.mark.parametrize("data", [wav(fmt_size=8), wav(rate=0), wav(bits=0, data=b"\0" * 64)])
+def test_voice_analysis_answers_malformed_wav_with_415(call, data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # recordings are saved under ./uploads
+    response = call("POST", "/api/voice-analysis",
+                    files={"audio": ("note.wav", data, "audio/wav")})
+    assert response.status_code == 415
+
+
+def test_voice_analysis_accepts_wav(call, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    response = call("POST", "/api/voice-analysis",
+                    files={"audio": ("note.wav", wav(), "audio/wav")})
+    assert response.status_code == 200
+    assert response.json()["transcribed_text"]
+
+
+def test_decode_pool_recovers_from_a_crashed_worker():
+    async def scenario():
+        pool = AudioDecodePool(workers=1)
+        pool.start()
+        try:
+            crashed = asyncio.get_running_loop().run_in_executor(pool._executor, os._exit, 1)
+            with pytest.raises(Exception):
+                await crashed
+            first = await pool.process(wav())
+            second = await pool.process(wav())
+            return pool.restarts, first, second
+        finally:
+            pool.stop()
+
+    restarts, first, second = asyncio.run(scenario())
+    assert restarts == 1
+    assert first["decoded"] and second["decoded"]
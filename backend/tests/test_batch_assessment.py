@@ -0,0 +1,71 @@
+"""/api/health-assessment/batch: JSON and NDJSON bodies, errors and caps"""
+
+import json
+
+import pytest
+
+from services.health_assessment_service import HealthAssessmentService
+
+ROW = {"pain_level": "severe", "swelling": "moderate", "duration": "3-7 days",
+       "affected_area": "ankle", "movement_difficulty": "unable",
+       "redness": "yes", "warmth": "no", "additional_notes": "sudden sharp pain"}
+
+
+def results(response):
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_json_rows_match_the_single_assessment(call):
+    rows = [ROW, {**ROW, "pain_level": "mild", "additional_notes": None}]
+    lines = results(call("POST", "/api/health-assessment/batch", json=rows))
+
+    assert [line["index"] for line in lines] == [0, 1]
+    single = HealthAssessmentService()
+    for row, line in zip(rows, lines):
+        expected = single.analyze_questionnaire(row)
+        for field in ("risk_level", "risk_score", "detected_patterns", "recommendations"):
+            assert line["result"][field] == expected[field], field
+    assert lines[0]["result"]["analysis_id"] != lines[1]["result"]["analysis_id"]
+
+
+def test_ndjson_reports_bad_rows_in_place(call):
+    body = "\n".join([json.dumps(ROW), "{not json", "", json.dumps([1]),
+                      json.dumps({"pain_level": "mild"}), json.dumps(ROW)])
+    lines = results(call("POST", "/api/health-assessment/batch", content=body,
+                         headers={"content-type": "application/x-ndjson"}))
+
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+    assert "result" in lines[0] and "result" in lines[4]
+    assert lines[1]["error"].startswith("Invalid JSON")
+    assert lines[2]["error"] == "Expected a questionnaire object"
+    assert isinstance(lines[3]["error"], list)   # validation errors
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+def test_body_that_is_not_utf8_is_400(call, content_type):
+    response = call("POST", "/api/health-assessment/batch",
+                    content=b'[{"affected_area": "\xff\xfe"}]',
+                    headers={"content-type": content_type})
+    assert response.status_code == 400
+    assert "not UTF-8" in response.json()["detail"]
+
+
+def test_json_body_that_is_not_an_array_is_400(call):
+    response = call("POST", "/api/health-assessment/batch", json=ROW)
+    assert response.status_code == 400
+
+
+def test_caps_are_413(call, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "BATCH_ASSESSMENT_MAX_ROWS", 2)
+    response = call("POST", "/api/health-assessment/batch", json=[ROW] * 3)
+    assert response.status_code == 413
+    assert "max 2" in response.json()["detail"]
+
+    monkeypatch.setattr(main, "BATCH_ASSESSMENT_MAX_BYTES", 100)
+    response = call("POST", "/api/health-assessment/batch", json=[ROW])
+    assert response.status_code == 413
+    assert "max 100 bytes" in response.json()["detail"]
@@ -0,0 +1,59 @@
+"""Chat history pages and running aggregates, and /api/chat/history"""
+
+import time
+import uuid
+
+from services.chat_store import ChatSession
+
+
+def entry(n, intent="symptom_inquiry", body_parts=(), symptoms=()):
+    return {"user_message": f"message {n}", "detected_intent": intent,
+            "entities": {"body_parts": list(body_parts), "symptoms": list(symptoms)},
+            "timestamp": f"2026-01-01T00:00:{n:02d}"}
+
+
+def test_pages_walk_back_through_the_retained_window():
+    session = ChatSession("s", depth=5)
+    for n in range(1, 9):
+        session.append(entry(n))
+
+    page, before = session.page(3)
+    assert [m["sequence"] for m in page] == [6, 7, 8]
+    assert page[0]["user_message"] == "message 6"
+    page, before = session.page(3, before)
+    assert [m["sequence"] for m in page] == [4, 5]   # 1-3 fell out of the window
+    assert before is None
+    assert session.page(10, before=2) == ([], None)
+
+
+def test_aggregates_cover_every_message_not_just_the_window():
+    session = ChatSession("s", depth=2)
+    session.append(entry(1, "greeting"))
+    session.append(entry(2, body_parts=["knee"], symptoms=["pain"]))
+    session.append(entry(3, body_parts=["ankle", "knee"]))
+
+    assert session.total_messages == 3
+    assert session.intent_counts == {"greeting": 1, "symptom_inquiry": 2}
+    assert list(session.body_parts) == ["knee", "ankle"]
+    assert session.first_timestamp == "2026-01-01T00:00:01"
+    restored = ChatSession.from_dict("s", session.to_dict(), 2, time.time())
+    assert restored.to_dict() == session.to_dict()
+
+
+def test_chat_history_endpoint_pages(call):
+    session_id = uuid.uuid4().hex
+    for n in range(5):
+        response = call("POST", "/api/chat",
+                        json={"message": f"my knee hurts {n}", "session_id": session_id})
+        assert response.status_code == 200
+        assert response.json()["session_id"] == session_id
+
+    page = call("GET", "/api/chat/history", params={"session": session_id, "limit": 2}).json()
+    assert page["total_messages"] == 5
+    assert [m["sequence"] for m in page["conversation_history"]] == [4, 5]
+    older = call("GET", "/api/chat/history", params={
+        "session": session_id, "limit": 2, "before": page["previous_page_before"]}).json()
+    assert [m["sequence"] for m in older["conversation_history"]] == [2, 3]
+
+    missing = call("GET", "/api/chat/history", params={"session": uuid.uuid4().hex})
+    assert missing.status_code == 404
@@ -0,0 +1,78 @@
+"""ChatSessionStore: LRU spill to SQLite, dropping and idle expiry"""
+
+import os
+import time
+
+from services.chat_store import ChatSessionStore
+
+
+def entry(n, intent="symptom_inquiry", body_parts=(), symptoms=()):
+    return {"user_message": f"message {n}", "detected_intent": intent,
+            "entities": {"body_parts": list(body_parts), "symptoms": list(symptoms)},
+            "timestamp": f"2026-01-01T00:00:{n:02d}"}
+
+
+def test_least_recently_used_sessions_spill_and_come_back(tmp_path):
+    store = ChatSessionStore(depth=10, max_messages=4,
+                             spill_path=os.path.join(tmp_path, "spill.db"))
+    try:
+        old = store.get("old")
+        for n in range(3):
+            store.append(old, entry(n, body_parts=["wrist"]))
+        new = store.get("new")
+        for n in range(3):
+            store.append(new, entry(n))
+
+        assert "old" not in store._sessions
+        assert store.stats()["spilled"] == 1
+        assert store.stats()["messages_in_memory"] == 3
+
+        back = store.get("old", create=False)
+        assert back.total_messages == 3
+        assert list(back.body_parts) == ["wrist"]
+        assert store.stats()["restored"] == 1
+        assert "new" not in store._sessions   # made room for it
+    finally:
+        store.close()
+
+
+def test_without_spill_file_sessions_over_the_cap_are_dropped():
+    store = ChatSessionStore(depth=10, max_messages=2, spill_path=None)
+    first = store.get("first")
+    store.append(first, entry(1))
+    store.append(first, entry(2))
+    store.append(store.get("second"), entry(1))
+    assert store.get("first", create=False) is None
+    assert store.stats()["dropped"] == 1
+
+
+def test_idle_sessions_expire(tmp_path):
+    store = ChatSessionStore(idle_seconds=0.05, spill_path=os.path.join(tmp_path, "spill.db"))
+    try:
+        store.append(store.get("s"), entry(1))
+        time.sleep(0.1)
+        assert store.get("s", create=False) is None
+        assert store.stats()["expired"] == 1
+    finally:
+        store.close()
+
+
+def test_chat_keeps_one_conversation_per_session(call):
+    def chat(message, session_id=None):
+        body = {"message": message}
+        if session_id:
+            body["session_id"] = session_id
+        response = call("POST", "/api/chat", json=body)
+        assert response.status_code == 200
+        return response.json()
+
+    first = chat("hello")
+    second = chat("my knee hurts", first["session_id"])
+    other = chat("hello")
+
+    assert second["session_id"] == first["session_id"]
+    assert (first["conversation_id"], second["conversation_id"]) == (1, 2)
+    assert other["session_id"] != first["session_id"]
+    assert other["conversation_id"] == 1
+    unknown = chat("hello", "no-such-session")
+    assert unknown["conversation_id"] == 1
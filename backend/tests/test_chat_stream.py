@@ -0,0 +1,94 @@
+"""/api/chat/stream: SSE framing, and a disconnect stopping the reply"""
+
+import asyncio
+import json
+import uuid
+
+from services.chat_responder import ChatResponder
+
+
+def sse_frames(text):
+    """[(event, data)] from an SSE body; every frame is event + data + blank line"""
+    assert text.endswith("\n\n")
+    frames = []
+    for block in text[:-2].split("\n\n"):
+        event, data = block.split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        frames.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return frames
+
+
+def test_stream_frames_meta_tokens_done_and_stores_the_reply(call):
+    session_id = uuid.uuid4().hex
+    response = call("POST", "/api/chat/stream",
+                    json={"message": "I have sharp pain in my knee", "session_id": session_id})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+
+    frames = sse_frames(response.text)
+    events = [event for event, _ in frames]
+    assert events[0] == "meta" and events[-1] == "done"
+    assert set(events[1:-1]) == {"token"}
+    meta, done = frames[0][1], frames[-1][1]
+    assert meta["session_id"] == session_id
+    assert "knee" in meta["entities_detected"]["body_parts"]
+    assert done["conversation_id"] == 1
+
+    reply = "".join(data["text"] for event, data in frames if event == "token")
+    history = call("GET", "/api/chat/history", params={"session": session_id}).json()
+    assert history["conversation_history"][-1]["ai_response"] == reply
+
+
+class HangingResponder(ChatResponder):
+    """First chunk at once, then nothing until closed"""
+
+    def __init__(self):
+        self.sent_first = asyncio.Event()
+        self.closed = False
+
+    async def stream(self, intent, message, context):
+        try:
+            yield "Let me "
+            self.sent_first.set()
+            await asyncio.sleep(3600)
+            yield "never sent"
+        finally:
+            self.closed = True
+
+
+def test_disconnect_stops_the_reply_and_stores_nothing(loop, client, call, monkeypatch):
+    import main
+
+    responder = HangingResponder()
+    monkeypatch.setattr(main.chat_service.get(), "responder", responder)
+    session_id = uuid.uuid4().hex
+    body = json.dumps({"message": "hello", "session_id": session_id}).encode()
+    requested = False
+    sent = []
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await responder.sent_first.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+             "method": "POST", "scheme": "http", "path": "/api/chat/stream",
+             "raw_path": b"/api/chat/stream", "root_path": "", "query_string": b"",
+             "headers": [(b"content-type", b"application/json"),
+                         (b"content-length", str(len(body)).encode())],
+             "client": ("127.0.0.1", 50000), "server": ("test", 80)}
+    loop.run_until_complete(asyncio.wait_for(main.app(scope, receive, send), 10))
+
+    assert responder.closed
+    streamed = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    assert b"event: meta" in streamed
+    assert b"event: done" not in streamed
+    missing = call("GET", "/api/chat/history", params={"session": session_id})
+    assert missing.status_code == 404
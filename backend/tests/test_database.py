@@ -0,0 +1,116 @@
+"""Engine pairs, pragmas and the schema bootstrap in database.py"""
+
+import os
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import OperationalError
+
+import database
+from database import build_engines, get_pragmas, init_db
+
+
+@pytest.fixture
+def url(tmp_path):
+    url = f"sqlite:///{os.path.join(tmp_path, 'test.db')}"
+    init_db(url)
+    return url
+
+
+def pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_performance_profile_tunes_both_engines(url):
+    writer, reader = build_engines(url, "performance")
+    try:
+        assert writer is not reader
+        assert pragma(writer, "journal_mode") == "wal"
+        assert pragma(writer, "synchronous") == 1     # NORMAL
+        for engine in (writer, reader):
+            assert pragma(engine, "busy_timeout") == 5000
+            assert pragma(engine, "temp_store") == 2   # MEMORY
+        assert writer.pool.size() == 1
+    finally:
+        writer.dispose()
+        reader.dispose()
+
+
+def test_reader_is_read_only(url):
+    writer, reader = build_engines(url, "performance")
+    try:
+        with writer.begin() as conn:
+            conn.execute(text("CREATE TABLE notes (body TEXT)"))
+            conn.execute(text("INSERT INTO notes VALUES ('written')"))
+        with reader.connect() as conn:
+            assert conn.execute(text("SELECT body FROM notes")).scalar() == "written"
+            with pytest.raises(OperationalError, match="readonly"):
+                conn.execute(text("INSERT INTO notes VALUES ('nope')"))
+    finally:
+        writer.dispose()
+        reader.dispose()
+
+
+def test_legacy_profile_shares_one_untuned_engine(url):
+    writer, reader = build_engines(url, "legacy")
+    try:
+        assert writer is reader
+        assert pragma(writer, "journal_mode") == "delete"
+    finally:
+        writer.dispose()
+
+
+def test_pragma_overrides_and_unknown_profile(monkeypatch):
+    monkeypatch.setenv("DB_PRAGMA_SYNCHRONOUS", "FULL")
+    assert get_pragmas("performance")["synchronous"] == "FULL"
+    assert get_pragmas("legacy") == {"synchronous": "FULL"}
+    with pytest.raises(ValueError, match="Unknown DB_PROFILE"):
+        get_pragmas("turbo")
+
+
+def alembic_config(url):
+    from alembic.config import Config
+
+    cfg = Config(os.path.join(database.BACKEND_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(database.BACKEND_DIR, "migrations"))
+    cfg.set_main_option("sqlalchemy.url", url)
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def test_init_db_adopts_a_database_from_before_migrations(tmp_path):
+    from alembic import command
+
+    url = f"sqlite:///{os.path.join(tmp_path, 'old.db')}"
+    # What create_all used to leave behind: the baseline tables, no version
+    command.upgrade(alembic_config(url), database.BASELINE_REVISION)
+    engine = create_engine(url)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE alembic_version"))
+            conn.execute(text(
+                "INSERT INTO scan_results (injury_type, confidence_score, risk_level) "
+                "VALUES ('cut', 0.9, 'low')"))
+        assert not database.schema_is_current(url)
+
+        init_db(url)
+
+        assert database.schema_is_current(url)
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT version_num FROM alembic_version")).scalar() \
+                == database.head_revision()
+            assert conn.execute(text("SELECT count(*) FROM scan_results")).scalar() == 1
+            indexes = {row[1] for row in conn.execute(text("PRAGMA index_list(scan_results)"))}
+            tables = set(inspect(conn).get_table_names())
+        # Only the migrations after the baseline ran
+        assert {"ix_scan_results_recent", "ix_scan_results_risk_level"} <= indexes
+        assert "id_sequences" in tables
+    finally:
+        engine.dispose()
+
+
+def test_head_revision_is_the_newest_migration():
+    versions = os.listdir(os.path.join(database.BACKEND_DIR, "migrations", "versions"))
+    newest = max(name for name in versions if name.endswith(".py"))
+    assert database.head_revision() == newest.split("_")[0]
@@ -0,0 +1,89 @@
+"""Synthetic dataset: the same seed gives the same database, and it is cached"""
+
+import json
+import os
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from benchmarks import dataset
+from benchmarks.dataset import (
+    Profile,
+    appointment_rows,
+    doctor_rows,
+    ensure_dataset,
+    generate,
+    resolve_profile,
+    scan_rows,
+)
+from database import head_revision
+
+TINY = Profile(doctors=40, scans=300, appointments=60)
+
+
+def dump(path):
+    with sqlite3.connect(path) as conn:
+        return {table: conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+                for table in ("doctors", "scan_results", "appointments")}
+
+
+def test_same_seed_same_rows():
+    assert list(doctor_rows(30, seed=1)) == list(doctor_rows(30, seed=1))
+    assert list(doctor_rows(30, seed=1)) != list(doctor_rows(30, seed=2))
+    assert list(scan_rows(50, seed=1)) == list(scan_rows(50, seed=1))
+    assert list(appointment_rows(50, 30, seed=1)) == list(appointment_rows(50, 30, seed=1))
+
+
+def test_rows_follow_the_documented_shape():
+    scans = list(scan_rows(3000, seed=7))
+    high = {injury: Counter(risk for i, _, risk, *_ in scans if i == injury)["HIGH"]
+            / sum(1 for i, *_ in scans if i == injury) for injury in ("fracture", "bruise")}
+    assert high["fracture"] > 0.5 > 0.1 > high["bruise"]
+    assert [s[-1] for s in scans] == sorted(s[-1] for s in scans)   # oldest first
+
+    doctor_ids = [a[0] for a in appointment_rows(2000, 100, seed=7)]
+    assert 1 <= min(doctor_ids) and max(doctor_ids) <= 100
+    assert sum(1 for d in doctor_ids if d <= 25) > 2 * sum(1 for d in doctor_ids if d > 75)
+
+
+def test_generate_builds_a_migrated_database_deterministically(tmp_path):
+    first, second = str(tmp_path / "a.db"), str(tmp_path / "b.db")
+    info = generate(first, TINY, seed=3)
+    generate(second, TINY, seed=3)
+
+    assert dump(first) == dump(second)
+    assert [len(rows) for rows in dump(first).values()] == [40, 300, 60]
+    assert info["profile"] == {"doctors": 40, "scans": 300, "appointments": 60}
+    with open(f"{first}.json") as f:
+        assert json.load(f)["seed"] == 3
+    assert not os.path.exists(f"{first}.building")
+
+    with sqlite3.connect(first) as conn:
+        assert conn.execute("SELECT version_num FROM alembic_version").fetchone()[0] \
+            == head_revision()
+        indexes = {name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "ix_scan_results_recent" in indexes   # dropped for the load, then rebuilt
+
+
+def test_ensure_dataset_reuses_the_cached_file(tmp_path, monkeypatch):
+    monkeypatch.setitem(dataset.PROFILES, "tiny", TINY)
+    builds = []
+    real_generate = dataset.generate
+    monkeypatch.setattr(dataset, "generate",
+                        lambda *args: builds.append(args) or real_generate(*args))
+
+    path = ensure_dataset("tiny", seed=5, cache_dir=str(tmp_path))
+    assert ensure_dataset("tiny", seed=5, cache_dir=str(tmp_path)) == path
+    assert len(builds) == 1
+    assert os.path.basename(path) == f"tiny-5-{head_revision()}.db"
+
+    monkeypatch.setitem(dataset.PROFILES, "tiny", Profile(doctors=41, scans=0, appointments=0))
+    assert ensure_dataset("tiny", seed=5, cache_dir=str(tmp_path)) == path
+    assert len(builds) == 2   # the profile changed, so the file was rebuilt
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError, match="Unknown dataset profile 'huge'"):
+        resolve_profile("huge")
@@ -0,0 +1,70 @@
+"""Memoized questionnaire analysis in HealthAssessmentService"""
+
+import copy
+import itertools
+
+from services.health_assessment_service import HealthAssessmentService
+
+ANSWERS = {
+    "pain_level": ["mild", "severe"],
+    "swelling": ["none", "moderate"],
+    "duration": ["less than 24 hours", "2 weeks+"],
+    "affected_area": ["knee"],
+    "movement_difficulty": ["none", "unable"],
+    "redness": ["yes", "no"],
+    "warmth": ["yes", "no"],
+    "additional_notes": [None, "sharp throbbing pain with fever"],
+}
+
+
+def questionnaires():
+    for values in itertools.product(*ANSWERS.values()):
+        yield dict(zip(ANSWERS, values))
+
+
+def without_request_fields(result):
+    return {k: v for k, v in result.items() if k not in ("analysis_id", "timestamp")}
+
+
+def test_memoized_results_match_uncached():
+    cached = HealthAssessmentService()
+    uncached = HealthAssessmentService(cache_size=0)
+    for responses in questionnaires():
+        expected = without_request_fields(uncached.analyze_questionnaire(responses))
+        assert without_request_fields(cached.analyze_questionnaire(responses)) == expected
+        assert without_request_fields(cached.analyze_questionnaire(responses)) == expected
+    info = cached.cache_info()
+    assert info["hits"] >= info["misses"] > 0
+
+
+def test_results_do_not_share_state():
+    service = HealthAssessmentService()
+    responses = next(questionnaires())
+    first = service.analyze_questionnaire(responses)
+    pristine = copy.deepcopy(without_request_fields(first))
+    first["risk_factors"].append("tampered")
+    first["treatment_guidance"]["medications"].append("tampered")
+    first["possible_conditions"][0]["name"] = "tampered"
+
+    assert without_request_fields(service.analyze_questionnaire(responses)) == pristine
+
+
+def test_missing_fields_share_a_key_with_their_defaults():
+    service = HealthAssessmentService()
+    assert (service.canonical_key({}, ["inflammation"])
+            == service.canonical_key({"pain_level": "moderate", "warmth": "no",
+                                      "additional_notes": "ignored"}, ["inflammation"]))
+
+
+def test_replacing_rules_clears_the_cache():
+    service = HealthAssessmentService()
+    responses = {"pain_level": "severe", "swelling": "none", "duration": "1-2 days",
+                 "movement_difficulty": "none", "redness": "no", "warmth": "no"}
+    before = service.analyze_questionnaire(responses)["risk_score"]
+
+    rules = {name: dict(table) for name, table in service.medical_rules.items()}
+    rules["pain_severity_rules"]["severe"] = {"risk_score": 9, "urgency": "high"}
+    service.medical_rules = rules
+
+    assert service.cache_info()["invalidations"] == 1
+    assert service.analyze_questionnaire(responses)["risk_score"] == before + 5
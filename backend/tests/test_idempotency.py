@@ -0,0 +1,82 @@
+"""Idempotency-Key on /api/book, and IdempotencyStore on its own"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from services.idempotency import IdempotencyConflict, IdempotencyStore
+from services.shared_state import LocalState
+
+
+@pytest.fixture
+def booking(call):
+    doctor = call("GET", "/api/doctors").json()[0]
+    return {"doctor_id": doctor["id"], "patient_name": "Test Patient",
+            "patient_phone": "5550001234", "appointment_slot": "Today 9:00 AM"}
+
+
+def test_retry_replays_the_first_booking(call, booking):
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    first = call("POST", "/api/book", json=booking, headers=headers)
+    second = call("POST", "/api/book", json=booking, headers=headers)
+
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+    assert second.status_code == 200
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.json() == first.json()
+
+
+def test_key_still_in_flight_is_409(loop, call, booking):
+    import main
+
+    key = uuid.uuid4().hex
+    payload = {**booking, "injury_type": None}   # as BookingRequest.dict() has it
+    loop.run_until_complete(main.idempotency.begin("book", key, payload))
+    response = call("POST", "/api/book", json=booking, headers={"Idempotency-Key": key})
+    assert response.status_code == 409
+    assert "still being processed" in response.json()["detail"]
+
+
+def test_other_body_with_same_key_is_422(call, booking):
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    assert call("POST", "/api/book", json=booking, headers=headers).status_code == 200
+    other = {**booking, "patient_name": "Someone Else"}
+    response = call("POST", "/api/book", json=other, headers=headers)
+    assert response.status_code == 422
+    assert "different request body" in response.json()["detail"]
+
+
+def test_without_key_every_request_books(call, booking):
+    first = call("POST", "/api/book", json=booking)
+    second = call("POST", "/api/book", json=booking)
+    assert first.status_code == second.status_code == 200
+    assert "idempotent-replayed" not in second.headers
+    assert first.json()["booking_id"] != second.json()["booking_id"]
+
+
+def test_store_in_flight_conflict_and_abandon():
+    async def scenario():
+        store = IdempotencyStore(LocalState())
+        payload = {"doctor_id": 1}
+        assert await store.begin("book", "k", payload) is None
+
+        with pytest.raises(IdempotencyConflict) as conflict:
+            await store.begin("book", "k", payload)
+        assert conflict.value.status_code == 409
+
+        await store.abandon("book", "k")   # the work failed: retry allowed
+        assert await store.begin("book", "k", payload) is None
+        await store.complete("book", "k", payload, {"ok": True})
+        assert await store.begin("book", "k", payload) == {"ok": True}
+        assert store.stats()["replayed"] == 1
+    asyncio.run(scenario())
+
+
+def test_store_keys_are_scoped():
+    async def scenario():
+        store = IdempotencyStore(LocalState())
+        await store.begin("book", "k", {"a": 1})
+        assert await store.begin("other", "k", {"b": 2}) is None
+    asyncio.run(scenario())
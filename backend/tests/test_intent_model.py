@@ -0,0 +1,70 @@
+"""Intent model: single and batch paths agree, ChatService falls back to rules"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from services.chat_service import ChatService
+from services.intent_model import (
+    HashedIntentModel,
+    batch_feature_indices,
+    feature_indices,
+    load_intent_model,
+    resolve_model_path,
+)
+
+EDGE_CASES = ["", "   ", "!!!", "hi", "HI THERE", "ibuprofen?", "knee " * 200,
+              "douleur au genou", "can I take ibuprofen for my knee"]
+
+
+@pytest.fixture(scope="module")
+def model():
+    model = load_intent_model()
+    if model is None:
+        pytest.skip("no intent model artifact")
+    return model
+
+
+@pytest.fixture(scope="module")
+def messages():
+    with open(resolve_model_path("ml_models/chat_intents.jsonl")) as f:
+        rows = [json.loads(line)["text"] for line in f]
+    return rows[::20] + EDGE_CASES
+
+
+def test_batch_features_match_single_message_features(messages):
+    rows, indices = batch_feature_indices(messages, 16)
+    for row, message in enumerate(messages):
+        assert indices[rows == row].tolist() == feature_indices(message, 16).tolist()
+
+
+def test_classify_batch_matches_classify(model, messages):
+    single = [model.classify(m) for m in messages]
+    batch = model.classify_batch(messages)
+    assert [intent for intent, _ in batch] == [intent for intent, _ in single]
+    assert np.allclose([p for _, p in batch], [p for _, p in single], atol=1e-5)
+    assert model.classify_batch([]) == []
+
+
+def test_saved_model_round_trips(model, tmp_path, messages):
+    prefix = str(tmp_path / "intents")
+    model.save(prefix)
+    loaded = HashedIntentModel.load(prefix)
+    assert loaded.describe()["memory_mapped"] is True
+    assert loaded.classify_batch(messages) == model.classify_batch(messages)
+
+
+def test_chat_service_uses_the_rules_without_an_artifact(tmp_path):
+    service = ChatService(intent_model_path=str(tmp_path / "missing"))
+    assert service.intent_model is service.rule_intents
+    results = service.classify_batch(["hello", "my knee hurts"])
+    assert [r["intent"] for r in results] == [service._classify(m)[0]
+                                              for m in ("hello", "my knee hurts")]
+
+
+def test_unusable_artifact_is_not_loaded(tmp_path):
+    (tmp_path / "broken.json").write_text('{"format_version": 999}')
+    assert load_intent_model(str(tmp_path / "broken")) is None
+    assert load_intent_model(os.path.join(str(tmp_path), "missing")) is None
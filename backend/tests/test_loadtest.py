@@ -0,0 +1,100 @@
+"""Load test harness: the open-loop run, its statistics and baseline comparison"""
+
+import json
+
+import pytest
+
+from benchmarks.loadtest.report import (
+    build_results,
+    compare,
+    load_results,
+    percentile,
+    save_results,
+    summarize,
+)
+from benchmarks.loadtest.runner import RunResult, Sample, run_load
+from benchmarks.loadtest.scenarios import DEFAULT_MIX, parse_mix
+
+CONFIG = {"target": "in-process", "rate": 50, "duration": 10, "dataset": None}
+
+
+def results(**endpoint):
+    stats = {"requests": 100, "rps": 50.0, "p50_ms": 10.0, "p95_ms": 40.0, "p99_ms": 80.0,
+             "max_ms": 120.0, "error_rate": 0.0, "rejected_rate": 0.0, "dropped": 0}
+    return {"version": 1, "commit": "abc1234", "config": dict(CONFIG),
+            "endpoints": {"GET /api/doctors": {**stats, **endpoint}}}
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values[:1], 99) == 1.0
+    assert percentile([], 95) == 0.0
+
+
+def test_summary_separates_errors_from_load_shedding():
+    statuses = [200] * 6 + [500, 0, 429, 503]
+    samples = [Sample("GET /api/doctors", i * 0.1, 0.01 * (i + 1), s)
+               for i, s in enumerate(statuses)]
+    stats = summarize(RunResult(samples, {"GET /api/doctors": 2, "POST /api/book": 1}, 2.0, 0.5))
+
+    doctors = stats["GET /api/doctors"]
+    assert (doctors["requests"], doctors["rps"], doctors["dropped"]) == (10, 5.0, 2)
+    assert doctors["error_rate"] == 0.2      # the 500 and the transport error
+    assert doctors["rejected_rate"] == 0.2   # 429 and 503
+    assert (doctors["p50_ms"], doctors["max_ms"]) == (50.0, 100.0)
+    assert stats["POST /api/book"]["requests"] == 0
+    assert stats["ALL"]["dropped"] == 3
+
+
+def test_compare_flags_regressions_beyond_tolerance_and_floor():
+    baseline = results()
+    assert compare(baseline, results(p95_ms=47.0, p99_ms=84.0)) == []   # within 20%
+    assert compare(results(p95_ms=2.0), results(p95_ms=3.0)) == []     # under --min-ms
+    assert compare(baseline, results(p95_ms=60.0)) == ["GET /api/doctors: p95_ms 40.0 -> 60.0"]
+    assert compare(baseline, results(error_rate=0.02)) == [
+        "GET /api/doctors: error_rate 0.00% -> 2.00%"]
+    assert compare(baseline, results(rps=30.0)) == ["GET /api/doctors: rps 50.0 -> 30.0"]
+
+    current = results()
+    current["endpoints"] = {}
+    assert compare(baseline, current) == ["GET /api/doctors: missing from current run"]
+
+
+def test_compare_refuses_runs_at_different_rates():
+    current = results(p95_ms=400.0)
+    current["config"]["rate"] = 100
+    assert compare(results(), current) == [
+        "config: rate 50 -> 100; runs are not comparable"]
+
+
+def test_results_file_round_trips_and_checks_its_version(tmp_path):
+    run = RunResult([Sample("GET /api/doctors", 0.0, 0.01, 200)], {}, 1.0, 0.0)
+    path = str(tmp_path / "run.json")
+    save_results(build_results(run, CONFIG), path)
+    loaded = load_results(path)
+    assert loaded["config"] == CONFIG
+    assert loaded["endpoints"]["ALL"]["requests"] == 1
+
+    with open(path, "w") as f:
+        json.dump({**loaded, "version": 0}, f)
+    with pytest.raises(ValueError, match="results version 0"):
+        load_results(path)
+
+
+def test_parse_mix():
+    assert parse_mix(None) == DEFAULT_MIX
+    mix = parse_mix("chat=0,doctors=9")
+    assert "chat" not in mix and mix["doctors"] == 9.0
+    with pytest.raises(ValueError, match="Unknown scenario"):
+        parse_mix("stampede=1")
+
+
+def test_open_loop_run_against_the_app(loop, client):
+    result = loop.run_until_complete(
+        run_load(client, {"doctors": 1, "admin": 1}, rate=100, duration=0.3, warmup=0.1))
+    assert result.samples
+    assert {s.endpoint for s in result.samples} <= {"GET /api/doctors", "GET /api/admin/stats"}
+    assert all(s.status == 200 and s.scheduled < 0.3 for s in result.samples)
+    assert result.dropped == {"GET /api/doctors": 0, "GET /api/admin/stats": 0}
@@ -0,0 +1,103 @@
+"""Metrics exposition, and merging worker snapshots for serve.py"""
+
+import asyncio
+import os
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import metrics
+from metrics import IN_FLIGHT, REQUESTS, MetricsMiddleware, MetricsRegistry, retire_worker
+
+
+def registry_with(requests, in_flight, latency):
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests", ("route",)).labels("/a").inc(requests)
+    registry.gauge("in_flight", "In flight").labels().set(in_flight)
+    registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)).labels().observe(latency)
+    registry.add_collector(lambda: ["# HELP pool_size Pool size", "# TYPE pool_size gauge",
+                                    'pool_size{engine="reader"} 8'])
+    return registry
+
+
+def snapshot_as(registry, directory, pid):
+    """Write registry's snapshot as if worker pid had written it"""
+    registry.directory = directory
+    registry.write_snapshot()
+    os.replace(os.path.join(directory, f"{os.getpid()}.json"),
+               os.path.join(directory, f"{pid}.json"))
+
+
+def sample(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_single_process_render():
+    text = registry_with(3, 2, 0.05).render()
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'pool_size{engine="reader"} 8' in text
+
+
+def test_scrape_merges_workers_and_keeps_retired_counts(tmp_path):
+    directory = str(tmp_path)
+    snapshot_as(registry_with(3, 2, 0.05), directory, 101)
+    snapshot_as(registry_with(4, 1, 0.5), directory, 102)
+    scraper = registry_with(5, 0, 5.0)   # the worker answering the scrape
+    scraper.directory = directory
+
+    text = scraper.render()
+    assert sample(text, "requests_total{") == ['requests_total{route="/a"} 12']
+    assert sample(text, "in_flight ") == ["in_flight 3"]
+    assert sample(text, "latency_seconds_count") == ["latency_seconds_count 3"]
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2' in text
+    assert sample(text, "pool_size{") == ['pool_size{engine="reader"} 24']
+    assert text.count("# TYPE pool_size gauge") == 1
+
+    retire_worker(directory, 101)   # worker 101 exited
+    text = scraper.render()
+    assert sample(text, "requests_total{") == ['requests_total{route="/a"} 12']
+    assert sample(text, "in_flight ") == ["in_flight 1"]   # its gauges are gone
+    assert sample(text, "pool_size{") == ['pool_size{engine="reader"} 16']
+    assert not os.path.exists(os.path.join(directory, "101.json"))
+
+    retire_worker(directory, 102)
+    assert sample(scraper.render(), "requests_total{") == ['requests_total{route="/a"} 12']
+
+
+def test_route_label_is_the_template_while_in_flight_and_after():
+    seen = {}
+
+    async def item(request):
+        seen["in_flight"] = IN_FLIGHT.labels("GET", "/items/{item_id}").value
+        return PlainTextResponse("ok")
+
+    inner = Starlette(routes=[Route("/items/{item_id}", item)])
+    app = MetricsMiddleware(inner, routes=lambda: inner.routes)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                     base_url="http://test") as client:
+            await client.get("/items/42")
+            await client.get("/nowhere/42")
+
+    before = REQUESTS.labels("GET", "/items/{item_id}", "200").value
+    asyncio.run(scenario())
+    assert seen["in_flight"] == 1
+    assert IN_FLIGHT.labels("GET", "/items/{item_id}").value == 0
+    assert REQUESTS.labels("GET", "/items/{item_id}", "200").value == before + 1
+    assert REQUESTS.labels("GET", "unmatched", "404").value >= 1
+
+
+def test_snapshots_work_without_file_locks(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "fcntl", None)   # as on Windows
+    directory = str(tmp_path)
+    snapshot_as(registry_with(3, 2, 0.05), directory, 101)
+    retire_worker(directory, 101)
+    scraper = registry_with(1, 0, 0.05)
+    scraper.directory = directory
+    assert sample(scraper.render(), "requests_total{") == ['requests_total{route="/a"} 4']
+    assert not os.path.exists(os.path.join(directory, ".lock"))
@@ -0,0 +1,88 @@
+"""Microbenchmark suite: the harness, the U test and the comparison verdicts"""
+
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+
+from benchmarks.microbench.cases import all_cases
+from benchmarks.microbench.compare import compare, compare_case, fmt_ns, mann_whitney_p
+from benchmarks.microbench.harness import Case, Settings, measure
+
+QUICK = Settings(round_seconds=0.002, max_seconds=0.02, min_rounds=3, max_rounds=5,
+                 alloc_calls=5)
+
+
+def case(before_ns, after_ns, before_peak=4096, after_peak=4096, spread=0.01):
+    def rounds(median):
+        return [median * (1 + spread * (i - 5) / 5) for i in range(11)]
+    return ({"median_ns": before_ns, "rounds_ns": rounds(before_ns), "peak_bytes": before_peak},
+            {"median_ns": after_ns, "rounds_ns": rounds(after_ns), "peak_bytes": after_peak})
+
+
+def test_mann_whitney_p():
+    low, high = list(range(1, 11)), list(range(11, 21))
+    assert mann_whitney_p(low, high) == pytest.approx(0.00018, abs=0.00005)
+    assert mann_whitney_p(low, high) == mann_whitney_p(high, low)
+    assert mann_whitney_p(low, list(low)) == 1.0
+    assert mann_whitney_p([5.0] * 8, [5.0] * 8) == 1.0   # all tied
+    assert mann_whitney_p([], high) == 1.0
+
+
+def test_verdicts_need_significance_and_size():
+    verdict = lambda before, after: compare_case(before, after, 0.01, 0.05, 0.2)[0]
+    assert verdict(*case(1000, 1500)) == "slower"
+    assert verdict(*case(1500, 1000)) == "faster"
+    assert verdict(*case(1000, 1030)) == "same"                 # significant, but 3%
+    assert verdict(*case(1000, 1500, spread=0.9)) == "same"     # 50%, but noise
+    assert verdict(*case(1000, 1000, after_peak=8192)) == "more-memory"
+    assert verdict(*case(1000, 1000, 100, 900)) == "same"       # under the 1 KiB floor
+
+
+def test_compare_reports_missing_and_failed_cases():
+    before, after = case(1000, 1000)
+    baseline = {"cases": {"a": before, "b": before, "c": {"error": "TypeError: old API"}}}
+    current = {"cases": {"a": after, "c": after, "d": after}}
+    rows = {name: (verdict, details) for name, verdict, details in compare(baseline, current)}
+    assert {name: verdict for name, (verdict, _) in rows.items()} == {
+        "a": "same", "b": "missing", "c": "error", "d": "missing"}
+    assert rows["c"][1] == {"error": "TypeError: old API"}
+
+
+def test_measure_times_sync_and_async_cases():
+    calls = []
+
+    @contextmanager
+    def sync_setup(loop):
+        yield lambda: calls.append(bytearray(2048))
+
+    @contextmanager
+    def async_setup(loop):
+        async def call():
+            await asyncio.sleep(0)
+        yield call
+
+    loop = asyncio.new_event_loop()
+    try:
+        sync = measure(Case("sync", sync_setup), loop, QUICK)
+        asynchronous = measure(Case("async", async_setup), loop, QUICK)
+    finally:
+        loop.close()
+
+    for result in (sync, asynchronous):
+        assert QUICK.min_rounds <= len(result["rounds_ns"]) <= QUICK.max_rounds
+        assert result["min_ns"] <= result["median_ns"] and result["iqr_ns"] >= 0
+    assert sync["peak_bytes"] >= 2048
+    assert sync["retained_bytes"] >= 2048   # every call keeps its buffer
+
+
+def test_case_names_are_unique_and_dataset_cases_are_opt_in():
+    names = [c.name for c in all_cases()]
+    assert len(names) == len(set(names))
+    extra = {c.name for c in all_cases("small")} - set(names)
+    assert extra == {"doctors.get_recommended_doctors[small]", "admin.get_stats[small]"}
+
+
+def test_fmt_ns():
+    assert [fmt_ns(v) for v in (850, 1500, 2.5e6, 3e9)] == ["850 ns", "1.50 µs", "2.50 ms",
+                                                            "3.00 s"]
@@ -0,0 +1,77 @@
+"""Hashed pattern model: feature paths agree, batch matches single, artifacts load"""
+
+import numpy as np
+import pytest
+
+from services import pattern_model
+from services.pattern_model import (
+    DEFAULT_PATTERN,
+    HashedPatternModel,
+    feature_indices,
+    load_pattern_model,
+)
+
+TEXTS = [
+    "",
+    "...",
+    "sharp",
+    "Sharp, sudden pain -- after the accident; swelling & redness!!",
+    "throbbing throbbing throbbing",
+    "pus   and\tfever\nspreading (hot) red",
+    "douleur aiguë après la chute, genou enflé",
+    "x" * 300,
+    "persistent recurring ache for weeks, " * 20,
+]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_short_and_vectorized_text_features_agree(text, monkeypatch):
+    responses = {"additional_notes": text, "pain_level": "severe"}
+    monkeypatch.setattr(pattern_model, "_VECTORIZE_CHARS", 1 << 30)
+    short = set(feature_indices(responses, 18).tolist())
+    monkeypatch.setattr(pattern_model, "_VECTORIZE_CHARS", -1)
+    vectorized = set(feature_indices(responses, 18).tolist())
+    assert short == vectorized
+    assert all(0 <= index < 1 << 18 for index in short)
+
+
+def random_model(hash_bits=12, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = ["acute_trauma", "inflammation", "chronic_condition", "infection"]
+    weights = rng.normal(0, 1.5, size=(1 << hash_bits, len(labels))).astype(np.float32)
+    return HashedPatternModel(weights, rng.normal(-1, 0.5, len(labels)), labels, hash_bits)
+
+
+def rows():
+    return [{"pain_level": level, "swelling": "moderate", "additional_notes": text}
+            for level in ("mild", "severe") for text in TEXTS] + [{}]
+
+
+def test_batch_prediction_matches_single():
+    model = random_model()
+    assert model.predict_batch(rows()) == [model.predict(row) for row in rows()]
+    assert model.predict_batch([]) == []
+
+
+def test_nothing_detected_is_the_default_pattern():
+    model = random_model()
+    model.thresholds = np.full(len(model.labels), 0.999999)
+    assert model.predict({"additional_notes": "sharp"}) == [DEFAULT_PATTERN]
+    assert model.predict_batch([{}]) == [[DEFAULT_PATTERN]]
+
+
+def test_saved_model_loads_memory_mapped(tmp_path):
+    model = random_model()
+    prefix = str(tmp_path / "model")
+    model.save(prefix, extra={"version": "test"})
+
+    loaded = load_pattern_model(prefix)
+    assert loaded.describe()["memory_mapped"] is True
+    assert loaded.describe()["version"] == "test"
+    assert loaded.predict_batch(rows()) == model.predict_batch(rows())
+
+
+def test_unusable_artifact_falls_back_to_rules(tmp_path):
+    assert load_pattern_model(str(tmp_path / "missing")) is None
+    (tmp_path / "broken.json").write_text('{"format_version": 999}')
+    assert load_pattern_model(str(tmp_path / "broken")) is None
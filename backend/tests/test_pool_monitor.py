@@ -0,0 +1,52 @@
+"""Connection hold times, gauges and leak detection in pool_monitor"""
+
+import os
+import time
+
+from sqlalchemy import create_engine, text
+
+from pool_monitor import PoolMonitor, db_endpoint
+
+
+def test_checkouts_are_labelled_and_leaks_reported(tmp_path):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'test.db')}",
+                           pool_size=2, max_overflow=0)
+    monitor = PoolMonitor(warn_after=0.05)
+    monitor.attach("writer", engine)
+    monitor.attach("reader", engine)   # shared engine: tracked once
+    try:
+        token = db_endpoint.set("GET /api/doctors")
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            held = engine.connect()
+        finally:
+            db_endpoint.reset(token)
+
+        gauges = monitor.gauges()
+        assert list(gauges) == ["writer"]
+        assert gauges["writer"]["checked_out"] == 1
+        assert gauges["writer"]["overflow"] == 0
+
+        time.sleep(0.1)
+        leaks = monitor.check_leaks()
+        assert [(l["engine"], l["endpoint"]) for l in leaks] == [("writer", "GET /api/doctors")]
+        held.close()
+
+        snapshot = monitor.snapshot()
+        assert snapshot["long_held"] == []
+        stats = snapshot["endpoints"]["GET /api/doctors"]
+        assert stats["checkouts"] == 2
+        assert stats["slow_checkouts"] == 1
+        assert stats["max_seconds"] >= 0.1
+    finally:
+        engine.dispose()
+
+
+def test_request_sessions_are_returned(call):
+    call("GET", "/api/doctors")
+    call("GET", "/api/admin/stats")
+    snapshot = call("GET", "/api/admin/db-pool").json()
+    assert snapshot["endpoints"]["GET /api/doctors"]["checkouts"] >= 1
+    assert all(engine["checked_out"] == 0 for engine in snapshot["engines"].values())
+    assert snapshot["long_held"] == []
@@ -0,0 +1,77 @@
+"""serve.py settings and the race-free one-time init workers share"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import serve
+from bootstrap import OneTimeInit, fcntl
+
+
+def seed_once(lock_path, marker, log):
+    """One worker starting up: seed unless the marker says it is done"""
+    async def seed():
+        if not os.path.exists(marker):
+            time.sleep(0.1)   # wide window for a racing worker
+            with open(log, "a") as f:
+                f.write(f"{os.getpid()}\n")
+            open(marker, "w").close()
+
+    asyncio.run(OneTimeInit(seed, lock_path).run())
+
+
+@pytest.mark.skipif(fcntl is None, reason="no file locks without fcntl")
+def test_workers_starting_together_seed_once(tmp_path):
+    args = (str(tmp_path / "init.lock"), str(tmp_path / "seeded"), str(tmp_path / "log"))
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=seed_once, args=args) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    with open(args[2]) as f:
+        assert len(f.read().split()) == 1
+
+
+def test_init_runs_once_per_process(tmp_path):
+    calls = []
+
+    async def init():
+        calls.append(1)
+
+    async def scenario():
+        once = OneTimeInit(init, str(tmp_path / "init.lock"))
+        return await once.run(), await once.run(), once.stats()
+
+    first, second, stats = asyncio.run(scenario())
+    assert (first, second, len(calls)) == (True, False, 1)
+    assert stats["done"] and stats["pid"] == os.getpid()
+
+
+def test_default_workers(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert serve.default_workers() == 3
+    monkeypatch.setenv("WEB_CONCURRENCY", "0")
+    assert serve.default_workers() == 1
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert 1 <= serve.default_workers() <= serve.SERVE_MAX_WORKERS
+
+
+def test_metrics_dir_drops_a_previous_runs_snapshots(tmp_path, monkeypatch):
+    for name in ("123.json", "124.json.tmp", "retired.json", "notes.txt"):
+        (tmp_path / name).write_text("{}")
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    assert serve.metrics_dir() == str(tmp_path)
+    assert os.listdir(tmp_path) == ["notes.txt"]
+
+    monkeypatch.setenv("METRICS_DIR", "")
+    directory = serve.metrics_dir()
+    try:
+        assert os.path.isdir(directory) and directory != str(tmp_path)
+    finally:
+        os.rmdir(directory)
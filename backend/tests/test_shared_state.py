@@ -0,0 +1,139 @@
+"""The three SharedState backends behave the same"""
+
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.resp_standin import RespStandin
+from services.chat_store import SharedChatSessionStore
+from services.shared_state import LocalState, RedisState, SQLiteState, default_sqlite_path
+
+
+@pytest.fixture(scope="module")
+def redis_url():
+    standin = RespStandin()
+    port = standin.start_in_thread()
+    yield f"redis://127.0.0.1:{port}/0"
+    standin.stop()
+
+
+@pytest.fixture(params=["local", "sqlite", "redis"])
+def state(request, tmp_path, redis_url):
+    if request.param == "local":
+        return lambda: LocalState()
+    if request.param == "sqlite":
+        return lambda: SQLiteState(os.path.join(tmp_path, "state.db"))
+    # A fresh prefix per test: the stand-in outlives the test
+    return lambda: RedisState(redis_url, prefix=f"test:{request.node.name}:")
+
+
+def run(state_factory, scenario):
+    async def main():
+        state = state_factory()
+        try:
+            return await scenario(state)
+        finally:
+            await state.close()
+    return asyncio.run(main())
+
+
+def test_set_get_delete(state):
+    async def scenario(s):
+        assert await s.get("k") is None
+        await s.set("k", "v1")
+        assert await s.get("k") == "v1"
+        await s.set("k", "v2")
+        assert await s.get("k") == "v2"
+        await s.delete("k")
+        assert await s.get("k") is None
+    run(state, scenario)
+
+
+def test_add_only_when_absent(state):
+    async def scenario(s):
+        assert await s.add("k", "first") is True
+        assert await s.add("k", "second") is False
+        assert await s.get("k") == "first"
+        await s.delete("k")
+        assert await s.add("k", "third") is True
+        assert await s.get("k") == "third"
+    run(state, scenario)
+
+
+def test_incr(state):
+    async def scenario(s):
+        assert await s.incr("n") == 1
+        assert await s.incr("n", 5) == 6
+        assert await s.incr("n", -2) == 4
+        assert await s.get("n") == "4"
+    run(state, scenario)
+
+
+def test_update_is_atomic_under_concurrency(state):
+    async def scenario(s):
+        def bump(current):
+            return str(int(current or 0) + 1)
+
+        await asyncio.gather(*(s.update("counter", bump) for _ in range(50)))
+        assert await s.get("counter") == "50"
+        assert await s.update("counter", lambda current: current + "!") == "50!"
+    run(state, scenario)
+
+
+def test_expiry(state):
+    async def scenario(s):
+        await s.set("set", "v", ttl=0.2)
+        assert await s.add("add", "v", ttl=0.2) is True
+        assert await s.incr("incr", ttl=0.2) == 1
+        await s.update("update", lambda current: "v", ttl=0.2)
+        await s.set("forever", "v")
+        await asyncio.sleep(0.35)
+
+        for key in ("set", "add", "incr", "update"):
+            assert await s.get(key) is None, key
+        assert await s.get("forever") == "v"
+        # Expired keys count as absent
+        assert await s.add("add", "again") is True
+        assert await s.incr("incr") == 1
+    run(state, scenario)
+
+
+def test_incr_ttl_is_set_on_creation_only(state):
+    async def scenario(s):
+        await s.incr("n", ttl=0.3)
+        await asyncio.sleep(0.2)
+        await s.incr("n", ttl=10)   # does not extend the window
+        await asyncio.sleep(0.2)
+        assert await s.get("n") is None
+    run(state, scenario)
+
+
+def entry(n):
+    return {"user_message": f"message {n}", "detected_intent": "symptom_inquiry",
+            "entities": {}, "timestamp": f"2026-01-01T00:00:{n:02d}"}
+
+
+def test_chat_sessions_keep_concurrent_appends(state):
+    async def scenario(s):
+        store = SharedChatSessionStore(s, depth=100)
+        session_id, first = await store.record(None, entry(0))
+        results = await asyncio.gather(*(store.record(session_id, entry(n))
+                                         for n in range(1, 21)))
+        session = await store.load(session_id)
+        assert first == 1
+        assert sorted(sequence for _, sequence in results) == list(range(2, 22))
+        assert session.total_messages == 21
+    run(state, scenario)
+
+
+def test_default_sqlite_file_is_per_database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    here = default_sqlite_path("sqlite:///./medidoctor.db")
+    assert here == default_sqlite_path(f"sqlite:///{tmp_path}/medidoctor.db")
+    assert here != default_sqlite_path("sqlite:///./other.db")
+    assert here != default_sqlite_path("postgresql://db.internal/medidoctor")
+
+    os.mkdir("elsewhere")
+    monkeypatch.chdir("elsewhere")   # same relative URL, another deployment
+    assert default_sqlite_path("sqlite:///./medidoctor.db") != here
@@ -0,0 +1,68 @@
+"""TranscriptionPool: backends, the queue timeout and worker restarts"""
+
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from services.speech_to_text import (
+    SIMULATED_TRANSCRIPTIONS,
+    TranscriptionBusy,
+    TranscriptionPool,
+    create_transcriber,
+)
+
+SPEECH = np.zeros(32000, dtype=np.float32)   # 2 s at 16 kHz
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown STT_BACKEND"):
+        create_transcriber("dictaphone")
+
+
+def test_inline_pool_transcribes_and_records_stats():
+    async def scenario():
+        pool = TranscriptionPool("simulated", workers=0)
+        await pool.start()
+        return await pool.transcribe(SPEECH, 60001), pool.snapshot()
+
+    result, snapshot = asyncio.run(scenario())
+    assert result["text"] == SIMULATED_TRANSCRIPTIONS[60001 % len(SIMULATED_TRANSCRIPTIONS)]
+    assert result["confidence"] == 0.92
+    assert snapshot["completed"] == 1
+    assert snapshot["audio_seconds"] == pytest.approx(2.0)
+    assert snapshot["real_time_factor"] is not None
+
+
+def test_no_free_worker_within_the_timeout_is_busy():
+    async def scenario():
+        pool = TranscriptionPool("simulated", workers=0, queue_timeout=0.05)
+        await pool._slots.acquire()   # a long transcription holds the only slot
+        assert pool.busy()
+        with pytest.raises(TranscriptionBusy):
+            await pool.transcribe(SPEECH, 1000)
+        return pool.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["timed_out"] == 1
+    assert snapshot["completed"] == 0
+
+
+def test_pool_is_rebuilt_after_a_worker_dies():
+    async def scenario():
+        pool = TranscriptionPool("simulated", workers=1)
+        await pool.start()
+        try:
+            crashed = asyncio.get_running_loop().run_in_executor(pool._executor, os._exit, 1)
+            with pytest.raises(Exception):
+                await crashed
+            result = await pool.transcribe(SPEECH, 1000)
+            return result, pool.snapshot()
+        finally:
+            pool.stop()
+
+    result, snapshot = asyncio.run(scenario())
+    assert result["text"] in SIMULATED_TRANSCRIPTIONS
+    assert snapshot["worker_restarts"] == 1
+    assert snapshot["completed"] == 1
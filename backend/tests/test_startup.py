@@ -0,0 +1,38 @@
+"""Cold start: a cheap `import main` and services built once on first use"""
+
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.startup_bench import bench_env, eager_imports
+from services.lazy import LazyService
+
+
+def test_import_main_loads_no_heavy_modules():
+    with tempfile.TemporaryDirectory() as tmp:
+        assert eager_imports(bench_env(tmp, "lazy")) == []
+        assert not os.path.exists(os.path.join(tmp, "medidoctor.db"))
+
+
+def test_lazy_service_is_built_once_on_first_use():
+    builds = []
+
+    def factory():
+        time.sleep(0.05)   # a warm-up thread and a request arrive together
+        builds.append(1)
+        return {"ready": True}
+
+    service = LazyService("demo", factory)
+    assert not service.loaded and service.build_info()["build_ms"] is None
+
+    threads = [threading.Thread(target=service.get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert service.get() is service.get()
+    assert service.keys() == {"ready": True}.keys()   # forwarded to the instance
+    assert service.build_info()["loaded"] and service.build_info()["build_ms"] >= 50
@@ -0,0 +1,90 @@
+"""Request traces: span trees, the debug header, profiles and the no-op path"""
+
+import asyncio
+import re
+
+import tracing
+from tracing import _debug_mode, _statement_name, active, run_in_context, span
+
+
+def names(node):
+    return [node["name"], *(name for child in node["children"] for name in names(child))]
+
+
+def test_debug_header_keeps_a_trace_with_stage_and_sql_spans(call):
+    response = call("GET", "/api/doctors", headers={"X-Debug-Trace": "trace"})
+    assert response.status_code == 200
+    trace_id = response.headers["x-trace-id"]
+
+    trace = call("GET", f"/api/admin/traces/{trace_id}").json()
+    assert trace["forced"] and trace["status"] == 200 and not trace["has_profile"]
+    assert trace["root"]["name"] == "GET /api/doctors"
+    stage = next(c for c in trace["root"]["children"]
+                 if c["name"] == "doctors.get_recommended_doctors")
+    assert "db SELECT doctors" in names(stage)
+    assert trace["spans"] == len(names(trace["root"])) - 1
+
+    listed = call("GET", "/api/admin/traces").json()["traces"]
+    assert listed[0]["id"] == trace_id
+
+
+def test_untraced_requests_carry_no_trace_id(call):
+    # conftest sets TRACE_SAMPLE_RATE=0
+    assert "x-trace-id" not in call("GET", "/api/doctors").headers
+    assert call("GET", "/api/admin/traces/0123456789abcdef").status_code == 404
+
+
+def test_profile_is_served_in_folded_format(call):
+    response = call("GET", "/api/doctors", headers={"X-Debug-Trace": "profile"})
+    trace_id = response.headers["x-trace-id"]
+    assert call("GET", f"/api/admin/traces/{trace_id}").json()["has_profile"]
+
+    profile = call("GET", f"/api/admin/traces/{trace_id}/profile")
+    assert profile.status_code == 200
+    assert f"trace-{trace_id}.folded" in profile.headers["content-disposition"]
+    assert all(re.fullmatch(r".+ \d+", line) for line in profile.text.splitlines())
+
+
+def test_debug_token_gates_the_header(monkeypatch):
+    def scope(*headers):
+        return {"headers": [(k.encode(), v.encode()) for k, v in headers]}
+
+    assert _debug_mode(scope(("x-debug-trace", "Profile"))) == "profile"
+    assert _debug_mode(scope(("x-debug-trace", "1"))) == "trace"
+    assert _debug_mode(scope(("x-debug-trace", "verbose"))) is None
+
+    monkeypatch.setattr(tracing, "TRACE_DEBUG_TOKEN", "s3cret")
+    assert _debug_mode(scope(("x-debug-trace", "trace"))) is None
+    assert _debug_mode(scope(("x-debug-trace", "trace"), ("x-debug-token", "s3cret"))) == "trace"
+
+
+def test_spans_outside_a_trace_are_a_shared_noop():
+    assert not active()
+    assert span("a") is span("b")
+    with span("a") as opened:
+        assert opened is None
+
+
+def test_run_in_context_carries_the_span_into_an_executor():
+    async def scenario():
+        trace = tracing.Trace("GET", "/x", forced=True)
+        token = tracing._current_span.set(trace.root)
+        try:
+            def work():
+                with span("in thread"):
+                    return active()
+            loop = asyncio.get_running_loop()
+            inside = await loop.run_in_executor(None, run_in_context(work))
+        finally:
+            tracing._current_span.reset(token)
+        return inside, trace
+
+    inside, trace = asyncio.run(scenario())
+    assert inside
+    assert [child.name for child in trace.root.children] == ["in thread"]
+
+
+def test_statement_names():
+    assert _statement_name('SELECT x FROM "doctors" WHERE id = ?') == "db SELECT doctors"
+    assert _statement_name("insert into scan_results values (?)") == "db INSERT scan_results"
+    assert _statement_name("PRAGMA journal_mode") == "db PRAGMA"
@@ -0,0 +1,98 @@
+"""TranscriptCache tiers, and re-sent voice notes skipping transcription"""
+
+import asyncio
+import os
+import time
+
+from services.shared_state import LocalState
+from services.transcript_cache import TranscriptCache
+
+ENTRY = {"text": "my knee hurts", "confidence": 0.9, "language": "en"}
+
+
+def test_memory_tier_is_an_lru(tmp_path):
+    async def scenario():
+        cache = TranscriptCache(max_entries=2, directory=None)
+        for name in ("a", "b"):
+            await cache.put(name, {**ENTRY, "text": name})
+        await cache.get("a")                       # a is now the newest
+        await cache.put("c", {**ENTRY, "text": "c"})
+        return [await cache.get(name) for name in ("a", "b", "c")], cache.cache_info()
+
+    (a, b, c), info = asyncio.run(scenario())
+    assert a["text"] == "a" and b is None and c["text"] == "c"
+    assert info["size"] == 2
+    assert info["misses"] == 1
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    key = TranscriptCache.key("vosk", "pcm:0123abcd")
+
+    async def scenario():
+        await TranscriptCache(directory=str(tmp_path)).put(key, ENTRY)
+        restarted = TranscriptCache(directory=str(tmp_path))
+        entry = await restarted.get(key)
+        again = await restarted.get(key)
+        missing = await restarted.get(TranscriptCache.key("whisper", "pcm:0123abcd"))
+        return entry, again, missing, restarted.cache_info()
+
+    entry, again, missing, info = asyncio.run(scenario())
+    assert entry == again == ENTRY
+    assert missing is None   # another backend's transcripts are never served
+    assert (info["disk_hits"], info["memory_hits"], info["misses"]) == (1, 1, 1)
+
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    cache = TranscriptCache(directory=str(tmp_path))
+    key = cache.key("vosk", "pcm:ffee")
+    os.makedirs(os.path.dirname(cache._path(key)))
+    with open(cache._path(key), "w") as f:
+        f.write("{truncated")
+    assert asyncio.run(cache.get(key)) is None
+    assert cache.cache_info()["disk_errors"] == 1
+
+
+def test_prune_keeps_the_newest_entries(tmp_path):
+    cache = TranscriptCache(directory=str(tmp_path), max_disk_entries=2)
+    keys = [cache.key("vosk", f"pcm:{n:04x}") for n in range(4)]
+    for age, key in enumerate(keys):
+        cache._write(key, ENTRY)
+        stamp = time.time() - 100 + age
+        os.utime(cache._path(key), (stamp, stamp))
+
+    assert cache.prune() == 2
+    assert [os.path.exists(cache._path(key)) for key in keys] == [False, False, True, True]
+
+
+def test_shared_state_replaces_the_disk(tmp_path):
+    async def scenario():
+        state = LocalState()
+        await TranscriptCache(directory=str(tmp_path), shared=state).put("k", ENTRY)
+        other_worker = TranscriptCache(directory=str(tmp_path), shared=state)
+        return await other_worker.get("k"), other_worker.cache_info()
+
+    entry, info = asyncio.run(scenario())
+    assert entry == ENTRY
+    assert info["shared_hits"] == 1
+    assert info["directory"] is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_resent_voice_note_is_served_from_the_cache(call, tmp_path, monkeypatch):
+    from tests.test_audio_frontend import wav
+
+    monkeypatch.chdir(tmp_path)
+    note = ("note.wav", wav(rate=16000, data=os.urandom(64000)), "audio/wav")
+
+    def transcripts():
+        return call("GET", "/api/admin/caches").json()["transcripts"]
+
+    before = transcripts()
+    first = call("POST", "/api/voice-analysis", files={"audio": note})
+    second = call("POST", "/api/voice-analysis", files={"audio": note})
+    after = transcripts()
+
+    assert first.status_code == second.status_code == 200
+    assert second.json()["transcribed_text"] == first.json()["transcribed_text"]
+    assert after["misses"] == before["misses"] + 1
+    assert after["memory_hits"] == before["memory_hits"] + 1
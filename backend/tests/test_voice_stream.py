@@ -0,0 +1,152 @@
+"""/ws/voice over the simulated stub, and bounded partials for real backends"""
+
+import asyncio
+import json
+import struct
+
+import numpy as np
+
+from services.audio_frontend import AudioDecodePool
+from services.voice_service import VoiceService
+from services.voice_stream import PooledStreamingTranscriber
+
+
+def streamed_wav(seconds: float, rate: int = 16000) -> bytes:
+    """16-bit mono tone with the data size left open, as streaming writers do"""
+    t = np.arange(int(seconds * rate)) / rate
+    pcm = (np.sin(2 * np.pi * 220 * t) * 12000).astype("<i2").tobytes()
+    header = (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+              + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16)
+              + b"data" + struct.pack("<I", 0xFFFFFFFF))
+    return header + pcm
+
+
+def chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def voice_stream(loop, frames, query=b"format=wav"):
+    """Run one /ws/voice connection; returns (JSON messages, close code)"""
+    import main
+
+    inbox = asyncio.Queue()
+    for message in ([{"type": "websocket.connect"}] + frames
+                    + [{"type": "websocket.disconnect", "code": 1000}]):
+        inbox.put_nowait(message)
+    sent = []
+
+    async def receive():
+        return await inbox.get()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws",
+             "path": "/ws/voice", "raw_path": b"/ws/voice", "root_path": "",
+             "query_string": query, "headers": [], "subprotocols": [],
+             "client": ("127.0.0.1", 50000), "server": ("test", 80)}
+    loop.run_until_complete(asyncio.wait_for(main.app(scope, receive, send), 30))
+
+    assert sent[0]["type"] == "websocket.accept"
+    messages = [json.loads(m["text"]) for m in sent if m["type"] == "websocket.send"]
+    closes = [m.get("code", 1000) for m in sent if m["type"] == "websocket.close"]
+    return messages, closes[0] if closes else None
+
+
+def audio_frames(data: bytes, size: int = 6400):
+    return ([{"type": "websocket.receive", "bytes": chunk} for chunk in chunks(data, size)]
+            + [{"type": "websocket.receive", "text": json.dumps({"type": "end"})}])
+
+
+def test_stream_sends_partials_then_the_final_analysis(loop, client, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # the recording is saved to ./uploads
+    messages, code = voice_stream(loop, audio_frames(streamed_wav(8)))
+
+    assert code == 1000
+    kinds = [m["type"] for m in messages]
+    assert kinds[-1] == "final"
+    assert "partial" in kinds
+    transcripts = [m["text"] for m in messages if m["type"] == "transcript"]
+    assert len(transcripts) > 1
+    assert all(b.startswith(a) for a, b in zip(transcripts, transcripts[1:]))
+
+    final = messages[-1]
+    assert final["transcribed_text"] == transcripts[-1]
+    assert final["analysis"]["risk_level"]
+    assert final["extracted_info"]["original_text"] == final["transcribed_text"]
+    acks = [m["bytes"] for m in messages if m["type"] == "ack"]
+    assert acks[-1] == len(streamed_wav(8))
+
+
+def test_unsupported_format_is_closed_1003(loop, client):
+    messages, code = voice_stream(loop, [], query=b"format=exe")
+    assert code == 1003
+    assert messages[0]["type"] == "error"
+
+
+def test_oversized_chunk_is_closed_1009(loop, client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "VOICE_WS_MAX_CHUNK_BYTES", 1000)
+    messages, code = voice_stream(loop, audio_frames(streamed_wav(1), size=2000))
+    assert code == 1009
+    assert "Chunk larger" in messages[-1]["detail"]
+
+
+def test_unexpected_text_frame_is_closed_1008(loop, client):
+    frames = [{"type": "websocket.receive", "text": "hello"}]
+    messages, code = voice_stream(loop, frames)
+    assert code == 1008
+    assert messages[-1]["type"] == "error"
+
+
+class RecordingPool:
+    """TranscriptionPool stand-in: 'transcribes' to the span length in samples"""
+
+    def __init__(self):
+        self.spans = []
+
+    def busy(self):
+        return False
+
+    async def transcribe(self, samples, audio_size):
+        self.spans.append(len(samples))
+        return {"text": f"[{len(samples)}]", "confidence": 0.9, "language": "en"}
+
+
+def test_partials_transcribe_a_bounded_span():
+    partial, window = 32000, 96000   # 1 s and 3 s of 16 kHz 16-bit
+    pool = RecordingPool()
+    transcriber = PooledStreamingTranscriber(
+        VoiceService(), AudioDecodePool(workers=0), pool,
+        partial_bytes=partial, window_bytes=window)
+    data = streamed_wav(20)
+
+    async def scenario():
+        texts = [await transcriber.feed(chunk) for chunk in chunks(data, 8000)]
+        return texts, await transcriber.finish()
+
+    texts, final = asyncio.run(scenario())
+    partial_spans, final_span = pool.spans[:-1], pool.spans[-1]
+
+    assert len(partial_spans) >= 15
+    assert max(partial_spans) <= (window + partial) // 2
+    assert final_span == 20 * 16000
+    assert final["transcribed_text"] == f"[{20 * 16000}]"
+    # Committed spans stay in the partial text, each at least a window long
+    *committed, current = [int(part.strip("[]")) for part in texts[-1].split()]
+    assert len(committed) >= 5
+    assert all(span >= window // 2 for span in committed)
+    assert texts[-1].startswith(transcriber.stable)
+
+
+def test_streams_that_are_not_wav_get_no_partials():
+    pool = RecordingPool()
+    transcriber = PooledStreamingTranscriber(
+        VoiceService(), AudioDecodePool(workers=0), pool, partial_bytes=10, window_bytes=100)
+
+    async def scenario():
+        await transcriber.feed(b"fLaC" + b"\0" * 100)
+        await transcriber.feed(b"\0" * 100)
+    asyncio.run(scenario())
+    assert pool.spans == []
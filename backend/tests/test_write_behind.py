@@ -0,0 +1,98 @@
+"""Write-behind: id blocks reserved across allocators, and rows flushed under their ids"""
+
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database import build_async_engines, init_db
+from services.write_behind import IdAllocator, ScanRecorder, ScanWriteBuffer
+
+ROW = {"injury_type": "cut", "confidence_score": 0.9, "risk_level": "LOW",
+       "image_path": None, "visual_notes": "test"}
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    url = f"sqlite:///{os.path.join(tmp_path, 'scans.db')}"
+    init_db(url)
+    return url
+
+
+def with_sessions(url, scenario):
+    async def main():
+        writer, reader = build_async_engines(url)
+        sessions = async_sessionmaker(writer, class_=AsyncSession, expire_on_commit=False)
+        try:
+            return await scenario(sessions)
+        finally:
+            await writer.dispose()
+            await reader.dispose()
+    return asyncio.run(main())
+
+
+def test_allocators_never_hand_out_the_same_id(database_url):
+    async def scenario(sessions):
+        # Two workers' allocators on one database, blocks of 5
+        first, second = IdAllocator(sessions, block_size=5), IdAllocator(sessions, block_size=5)
+        ids = []
+        for _ in range(4):
+            ids += await first.allocate(3)
+            ids += await second.allocate(2)
+        ids += await first.allocate(12)   # larger than a block
+        return ids
+
+    ids = with_sessions(database_url, scenario)
+    assert len(ids) == len(set(ids)) == 32
+    assert min(ids) == 1
+
+
+def test_blocks_start_above_existing_rows(database_url):
+    async def scenario(sessions):
+        async with sessions() as db:
+            await db.execute(text(
+                "INSERT INTO scan_results (id, injury_type, confidence_score, risk_level) "
+                "VALUES (500, 'cut', 0.5, 'LOW')"))
+            await db.commit()
+        return await IdAllocator(sessions).allocate(2)
+
+    assert with_sessions(database_url, scenario) == [501, 502]
+
+
+def test_buffer_flushes_rows_under_their_ids(database_url):
+    async def scenario(sessions):
+        buffer = ScanWriteBuffer(sessions, batch_size=2, flush_ms=5, durability="group")
+        recorder = ScanRecorder(buffer)
+        await recorder.start()
+        try:
+            records = await asyncio.gather(*(recorder.record(None, **ROW) for _ in range(5)))
+            async with sessions() as db:
+                many = await recorder.record_many(db, [ROW] * 3)
+        finally:
+            await recorder.stop()
+        async with sessions() as db:
+            stored = (await db.execute(text("SELECT id FROM scan_results ORDER BY id"))).scalars()
+            stored = list(stored)
+        return [r.id for r in records], many, stored, recorder.stats()
+
+    ids, many, stored, stats = with_sessions(database_url, scenario)
+    assert sorted(ids + many) == stored
+    assert len(set(ids + many)) == 8
+    assert stats["flushed"] == 5 and stats["failed"] == 0
+
+
+def test_buffered_rows_are_flushed_on_stop(database_url):
+    async def scenario(sessions):
+        buffer = ScanWriteBuffer(sessions, flush_ms=10_000, durability="buffered")
+        await buffer.start()
+        rows = [await buffer.submit(ROW) for _ in range(3)]
+        await buffer.stop()
+        async with sessions() as db:
+            count = await db.scalar(text("SELECT COUNT(*) FROM scan_results"))
+        return rows, count
+
+    rows, count = with_sessions(database_url, scenario)
+    assert count == 3
+    assert all(row["created_at"] is not None for row in rows)
@@ -0,0 +1,359 @@
+"""
+Request Tracing and Profiling
+=============================
+Nested timing spans for one request, kept when the request is slow or was
+asked for, and an optional sampling profile of that request.
+
+Spans
+-----
+The current span lives in a context variable. Every metrics.stage() block
+opens a span, and so does every SQL statement on the app's engines
+(instrument_engine). asyncio.to_thread copies the context, so spans opened
+in worker threads land under the span that started the thread. Use
+run_in_context() for executors that do not copy it.
+
+When the request is not traced, span() returns a shared no-op after one
+context variable lookup, so the spans can stay in the code.
+
+Which requests
+--------------
+- TRACE_SAMPLE_RATE of all requests are traced; those slower than
+  TRACE_SLOW_SECONDS go to a ring buffer of TRACE_BUFFER_SIZE traces
+- X-Debug-Trace: trace    traces this request and always keeps it
+- X-Debug-Trace: profile  also samples its stack every
+  TRACE_PROFILE_INTERVAL_MS (one profile at a time per worker);
+  TRACE_PROFILE_RATE does the same for a fraction of requests
+When TRACE_DEBUG_TOKEN is set, the header only counts with a matching
+X-Debug-Token. Traced responses carry X-Trace-Id.
+
+The profile samples the event loop thread while the request's task is
+running on it; while Python code holds the GIL, samples come at most
+every switch interval (5 ms by default). It is returned in the
+folded-stack format ("a;b;c 12" per line) read by flamegraph.pl,
+speedscope and inferno, from GET /api/admin/traces/{id}/profile.
+
+Traces are per worker.
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "1.0"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+TRACE_PROFILE_RATE = float(os.getenv("TRACE_PROFILE_RATE", "0"))
+TRACE_PROFILE_INTERVAL_MS = float(os.getenv("TRACE_PROFILE_INTERVAL_MS", "1"))
+TRACE_DEBUG_TOKEN = os.getenv("TRACE_DEBUG_TOKEN", "")
+
+# Spans per trace; a runaway loop of SQL statements stops adding more
+TRACE_MAX_SPANS = 2000
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "children", "trace")
+
+    def __init__(self, name: str, trace: "Trace"):
+        self.name = name
+        self.trace = trace
+        self.children: List["Span"] = []
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+    def to_dict(self, origin: float) -> Dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+
+class Trace:
+    """One request: the root span, its outcome and an optional profile"""
+
+    def __init__(self, method: str, path: str, forced: bool):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.forced = forced
+        self.timestamp = time.time()
+        self.spans = 0
+        self.root = Span(f"{method} {path}", self)
+        self.status: Optional[int] = None
+        self.profile: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        return end - self.root.start
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "timestamp": self.timestamp,
+            "duration_ms": round(self.duration * 1000, 3),
+            "spans": self.spans,
+            "forced": self.forced,
+            "has_profile": self.profile is not None,
+        }
+
+    def to_dict(self) -> Dict:
+        return {**self.summary(), "root": self.root.to_dict(self.root.start)}
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _SpanContext:
+    __slots__ = ("span", "parent", "token")
+
+    def __init__(self, name: str, parent: Span):
+        self.parent = parent
+        self.span = Span(name, parent.trace)
+
+    def __enter__(self):
+        trace = self.parent.trace
+        if trace.spans < TRACE_MAX_SPANS:
+            trace.spans += 1
+            self.parent.children.append(self.span)
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end = time.perf_counter()
+        try:
+            _current_span.reset(self.token)
+        except ValueError:   # exited from another context (closed generator)
+            _current_span.set(self.parent)
+        return False
+
+
+def span(name: str):
+    """`with span("name"):` - a child of the current span, or a no-op"""
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP
+    return _SpanContext(name, parent)
+
+
+def active() -> bool:
+    return _current_span.get() is not None
+
+
+def run_in_context(fn: Callable, *args) -> Callable[[], object]:
+    """fn(*args) bound to a copy of the current context, for executors that
+    do not copy it (loop.run_in_executor)"""
+    context = contextvars.copy_context()
+    return lambda: context.run(fn, *args)
+
+
+# -- SQL statements -----------------------------------------------------------
+
+_instrumented_engines = set()
+_SQL_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+\"?(\w+)", re.IGNORECASE)
+
+
+def _statement_name(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    table = _SQL_TABLE.search(statement)
+    return f"db {verb} {table.group(1)}" if table else f"db {verb}"
+
+
+def instrument_engine(engine):
+    """A span per SQL statement on engine (sync Engine or AsyncEngine)"""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if id(sync_engine) in _instrumented_engines:
+        return   # shared writer/reader engine, already instrumented
+    _instrumented_engines.add(id(sync_engine))
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current_span.get() is None:
+            return
+        ctx = span(_statement_name(statement))
+        ctx.__enter__()
+        conn.info.setdefault("trace_spans", []).append(ctx)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("trace_spans")
+        if stack:
+            stack.pop().__exit__(None, None, None)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        stack = conn.info.get("trace_spans") if conn is not None else None
+        if stack:
+            stack.pop().__exit__(None, None, None)
+
+
+# -- profiling ----------------------------------------------------------------
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's stack every interval, counting only the samples
+    taken while task is the loop's running task.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, task: asyncio.Task,
+                 interval: float = TRACE_PROFILE_INTERVAL_MS / 1000):
+        super().__init__(name="trace-profiler", daemon=True)
+        self.loop = loop
+        self.task = task
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _label(code) -> str:
+        name = getattr(code, "co_qualname", code.co_name)
+        return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            if asyncio.current_task(self.loop) is not self.task:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                if frame.f_code.co_filename != __file__:
+                    stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> str:
+        """Stop sampling; the folded stacks, heaviest first"""
+        self._stop_event.set()
+        self.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# -- request side -------------------------------------------------------------
+
+class TraceBuffer:
+    """The last TRACE_BUFFER_SIZE kept traces"""
+
+    def __init__(self, size: int = TRACE_BUFFER_SIZE):
+        self._traces = deque(maxlen=size)
+        self._stats = {"traced": 0, "kept": 0, "profiled": 0}
+
+    def count(self, event: str):
+        self._stats[event] += 1
+
+    def add(self, trace: Trace):
+        self._traces.append(trace)
+        self._stats["kept"] += 1
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        return next((t for t in self._traces if t.id == trace_id), None)
+
+    def list(self, min_ms: float = 0, limit: int = 50) -> List[Dict]:
+        traces = [t.summary() for t in reversed(self._traces)
+                  if t.duration * 1000 >= min_ms]
+        return traces[:limit]
+
+    def stats(self) -> Dict:
+        return {**self._stats, "buffered": len(self._traces), "size": self._traces.maxlen,
+                "sample_rate": TRACE_SAMPLE_RATE, "slow_seconds": TRACE_SLOW_SECONDS}
+
+
+trace_buffer = TraceBuffer()
+
+
+def _debug_mode(scope) -> Optional[str]:
+    """'trace' or 'profile' from the X-Debug-Trace header, if allowed"""
+    mode = token = None
+    for key, value in scope.get("headers", ()):
+        if key == b"x-debug-trace":
+            mode = value.decode("latin-1").strip().lower()
+        elif key == b"x-debug-token":
+            token = value.decode("latin-1")
+    if mode not in ("trace", "profile", "1"):
+        return None
+    if TRACE_DEBUG_TOKEN and token != TRACE_DEBUG_TOKEN:
+        return None
+    return "profile" if mode == "profile" else "trace"
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware starting, profiling and keeping request traces"""
+
+    def __init__(self, app, buffer: TraceBuffer = trace_buffer):
+        self.app = app
+        self.buffer = buffer
+        self._profiling = threading.Lock()   # one profile at a time
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = _debug_mode(scope)
+        forced = mode is not None
+        if not forced:
+            if TRACE_PROFILE_RATE and random.random() < TRACE_PROFILE_RATE:
+                mode = "profile"
+            elif not (TRACE_SAMPLE_RATE and random.random() < TRACE_SAMPLE_RATE):
+                await self.app(scope, receive, send)
+                return
+
+        trace = Trace(scope["method"], scope["path"], forced)
+        self.buffer.count("traced")
+        sampler = None
+        if mode == "profile" and self._profiling.acquire(blocking=False):
+            sampler = StackSampler(asyncio.get_running_loop(), asyncio.current_task())
+            sampler.start()
+
+        trace_id_header = (b"x-trace-id", trace.id.encode())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), trace_id_header]}
+            await send(message)
+
+        token = _current_span.set(trace.root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_span.reset(token)
+            trace.root.end = time.perf_counter()
+            if sampler is not None:
+                trace.profile = sampler.stop()
+                self._profiling.release()
+                self.buffer.count("profiled")
+            route = scope.get("route")
+            if route is not None:
+                trace.root.name = f"{trace.method} {route.path}"
+            if trace.forced or sampler is not None or trace.duration >= TRACE_SLOW_SECONDS:
+                self.buffer.add(trace)
@@ -140,6 +140,7 @@ export interface VoiceAnalysisResponse {
 export interface ChatMessageRequest {
     message: string;
     context?: Record<string, unknown>;
+    session_id?: string;
 }
 
 export interface ChatMessageResponse {
@@ -154,11 +155,13 @@ export interface ChatMessageResponse {
         duration?: string;
     };
     timestamp: string;
+    session_id: string;
     conversation_id: number;
 }
 
 class ApiService {
     private baseURL: string;
+    private chatSessionId?: string;
 
     constructor() {
         this.baseURL = API_BASE_URL;
@@ -300,26 +303,80 @@ class ApiService {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify(request),
+            body: JSON.stringify({ session_id: this.chatSessionId, ...request }),
         });
 
         if (!response.ok) {
             throw new Error('Chat request failed');
         }
 
-        return response.json();
+        const result: ChatMessageResponse = await response.json();
+        this.chatSessionId = result.session_id;
+        return result;
+    }
+
+    /**
+     * Send chat message and receive the reply as it is generated
+     * (Server-Sent Events from /api/chat/stream). Abort the signal to stop.
+     */
+    async streamChatMessage(
+        request: ChatMessageRequest,
+        onEvent: (event: 'meta' | 'token' | 'done' | 'error', data: Record<string, unknown>) => void,
+        signal?: AbortSignal,
+    ): Promise<void> {
+        const response = await fetch(`${this.baseURL}/api/chat/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ session_id: this.chatSessionId, ...request }),
+            signal,
+        });
+
+        if (!response.ok || !response.body) {
+            throw new Error('Chat request failed');
+        }
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            let end;
+            while ((end = buffer.indexOf('\n\n')) >= 0) {
+                const frame = buffer.slice(0, end);
+                buffer = buffer.slice(end + 2);
+                const event = frame.match(/^event: (.*)$/m)?.[1] as 'meta' | 'token' | 'done' | 'error';
+                const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] ?? '{}');
+                if (event === 'meta') {
+                    this.chatSessionId = data.session_id;
+                }
+                onEvent(event, data);
+            }
+        }
     }
 
     /**
      * Get chat conversation history
      */
-    async getChatHistory(): Promise<{
+    async getChatHistory(sessionId = this.chatSessionId): Promise<{
+        session_id: string;
         total_messages: number;
+        history_depth: number;
         intents_discussed: string[];
+        intent_counts: Record<string, number>;
         entities_mentioned: Record<string, string[]>;
+        first_message_at: string | null;
+        last_message_at: string | null;
         conversation_history: unknown[];
+        previous_page_before: number | null;
     }> {
-        const response = await fetch(`${this.baseURL}/api/chat/history`);
+        if (!sessionId) {
+            throw new Error('No chat session yet');
+        }
+        const response = await fetch(
+            `${this.baseURL}/api/chat/history?session=${encodeURIComponent(sessionId)}`);
 
         if (!response.ok) {
             throw new Error('Failed to fetch chat history');